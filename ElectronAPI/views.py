@@ -1,10 +1,8 @@
 #ElectronAPI/views.py
 import os
-from datetime import datetime, time, timedelta
+from datetime import datetime, timedelta
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
-from django.db.models import Count
-from django.db.models.functions import TruncDay
 from django.http import JsonResponse, FileResponse
 from django.conf import settings
 from rest_framework import status, permissions, generics
@@ -25,6 +23,7 @@ from core.models import (
     ProductOperation,
     RetouchRequestProduct
     )
+from core.staff_stats_logic import day_range, photographer_daily_photographed
 
 
 # --- Получение списка заявок на съемке ---
@@ -203,29 +202,11 @@ class PhotographerStats(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        start_datetime = timezone.make_aware(datetime.combine(start_date, time.min))
-        end_datetime = timezone.make_aware(datetime.combine(end_date, time.max))
+        start_datetime, end_datetime = day_range(start_date, end_date)
+        daily_counts = photographer_daily_photographed(request.user, start_datetime, end_datetime)
 
-        queryset = STRequestProduct.objects.filter(
-            request__photographer=request.user,
-            request__photo_date__range=(start_datetime, end_datetime),
-            photo_status__id__in=[1, 2, 25],
-            sphoto_status__id=1
-        )
-
-        total_count = queryset.count()
-
-        daily_counts = (
-            queryset
-            .annotate(day=TruncDay('request__photo_date'))
-            .values('day')
-            .annotate(count=Count('id'))
-            .order_by('day')
-        )
-
-        daily_data = {
-            item['day'].strftime('%Y-%m-%d'): item['count'] for item in daily_counts
-        }
+        total_count = sum(daily_counts.values())
+        daily_data = {day.strftime('%Y-%m-%d'): count for day, count in daily_counts.items()}
 
         return Response({
             'total_count': total_count,
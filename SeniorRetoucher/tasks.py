@@ -7,6 +7,7 @@ from aiogram.utils.markdown import hbold, hcode
 from django.conf import settings
 from django.utils import timezone
 from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from django.db import transaction
 from django.db.models import Max
 from google.oauth2 import service_account
@@ -16,6 +17,7 @@ from googleapiclient.errors import HttpError
 # Импортируем нужные модели из core приложения
 # Убедитесь, что путь импорта соответствует вашей структуре проекта
 from core.models import RetouchRequestProduct, STRequestProduct, RetouchRequest
+from manager.numbering_logic import allocate_number, RETOUCH_REQUEST_SEQUENCE
 
 # Настраиваем логирование
 logger = logging.getLogger(__name__)
@@ -122,8 +124,7 @@ def check_retoucher_folders():
         message_text = "\n".join(message_parts)
         
         logger.info(f"Отправка отчета в чат {TARGET_CHAT_ID} (тема {MESSAGE_THREAD_ID})...")
-        async_task(
-            'telegram_bot.tasks.send_message_task',
+        enqueue_telegram_message(
             chat_id=TARGET_CHAT_ID,
             text=message_text,
             message_thread_id=MESSAGE_THREAD_ID,
@@ -177,8 +178,7 @@ def schedule_auto_retouch_requests():
         try:
             with transaction.atomic():
                 # Генерируем новый номер заявки
-                last_request_number = RetouchRequest.objects.aggregate(max_number=Max('RequestNumber'))['max_number']
-                new_request_number = (last_request_number or 0) + 1
+                new_request_number = allocate_number(RETOUCH_REQUEST_SEQUENCE)
                 
                 logger.info(f"Создание заявки #{new_request_number} для {len(chunk_ids)} продуктов.")
 
@@ -225,8 +225,7 @@ def schedule_auto_retouch_requests():
         thread_id = 11
 
         try:
-            async_task(
-                'telegram_bot.tasks.send_message_task',
+            enqueue_telegram_message(
                 chat_id=chat_id,
                 text=message,
                 message_thread_id=thread_id
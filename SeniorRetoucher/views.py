@@ -6,6 +6,7 @@ from django.db import transaction
 from django.db.models import Count, Q, Max
 from django.contrib.auth.models import User, Group
 from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from aiogram.utils.markdown import hbold
 from rest_framework import generics, views, status
 from rest_framework.response import Response
@@ -22,6 +23,7 @@ from core.models import (
     UserProfile,
     RetouchRequestStatus
 )
+from manager.numbering_logic import allocate_number, RETOUCH_REQUEST_SEQUENCE
 
 from .serializers import (
     STRequestProductSerializer,
@@ -101,15 +103,8 @@ class CreateRetouchRequestView(views.APIView):
             return Response({"error": "Retoucher not found."}, status=status.HTTP_404_NOT_FOUND)
             
         # --- ИЗМЕНЕННЫЙ БЛОК ---
-        # Генерация инкрементального номера заявки.
-        # Находим максимальный существующий номер.
-        last_request_number = RetouchRequest.objects.aggregate(max_number=Max('RequestNumber'))['max_number']
-        
-        # Если в таблице есть записи, прибавляем 1, иначе начинаем с 1 (или любого другого числа).
-        if last_request_number is not None:
-            new_request_number = last_request_number + 1
-        else:
-            new_request_number = 1 # Первая заявка будет с номером 1
+        # Генерация инкрементального номера заявки из общего счетчика.
+        new_request_number = allocate_number(RETOUCH_REQUEST_SEQUENCE)
         # --- КОНЕЦ ИЗМЕНЕННОГО БЛОКА ---
 
         # Create RetouchRequest
@@ -159,8 +154,7 @@ class CreateRetouchRequestView(views.APIView):
             if retoucher.profile and retoucher.profile.telegram_id:
                 message = (f"Вам назначена заявка {new_request.RequestNumber}, "
                            f"количество SKU: {len(products_to_link)}")
-                async_task(
-                    'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+                enqueue_telegram_message(
                     chat_id=retoucher.profile.telegram_id,
                     text=message
                 )
@@ -347,8 +341,7 @@ class UpdateRetouchRequestStatusView(views.APIView):
             try:
                 if retoucher and retoucher.profile and retoucher.profile.telegram_id:
                     message = f"Правки по заявке {retouch_request.RequestNumber}"
-                    async_task(
-                        'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+                    enqueue_telegram_message(
                         chat_id=retoucher.profile.telegram_id,
                         text=message
                     )
@@ -476,8 +469,7 @@ class ReassignRetoucherView(views.APIView):
                 num_products = retouch_request.retouch_products.count()
                 message = (f"Вам назначена заявка {retouch_request.RequestNumber}, "
                            f"количество SKU: {num_products}")
-                async_task(
-                    'telegram_bot.tasks.send_message_task',
+                enqueue_telegram_message(
                     chat_id=new_retoucher.profile.telegram_id,
                     text=message
                 )
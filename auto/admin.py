@@ -5,3 +5,8 @@ from . import models
 @admin.register(models.RGTScripts)
 class RGTScriptsAdmin(admin.ModelAdmin):
     list_display = ['id', 'OKZReorderEnable', 'OKZReorderTreshold', 'OldProductsPriorityEnable', 'OldProductsPriorityTreshold']
+
+@admin.register(models.CatalogueImport)
+class CatalogueImportAdmin(admin.ModelAdmin):
+    list_display = ['id', 'file_name', 'md5_checksum', 'started_at', 'finished_at', 'is_success']
+    readonly_fields = ['report']
@@ -0,0 +1,533 @@
+# auto/import_logic.py
+"""
+Загрузка выгрузки товаров из Google Drive.
+
+Файл скачивается один раз, читается потоково (openpyxl read_only) чанками,
+каждая строка разбирается один раз в типизированную запись и раздается
+во все цели (core.Product и render.Product). Запись в базу - bulk_create /
+bulk_update по чанку вместо update_or_create на каждую строку.
+
+Журнал загрузок (CatalogueImport) позволяет пропускать запуск, если файл
+не менялся, а хеши строк (CatalogueRowHash) - не трогать строки, содержимое
+которых совпадает с прошлой загрузкой и с текущими значениями в базе.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from itertools import islice
+
+import openpyxl
+from django.db import transaction, DatabaseError
+from django.db.models import IntegerField, BigIntegerField
+from django.utils import timezone
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
+
+from core.models import Product, ProductCategory
+from render.models import Product as RenderProduct
+
+from .models import CatalogueImport, CatalogueRowHash
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+SERVICE_ACCOUNT_FILE = 'credentials.json'
+CATALOGUE_FOLDER_ID = '1DMJTs6tUUA6ERkDSDTUYYsYtKHp5yIdv'
+XLSX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Сколько строк файла обрабатываем за один проход (одна транзакция, несколько запросов)
+IMPORT_CHUNK_SIZE = 2000
+
+# Колонка с последним используемым значением (остаток) - строки короче дополняем None
+ROW_WIDTH = 15
+
+_INT_BOUNDS = {
+    IntegerField: (-2**31, 2**31 - 1),
+    BigIntegerField: (-2**63, 2**63 - 1),
+}
+
+
+def new_import_report() -> dict:
+    """Пустой отчет о загрузке: сколько строк добавлено/обновлено/без изменений/отклонено."""
+    return {'inserted': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0}
+
+
+def merge_import_report(report: dict, other: dict):
+    for key, value in other.items():
+        report[key] += value
+
+
+def format_import_report(report: dict) -> str:
+    return (
+        f"добавлено {report['inserted']}, обновлено {report['updated']}, "
+        f"без изменений {report['unchanged']}, отклонено {report['rejected']}"
+    )
+
+
+# --- Google Drive ---
+
+def get_drive_service():
+    creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    return build('drive', 'v3', credentials=creds)
+
+
+def find_latest_catalogue_file(drive_service):
+    """Возвращает метаданные последнего по modifiedTime .xlsx в папке выгрузки или None."""
+    query = f"'{CATALOGUE_FOLDER_ID}' in parents and mimeType='{XLSX_MIME_TYPE}' and trashed=false"
+    results = drive_service.files().list(
+        q=query,
+        fields="files(id, name, modifiedTime, md5Checksum)",
+        includeItemsFromAllDrives=True,
+        supportsAllDrives=True
+    ).execute()
+    items = results.get('files', [])
+    if not items:
+        return None
+    items.sort(key=lambda x: x.get('modifiedTime', ''), reverse=True)
+    return items[0]
+
+
+def download_catalogue_file(drive_service, file_meta) -> str:
+    """Скачивает файл во временный .xlsx и проверяет, что это zip. Возвращает путь к файлу."""
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as temp_file:
+        temp_file_path = temp_file.name
+
+    try:
+        request = drive_service.files().get_media(fileId=file_meta['id'])
+        with open(temp_file_path, 'wb') as fh:
+            downloader = MediaIoBaseDownload(fh, request)
+            done = False
+            while not done:
+                status, done = downloader.next_chunk()
+                logger.info(f"Загружено {int(status.progress() * 100)}%.")
+
+        if not zipfile.is_zipfile(temp_file_path):
+            with open(temp_file_path, 'rb') as f_content:
+                file_start_content = f_content.read(100)
+            logger.error(f"Файл {file_meta['name']} не является корректным XLSX (не ZIP). Начало содержимого: {file_start_content}")
+            raise Exception("Скачанный файл не является корректным XLSX (не распознается как ZIP-архив).")
+    except Exception:
+        os.remove(temp_file_path)
+        raise
+
+    return temp_file_path
+
+
+# --- Разбор файла ---
+
+def iter_sheet_chunks(file_path, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Потоково читает активный лист xlsx (read_only) и отдает чанки
+    (row_index, values) начиная со второй строки. Память не растет с размером файла.
+    """
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows = enumerate(ws.iter_rows(min_row=2, values_only=True), start=2)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield [
+                (row_index, tuple(values) + (None,) * (ROW_WIDTH - len(values)))
+                for row_index, values in chunk
+            ]
+    finally:
+        wb.close()
+
+
+def _to_int(value):
+    return int(value) if value is not None else None
+
+
+def _to_str(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def parse_catalogue_row(values) -> dict:
+    """
+    Разбирает строку выгрузки в типизированную запись, общую для всех целей.
+    Пустые строки - None. Бросает ValueError, если строку нельзя загрузить.
+    """
+    barcode = _to_str(values[0])
+    if barcode is None:
+        raise ValueError("пустой баркод")
+    return {
+        'barcode': barcode,
+        'product_id': _to_int(values[1]),
+        'sku_id': _to_int(values[2]),
+        'name': _to_str(values[3]),
+        'category_id': _to_int(values[4]),
+        'shop_type': _to_str(values[5]),
+        'category_name': _to_str(values[6]),
+        'shop_id': _to_int(values[7]),
+        'shop_name': _to_str(values[8]),
+        'product_status': _to_str(values[9]),
+        'product_moderation_status': _to_str(values[10]),
+        'photo_moderation_status': _to_str(values[11]),
+        'sku_status': _to_str(values[12]),
+        'quantity': _to_int(values[14]),
+    }
+
+
+def parse_catalogue_chunk(chunk):
+    """
+    Разбирает чанк строк. Возвращает ({barcode: запись}, количество отклоненных строк).
+    При повторе баркода в файле выигрывает последняя строка.
+    """
+    records = {}
+    rejected = 0
+    for row_index, values in chunk:
+        try:
+            record = parse_catalogue_row(values)
+        except (ValueError, TypeError) as e:
+            rejected += 1
+            logger.warning(f"Строка {row_index}: {e}. Пропускаем строку. Данные: {list(values)}")
+            continue
+        records[record['barcode']] = record
+    return records, rejected
+
+
+def row_hash(data: dict) -> str:
+    """MD5 содержимого строки для сравнения с прошлой загрузкой."""
+    return hashlib.md5(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def validate_for_model(model, data: dict):
+    """
+    Проверяет длину строк и диапазон целых чисел по описанию полей модели.
+    Нужна, чтобы одна битая строка не уронила весь bulk-запрос чанка.
+    """
+    for field_name, value in data.items():
+        if value is None:
+            continue
+        field = model._meta.get_field(field_name)
+        max_length = getattr(field, 'max_length', None)
+        if max_length and isinstance(value, str) and len(value) > max_length:
+            raise ValueError(f"{field_name}: длина {len(value)} больше {max_length}")
+        bounds = _INT_BOUNDS.get(type(field))
+        if bounds and not (bounds[0] <= value <= bounds[1]):
+            raise ValueError(f"{field_name}: значение {value} вне диапазона")
+
+
+# --- Цели загрузки ---
+
+class CatalogueTarget:
+    """
+    Модель, в которую раздаются строки выгрузки.
+    Наследники задают модель, ключевое поле, список полей и преобразование записи.
+    """
+    name = None
+    model = None
+    key_field = None
+    fields = []
+
+    def to_fields(self, record: dict) -> dict:
+        raise NotImplementedError
+
+    def before_write(self, records: dict):
+        """Вызывается внутри транзакции чанка до записи товаров."""
+
+    def upsert(self, rows: dict, report: dict):
+        """rows: {key: {поле: значение}}. Один SELECT по ключам и bulk_create/bulk_update."""
+        existing = {
+            getattr(obj, self.key_field): obj
+            for obj in self.model.objects.filter(**{f'{self.key_field}__in': list(rows.keys())})
+        }
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        for key, data in rows.items():
+            obj = existing.get(key)
+            if obj is None:
+                to_create.append(self.model(**{self.key_field: key}, **data))
+                continue
+            changed = False
+            for field, value in data.items():
+                if getattr(obj, field) != value:
+                    setattr(obj, field, value)
+                    changed = True
+            if changed:
+                obj.updated_at = now
+                to_update.append(obj)
+            else:
+                report['unchanged'] += 1
+
+        if to_create:
+            self.model.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            self.model.objects.bulk_update(to_update, self.fields + ['updated_at'], batch_size=500)
+        report['inserted'] += len(to_create)
+        report['updated'] += len(to_update)
+
+    def hash_fields(self, record: dict) -> dict:
+        """Что входит в хеш строки - по умолчанию все загружаемые поля."""
+        return self.to_fields(record)
+
+    def _filter_unchanged(self, rows: dict, hashes: dict, report: dict) -> dict:
+        """
+        Отбрасывает строки, хеш которых совпадает с сохраненным и значения которых в базе
+        все еще совпадают с файлом. Те же колонки меняют и другие писатели
+        (core.product_upload_logic, ручная правка остатка), поэтому одного хеша мало:
+        текущие значения кандидатов читаются одним запросом только по загружаемым колонкам.
+        """
+        stored = dict(
+            CatalogueRowHash.objects.filter(target=self.name, barcode__in=list(rows.keys()))
+            .values_list('barcode', 'row_hash')
+        )
+        candidates = [key for key in rows if stored.get(key) == hashes[key]]
+        if not candidates:
+            return rows
+        unchanged = {
+            current[self.key_field]
+            for current in self.model.objects.filter(**{f'{self.key_field}__in': candidates})
+            .values(self.key_field, *self.fields)
+            if all(current[field] == value for field, value in rows[current[self.key_field]].items())
+        }
+        report['unchanged'] += len(unchanged)
+        return {key: data for key, data in rows.items() if key not in unchanged}
+
+    def _save_hashes(self, hashes: dict):
+        CatalogueRowHash.objects.bulk_create(
+            [CatalogueRowHash(target=self.name, barcode=key, row_hash=value) for key, value in hashes.items()],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['target', 'barcode'],
+            update_fields=['row_hash', 'updated_at'],
+        )
+
+    def import_records(self, records: dict, report: dict, use_hashes=True):
+        rows = {}
+        for barcode, record in records.items():
+            data = self.to_fields(record)
+            try:
+                validate_for_model(self.model, {self.key_field: barcode, **data})
+            except ValueError as e:
+                report['rejected'] += 1
+                logger.warning(f"[{self.name}] Баркод {barcode}: {e}. Пропускаем строку.")
+                continue
+            rows[barcode] = data
+
+        if not rows:
+            return
+
+        hashes = {key: row_hash(self.hash_fields(records[key])) for key in rows}
+        if use_hashes:
+            rows = self._filter_unchanged(rows, hashes, report)
+            if not rows:
+                return
+        hashes = {key: hashes[key] for key in rows}
+
+        chunk_report = new_import_report()
+        try:
+            with transaction.atomic():
+                self.before_write({key: records[key] for key in rows})
+                self.upsert(rows, chunk_report)
+                self._save_hashes(hashes)
+        except DatabaseError as e:
+            logger.error(f"[{self.name}] Ошибка bulk-загрузки чанка ({len(rows)} строк): {e}. Переходим на построчную загрузку.")
+            chunk_report = new_import_report()
+            self._import_row_by_row(records, rows, hashes, chunk_report)
+        merge_import_report(report, chunk_report)
+
+    def _import_row_by_row(self, records: dict, rows: dict, hashes: dict, report: dict):
+        """Запасной путь: если bulk-запрос чанка упал, грузим строки по одной и отбраковываем битые."""
+        for key, data in rows.items():
+            row_report = new_import_report()
+            try:
+                with transaction.atomic():
+                    self.before_write({key: records[key]})
+                    self.upsert({key: data}, row_report)
+                    self._save_hashes({key: hashes[key]})
+            except DatabaseError as e:
+                row_report = new_import_report()
+                row_report['rejected'] = 1
+                logger.error(f"[{self.name}] Баркод {key}: строка отклонена базой данных: {e}")
+            merge_import_report(report, row_report)
+
+
+class CoreProductTarget(CatalogueTarget):
+    name = 'core'
+    model = Product
+    key_field = 'barcode'
+    fields = [
+        'ProductID',
+        'SKUID',
+        'name',
+        'category_id',
+        'seller',
+        'in_stock_sum',
+        'ShopType',
+        'ShopName',
+        'ProductStatus',
+        'ProductModerationStatus',
+        'PhotoModerationStatus',
+        'SKUStatus',
+    ]
+
+    def to_fields(self, record):
+        return {
+            'ProductID': record['product_id'],
+            'SKUID': record['sku_id'],
+            'name': record['name'] or "",
+            'category_id': record['category_id'],
+            'seller': record['shop_id'],
+            'in_stock_sum': record['quantity'] or 0,
+            'ShopType': record['shop_type'] or "",
+            'ShopName': record['shop_name'] or "",
+            'ProductStatus': record['product_status'] or "",
+            'ProductModerationStatus': record['product_moderation_status'] or "",
+            'PhotoModerationStatus': record['photo_moderation_status'] or "",
+            'SKUStatus': record['sku_status'] or "",
+        }
+
+    def hash_fields(self, record):
+        # Имя категории не хранится в Product, но должно доходить до ProductCategory
+        return {**self.to_fields(record), 'category_name': record['category_name']}
+
+    def before_write(self, records):
+        """Создает недостающие категории и обновляет изменившиеся имена."""
+        categories = {}
+        for record in records.values():
+            category_id = record['category_id']
+            if category_id is not None and (record['category_name'] or category_id not in categories):
+                categories[category_id] = record['category_name']
+        if not categories:
+            return
+
+        existing = ProductCategory.objects.in_bulk(list(categories.keys()))
+        to_create = []
+        to_update = []
+        now = timezone.now()
+        for category_id, name in categories.items():
+            category = existing.get(category_id)
+            if category is None:
+                to_create.append(ProductCategory(id=category_id, name=name))
+                logger.info(f"Создана категория: ID={category_id}, Name='{name}'")
+            elif name and category.name != name:
+                logger.info(f"Обновлено имя категории: ID={category_id}, New Name='{name}', Old Name='{category.name}'")
+                category.name = name
+                category.updated_at = now
+                to_update.append(category)
+        if to_create:
+            ProductCategory.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_update:
+            ProductCategory.objects.bulk_update(to_update, ['name', 'updated_at'])
+
+
+class RenderProductTarget(CatalogueTarget):
+    name = 'render'
+    model = RenderProduct
+    key_field = 'Barcode'
+    fields = [
+        'ProductID',
+        'SKUID',
+        'Name',
+        'CategoryName',
+        'CategoryID',
+        'ShopID',
+        'ShopType',
+        'ShopName',
+        'ProductStatus',
+        'ProductModerationStatus',
+        'PhotoModerationStatus',
+        'SKUStatus',
+        'WMSQuantity',
+    ]
+
+    def to_fields(self, record):
+        return {
+            'ProductID': record['product_id'],
+            'SKUID': record['sku_id'],
+            'Name': record['name'],
+            'CategoryName': record['category_name'],
+            'CategoryID': record['category_id'],
+            'ShopID': record['shop_id'],
+            'ShopType': record['shop_type'],
+            'ShopName': record['shop_name'],
+            'ProductStatus': record['product_status'],
+            'ProductModerationStatus': record['product_moderation_status'],
+            'PhotoModerationStatus': record['photo_moderation_status'],
+            'SKUStatus': record['sku_status'],
+            'WMSQuantity': record['quantity'],
+        }
+
+
+CATALOGUE_TARGETS = {
+    CoreProductTarget.name: CoreProductTarget,
+    RenderProductTarget.name: RenderProductTarget,
+}
+
+
+def import_catalogue_file(file_path, targets=None, chunk_size=IMPORT_CHUNK_SIZE, use_hashes=True) -> dict:
+    """
+    Один потоковый проход по файлу с раздачей каждого чанка во все цели.
+    use_hashes=False - сравнивать все строки с базой, игнорируя сохраненные хеши.
+    Возвращает {имя цели: отчет new_import_report()}.
+    """
+    target_objects = [CATALOGUE_TARGETS[name]() for name in (targets or CATALOGUE_TARGETS)]
+    reports = {target.name: new_import_report() for target in target_objects}
+
+    for chunk in iter_sheet_chunks(file_path, chunk_size):
+        records, rejected = parse_catalogue_chunk(chunk)
+        for target in target_objects:
+            reports[target.name]['rejected'] += rejected
+            target.import_records(records, reports[target.name], use_hashes=use_hashes)
+        logger.info(
+            f"Обработано строк до {chunk[-1][0]}: "
+            + "; ".join(f"{name}: {format_import_report(report)}" for name, report in reports.items())
+        )
+    return reports
+
+
+def run_catalogue_import(targets=None, chunk_size=IMPORT_CHUNK_SIZE, force=False):
+    """
+    Полный цикл: поиск последнего файла в папке выгрузки, одно скачивание,
+    один разбор и раздача в цели.
+    Если последняя успешная загрузка была из того же файла (id + md5/modifiedTime),
+    файл не скачивается. force=True - загрузить заново и сравнить все строки с базой.
+    Возвращает (метаданные файла, отчеты по целям); отчеты = None, если запуск пропущен,
+    и (None, {}), если файлов нет.
+    """
+    drive_service = get_drive_service()
+    latest_file = find_latest_catalogue_file(drive_service)
+    if latest_file is None:
+        logger.warning("Файлы не найдены в указанной папке Google Drive.")
+        return None, {}
+
+    last_import = CatalogueImport.objects.filter(is_success=True).first()
+    if not force and last_import and last_import.is_same_file(latest_file):
+        logger.info(f"Файл {latest_file['name']} не изменился с загрузки {last_import.started_at}. Пропускаем.")
+        return latest_file, None
+
+    ledger = CatalogueImport.objects.create(
+        file_id=latest_file['id'],
+        file_name=latest_file.get('name'),
+        md5_checksum=latest_file.get('md5Checksum'),
+        modified_time=latest_file.get('modifiedTime'),
+    )
+
+    logger.info(f"Загружаем файл: {latest_file['name']} (ID: {latest_file['id']}, Modified: {latest_file.get('modifiedTime')})")
+    temp_file_path = download_catalogue_file(drive_service, latest_file)
+    try:
+        reports = import_catalogue_file(temp_file_path, targets, chunk_size, use_hashes=not force)
+    finally:
+        try:
+            os.remove(temp_file_path)
+            logger.info(f"Временный файл {temp_file_path} удален.")
+        except OSError as e:
+            logger.error(f"Не удалось удалить временный файл {temp_file_path}: {e}")
+
+    ledger.finished_at = timezone.now()
+    ledger.report = reports
+    # Пропускать следующий запуск можно, только если файл загружен во все цели
+    ledger.is_success = targets is None or set(targets) == set(CATALOGUE_TARGETS)
+    ledger.save(update_fields=['finished_at', 'report', 'is_success'])
+    return latest_file, reports
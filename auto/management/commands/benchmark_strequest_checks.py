@@ -0,0 +1,111 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Product, STRequest, STRequestProduct
+from auto.tasks import CHECKED_PHOTO_STATUS_IDS, get_unverified_photo_counts, update_strequest_status
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_update_strequest_status():
+    # Прежняя реализация: проход по заявкам и их товарам в Python, save() на каждую
+    for st_request in STRequest.objects.filter(status_id=3):
+        products = STRequestProduct.objects.filter(request=st_request)
+        if not products.exists():
+            continue
+        if all(p.photo_status_id in CHECKED_PHOTO_STATUS_IDS and p.sphoto_status_id == 1 for p in products):
+            st_request.status_id = 5
+            st_request.check_time = timezone.now()
+            st_request.save()
+
+
+def _legacy_unverified_photo_counts():
+    # Прежняя реализация: отдельный COUNT на каждую заявку
+    lines = []
+    for st_request in STRequest.objects.filter(status_id=3):
+        products_count = STRequestProduct.objects.filter(
+            request=st_request, photo_status_id__in=CHECKED_PHOTO_STATUS_IDS
+        ).exclude(sphoto_status_id=1).count()
+        if products_count > 0:
+            photographer = st_request.photographer
+            lines.append((st_request.RequestNumber, photographer, products_count))
+    return lines
+
+
+def _new_unverified_photo_counts():
+    return list(get_unverified_photo_counts())
+
+
+class Command(BaseCommand):
+    help = ('Замер update_strequest_status и check_unverified_photos (старая и новая реализация) '
+            'на синтетических заявках в статусе 3. Данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,500,2000',
+                            help='Число открытых заявок через запятую')
+        parser.add_argument('--products', type=int, default=20,
+                            help='Товаров в заявке')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        per_request = options['products']
+
+        self.stdout.write(f"{'заявок':>8} | {'задача':<24} | {'старая, с':>10} | {'запросов':>8} | {'новая, с':>9} | {'запросов':>8}")
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    self._create_requests(size, per_request)
+                    for title, legacy, new in [
+                        ('update_strequest_status', _legacy_update_strequest_status, update_strequest_status),
+                        ('check_unverified_photos', _legacy_unverified_photo_counts, _new_unverified_photo_counts),
+                    ]:
+                        legacy_time, legacy_queries = self._measure(legacy)
+                        new_time, new_queries = self._measure(new)
+                        self.stdout.write(
+                            f"{size:>8} | {title:<24} | {legacy_time:>10.3f} | {legacy_queries:>8} | "
+                            f"{new_time:>9.3f} | {new_queries:>8}"
+                        )
+                    raise _Rollback()
+            except _Rollback:
+                pass
+
+    def _measure(self, func):
+        # Каждый прогон на одних и тех же данных: изменения откатываются точкой сохранения
+        try:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    func()
+                    elapsed = time.perf_counter() - started
+                raise _Rollback()
+        except _Rollback:
+            pass
+        return elapsed, len(context.captured_queries)
+
+    def _create_requests(self, size, per_request):
+        products = Product.objects.bulk_create([
+            Product(barcode=f"9{index:012d}", name=f"benchmark {index}", in_stock_sum=0)
+            for index in range(per_request)
+        ])
+        requests = STRequest.objects.bulk_create([
+            STRequest(RequestNumber=f"8{index:012d}", status_id=3)
+            for index in range(size)
+        ])
+        rows = []
+        for index, st_request in enumerate(requests):
+            # Половина заявок проверена полностью, в остальных есть непроверенные товары
+            fully_checked = index % 2 == 0
+            for position, product in enumerate(products):
+                rows.append(STRequestProduct(
+                    request=st_request,
+                    product=product,
+                    photo_status_id=1,
+                    sphoto_status_id=1 if fully_checked or position % 3 else None,
+                ))
+        STRequestProduct.objects.bulk_create(rows, batch_size=5000)
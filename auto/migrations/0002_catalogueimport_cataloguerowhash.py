@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auto', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.CharField(max_length=128, verbose_name='ID файла в Google Drive')),
+                ('file_name', models.CharField(blank=True, max_length=512, null=True, verbose_name='Имя файла')),
+                ('md5_checksum', models.CharField(blank=True, max_length=32, null=True, verbose_name='MD5 файла')),
+                ('modified_time', models.CharField(blank=True, max_length=64, null=True, verbose_name='modifiedTime файла')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Начало загрузки')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание загрузки')),
+                ('is_success', models.BooleanField(default=False, verbose_name='Успешно')),
+                ('report', models.JSONField(blank=True, null=True, verbose_name='Отчет')),
+            ],
+            options={
+                'verbose_name': 'Загрузка выгрузки товаров',
+                'verbose_name_plural': 'Журнал загрузок выгрузки товаров',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogueRowHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(max_length=16, verbose_name='Цель загрузки')),
+                ('barcode', models.CharField(max_length=13, verbose_name='Баркод')),
+                ('row_hash', models.CharField(max_length=32, verbose_name='Хеш строки')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Хеш строки выгрузки',
+                'verbose_name_plural': 'Хеши строк выгрузки',
+                'constraints': [models.UniqueConstraint(fields=('target', 'barcode'), name='auto_cataloguerowhash_target_barcode_uniq')],
+            },
+        ),
+    ]
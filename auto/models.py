@@ -33,3 +33,49 @@ class RGTScripts(models.Model):
         # Если экземпляр не существует, он будет создан с настройками по умолчанию.
         obj, created = cls.objects.get_or_create(pk=1) # Используем pk=1 для определенности
         return obj
+
+
+#Журнал загрузок выгрузки товаров из Google Drive
+class CatalogueImport(models.Model):
+    file_id = models.CharField(max_length=128, verbose_name="ID файла в Google Drive")
+    file_name = models.CharField(max_length=512, blank=True, null=True, verbose_name="Имя файла")
+    md5_checksum = models.CharField(max_length=32, blank=True, null=True, verbose_name="MD5 файла")
+    modified_time = models.CharField(max_length=64, blank=True, null=True, verbose_name="modifiedTime файла")
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="Начало загрузки")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Окончание загрузки")
+    is_success = models.BooleanField(default=False, verbose_name="Успешно")
+    report = models.JSONField(null=True, blank=True, verbose_name="Отчет")
+
+    class Meta:
+        verbose_name = "Загрузка выгрузки товаров"
+        verbose_name_plural = "Журнал загрузок выгрузки товаров"
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.file_name} ({self.started_at})"
+
+    def is_same_file(self, file_meta) -> bool:
+        """Совпадает ли файл с метаданными из Drive (по md5, а если его нет - по modifiedTime)."""
+        if self.file_id != file_meta.get('id'):
+            return False
+        if file_meta.get('md5Checksum'):
+            return self.md5_checksum == file_meta['md5Checksum']
+        return self.modified_time == file_meta.get('modifiedTime')
+
+
+#Хеш содержимого строки выгрузки по каждому баркоду и цели загрузки
+class CatalogueRowHash(models.Model):
+    target = models.CharField(max_length=16, verbose_name="Цель загрузки")
+    barcode = models.CharField(max_length=13, verbose_name="Баркод")
+    row_hash = models.CharField(max_length=32, verbose_name="Хеш строки")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Хеш строки выгрузки"
+        verbose_name_plural = "Хеши строк выгрузки"
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'barcode'], name='auto_cataloguerowhash_target_barcode_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.target} - {self.barcode}"
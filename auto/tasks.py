@@ -3,13 +3,14 @@ import pytz
 import logging
 from datetime import datetime, time, timedelta
 from django.contrib.auth.models import Group, User
-from django.db.models import Q
+from django.db.models import Count, F, Q
 from django.db import transaction
 from django.utils import timezone
 
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from aiogram.utils.markdown import hbold
 
 from core.models import (
@@ -27,19 +28,38 @@ from core.models import (
     )
 from render.models import Product as RenderProduct
 
+from manager.rollup_logic import record_product_snapshot, PRODUCT_SNAPSHOT_METRICS
 from .models import RGTScripts
+from .import_logic import (
+    run_catalogue_import,
+    format_import_report,
+    CoreProductTarget,
+    RenderProductTarget
+    )
 
-import os
-import tempfile
-import zipfile
-import openpyxl
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 from googleapiclient.errors import HttpError # Импорт для обработки ошибок Google API
 
 logger = logging.getLogger(__name__)
 
+# Статусы фото, при которых товар считается отснятым
+CHECKED_PHOTO_STATUS_IDS = [1, 2, 25]
+
+
+def get_unverified_photo_counts():
+    """
+    Заявки в статусе 3 с числом отснятых, но не проверенных старшим товаров
+    (photo_status в CHECKED_PHOTO_STATUS_IDS, sphoto_status != 1). Один запрос.
+    """
+    shot = Q(strequestproduct__photo_status_id__in=CHECKED_PHOTO_STATUS_IDS)
+    return STRequest.objects.filter(status_id=3).annotate(
+        products_shot=Count('strequestproduct', filter=shot),
+        products_shot_checked=Count('strequestproduct', filter=shot & Q(strequestproduct__sphoto_status_id=1)),
+    ).annotate(
+        products_unverified=F('products_shot') - F('products_shot_checked')
+    ).filter(products_unverified__gt=0).select_related('photographer')
+
 # Проверяем количество непроверенных
 def check_unverified_photos():
     # Получаем текущее время в часовом поясе Asia/Almaty
@@ -50,28 +70,18 @@ def check_unverified_photos():
     if now < time(8, 0) or now > time(19, 40):
         return
 
-    # Выбираем заявки со статусом = 3
-    st_requests = STRequest.objects.filter(status_id=3)
     message_lines = []
+    for request in get_unverified_photo_counts():
+        # Формируем ФИО фотографа. Если фотограф отсутствует, ставим заглушку.
+        photographer = request.photographer
+        if photographer:
+            photographer_name = f"{photographer.first_name} {photographer.last_name}"
+        else:
+            photographer_name = "Нет фотографа"
 
-    for request in st_requests:
-        # Считаем количество продуктов заявки, где photo_status в [1, 2, 25] и sphoto_status != 1.
-        products_count = STRequestProduct.objects.filter(
-            request=request,
-            photo_status_id__in=[1, 2, 25]
-        ).exclude(sphoto_status_id=1).count()
-
-        if products_count > 0:
-            # Формируем ФИО фотографа. Если фотограф отсутствует, ставим заглушку.
-            photographer = request.photographer
-            if photographer:
-                photographer_name = f"{photographer.first_name} {photographer.last_name}"
-            else:
-                photographer_name = "Нет фотографа"
-            
-            message_lines.append(
-                f"Заявка {request.RequestNumber} - {photographer_name} - {products_count}"
-            )
+        message_lines.append(
+            f"Заявка {request.RequestNumber} - {photographer_name} - {request.products_unverified}"
+        )
     
     if not message_lines:
         # Если нет заявок с непроверенными фото, завершаем задачу.
@@ -92,11 +102,10 @@ def check_unverified_photos():
             profile__telegram_id__isnull=False,
             profile__telegram_id__gt="",
             profile__on_work=True
-        )
+        ).select_related('profile')
         for user in users:
             telegram_id = user.profile.telegram_id
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+            enqueue_telegram_message(
                 chat_id=telegram_id,
                 text=message_text,
             )
@@ -136,8 +145,7 @@ def check_retoucher_queue():
         # Отправляем сообщение каждому пользователю
         for user in users:
             telegram_id = user.profile.telegram_id
-            async_task(
-                'telegram_bot.tasks.send_message_task',
+            enqueue_telegram_message(
                 chat_id=telegram_id,
                 text=message_text
             )
@@ -148,69 +156,61 @@ def reset_on_work_flag():
     print(f"Reset on_work flag for {updated} user profiles")
 
 # Проверяем все заявки на съемке и переводим в отснятое, отправляем сообщение фотографу.        
+def get_fully_checked_strequests():
+    """
+    Заявки в статусе 3, у которых есть товары и все они отсняты (photo_status в
+    CHECKED_PHOTO_STATUS_IDS) и проверены старшим (sphoto_status=1). Один запрос.
+    """
+    return STRequest.objects.filter(status_id=3).annotate(
+        products_total=Count('strequestproduct'),
+        products_checked=Count('strequestproduct', filter=Q(
+            strequestproduct__photo_status_id__in=CHECKED_PHOTO_STATUS_IDS,
+            strequestproduct__sphoto_status_id=1
+        )),
+    ).filter(products_total__gt=0, products_checked=F('products_total'))
+
+
 def update_strequest_status():
-    # Получаем все заявки со статусом 3
-    st_requests = STRequest.objects.filter(status_id=3)
-    
-    for st_request in st_requests:
-        # Получаем все связанные записи
-        products = STRequestProduct.objects.filter(request=st_request)
-        # Если заявке не привязаны продукты, пропускаем её
-        if not products.exists():
+    # Заявки в статусе 3, полностью проверенные старшим фотографом (один запрос, с профилями фотографов)
+    ready_requests = list(get_fully_checked_strequests().select_related('photographer__profile'))
+    if not ready_requests:
+        return 0
+
+    # Переводим все найденные заявки в статус 5 одним UPDATE и ставим check_time = now.
+    # Условие по статусу повторяется: заявку могли перевести вручную между запросами.
+    now = timezone.now()
+    request_ids = [st_request.id for st_request in ready_requests]
+    updated = STRequest.objects.filter(id__in=request_ids, status_id=3).update(
+        status_id=5, check_time=now, updated_at=now
+    )
+    if updated != len(ready_requests):
+        # Часть заявок изменили между запросами - уведомляем только о переведенных этим UPDATE
+        moved_ids = set(STRequest.objects.filter(
+            id__in=request_ids, status_id=5, check_time=now
+        ).values_list('id', flat=True))
+        ready_requests = [st_request for st_request in ready_requests if st_request.id in moved_ids]
+
+    # Уведомляем фотографов в телеграм - профили уже загружены
+    for st_request in ready_requests:
+        photographer = st_request.photographer
+        if not photographer:
+            logger.info(f"У заявки {st_request.RequestNumber} не указан фотограф (STRequest.photographer is None).")
             continue
-        
-        all_valid = True
-        for product in products:
-            # Проверяем, что photo_status не пустой и входит в [1, 2, 25]
-            if product.photo_status_id not in [1, 2, 25]:
-                all_valid = False
-                break
-            # Проверяем, что sphoto_status не пустой и равен 1
-            if product.sphoto_status_id != 1:
-                all_valid = False
-                break
-        
-        # Если для всех продуктов условия выполнены, обновляем статус заявки на 5
-        if all_valid:
-            st_request.status_id = 5
-            # --- Начало добавленных шагов ---
-            # 1. Ставим STRequest.check_time = now
-            st_request.check_time = timezone.now()
-            
-            st_request.save() # Сохраняем изменения (status_id и check_time)
-
-            # 2. Отправляем сообщение в телеграм пользователю из поля STRequest.photographer
-            photographer = st_request.photographer
-            if photographer:
-                try:
-                    # Пытаемся получить профиль пользователя. 
-                    # UserProfile.user - это OneToOneField к User, related_name='profile'
-                    user_profile = photographer.profile 
-                    if user_profile and user_profile.telegram_id:
-                        # Пытаемся получить номер заявки. 
-                        # Замените 'RequestNumber' на фактическое имя поля в вашей модели STRequest,
-                        # если оно отличается (например, 'number', 'id' и т.д.).
-                        request_identifier = getattr(st_request, 'RequestNumber', st_request.id)
-                        
-                        message_text = f"Заявка {request_identifier} полностью проверена. Можно сдавать."
-                        async_task(
-                            'telegram_bot.tasks.send_message_task',
-                            chat_id=user_profile.telegram_id,
-                            text=message_text
-                        )
-                    else:
-                        print(f"У пользователя {photographer.username} отсутствует telegram_id в профиле.")
-                except UserProfile.DoesNotExist:
-                    print(f"У пользователя {photographer.username} отсутствует профиль UserProfile.")
-                except AttributeError as e:
-                    # Это может произойти, если у объекта photographer нет атрибута 'profile'
-                    # или у st_request нет атрибута 'RequestNumber' (и нет 'id' как запасного)
-                    print(f"Ошибка доступа к атрибуту для фотографа {photographer.username} или заявки {st_request.id}: {e}")
-            else:
-                # Пытаемся получить номер заявки для лога, если фотограф не указан
-                request_identifier_log = getattr(st_request, 'RequestNumber', st_request.id)
-                print(f"У заявки {request_identifier_log} не указан фотограф (STRequest.photographer is None).")
-            # --- Конец добавленных шагов ---
+        try:
+            user_profile = photographer.profile
+        except UserProfile.DoesNotExist:
+            logger.info(f"У пользователя {photographer.username} отсутствует профиль UserProfile.")
+            continue
+        if not user_profile.telegram_id:
+            logger.info(f"У пользователя {photographer.username} отсутствует telegram_id в профиле.")
+            continue
+        enqueue_telegram_message(
+            chat_id=user_profile.telegram_id,
+            text=f"Заявка {st_request.RequestNumber} полностью проверена. Можно сдавать."
+        )
+
+    logger.info(f"update_strequest_status: переведено в статус 5 заявок: {len(ready_requests)}")
+    return len(ready_requests)
 
 # Поздравление с ДР
 def birthday_congratulations():
@@ -239,8 +239,7 @@ def birthday_congratulations():
             message += f" - {telegram_name}"
         # Добавляем эмодзи поздравления
         message += " 🎉🎂🥳"
-        async_task(
-            'telegram_bot.tasks.send_message_task',
+        enqueue_telegram_message(
             chat_id=chat_id,
             text=message
         )
@@ -270,8 +269,7 @@ def update_priority_for_old_incoming_products(): # Изменено: bind=True 
     if not rgt_settings.OldProductsPriorityEnable:
         message = f"{TASK_NAME} - отключен в настройках."
         logger.info(f"Task: {message}") # Изменено
-        async_task(
-            'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+        enqueue_telegram_message(
             chat_id=GROUP_CHAT_ID,
             text=message,
             message_thread_id=GROUP_THREAD_ID
@@ -289,8 +287,7 @@ def update_priority_for_old_incoming_products(): # Изменено: bind=True 
             "но порог (OldProductsPriorityTreshold) не установлен в настройках РГТ."
         )
         logger.error(f"Task: {error_message}") # Изменено
-        async_task(
-            'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+        enqueue_telegram_message(
             chat_id=GROUP_CHAT_ID,
             text=error_message,
             message_thread_id=GROUP_THREAD_ID
@@ -324,8 +321,7 @@ def update_priority_for_old_incoming_products(): # Изменено: bind=True 
 
             logger.info(f"Task ({TASK_NAME}): Successfully set priority=True for {updated_count} products.") # Изменено
             group_message = f"{TASK_NAME} - обновлено {updated_count} SKU."
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+            enqueue_telegram_message(
                 chat_id=GROUP_CHAT_ID,
                 text=group_message,
                 message_thread_id=GROUP_THREAD_ID
@@ -334,8 +330,7 @@ def update_priority_for_old_incoming_products(): # Изменено: bind=True 
         else:
             logger.info(f"Task ({TASK_NAME}): No products found matching the criteria.") # Изменено
             group_message = f"{TASK_NAME} - нет SKU для обновления."
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+            enqueue_telegram_message(
                 chat_id=GROUP_CHAT_ID,
                 text=group_message,
                 message_thread_id=GROUP_THREAD_ID
@@ -390,8 +385,7 @@ def update_render_product_retouch_block_status():
             group_chat_id = "-1002559221974"
             group_thread_id = 11
             group_message = f"Скрипт блокировки рендеров, где есть готовые фото фс - {updated_count} заблокировано"
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+            enqueue_telegram_message(
                 chat_id=group_chat_id,
                 text=group_message,
                 message_thread_id=group_thread_id
@@ -444,8 +438,7 @@ def update_render_product_is_on_order_status(user_id=None, task_id=None):
         group_chat_id = "-1002559221974"
         group_thread_id = 11
         group_message = f"Статус IsOnOrder обновлен: Сброшено: {reset_count}, Обновлено: {update_count}."
-        async_task(
-            'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+        enqueue_telegram_message(
             chat_id=group_chat_id,
             text=group_message,
             message_thread_id=group_thread_id
@@ -483,188 +476,46 @@ def update_render_product_is_on_order_status(user_id=None, task_id=None):
     return final_message
 
 
-# Обновление базы основной Product
+# Обновление базы основной Product и базы рендеров
 def update_products_from_excel_on_drive(*args, **kwargs):
     """
-    Таска для обновления моделей Product и ProductCategory из последнего .xlsx файла в Google Drive.
+    Таска для обновления моделей Product, ProductCategory и render.Product
+    из последнего .xlsx файла в Google Drive. Файл скачивается и разбирается один раз.
     """
-    SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
-    SERVICE_ACCOUNT_FILE = 'credentials.json'
-    
     try:
-        creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        drive_service = build('drive', 'v3', credentials=creds)
-    except Exception as e:
-        logger.error(f"Ошибка аутентификации Google Drive: {e}") # Изменено
+        latest_file, reports = run_catalogue_import()
+    except FileNotFoundError:
+        logger.error("Файл credentials.json не найден.")
         return
-
-    folder_id = '1DMJTs6tUUA6ERkDSDTUYYsYtKHp5yIdv'
-    query = (
-        f"'{folder_id}' in parents and "
-        "mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' and trashed=false"
-    )
-
-    try:
-        results = drive_service.files().list(
-            q=query,
-            fields="files(id, name, modifiedTime)",
-            includeItemsFromAllDrives=True,
-            supportsAllDrives=True
-        ).execute()
     except Exception as e:
-        logger.error(f"Ошибка при запросе списка файлов из Google Drive: {e}") # Изменено
-        return
-        
-    items = results.get('files', [])
-    if not items:
-        logger.warning("Файлы не найдены в указанной папке Google Drive.") # Изменено
+        logger.error(f"Произошла ошибка во время выполнения задачи: {e}", exc_info=True)
         return
 
-    items.sort(key=lambda x: x.get('modifiedTime', ''), reverse=True)
-    latest_file = items[0]
-    file_id = latest_file['id']
-    logger.info(f"Загружаем файл: {latest_file['name']} (ID: {file_id}, Modified: {latest_file.get('modifiedTime')})") # Изменено
-
-    temp_file_path = None
-    try:
-        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as temp_file:
-            temp_file_path = temp_file.name
-        
-        request = drive_service.files().get_media(fileId=file_id)
-        with open(temp_file_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-                logger.info(f"Загружено {int(status.progress() * 100)}%.") # Изменено
-
-        with open(temp_file_path, 'rb') as f:
-            header = f.read(4)
-            logger.debug(f"File header bytes: {header}") # Изменено
-        
-        if not zipfile.is_zipfile(temp_file_path):
-            with open(temp_file_path, 'rb') as f_content:
-                file_start_content = f_content.read(100)
-            logger.error(f"Файл {latest_file['name']} не является корректным XLSX (не ZIP). Начало содержимого: {file_start_content}") # Изменено
-            raise Exception("Скачанный файл не является корректным XLSX (не распознается как ZIP-архив).")
-
-        with zipfile.ZipFile(temp_file_path, 'r') as archive:
-            logger.debug("Содержимое архива XLSX:") # Изменено
-            for file_in_archive in archive.namelist():
-                logger.debug(file_in_archive) # Изменено
-        
-        wb = openpyxl.load_workbook(temp_file_path, data_only=True)
-        ws = wb.active
-
-        for row_index, row in enumerate(ws.iter_rows(min_row=2), start=2):
-            try:
-                barcode_val = row[0].value
-                if barcode_val is None or str(barcode_val).strip() == "":
-                    logger.warning(f"Строка {row_index}: Пропущен пустой баркод.") # Изменено
-                    continue
-                barcode = str(barcode_val).strip()
-
-                product_id_val = row[1].value
-                product_id = int(product_id_val) if product_id_val is not None else None
-                
-                skuid_val = row[2].value
-                skuid = int(skuid_val) if skuid_val is not None else None
-                
-                product_name = str(row[3].value).strip() if row[3].value is not None else ""
-
-                category_id_val = row[4].value
-                category_id = int(category_id_val) if category_id_val is not None else None
-
-                product_ShopType = str(row[5].value).strip() if row[5].value is not None else ""
-                
-                category_name_val = row[6].value
-                category_name = str(category_name_val).strip() if category_name_val is not None else None
-                
-                seller_val = row[7].value
-                seller = int(seller_val) if seller_val is not None else None
-
-                product_ShopName = str(row[8].value).strip() if row[8].value is not None else ""
-
-                product_ProductStatus = str(row[9].value).strip() if row[9].value is not None else ""
-
-                product_ProductModerationStatus = str(row[10].value).strip() if row[10].value is not None else ""
-
-                product_PhotoModerationStatus = str(row[11].value).strip() if row[11].value is not None else ""
-
-                product_SKUStatus = str(row[12].value).strip() if row[12].value is not None else ""
-                
-                in_stock_sum_val = row[14].value 
-                in_stock_sum = int(in_stock_sum_val) if in_stock_sum_val is not None else 0
-
-                category_instance = None
-                if category_id is not None:
-                    category_defaults = {}
-                    if category_name:
-                         category_defaults['name'] = category_name
-                    
-                    category_instance, created = ProductCategory.objects.update_or_create(
-                        id=category_id,
-                        defaults=category_defaults
-                    )
-                    if created:
-                        logger.info(f"Создана категория: ID={category_id}, Name='{category_name}'") # Изменено
-                    elif category_defaults.get('name') and category_instance.name != category_defaults['name']:
-                        logger.info(f"Обновлено имя категории: ID={category_id}, New Name='{category_name}', Old Name='{category_instance.name}'") # Изменено
-                else:
-                    logger.warning(f"Строка {row_index}, Баркод {barcode}: ID категории не указан. Продукт будет без категории.") # Изменено
-
-                product_data_for_update = {
-                    'ProductID': product_id,
-                    'SKUID': skuid,
-                    'name': product_name,
-                    'category': category_instance,
-                    'seller': seller,
-                    'in_stock_sum': in_stock_sum,
-                    'ShopType': product_ShopType,
-                    'ShopName': product_ShopName,
-                    'ProductStatus': product_ProductStatus,
-                    'ProductModerationStatus': product_ProductModerationStatus,
-                    'PhotoModerationStatus': product_PhotoModerationStatus,
-                    'SKUStatus': product_SKUStatus,
-                }
-                
-                product_obj, created = Product.objects.update_or_create(
-                    barcode=barcode,
-                    defaults=product_data_for_update
-                )
-
-            except ValueError as ve:
-                logger.error(f"Ошибка конвертации данных в строке {row_index}: {ve}. Пропускаем строку. Данные: {row_values(row)}") # Изменено
-            except Exception as e:
-                logger.error(f"Общая ошибка при обработке строки {row_index} с баркодом '{barcode_val}': {e}. Данные: {row_values(row)}") # Изменено
+    if latest_file is None:
+        return
+    if reports is None:
+        # Файл не менялся с прошлой успешной загрузки
+        return "Файл выгрузки не изменился, загрузка пропущена."
+
+    group_chat_id = "-1002559221974"
+    group_thread_id = 11
+    group_message = (
+        "Обновление базы продуктов завершено: "
+        f"{format_import_report(reports[CoreProductTarget.name])}\n"
+        "Обновление базы рендеров завершено: "
+        f"{format_import_report(reports[RenderProductTarget.name])}"
+    )
+    enqueue_telegram_message(
+        chat_id=group_chat_id,
+        text=group_message,
+        message_thread_id=group_thread_id
+    )
 
-        group_chat_id = "-1002559221974"
-        group_thread_id = 11
-        group_message = "Обновление базы продуктов завершено"
-        async_task(
-            'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-            chat_id=group_chat_id,
-            text=group_message,
-            message_thread_id=group_thread_id
-        )
-        
-        logger.info("Обновление базы продуктов завершено.") # Изменено
+    logger.info(group_message)
 
-    except FileNotFoundError:
-        logger.error(f"Файл credentials.json не найден по пути {SERVICE_ACCOUNT_FILE}.") # Изменено
-    except Exception as e:
-        logger.error(f"Произошла ошибка во время выполнения задачи: {e}") # Изменено
-    finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-                logger.info(f"Временный файл {temp_file_path} удален.") # Изменено
-            except Exception as e:
-                logger.error(f"Не удалось удалить временный файл {temp_file_path}: {e}") # Изменено
-
-def row_values(row):
-    """Вспомогательная функция для логирования значений строки."""
-    return [cell.value for cell in row]
+    # Остатки и статусы модерации поменялись - пересобираем кандидатов на пересъемку
+    async_task('render.tasks.refresh_reshoot_candidates_task')
+    return reports
 
 #Обертка для update_products_from_excel_on_drive
 def update_products_from_excel_on_drive_custom_timeout():
@@ -706,41 +557,11 @@ def write_product_stats_to_google_sheet():
         return f"Task failed: {e}"
 
     try:
-        all_products = Product.objects.all()
-        products_in_stock = all_products.filter(in_stock_sum__gt=0)
-        
-        blocked_status_query = Q(ProductModerationStatus='Заблокирован') | Q(SKUStatus='Заблокирован')
-
-        total_count = all_products.count()
-        
-        blocked_count = all_products.filter(blocked_status_query).distinct().count()
-        
-        passed_moderation_count = all_products.filter(PhotoModerationStatus="Прошло модерацию").count()
-        in_moderation_count = all_products.filter(PhotoModerationStatus="На модерации").count()
-        rejected_moderation_count = all_products.filter(PhotoModerationStatus="Отклонено").count()
-        
-        in_stock_count = products_in_stock.count()
-        
-        blocked_in_stock_count = products_in_stock.filter(blocked_status_query).distinct().count()
-        passed_moderation_in_stock_count = products_in_stock.filter(PhotoModerationStatus="Прошло модерацию").count()
-        in_moderation_in_stock_count = products_in_stock.filter(PhotoModerationStatus="На модерации").count()
-        rejected_moderation_in_stock_count = products_in_stock.filter(PhotoModerationStatus="Отклонено").count()
-
+        # Один агрегирующий запрос; снимок сохраняется и в DailyStat (метрики product_*)
+        snapshot = record_product_snapshot()
         current_date = datetime.now().strftime('%d.%m.%Y')
 
-        row_data = [
-            current_date,
-            total_count,
-            blocked_count,
-            passed_moderation_count,
-            in_moderation_count,
-            rejected_moderation_count,
-            in_stock_count,
-            blocked_in_stock_count,
-            passed_moderation_in_stock_count,
-            in_moderation_in_stock_count,
-            rejected_moderation_in_stock_count
-        ]
+        row_data = [current_date] + [snapshot[metric] for metric in PRODUCT_SNAPSHOT_METRICS]
         
         logger.info(f"Calculated stats for {current_date}: {row_data[1:]}")
 
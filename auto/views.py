@@ -22,6 +22,7 @@ from core.models import (
     Order,
     OrderStatus
     )
+from core.reference_data import get_reference
 
 from django_q.tasks import async_task
 from .models import RGTScripts
@@ -152,8 +153,8 @@ def order_status_refresh(request):
 
     # Получаем статусы с id=3 и id=2
     try:
-        status_3 = OrderStatus.objects.get(id=3)
-        status_2 = OrderStatus.objects.get(id=2)
+        status_3 = get_reference(OrderStatus, 3)
+        status_2 = get_reference(OrderStatus, 2)
     except OrderStatus.DoesNotExist:
         # Можно улучшить сообщение об ошибке, указав, какой статус не найден,
         # но для простоты оставим как в вашем оригинальном коде.
@@ -2,9 +2,17 @@ from django.apps import AppConfig
 
 
 class CoreConfig(AppConfig):
+    # В модуле два AppConfig - без default Django не выбрал бы ни один
+    default = True
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
 
+    def ready(self):
+        from .reference_data import connect_reference_data_signals
+        from .request_summary_logic import connect_request_summary_signals
+        connect_reference_data_signals()
+        connect_request_summary_signals()
+
 class MyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
@@ -0,0 +1,127 @@
+#core/dirty_fields.py
+"""
+Отслеживание измененных полей модели без повторного чтения строки из БД.
+
+DirtyFieldsMixin запоминает значения полей при загрузке объекта (from_db) и после каждого save(),
+так что изменения считаются в памяти:
+- get_dirty_fields() - attname полей, изменившихся с момента загрузки/сохранения;
+- get_previous_values(attnames) - прежние значения (для объекта, созданного не из БД, -
+  один запрос, как раньше);
+- save() без update_fields у загруженного объекта пишет только измененные поля
+  и поля auto_now (updated_at), save(update_fields=...) не трогает.
+  Если писать нечего (нет изменений и полей auto_now), save() пишет все поля, как раньше:
+  пустой update_fields Django пропускает вместе с pre_save/post_save.
+  Если строку удалили после загрузки, узкий UPDATE не затрагивает строк - save() повторяется
+  без update_fields и, как обычный save(), вставляет строку заново (pre_save при этом
+  срабатывает дважды).
+
+Поля, которые save() модели вычисляет из других (даты комментариев, длительности),
+при явном update_fields добавляются через with_derived_fields().
+"""
+import copy
+
+from django.db import DatabaseError
+from django.db.models import DEFERRED
+
+_MUTABLE_TYPES = (dict, list, set)
+
+
+def _snapshot_value(value):
+    # Изменение списка/словаря на месте не должно менять снимок
+    return copy.deepcopy(value) if isinstance(value, _MUTABLE_TYPES) else value
+
+
+class DirtyFieldsMixin:
+    # Сужать update_fields до измененных полей при save() загруженного объекта
+    narrow_update_fields = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            attname: _snapshot_value(value)
+            for attname, value in zip(field_names, values)
+            if value is not DEFERRED
+        }
+        return instance
+
+    def _remember_values(self, attnames=None):
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        if attnames is None:
+            attnames = [field.attname for field in self._meta.concrete_fields]
+        for attname in attnames:
+            if attname in self.__dict__:
+                loaded[attname] = _snapshot_value(self.__dict__[attname])
+
+    def get_dirty_fields(self):
+        """
+        attname измененных полей. None - снимка нет (объект создан не из БД и еще не сохранялся).
+        Поле, отложенное при загрузке (defer/only) и затем заданное, считается измененным.
+        """
+        loaded = self.__dict__.get('_loaded_values')
+        if loaded is None:
+            return None
+        dirty = set()
+        for field in self._meta.concrete_fields:
+            attname = field.attname
+            if attname not in self.__dict__:
+                continue
+            if attname not in loaded or loaded[attname] != self.__dict__[attname]:
+                dirty.add(attname)
+        return dirty
+
+    def get_previous_values(self, attnames):
+        """Значения полей на момент загрузки/сохранения: {attname: значение}, {} - строки нет."""
+        loaded = self.__dict__.get('_loaded_values') or {}
+        if all(attname in loaded for attname in attnames):
+            return {attname: loaded[attname] for attname in attnames}
+        return type(self)._base_manager.filter(pk=self.pk).values(*attnames).first() or {}
+
+    @staticmethod
+    def with_derived_fields(update_fields, source_fields, derived_fields):
+        """update_fields с вычисляемыми полями, если в нем есть поля-источники."""
+        if update_fields is None:
+            return None
+        update_fields = set(update_fields)
+        if update_fields & set(source_fields):
+            update_fields |= set(derived_fields)
+        return update_fields
+
+    def _narrowed_update_fields(self):
+        dirty = self.get_dirty_fields()
+        if dirty is None or self._meta.pk.attname in dirty:
+            return None
+        auto_now = {
+            field.attname for field in self._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        }
+        return (dirty | auto_now) or None
+
+    def save(self, *args, **kwargs):
+        narrowed = False
+        if (self.narrow_update_fields and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert') and not self._state.adding and self.pk is not None):
+            kwargs['update_fields'] = self._narrowed_update_fields()
+            narrowed = kwargs['update_fields'] is not None
+        try:
+            super().save(*args, **kwargs)
+        except DatabaseError as error:
+            # "Save with update_fields did not affect any rows" - строки уже нет.
+            # Ошибки самой БД приходят с __cause__ от драйвера и пробрасываются как есть
+            if not narrowed or type(error) is not DatabaseError or error.__cause__ is not None:
+                raise
+            kwargs['update_fields'] = None
+            super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._remember_values()
+        else:
+            self._remember_values([self._meta.get_field(name).attname for name in update_fields])
+
+    save.alters_data = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._remember_values(
+            None if fields is None else [self._meta.get_field(name).attname for name in fields]
+        )
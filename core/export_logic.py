@@ -0,0 +1,299 @@
+# core/export_logic.py
+"""
+Выгрузки таблиц в XLSX/CSV.
+
+Выгрузка описывается объектом TableExport: queryset, колонки (заголовок, поля values(), форматтер)
+и имя файла. Строки читаются через values().iterator(chunk_size=...) без создания моделей,
+форматтеры получают уже готовые значения (часовой пояс вычисляется один раз на выгрузку).
+- CSV отдается StreamingHttpResponse по мере чтения строк;
+- XLSX пишется write_only-книгой openpyxl во временный файл (память не растет с числом строк)
+  и отдается FileResponse.
+Большие выгрузки уходят в Django-Q (core.tasks.export_table_task): файл кладется
+в MEDIA_ROOT/exports, ссылка приходит в WebSocket-группу user_task_{user_id}.
+
+Выгрузка передается в задачу по пути импорта, например 'stockman.exports.ORDER_PRODUCTS_EXPORT'.
+"""
+import csv
+import logging
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_q.tasks import async_task
+from openpyxl import Workbook
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT_XLSX = 'xlsx'
+EXPORT_FORMAT_CSV = 'csv'
+EXPORT_FORMATS = (EXPORT_FORMAT_XLSX, EXPORT_FORMAT_CSV)
+
+CONTENT_TYPES = {
+    EXPORT_FORMAT_XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    EXPORT_FORMAT_CSV: 'text/csv; charset=utf-8',
+}
+
+DEFAULT_EXPORT_CHUNK_SIZE = 2000
+# Папка в MEDIA_ROOT для файлов фоновых выгрузок
+EXPORTS_DIR = 'exports'
+
+
+def get_export_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', DEFAULT_EXPORT_CHUNK_SIZE)
+
+
+# --- Форматтеры значений ---
+
+def as_int_or_raw(value):
+    """Число, если значение к нему приводится (ШК, номер заказа), иначе значение как есть."""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return value
+
+
+def as_text(value):
+    return '' if value is None else value
+
+
+def as_yes_no(value):
+    return "да" if value else "нет"
+
+
+def datetime_formatter():
+    """
+    Форматтер даты 'дд.мм.гггг чч:мм:сс' в текущем часовом поясе.
+    Пояс берется один раз при создании, а не в каждой строке через timezone.localtime.
+    """
+    tz = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if not value:
+            return ''
+        if timezone.is_aware(value):
+            value = value.astimezone(tz)
+        return (f"{value.day:02d}.{value.month:02d}.{value.year:04d} "
+                f"{value.hour:02d}:{value.minute:02d}:{value.second:02d}")
+
+    return format_datetime
+
+
+def iso_datetime_formatter():
+    """Дата в ISO 8601 в текущем часовом поясе - как DateTimeField сериализаторов DRF."""
+    tz = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        if timezone.is_aware(value):
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+def as_str(value):
+    return None if value is None else str(value)
+
+
+def full_name(first_name, last_name):
+    return f"{first_name} {last_name}"
+
+
+@dataclass
+class ExportColumn:
+    """
+    header - заголовок колонки, fields - поля values(), которые нужны колонке.
+    formatter(*values) получает значения полей по порядку; без formatter берется первое поле как есть.
+    formatter_factory() вызывается один раз на выгрузку и возвращает formatter
+    (для форматтеров с контекстом, например часовым поясом).
+    """
+    header: str
+    fields: Sequence[str]
+    formatter: Optional[Callable] = None
+    formatter_factory: Optional[Callable] = None
+    # Поле-признак: если оно пустое, в ячейку пишется empty (например, нет связанного пользователя)
+    present_if: Optional[str] = None
+    empty: object = ''
+
+
+@dataclass
+class TableExport:
+    name: str
+    filename: str
+    columns: Sequence[ExportColumn]
+    get_queryset: Callable
+    sheet_title: str = 'Sheet'
+
+    @property
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    def value_fields(self):
+        fields = []
+        for column in self.columns:
+            for name in list(column.fields) + ([column.present_if] if column.present_if else []):
+                if name not in fields:
+                    fields.append(name)
+        return fields
+
+    def build_row_function(self):
+        """Функция values()-словарь -> строка ячеек. Форматтеры создаются один раз на выгрузку."""
+        getters = []
+        for column in self.columns:
+            formatter = column.formatter_factory() if column.formatter_factory else column.formatter
+            getters.append((tuple(column.fields), formatter, column.present_if, column.empty))
+
+        def to_row(values):
+            row = []
+            for fields, formatter, present_if, empty in getters:
+                if present_if and values[present_if] is None:
+                    row.append(empty)
+                elif formatter is None:
+                    row.append(values[fields[0]])
+                else:
+                    row.append(formatter(*[values[name] for name in fields]))
+            return row
+
+        return to_row
+
+    def iter_rows(self, params=None, chunk_size=None):
+        queryset = self.get_queryset(**(params or {})).values(*self.value_fields())
+        to_row = self.build_row_function()
+        for values in queryset.iterator(chunk_size=chunk_size or get_export_chunk_size()):
+            yield to_row(values)
+
+    def count(self, params=None):
+        return self.get_queryset(**(params or {})).count()
+
+
+def get_export(path) -> TableExport:
+    export = import_string(path)
+    if not isinstance(export, TableExport):
+        raise TypeError(f"{path} не является TableExport")
+    return export
+
+
+def write_xlsx(export, file_obj, params=None, on_rows_written=None, progress_every=None):
+    """Пишет выгрузку в file_obj write_only-книгой (строки не держатся в памяти)."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=export.sheet_title)
+    ws.append(export.headers)
+    written = 0
+    progress_every = progress_every or get_export_chunk_size()
+    for row in export.iter_rows(params):
+        ws.append(row)
+        written += 1
+        if on_rows_written and written % progress_every == 0:
+            on_rows_written(written)
+    wb.save(file_obj)
+    return written
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: writerow возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(export, params=None):
+    writer = csv.writer(_Echo(), delimiter=';')
+    # BOM - чтобы Excel открыл UTF-8 с кириллицей
+    yield '\ufeff' + writer.writerow(export.headers)
+    for row in export.iter_rows(params):
+        yield writer.writerow(row)
+
+
+def write_csv(export, file_obj, params=None, on_rows_written=None, progress_every=None):
+    written = 0
+    progress_every = progress_every or get_export_chunk_size()
+    for index, line in enumerate(iter_csv(export, params)):
+        file_obj.write(line.encode('utf-8'))
+        if index:
+            written += 1
+            if on_rows_written and written % progress_every == 0:
+                on_rows_written(written)
+    return written
+
+
+WRITERS = {
+    EXPORT_FORMAT_XLSX: write_xlsx,
+    EXPORT_FORMAT_CSV: write_csv,
+}
+
+
+def _attachment_name(export, export_format):
+    return f"{export.filename}.{export_format}"
+
+
+def export_response(export, export_format=EXPORT_FORMAT_XLSX, params=None):
+    """HTTP-ответ с файлом выгрузки. CSV - потоком, XLSX - из временного файла."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+    filename = _attachment_name(export, export_format)
+
+    if export_format == EXPORT_FORMAT_CSV:
+        response = StreamingHttpResponse(iter_csv(export, params), content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    # Безымянный временный файл удаляется при закрытии ответа
+    temp_file = tempfile.TemporaryFile(suffix=f'.{export_format}')
+    try:
+        write_xlsx(export, temp_file, params)
+        temp_file.seek(0)
+    except Exception:
+        temp_file.close()
+        raise
+    return FileResponse(temp_file, as_attachment=True, filename=filename,
+                        content_type=CONTENT_TYPES[export_format])
+
+
+def write_export_file(export, export_format=EXPORT_FORMAT_XLSX, params=None, on_rows_written=None):
+    """
+    Пишет выгрузку в MEDIA_ROOT/exports (через временный файл и os.replace).
+    Возвращает (путь к файлу, URL относительно MEDIA_URL, число строк).
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+    final_dir = os.path.join(settings.MEDIA_ROOT, EXPORTS_DIR)
+    os.makedirs(final_dir, exist_ok=True)
+    stamp = timezone.localtime().strftime('%Y%m%d_%H%M%S')
+    final_name = f"{export.filename}_{stamp}_{uuid.uuid4().hex[:8]}.{export_format}"
+    final_path = os.path.join(final_dir, final_name)
+
+    fd, temp_path = tempfile.mkstemp(suffix=f'.{export_format}', dir=final_dir)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            rows = WRITERS[export_format](export, temp_file, params, on_rows_written=on_rows_written)
+        os.replace(temp_path, final_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return final_path, f"{settings.MEDIA_URL}{EXPORTS_DIR}/{final_name}", rows
+
+
+def enqueue_export(export_path, user_id, export_format=EXPORT_FORMAT_XLSX, params=None):
+    """
+    Ставит выгрузку в Django-Q. Возвращает task_id, по которому фронтенд
+    ждет ссылку на файл в WebSocket-группе user_task_{user_id}.
+    """
+    get_export(export_path)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+    task_id = str(uuid.uuid4())
+    async_task('core.tasks.export_table_task', export_path, user_id=user_id,
+               export_format=export_format, params=params, task_id=task_id)
+    return task_id
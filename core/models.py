@@ -1,6 +1,8 @@
 #core.models
 from django.db import models
 from django.contrib.auth.models import User
+from .dirty_fields import DirtyFieldsMixin
+from .querysets import TrackedDeleteMixin, TrackedQuerySet
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -57,7 +59,7 @@ class STRequestType(models.Model):
         return self.name
 
 # Модель заявки
-class STRequest(models.Model):
+class STRequest(TrackedDeleteMixin, DirtyFieldsMixin, models.Model):
     RequestNumber = models.CharField(max_length=13, unique=True)
     photographer = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='photographer_requests', blank=True, null=True)
     retoucher = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='retoucher_requests', blank=True, null=True)
@@ -78,8 +80,29 @@ class STRequest(models.Model):
     STRequestType = models.ForeignKey(STRequestType, on_delete=models.SET_NULL, null=True, default=1)
     STRequestTypeBlocked = models.BooleanField(default=False)
 
+    # Сводка по товарам заявки, пересчитывается при их изменении (core.request_summary_logic)
+    summary_total = models.IntegerField(default=0, verbose_name="Товаров в заявке")
+    summary_for_check = models.IntegerField(default=0, verbose_name="Товаров на проверке")
+    summary_has_priority = models.BooleanField(default=False, verbose_name="Есть приоритетные товары")
+    summary_has_info = models.BooleanField(default=False, verbose_name="Есть товары с инфо")
+    summary_min_income_date = models.DateTimeField(blank=True, null=True, verbose_name="Самая ранняя приемка товара")
+
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TrackedQuerySet.as_manager()
+    # Снимок полей нужен только счетчикам очередей - save() пишет все поля, как раньше
+    narrow_update_fields = False
+
+    class Meta:
+        indexes = [
+            # Списки заявок фотографов: статус, приоритетные первыми, затем по самой ранней приемке
+            # (в PostgreSQL ASC-индекс хранит NULL последними - как ORDER BY ... NULLS LAST)
+            models.Index(
+                fields=['status', '-summary_has_priority', 'summary_min_income_date', 'id'],
+                name='core_strequest_dashboard_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.RequestNumber
 
@@ -109,7 +132,7 @@ class ProductMoveStatus(models.Model):
         return f"{self.id} - {self.name}"
 
 # Модель для товаров
-class Product(models.Model):
+class Product(TrackedDeleteMixin, DirtyFieldsMixin, models.Model):
     barcode = models.CharField(max_length=13, unique=True)
     name = models.CharField(max_length=255)
     cell = models.CharField(max_length=50, blank=True, null=True)
@@ -136,10 +159,20 @@ class Product(models.Model):
     
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TrackedQuerySet.as_manager()
+    # Снимок полей нужен только сводке заявок и счетчикам очередей - save() пишет все поля, как раньше
+    narrow_update_fields = False
+
+    class Meta:
+        indexes = [
+            # Товары на складе (move_status=3) по дате приемки, фильтр по приоритету
+            models.Index(fields=['move_status', 'income_date', 'priority'], name='core_product_move_income_idx'),
+        ]
+
     def __str__(self):
         return f"{self.barcode} - {self.name}"  # Отображаем barcode и имя
     
-class STRequestProduct(models.Model):
+class STRequestProduct(TrackedDeleteMixin, DirtyFieldsMixin, models.Model):
     request = models.ForeignKey(STRequest, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     retouch_status = models.ForeignKey('RetouchStatus', on_delete=models.SET_NULL, blank=True, null=True)
@@ -156,13 +189,22 @@ class STRequestProduct(models.Model):
     IsDeleteAccess = models.BooleanField(default=False)
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TrackedQuerySet.as_manager()
+
     class Meta:
         ordering = ['product__barcode']  # Сортировка по шк
+        indexes = [
+            # Очереди ретуши и проверки фото, статистика снятых товаров
+            models.Index(fields=['photo_status', 'sphoto_status', 'OnRetouch'], name='core_strp_photo_status_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Вычисляем продолжительность съемки, если есть начало и конец
         if self.shooting_time_start and self.shooting_time_end:
             self.shooting_time_spent  = self.shooting_time_end - self.shooting_time_start
+            kwargs['update_fields'] = self.with_derived_fields(
+                kwargs.get('update_fields'), ['shooting_time_start', 'shooting_time_end'], ['shooting_time_spent']
+            )
         
         # Вызываем оригинальный метод save() для сохранения объекта
         super().save(*args, **kwargs)
@@ -184,7 +226,7 @@ class OrderStatus(models.Model):
     def __str__(self):
         return self.name
 
-class Order(models.Model):
+class Order(TrackedDeleteMixin, DirtyFieldsMixin, models.Model):
     OrderNumber = models.BigIntegerField(unique=True, null=True)
     date = models.DateTimeField(null=True, blank=True)
     creator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
@@ -202,6 +244,10 @@ class Order(models.Model):
     )  # Пользователь, который принял товар
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TrackedQuerySet.as_manager()
+    # Снимок полей нужен только счетчикам очередей - save() пишет все поля, как раньше
+    narrow_update_fields = False
+
     class Meta:
         ordering = ['OrderNumber']
 
@@ -213,7 +259,7 @@ class Order(models.Model):
     def __str__(self):
         return str(self.OrderNumber)
 
-class OrderProduct(models.Model):
+class OrderProduct(TrackedDeleteMixin, DirtyFieldsMixin, models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     product = models.ForeignKey('Product', on_delete=models.CASCADE)
 
@@ -224,6 +270,10 @@ class OrderProduct(models.Model):
     accepted_date = models.DateTimeField(null=True, blank=True)  # Date and time of acceptance
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TrackedQuerySet.as_manager()
+    # Снимок полей нужен только счетчикам очередей - save() пишет все поля, как раньше
+    narrow_update_fields = False
+
 class Invoice(models.Model):
     InvoiceNumber = models.CharField(max_length=13, unique=True, null=True)
     date = models.DateTimeField(null=True, blank=True)
@@ -275,7 +325,7 @@ class ProductOperationTypes(models.Model):
         return self.name
 
 # Модель для записи операций
-class ProductOperation(models.Model):
+class ProductOperation(DirtyFieldsMixin, models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     operation_type = models.ForeignKey(ProductOperationTypes, on_delete=models.SET_NULL, null=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
@@ -289,6 +339,12 @@ class ProductOperation(models.Model):
     PhotoModerationStatus = models.CharField(max_length=64, blank=True, null=True)
     SKUStatus = models.CharField(max_length=64, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Операции по типу за период (статистика приемки/отправки, дневные сводки)
+            models.Index(fields=['operation_type', 'date'], name='core_prodop_type_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product.barcode} - {self.operation_type.name}"
 
@@ -375,7 +431,7 @@ class ShootingToRetouchLink(models.Model):
     def __str__(self):
         return f"Shooting: {self.shooting_request.RequestNumber} -> Retouch: {self.retouch_request.RequestNumber}"
 
-class RetouchRequestProduct(models.Model):
+class RetouchRequestProduct(TrackedDeleteMixin, DirtyFieldsMixin, models.Model):
     retouch_request = models.ForeignKey(RetouchRequest, on_delete=models.CASCADE, related_name='retouch_products')
     st_request_product = models.ForeignKey(STRequestProduct, blank=True, null=True, on_delete=models.CASCADE, related_name='retouch_requests')
 
@@ -388,6 +444,22 @@ class RetouchRequestProduct(models.Model):
     IsOnUpload = models.BooleanField(default=False, verbose_name="В загрузке")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TrackedQuerySet.as_manager()
+    # Снимок полей нужен только счетчикам очередей - save() пишет все поля, как раньше
+    narrow_update_fields = False
+
+    class Meta:
+        indexes = [
+            # Очередь загрузки фото от ФС модераторами (render.dispatch_logic.STUDIO_UPLOAD_QUEUE)
+            models.Index(
+                fields=['updated_at', 'id'],
+                condition=models.Q(IsOnUpload=False, retouch_status=2, sretouch_status=1),
+                name='core_rrp_studio_upload_q_idx',
+            ),
+            # Очереди проверки и загрузки фото от ФС (счетчики очередей)
+            models.Index(fields=['retouch_status', 'sretouch_status', 'IsOnUpload'], name='core_rrp_retouch_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.st_request_product.product.barcode}"
 
@@ -1,7 +1,242 @@
 # pagination.py (например, можно создать этот файл для кастомной пагинации)
+"""
+Пагинация списков.
+
+KeysetPaginationMixin добавляет к PageNumberPagination режим курсора (keyset):
+?pagination=cursor - первая страница, дальше по ссылке next (?cursor=...).
+Страница выбирается условием по (колонки сортировки, id) после последней строки
+предыдущей страницы, без OFFSET и без COUNT(*) - глубокие страницы стоят как первая.
+Количество - по запросу: ?count=approx (оценка планировщика PostgreSQL) или ?count=exact.
+Без этих параметров эндпоинт работает по номерам страниц, как раньше.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.query import ModelIterable
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+KEYSET_ALIAS_PREFIX = 'keyset_'
+
 
 class NofotoPagination(PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 999999
+
+
+# --- Курсор ---
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    if isinstance(value, timedelta):
+        return {'td': value.total_seconds()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+        if 'td' in value:
+            return timedelta(seconds=value['td'])
+    return value
+
+
+def encode_cursor(ordering, values, pk):
+    data = {'o': ordering, 'v': [_encode_value(value) for value in values], 'pk': pk}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(сортировка, значения, pk) или ValueError."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return data['o'], [_decode_value(value) for value in data['v']], data['pk']
+    except (binascii.Error, UnicodeError, KeyError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(str(e))
+
+
+# --- Сортировка ---
+
+def _term_nullable(queryset, name):
+    """Может ли колонка сортировки быть NULL (nullable поле или LEFT JOIN по пути)."""
+    if name in queryset.query.annotations:
+        return True
+    opts = queryset.model._meta
+    for part in name.split(LOOKUP_SEP):
+        try:
+            field = opts.pk if part == 'pk' else opts.get_field(part)
+        except FieldDoesNotExist:
+            return True
+        if field.null or not field.concrete:
+            return True
+        if field.is_relation:
+            opts = field.related_model._meta
+    return False
+
+
+def get_keyset_ordering(queryset, default='-pk'):
+    """
+    [(колонка, по убыванию, nullable)] и направление id или None, если сортировку
+    нельзя превратить в ключ (случайная, выражения). id добавляется последним ключом.
+    """
+    ordering = list(queryset.query.order_by) or list(queryset.query.get_meta().ordering or []) or [default]
+    pk_names = {'pk', queryset.model._meta.pk.name, queryset.model._meta.pk.attname}
+    terms = []
+    for term in ordering:
+        if not isinstance(term, str) or term == '?':
+            return None
+        descending = term.startswith('-')
+        name = term.lstrip('-+')
+        if name in pk_names:
+            return terms, descending
+        terms.append((name, descending, _term_nullable(queryset, name)))
+    return terms, terms[0][1]
+
+
+def estimate_count(queryset):
+    """Оценка числа строк планировщиком PostgreSQL (EXPLAIN), для других СУБД - None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPaginationMixin:
+    """Режим курсора для PageNumberPagination (см. описание модуля)."""
+    pagination_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # Сортировка, если у queryset и модели ее нет
+    keyset_default_ordering = '-pk'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    keyset_mode = False
+
+    def _keyset_requested(self, request):
+        return (request.query_params.get(self.pagination_query_param) == 'cursor'
+                or self.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        keyset = None
+        if (isinstance(queryset, QuerySet) and issubclass(queryset._iterable_class, ModelIterable)
+                and self._keyset_requested(request)):
+            keyset = get_keyset_ordering(queryset, self.keyset_default_ordering)
+        self.keyset_mode = keyset is not None
+        if not self.keyset_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        terms, pk_descending = keyset
+        ordering_key = [('-' if descending else '') + name for name, descending, _ in terms]
+        ordering_key.append('-pk' if pk_descending else 'pk')
+
+        aliases = [f"{KEYSET_ALIAS_PREFIX}{index}" for index in range(len(terms))]
+        page_queryset = queryset.annotate(**{alias: F(name) for alias, (name, _, _) in zip(aliases, terms)})
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                cursor_ordering, values, pk = decode_cursor(cursor)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            if cursor_ordering != ordering_key or len(values) != len(terms):
+                raise NotFound(self.invalid_cursor_message)
+            page_queryset = page_queryset.filter(self._after_cursor(aliases, terms, values, pk, pk_descending))
+
+        order_by = [
+            (F(alias).desc(nulls_last=True) if descending else F(alias).asc(nulls_last=True)) if nullable
+            else (F(alias).desc() if descending else F(alias).asc())
+            for alias, (_, descending, nullable) in zip(aliases, terms)
+        ]
+        order_by.append('-pk' if pk_descending else 'pk')
+        rows = list(page_queryset.order_by(*order_by)[:page_size + 1])
+
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = None
+        if self.has_next:
+            last = rows[-1]
+            self.next_cursor = encode_cursor(ordering_key, [getattr(last, alias) for alias in aliases], last.pk)
+        self.keyset_count = self._get_keyset_count(queryset, request)
+        return rows
+
+    @staticmethod
+    def _after_cursor(aliases, terms, values, pk, pk_descending):
+        """
+        Строки после (values, pk) в порядке сортировки: a > va OR (a = va AND (b > vb OR ...)).
+        NULL идут последними. Для первой NOT NULL колонки добавляется a >= va - условие по индексу.
+        """
+        condition = Q(pk__lt=pk) if pk_descending else Q(pk__gt=pk)
+        for alias, (_, descending, nullable), value in reversed(list(zip(aliases, terms, values))):
+            if value is None:
+                condition = Q(**{f'{alias}__isnull': True}) & condition
+                continue
+            after = Q(**{f"{alias}__{'lt' if descending else 'gt'}": value})
+            if nullable:
+                after |= Q(**{f'{alias}__isnull': True})
+            condition = after | (Q(**{alias: value}) & condition)
+        if terms and values[0] is not None and not terms[0][2]:
+            condition &= Q(**{f"{aliases[0]}__{'lte' if terms[0][1] else 'gte'}": values[0]})
+        return condition
+
+    def _get_keyset_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    def get_next_link(self):
+        if not self.keyset_mode:
+            return super().get_next_link()
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_previous_link(self):
+        if not self.keyset_mode:
+            return super().get_previous_link()
+        # Курсор идет только вперед: бесконечная прокрутка и переход к следующей странице
+        return None
+
+    def get_paginated_response(self, data):
+        if not self.keyset_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.keyset_count,
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
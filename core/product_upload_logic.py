@@ -0,0 +1,194 @@
+# core/product_upload_logic.py
+"""
+Массовая загрузка товаров из Excel (manager_bulk_upload, upload_products_batch).
+
+Строки проверяются по одной заранее загруженной карте категорий,
+запись - чанками через bulk_create(update_conflicts=True) по уникальному barcode.
+Ошибки возвращаются построчно: {'row': номер строки с 1, 'data': строка, 'errors': [...]}.
+С флагом "async" в запросе запись уходит в Django-Q (core.tasks.bulk_upsert_products_task).
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django_q.tasks import async_task
+
+from .models import Product, ProductCategory
+
+logger = logging.getLogger(__name__)
+
+# Поля товара, которые перезаписываются загрузкой
+PRODUCT_UPLOAD_FIELDS = ['name', 'category', 'seller', 'in_stock_sum', 'cell']
+
+REQUIRED_UPLOAD_FIELDS = ["barcode", "name", "category_id", "seller", "in_stock_sum", "cell"]
+
+DEFAULT_UPSERT_BATCH_SIZE = 1000
+
+
+def get_upsert_batch_size():
+    return getattr(settings, 'PRODUCT_UPLOAD_BATCH_SIZE', DEFAULT_UPSERT_BATCH_SIZE)
+
+
+def _to_int(value, field, row_errors):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        row_errors.append(f"Поле '{field}' должно быть числом")
+        return None
+
+
+def _validate_strict_row(row, category_ids):
+    """Правила manager_bulk_upload: все поля обязательны, ШК дополняется нулями до 13."""
+    row_errors = []
+    for field in REQUIRED_UPLOAD_FIELDS:
+        if field not in row:
+            row_errors.append(f"Отсутствует поле '{field}'")
+    if row_errors:
+        return None, row_errors
+
+    barcode = None
+    barcode_input = row.get('barcode')
+    if barcode_input is None:
+        row_errors.append("Поле 'barcode' не может быть null.")
+    else:
+        # Из Excel штрихкод может прийти числом без ведущих нулей
+        barcode_str = str(barcode_input).strip()
+        if not barcode_str:
+            row_errors.append("Поле 'barcode' не должно быть пустым после обработки.")
+        elif not barcode_str.isdigit():
+            row_errors.append(f"Поле 'barcode' ('{barcode_str}') должно содержать только цифры.")
+        elif len(barcode_str) > 13:
+            row_errors.append(f"Длина исходного штрихкода '{barcode_str}' ({len(barcode_str)}) не должна превышать 13 цифр.")
+        else:
+            barcode = barcode_str.zfill(13)
+
+    name = row.get('name')
+    if not isinstance(name, str) or not name.strip():
+        row_errors.append("Поле 'name' должно быть непустой строкой")
+
+    category_id = _to_int(row.get('category_id'), 'category_id', row_errors)
+    if category_id is not None and category_id not in category_ids:
+        row_errors.append(f"Категория с id {category_id} не существует")
+
+    seller = _to_int(row.get('seller'), 'seller', row_errors)
+    in_stock_sum = _to_int(row.get('in_stock_sum'), 'in_stock_sum', row_errors)
+
+    cell = row.get('cell')
+    if not isinstance(cell, str):
+        row_errors.append("Поле 'cell' должно быть строкой")
+
+    if row_errors:
+        return None, row_errors
+    return {
+        'barcode': barcode,
+        'name': name.strip(),
+        'category_id': category_id,
+        'seller': seller,
+        'in_stock_sum': in_stock_sum,
+        'cell': cell.strip(),
+    }, []
+
+
+def _validate_batch_row(row, category_ids):
+    """Правила upload_products_batch: ШК и значения берутся как есть, cell необязательна."""
+    barcode = row.get('barcode')
+    name = row.get('name')
+    if not barcode or not name or row.get('category_id') is None or row.get('seller') is None or row.get('in_stock_sum') is None:
+        return None, ["Отсутствуют обязательные данные"]
+
+    row_errors = []
+    barcode = str(barcode).strip()
+    if len(barcode) > 13:
+        row_errors.append(f"Длина штрихкода '{barcode}' не должна превышать 13 символов.")
+
+    category_id = _to_int(row.get('category_id'), 'category_id', row_errors)
+    if category_id is not None and category_id not in category_ids:
+        row_errors.append(f"Категория с id {category_id} не существует")
+
+    seller = _to_int(row.get('seller'), 'seller', row_errors)
+    in_stock_sum = _to_int(row.get('in_stock_sum'), 'in_stock_sum', row_errors)
+
+    if row_errors:
+        return None, row_errors
+    return {
+        'barcode': barcode,
+        'name': name,
+        'category_id': category_id,
+        'seller': seller,
+        'in_stock_sum': in_stock_sum,
+        'cell': row.get('cell'),
+    }, []
+
+
+def validate_product_rows(rows, strict=True):
+    """
+    Проверяет строки загрузки. strict=True - правила manager_bulk_upload,
+    strict=False - правила upload_products_batch.
+    Возвращает (валидные товары, построчные ошибки); категории загружаются одним запросом.
+    """
+    category_ids = set(ProductCategory.objects.values_list('id', flat=True))
+    validate_row = _validate_strict_row if strict else _validate_batch_row
+
+    items = []
+    errors = []
+    for index, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'data': row, 'errors': ["Строка должна быть объектом"]})
+            continue
+        item, row_errors = validate_row(row, category_ids)
+        if row_errors:
+            errors.append({'row': index, 'data': row, 'errors': row_errors})
+        else:
+            items.append(item)
+    return items, errors
+
+
+def format_row_errors(errors):
+    """Ошибки в старом формате manager_bulk_upload: 'Строка N: ошибка, ошибка'."""
+    return [f"Строка {error['row']}: " + ", ".join(error['errors']) for error in errors]
+
+
+def upsert_products(items, batch_size=None, on_batch_done=None):
+    """
+    Создает/обновляет товары по barcode чанками bulk_create(update_conflicts=True)
+    в одной транзакции. При повторе ШК во входных данных побеждает последняя строка.
+    on_batch_done(processed, total) вызывается после каждого чанка.
+    Возвращает {'created', 'updated'} - счетчики по строкам, как при построчной записи.
+    """
+    batch_size = batch_size or get_upsert_batch_size()
+    # ON CONFLICT не может обновить одну строку дважды в одном запросе
+    unique_items = list({item['barcode']: item for item in items}.values())
+    total = len(unique_items)
+    created = 0
+
+    with transaction.atomic():
+        for start in range(0, total, batch_size):
+            chunk = unique_items[start:start + batch_size]
+            existing = set(Product.objects.filter(
+                barcode__in=[item['barcode'] for item in chunk]
+            ).values_list('barcode', flat=True))
+            created += sum(1 for item in chunk if item['barcode'] not in existing)
+
+            Product.objects.bulk_create(
+                [Product(**item) for item in chunk],
+                update_conflicts=True,
+                unique_fields=['barcode'],
+                update_fields=PRODUCT_UPLOAD_FIELDS + ['updated_at'],
+            )
+            if on_batch_done:
+                on_batch_done(min(start + batch_size, total), total)
+
+    updated = len(items) - created
+    logger.info(f"Загрузка товаров: создано {created}, обновлено {updated}")
+    return {'created': created, 'updated': updated}
+
+
+def enqueue_product_upsert(items, user_id):
+    """
+    Отправляет запись в Django-Q (для больших файлов). Возвращает task_id,
+    по которому фронтенд отслеживает прогресс в WebSocket-группе user_task_{user_id}.
+    """
+    task_id = str(uuid.uuid4())
+    async_task('core.tasks.bulk_upsert_products_task', items, user_id=user_id, task_id=task_id)
+    return task_id
@@ -0,0 +1,126 @@
+#core/querysets.py
+"""
+QuerySet с хуками на массовые операции записи.
+
+update()/bulk_update()/bulk_create() не отправляют post_save,
+поэтому подписчики, которым важны изменения полей (счетчики очередей и т.п.),
+регистрируют здесь хук: hook(model, fields) -> None, если поля не интересны,
+или трекер с методами before(pks), after(pks) и invalidate().
+fields - имена записываемых полей, None - bulk_create, DELETE - удаление строк.
+
+Удаления тоже идут через хуки (QuerySet.delete() и delete() объекта с TrackedDeleteMixin),
+а не через сигналы pre_delete/post_delete: с подписчиками на них Django не может
+удалять без загрузки строк (fast delete), в том числе при каскадном удалении.
+Строки, удаляемые каскадом, хуки не видят - их вклад трекер считает по родителю.
+"""
+import threading
+
+from django.db import models
+
+_write_hooks = []
+
+# Значение fields для удаления строк
+DELETE = 'delete'
+
+# bulk_update внутри вызывает update() - вложенный вызов не должен учитываться второй раз
+_tracking = threading.local()
+
+
+def register_write_hook(hook):
+    if hook not in _write_hooks:
+        _write_hooks.append(hook)
+
+
+def _trackers(model, fields):
+    if getattr(_tracking, 'suspended', False):
+        return []
+    trackers = []
+    for hook in _write_hooks:
+        tracker = hook(model, fields)
+        if tracker is not None:
+            trackers.append(tracker)
+    return trackers
+
+
+class TrackedQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        trackers = _trackers(self.model, kwargs.keys())
+        if not trackers:
+            return super().update(**kwargs)
+        pks = list(self.values_list('pk', flat=True))
+        for tracker in trackers:
+            tracker.before(pks)
+        rows = super().update(**kwargs)
+        for tracker in trackers:
+            tracker.after(pks)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        trackers = _trackers(self.model, fields)
+        if not trackers:
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        objs = list(objs)
+        pks = [obj.pk for obj in objs]
+        for tracker in trackers:
+            tracker.before(pks)
+        _tracking.suspended = True
+        try:
+            rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        finally:
+            _tracking.suspended = False
+        for tracker in trackers:
+            tracker.after(pks)
+        return rows
+
+    bulk_update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        trackers = _trackers(self.model, None)
+        objs = super().bulk_create(objs, *args, **kwargs)
+        pks = [obj.pk for obj in objs]
+        for tracker in trackers:
+            # При upsert часть строк уже существовала - дельту не посчитать
+            if kwargs.get('update_conflicts') or kwargs.get('ignore_conflicts') or None in pks:
+                tracker.invalidate()
+            else:
+                tracker.before([])
+                tracker.after(pks)
+        return objs
+
+    bulk_create.alters_data = True
+
+    def delete(self):
+        trackers = _trackers(self.model, DELETE)
+        if not trackers:
+            return super().delete()
+        pks = list(self.values_list('pk', flat=True))
+        for tracker in trackers:
+            tracker.before(pks)
+        result = super().delete()
+        for tracker in trackers:
+            tracker.after(pks)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class TrackedDeleteMixin:
+    """delete() объекта через хуки удаления, как QuerySet.delete()."""
+
+    def delete(self, using=None, keep_parents=False):
+        trackers = _trackers(type(self), DELETE)
+        if not trackers:
+            return super().delete(using=using, keep_parents=keep_parents)
+        pks = [self.pk]
+        for tracker in trackers:
+            tracker.before(pks)
+        result = super().delete(using=using, keep_parents=keep_parents)
+        for tracker in trackers:
+            tracker.after(pks)
+        return result
+
+    delete.alters_data = True
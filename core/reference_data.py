@@ -0,0 +1,146 @@
+# core/reference_data.py
+"""
+Кэш справочников (статусы, типы операций) в памяти процесса.
+
+Таблица справочника читается из БД один раз при первом обращении,
+дальше get_reference(OrderStatus, 2) отдает объект без запроса.
+Изменение справочника (админка, shell) через post_save/post_delete
+увеличивает общую версию в кэше (Redis): каждый процесс сверяет ее
+не чаще раза в REFERENCE_DATA_CHECK_INTERVAL секунд и перечитывает таблицы.
+"""
+import threading
+import time
+from typing import List, Optional, Type, TypeVar
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+M = TypeVar('M', bound=models.Model)
+
+REFERENCE_MODELS = [
+    'core.STRequestStatus',
+    'core.STRequestType',
+    'core.ProductMoveStatus',
+    'core.OrderStatus',
+    'core.RetouchStatus',
+    'core.SRetouchStatus',
+    'core.PhotoStatus',
+    'core.SPhotoStatus',
+    'core.ProductOperationTypes',
+    'core.STRequestHistoryOperations',
+    'core.RetouchRequestStatus',
+    'render.RenderCheckResult',
+    'render.RetouchStatus',
+    'render.SeniorRetouchStatus',
+    'render.UploadStatus',
+]
+
+REFERENCE_DATA_VERSION_KEY = 'core:reference_data_version'
+
+# Как часто процесс сверяет версию справочников с общим кэшем
+DEFAULT_CHECK_INTERVAL = 5
+
+
+class _ReferenceState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.version = None
+        self.checked_at = 0.0
+
+
+_state = _ReferenceState()
+
+
+def get_reference_models():
+    return [apps.get_model(label) for label in REFERENCE_MODELS]
+
+
+def _check_interval():
+    return getattr(settings, 'REFERENCE_DATA_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+
+
+def _get_table(model):
+    now = time.monotonic()
+    if now - _state.checked_at >= _check_interval():
+        version = cache.get(REFERENCE_DATA_VERSION_KEY)
+        with _state.lock:
+            if version != _state.version:
+                _state.tables = {}
+                _state.version = version
+            _state.checked_at = now
+
+    tables = _state.tables
+    table = tables.get(model)
+    if table is None:
+        table = {obj.pk: obj for obj in model._default_manager.all()}
+        tables[model] = table
+    return table
+
+
+def _is_registered(model):
+    return model._meta.label in REFERENCE_MODELS
+
+
+def get_reference_or_none(model: Type[M], pk) -> Optional[M]:
+    """Запись справочника по pk или None. Для незарегистрированной модели - обычный запрос."""
+    if not _is_registered(model):
+        return model._default_manager.filter(pk=pk).first()
+    try:
+        pk = model._meta.pk.to_python(pk)
+    except ValidationError:
+        return None
+    return _get_table(model).get(pk)
+
+
+def get_reference(model: Type[M], pk) -> M:
+    """Как model.objects.get(pk=pk): при отсутствии записи - model.DoesNotExist."""
+    obj = get_reference_or_none(model, pk)
+    if obj is None:
+        raise model.DoesNotExist(f"{model.__name__} с pk={pk} не найден.")
+    return obj
+
+
+def get_reference_or_404(model: Type[M], pk) -> M:
+    obj = get_reference_or_none(model, pk)
+    if obj is None:
+        raise Http404(f"{model.__name__} с pk={pk} не найден.")
+    return obj
+
+
+def all_references(model: Type[M]) -> List[M]:
+    """Все записи справочника в порядке pk."""
+    if not _is_registered(model):
+        return list(model._default_manager.order_by('pk'))
+    return [obj for _, obj in sorted(_get_table(model).items())]
+
+
+def invalidate_reference_data():
+    """Сбрасывает кэш справочников во всех процессах."""
+    with _state.lock:
+        _state.tables = {}
+    cache.add(REFERENCE_DATA_VERSION_KEY, 0, None)
+    try:
+        cache.incr(REFERENCE_DATA_VERSION_KEY)
+    except ValueError:
+        # Ключ вытеснили между add и incr
+        cache.set(REFERENCE_DATA_VERSION_KEY, 1, None)
+
+
+def _on_reference_changed(sender, **kwargs):
+    # Свой процесс не должен видеть старые данные даже до коммита
+    with _state.lock:
+        _state.tables = {}
+    transaction.on_commit(invalidate_reference_data)
+
+
+def connect_reference_data_signals():
+    for model in get_reference_models():
+        uid = f'reference_data_{model._meta.label_lower}'
+        post_save.connect(_on_reference_changed, sender=model, dispatch_uid=uid)
+        post_delete.connect(_on_reference_changed, sender=model, dispatch_uid=uid)
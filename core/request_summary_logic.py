@@ -0,0 +1,242 @@
+# core/request_summary_logic.py
+"""
+Сводка по товарам заявки на съемку, хранимая в колонках STRequest.summary_*:
+summary_total (товаров), summary_for_check (на проверке: photo_status 1/2/25, не принято старшим),
+summary_has_priority, summary_has_info, summary_min_income_date.
+
+Списки заявок фотографов сортируются и выводятся по этим колонкам без агрегатов по товарам.
+Колонки пересчитываются после коммита транзакции, в которой изменились:
+- товары заявки (STRequestProduct: заявка, товар, статусы фото) - сигнал post_save
+  и хуки массовых операций и удалений core.querysets.TrackedQuerySet;
+- товары (Product: priority, info, income_date, удаление) - по всем заявкам, где есть товар.
+bulk_create товаров не отслеживается: новые товары еще не в заявках, а upsert
+(product_upload_logic) эти поля не меняет. Если затронутые заявки не определить
+(upsert товаров заявок, слишком большая массовая операция), ставится полный пересчет
+rebuild_request_summaries_task; он же раз в сутки запускается по расписанию для сверки
+(manager/migrations/0004_request_summaries_rebuild_schedule.py).
+"""
+import logging
+
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Min, Q
+from django.db.models.signals import post_save
+from django_q.tasks import async_task
+
+from .models import Product, STRequest, STRequestProduct
+from .querysets import DELETE, register_write_hook
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = [
+    'summary_total', 'summary_for_check', 'summary_has_priority', 'summary_has_info', 'summary_min_income_date',
+]
+EMPTY_SUMMARY = {
+    'summary_total': 0,
+    'summary_for_check': 0,
+    'summary_has_priority': False,
+    'summary_has_info': False,
+    'summary_min_income_date': None,
+}
+
+FOR_CHECK_PHOTO_STATUSES = [1, 2, 25]
+FOR_CHECK = Q(photo_status_id__in=FOR_CHECK_PHOTO_STATUSES) & ~Q(sphoto_status_id=1)
+HAS_INFO = Q(product__info__isnull=False) & ~Q(product__info='')
+
+# Поля, от которых зависит сводка
+REQUEST_PRODUCT_FIELDS = {'request', 'product', 'photo_status', 'sphoto_status'}
+PRODUCT_FIELDS = {'priority', 'info', 'income_date'}
+
+REFRESH_BATCH_SIZE = 2000
+# Массовая операция над большим числом строк - полный пересчет в фоне вместо поиска заявок
+BULK_TRACKING_LIMIT = 5000
+
+
+# --- Пересчет ---
+
+def compute_request_summaries(request_ids):
+    """{id заявки: значения summary_*} одним сгруппированным запросом по товарам заявок."""
+    summaries = {request_id: dict(EMPTY_SUMMARY) for request_id in request_ids}
+    rows = (
+        STRequestProduct.objects
+        .filter(request_id__in=request_ids)
+        .values('request_id')
+        .annotate(
+            total=Count('id'),
+            for_check=Count('id', filter=FOR_CHECK),
+            priority=Count('id', filter=Q(product__priority=True)),
+            info=Count('id', filter=HAS_INFO),
+            min_income_date=Min('product__income_date'),
+        )
+        .order_by()
+    )
+    for row in rows:
+        summaries[row['request_id']] = {
+            'summary_total': row['total'],
+            'summary_for_check': row['for_check'],
+            'summary_has_priority': row['priority'] > 0,
+            'summary_has_info': row['info'] > 0,
+            'summary_min_income_date': row['min_income_date'],
+        }
+    return summaries
+
+
+def refresh_request_summaries(request_ids):
+    """
+    Пересчитывает сводку заявок request_ids. Возвращает число обновленных заявок.
+    Строки заявок блокируются (в порядке id) до подсчета: параллельный пересчет тех же заявок
+    ждет и считает уже после коммита первого, так что старая сводка не перезапишет новую.
+    """
+    request_ids = sorted({request_id for request_id in request_ids if request_id})
+    updated = 0
+    for start in range(0, len(request_ids), REFRESH_BATCH_SIZE):
+        batch = request_ids[start:start + REFRESH_BATCH_SIZE]
+        with transaction.atomic():
+            locked = list(STRequest.objects.select_for_update().filter(pk__in=batch)
+                          .order_by('pk').values_list('pk', flat=True))
+            summaries = compute_request_summaries(locked)
+            updated += STRequest.objects.bulk_update(
+                [STRequest(pk=request_id, **values) for request_id, values in summaries.items()],
+                SUMMARY_FIELDS,
+            )
+    return updated
+
+
+def refresh_product_request_summaries(product_ids):
+    """Пересчитывает сводку заявок, в которых есть товары product_ids."""
+    request_ids = (STRequestProduct.objects.filter(product_id__in=list(product_ids))
+                   .values_list('request_id', flat=True).distinct().order_by())
+    return refresh_request_summaries(list(request_ids))
+
+
+def rebuild_request_summaries():
+    """Полный пересчет сводки всех заявок. Возвращает число заявок."""
+    request_ids = list(STRequest.objects.order_by('pk').values_list('pk', flat=True))
+    return refresh_request_summaries(request_ids)
+
+
+# --- Планирование после коммита ---
+
+def _run_refresh(refresh, ids):
+    try:
+        refresh(ids)
+    except DatabaseError as e:
+        logger.error(f"Не удалось обновить сводку заявок: {e}", exc_info=True)
+        schedule_full_rebuild()
+
+
+def schedule_request_summary_refresh(request_ids):
+    request_ids = {request_id for request_id in request_ids if request_id}
+    if request_ids:
+        transaction.on_commit(lambda: _run_refresh(refresh_request_summaries, request_ids))
+
+
+def schedule_product_summary_refresh(product_ids):
+    product_ids = set(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: _run_refresh(refresh_product_request_summaries, product_ids))
+
+
+def schedule_full_rebuild():
+    transaction.on_commit(lambda: async_task('core.tasks.rebuild_request_summaries_task'))
+
+
+# --- Отслеживание изменений ---
+
+def _tracked_fields_changed(instance, fields, update_fields):
+    if update_fields is not None and not fields & {
+        type(instance)._meta.get_field(name).name for name in update_fields
+    }:
+        return False
+    # Снимок загруженных значений (core.dirty_fields): в post_save он еще не обновлен
+    dirty = instance.get_dirty_fields()
+    if dirty is None:
+        return True
+    return any(type(instance)._meta.get_field(name).attname in dirty for name in fields)
+
+
+def _on_request_product_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        schedule_request_summary_refresh([instance.request_id])
+    elif _tracked_fields_changed(instance, REQUEST_PRODUCT_FIELDS, update_fields):
+        # При переносе товара в другую заявку меняются обе
+        previous = instance.get_previous_values(['request_id'])
+        schedule_request_summary_refresh([instance.request_id, previous.get('request_id')])
+
+
+def _on_product_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created:
+        return
+    if _tracked_fields_changed(instance, PRODUCT_FIELDS, update_fields):
+        schedule_product_summary_refresh([instance.pk])
+
+
+class _RequestProductTracker:
+    """Массовые операции над товарами заявок: заявки строк до и после записи."""
+
+    def __init__(self):
+        self.request_ids = set()
+
+    def _request_ids(self, pks):
+        return set(STRequestProduct.objects.filter(pk__in=pks).values_list('request_id', flat=True).order_by())
+
+    def before(self, pks):
+        self.request_ids = self._request_ids(pks) if len(pks) <= BULK_TRACKING_LIMIT else None
+
+    def after(self, pks):
+        if self.request_ids is None or len(pks) > BULK_TRACKING_LIMIT:
+            self.invalidate()
+        else:
+            schedule_request_summary_refresh(self.request_ids | self._request_ids(pks))
+
+    def invalidate(self):
+        schedule_full_rebuild()
+
+
+class _ProductTracker:
+    """
+    Массовые изменения товаров: связь товар-заявка не меняется, заявки ищутся после коммита.
+    При удалении товары заявок удаляются каскадом - заявки запоминаются до удаления.
+    """
+
+    def __init__(self, deleting=False):
+        self.deleting = deleting
+        self.request_ids = set()
+
+    def before(self, pks):
+        if self.deleting and len(pks) <= BULK_TRACKING_LIMIT:
+            self.request_ids = set(STRequestProduct.objects.filter(product_id__in=pks)
+                                   .values_list('request_id', flat=True).order_by())
+
+    def after(self, pks):
+        if len(pks) > BULK_TRACKING_LIMIT:
+            self.invalidate()
+        elif self.deleting:
+            schedule_request_summary_refresh(self.request_ids)
+        else:
+            schedule_product_summary_refresh(pks)
+
+    def invalidate(self):
+        schedule_full_rebuild()
+
+
+def request_summary_write_hook(model, fields):
+    if model is STRequestProduct:
+        if fields is None or fields is DELETE or REQUEST_PRODUCT_FIELDS & {
+            model._meta.get_field(name).name for name in fields
+        }:
+            return _RequestProductTracker()
+    elif model is Product:
+        if fields is DELETE:
+            return _ProductTracker(deleting=True)
+        # fields is None - bulk_create (см. описание модуля)
+        if fields is not None and PRODUCT_FIELDS & {model._meta.get_field(name).name for name in fields}:
+            return _ProductTracker()
+    return None
+
+
+def connect_request_summary_signals():
+    register_write_hook(request_summary_write_hook)
+    post_save.connect(_on_request_product_saved, sender=STRequestProduct, dispatch_uid='request_summary_strp_save')
+    post_save.connect(_on_product_saved, sender=Product, dispatch_uid='request_summary_product_save')
@@ -0,0 +1,124 @@
+# core/staff_stats_logic.py
+"""
+Статистика производительности сотрудников по заявкам на съемку (STRequest).
+
+Все функции принимают полуоткрытый интервал [start_dt, end_dt) aware-datetime
+(day_range() строит его по датам в текущем часовом поясе): фильтр photo_date >= ... AND < ...
+использует индекс по дате, в отличие от photo_date__date / __year / __day.
+Счетчики по сотруднику считаются одним сгруппированным запросом с Count(filter=...).
+
+Используется эндпоинтами статистики (ftback sp_daily_stats, core PhotographerStatsView /
+RetoucherStatsView, ElectronAPI PhotographerStats) и сводками в Telegram (photographer.tasks).
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import STRequest, STRequestProduct
+
+# Товар снят: photo_status 1/2/25 и проверен старшим фотографом
+PHOTOGRAPHED_PHOTO_STATUSES = [1, 2, 25]
+PHOTOGRAPHED_SPHOTO_STATUS = 1
+
+
+def day_range(start_date, end_date=None):
+    """Полуоткрытый интервал [начало start_date, начало дня после end_date) в текущем часовом поясе."""
+    end_date = end_date or start_date
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min)),
+        timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)),
+    )
+
+
+def user_display_name(first_name, last_name, username=None):
+    """'Имя Фамилия', для пользователя без имени - username."""
+    name = f"{first_name or ''} {last_name or ''}".strip()
+    return name or username or ''
+
+
+def _photographed_q(prefix=''):
+    return Q(**{
+        f'{prefix}photo_status_id__in': PHOTOGRAPHED_PHOTO_STATUSES,
+        f'{prefix}sphoto_status_id': PHOTOGRAPHED_SPHOTO_STATUS,
+    })
+
+
+def _request_user_stats(user_field, date_field, start_dt, end_dt, statuses=None):
+    """
+    Заявки с date_field в [start_dt, end_dt), сгруппированные по сотруднику user_field.
+    Возвращает список словарей: user_id, first_name, last_name, username,
+    requests (заявок), products (товаров в них), photographed (снятых товаров).
+    Сотрудник попадает в результат, если у него есть хотя бы одна заявка за период.
+    """
+    queryset = STRequest.objects.filter(**{
+        f'{date_field}__gte': start_dt,
+        f'{date_field}__lt': end_dt,
+        f'{user_field}__isnull': False,
+    })
+    if statuses:
+        queryset = queryset.filter(status_id__in=statuses)
+
+    rows = (
+        queryset
+        .values(f'{user_field}_id', f'{user_field}__first_name', f'{user_field}__last_name', f'{user_field}__username')
+        .annotate(
+            requests=Count('id', distinct=True),
+            products=Count('strequestproduct'),
+            photographed=Count('strequestproduct', filter=_photographed_q('strequestproduct__')),
+        )
+        .order_by()
+    )
+    return [
+        {
+            'user_id': row[f'{user_field}_id'],
+            'first_name': row[f'{user_field}__first_name'],
+            'last_name': row[f'{user_field}__last_name'],
+            'username': row[f'{user_field}__username'],
+            'requests': row['requests'],
+            'products': row['products'],
+            'photographed': row['photographed'],
+        }
+        for row in rows
+    ]
+
+
+def photographer_stats(start_dt, end_dt, statuses=None):
+    """Статистика фотографов по дате съемки (photo_date)."""
+    return _request_user_stats('photographer', 'photo_date', start_dt, end_dt, statuses)
+
+
+def assistant_stats(start_dt, end_dt, statuses=None):
+    """Статистика ассистентов по дате ассистирования (assistant_date)."""
+    return _request_user_stats('assistant', 'assistant_date', start_dt, end_dt, statuses)
+
+
+def retoucher_stats(start_dt, end_dt, statuses=None):
+    """Статистика ретушеров по дате ретуши (retouch_date)."""
+    return _request_user_stats('retoucher', 'retouch_date', start_dt, end_dt, statuses)
+
+
+def photographer_daily_photographed(photographer, start_dt, end_dt):
+    """Снятые фотографом товары по дням: {date: число}, одним запросом."""
+    rows = (
+        STRequestProduct.objects
+        .filter(
+            _photographed_q(),
+            request__photographer=photographer,
+            request__photo_date__gte=start_dt,
+            request__photo_date__lt=end_dt,
+        )
+        .annotate(day=TruncDate('request__photo_date'))
+        .values('day')
+        .annotate(count=Count('id'))
+        .order_by('day')
+    )
+    return {row['day']: row['count'] for row in rows}
+
+
+def sorted_by(stats, key):
+    """Статистика по убыванию key, при равенстве - по имени."""
+    return sorted(stats, key=lambda item: (
+        -item[key], user_display_name(item['first_name'], item['last_name'], item['username'])
+    ))
@@ -0,0 +1,121 @@
+#core/tasks.py
+import logging
+import os
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .export_logic import EXPORTS_DIR, get_export, write_export_file
+from .product_upload_logic import upsert_products
+from .request_summary_logic import rebuild_request_summaries
+
+logger = logging.getLogger(__name__)
+
+
+def bulk_upsert_products_task(items, user_id=None, task_id=None):
+    """
+    Фоновая запись проверенных строк загрузки товаров.
+    Прогресс и результат уходят в WebSocket-группу user_task_{user_id}.
+    """
+    logger.info(f"Запуск задачи: bulk_upsert_products_task ({len(items)} строк, user_id: {user_id}, task_id: {task_id})")
+    channel_layer = get_channel_layer() if user_id else None
+
+    def send_ws_message(message_type, payload):
+        if channel_layer:
+            payload = {**payload, 'task_id': task_id}
+            async_to_sync(channel_layer.group_send)(
+                f'user_task_{user_id}',
+                {'type': 'send_task_progress', 'message': {'type': message_type, 'payload': payload}}
+            )
+
+    def on_batch_done(processed, total):
+        send_ws_message('progress', {
+            'current': processed, 'total': total, 'percent': round((processed / total) * 100),
+            'description': f"Загружено товаров: {processed} из {total}"
+        })
+
+    try:
+        result = upsert_products(items, on_batch_done=on_batch_done)
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении задачи bulk_upsert_products_task: {e}", exc_info=True)
+        send_ws_message('error', {'status': 'error', 'message': f'Ошибка при загрузке данных: {e}'})
+        # Перевыбрасываем исключение, чтобы задача в Django-Q пометилась как FAILED
+        raise
+
+    final_message = f"Данные успешно загружены. Создано: {result['created']}, Обновлено: {result['updated']}."
+    send_ws_message('completed', {'status': 'completed', 'message': final_message, **result})
+    return final_message
+
+
+def export_table_task(export_path, user_id=None, export_format='xlsx', params=None, task_id=None):
+    """
+    Фоновая выгрузка (core.export_logic): файл пишется в MEDIA_ROOT/exports,
+    прогресс и ссылка на файл уходят в WebSocket-группу user_task_{user_id}.
+    """
+    logger.info(f"Запуск задачи: export_table_task ({export_path}, {export_format}, user_id: {user_id}, task_id: {task_id})")
+    channel_layer = get_channel_layer() if user_id else None
+
+    def send_ws_message(message_type, payload):
+        if channel_layer:
+            payload = {**payload, 'task_id': task_id}
+            async_to_sync(channel_layer.group_send)(
+                f'user_task_{user_id}',
+                {'type': 'send_task_progress', 'message': {'type': message_type, 'payload': payload}}
+            )
+
+    try:
+        export = get_export(export_path)
+        total = export.count(params)
+
+        def on_rows_written(written):
+            send_ws_message('progress', {
+                'current': written, 'total': total, 'percent': round((written / total) * 100) if total else 100,
+                'description': f"Выгружено строк: {written} из {total}"
+            })
+
+        file_path, file_url, rows = write_export_file(export, export_format, params, on_rows_written=on_rows_written)
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении задачи export_table_task: {e}", exc_info=True)
+        send_ws_message('error', {'status': 'error', 'message': f'Ошибка при выгрузке: {e}'})
+        raise
+
+    download_url = f"{settings.API_AND_MEDIA_BASE_URL}{file_url}"
+    logger.info(f"Выгрузка {export.name} готова: {file_path} ({rows} строк)")
+    send_ws_message('completed', {
+        'status': 'completed', 'message': f"Выгрузка готова, строк: {rows}.",
+        'download_url': download_url, 'rows': rows,
+    })
+    return download_url
+
+
+def cleanup_old_exports(days_to_keep=1):
+    """
+    Удаляет файлы фоновых выгрузок старше days_to_keep дней.
+    Запускается по расписанию раз в сутки (manager/migrations/0006_exports_cleanup_schedule.py).
+    """
+    export_dir = os.path.join(settings.MEDIA_ROOT, EXPORTS_DIR)
+    if not os.path.isdir(export_dir):
+        return 0
+    threshold = time.time() - days_to_keep * 86400
+    removed = 0
+    for entry in os.scandir(export_dir):
+        if entry.is_file() and entry.stat().st_mtime < threshold:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Не удалось удалить файл выгрузки {entry.path}: {e}")
+    logger.info(f"Удалено старых файлов выгрузок: {removed}")
+    return removed
+
+
+def rebuild_request_summaries_task():
+    """
+    Полный пересчет сводки по товарам заявок (STRequest.summary_*): после массовых операций,
+    которые нельзя отследить, и периодически для сверки. Возвращает число заявок.
+    """
+    updated = rebuild_request_summaries()
+    logger.info(f"Сводка по товарам заявок пересчитана: {updated} заявок.")
+    return updated
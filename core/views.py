@@ -1,5 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import STRequest, Product, Invoice, ProductMoveStatus, ProductCategory, Product, Order, OrderProduct, OrderStatus, STRequestProduct, ProductOperation, ProductOperationTypes, InvoiceProduct, RetouchStatus, STRequestStatus, UserURLs, STRequestHistory, STRequestHistoryOperations, Blocked_Shops, Nofoto, Blocked_Barcode, APIKeys, UserProfile
+from .reference_data import get_reference, get_reference_or_none
+from manager.numbering_logic import allocate_number, STREQUEST_SEQUENCE, ORDER_SEQUENCE, INVOICE_SEQUENCE
 from .forms import STRequestForm
 from django.contrib.auth.decorators import login_required
 from rest_framework import viewsets, status, serializers, generics, permissions, filters
@@ -18,7 +20,9 @@ from django.conf import settings
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from .serializers import UserSerializer, ProductSerializer, STRequestSerializer, InvoiceSerializer, StatusSerializer, ProductOperationSerializer, OrderSerializer, RetouchStatusSerializer, STRequestStatusSerializer, OrderStatusSerializer, ProductCategorySerializer, UserURLsSerializer, STRequestHistorySerializer, NofotoListSerializer, DefectSerializer
-from .pagination import NofotoPagination
+from .pagination import KeysetPaginationMixin, NofotoPagination
+from .product_upload_logic import validate_product_rows, upsert_products, enqueue_product_upsert
+from .staff_stats_logic import day_range, photographer_stats, retoucher_stats
 from django.db import transaction, IntegrityError
 from django.db.models import Count, Max, F, Value, Q, Sum, OuterRef, Subquery
 from django.db.models.functions import Concat
@@ -35,17 +39,17 @@ from django_q.tasks import async_task
 logger = logging.getLogger(__name__)
 
 # Пагинация
-class ProductPagination(PageNumberPagination):
+class ProductPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 999999
 
-class OrderPagination(PageNumberPagination):
+class OrderPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
-class ProductHistoryPagination(PageNumberPagination):
+class ProductHistoryPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 1000
@@ -146,14 +150,8 @@ def send_products(request):
 
 
 def generate_next_request_number():
-    with transaction.atomic():
-        last_request = STRequest.objects.select_for_update().order_by('-RequestNumber').first()
-        if last_request:
-            # Увеличиваем числовую часть номера
-            next_number = str(int(last_request.RequestNumber) + 1).zfill(13)
-        else:
-            next_number = "2000000000001"
-        return next_number
+    # Номер выдает общий счетчик заявок (manager.numbering_logic)
+    return str(allocate_number(STREQUEST_SEQUENCE)).zfill(13)
 
 # Проверка наличия штрихкода
 @api_view(['GET'])
@@ -173,7 +171,7 @@ def add_product_operation(request):
     comment = request.data.get('comment', '')  # Получаем комментарий из запроса
 
     # Находим тип операции
-    operation_type = ProductOperationTypes.objects.filter(id=operation_id).first()
+    operation_type = get_reference_or_none(ProductOperationTypes, operation_id)
     if not operation_type:
         return Response({'error': 'Invalid operation type'}, status=400)
 
@@ -524,7 +522,7 @@ def create_request(request):
     )
 
     # Получаем тип операции для истории
-    operation_type = STRequestHistoryOperations.objects.filter(id=1).first()
+    operation_type = get_reference_or_none(STRequestHistoryOperations, 1)
     if not operation_type:
         return Response({'error': 'Тип операции с ID=1 не найден'}, status=400)
 
@@ -679,9 +677,8 @@ def create_invoice(request):
     creator = request.user  # Получаем текущего пользователя
     date = request.data.get('date', timezone.now())
 
-    # Получаем максимальный номер накладной и увеличиваем его на 1
-    max_invoice_number = Invoice.objects.aggregate(Max('InvoiceNumber'))['InvoiceNumber__max']
-    new_invoice_number = str(int(max_invoice_number) + 1).zfill(13) if max_invoice_number else '0000000000001'
+    # Следующий номер накладной из общего счетчика
+    new_invoice_number = str(allocate_number(INVOICE_SEQUENCE)).zfill(13)
 
     # Создаем новую накладную с уникальным номером
     new_invoice = Invoice.objects.create(
@@ -781,7 +778,7 @@ def log_defect_operation(request):
     product.save()
 
     # Получаем тип операции (25 - "брак")
-    defect_operation_type = ProductOperationTypes.objects.get(id=25)
+    defect_operation_type = get_reference(ProductOperationTypes, 25)
 
     # Логируем операцию с комментарием
     ProductOperation.objects.create(
@@ -829,7 +826,7 @@ def finalize_request(request):
         return Response({'error': 'Заявка не найдена'}, status=404)
 
     # Получаем тип операции для истории
-    operation_type = STRequestHistoryOperations.objects.filter(id=1).first()
+    operation_type = get_reference_or_none(STRequestHistoryOperations, 1)
     if not operation_type:
         return Response({'error': 'Тип операции с ID=1 не найден'}, status=400)
 
@@ -966,8 +963,8 @@ def update_request(request, request_number):
         logger.info(f'Удаляем штрихкоды: {removed_barcodes}')
 
         # Получаем типы операций
-        add_operation = STRequestHistoryOperations.objects.filter(id=1).first()
-        remove_operation = STRequestHistoryOperations.objects.filter(id=2).first()
+        add_operation = get_reference_or_none(STRequestHistoryOperations, 1)
+        remove_operation = get_reference_or_none(STRequestHistoryOperations, 2)
         if not add_operation or not remove_operation:
             return Response({'error': 'Не найдены типы операций (id=1 или id=2)'}, status=400)
 
@@ -1378,10 +1375,7 @@ def create_order(request):
         priority_flag = request.data.get('priority', False)
 
         # Генерация нового номера заказа
-        last_order = Order.objects.aggregate(Max('OrderNumber'))
-        new_order_number = int(last_order['OrderNumber__max'] or 0) + 1
-        while Order.objects.filter(OrderNumber=new_order_number).exists():
-            new_order_number += 1
+        new_order_number = allocate_number(ORDER_SEQUENCE)
 
         current_date = timezone.now()
         creator_id = request.user.id
@@ -1430,53 +1424,45 @@ def upload_products_batch(request):
     if not data:
         return Response({'error': 'Отсутствуют данные для загрузки'}, status=400)
 
-    missing_data_rows = []  # Список для хранения строк с отсутствующими данными
-
-    # Начинаем транзакцию для обработки данных
-    with transaction.atomic():
-        for index, row in enumerate(data):
-            barcode = row.get('barcode')
-            name = row.get('name')
-            category_id = row.get('category_id')
-            seller = row.get('seller')
-            in_stock_sum = row.get('in_stock_sum')
-            cell = row.get('cell')
-
-            # Проверка на обязательные поля
-            if not barcode or not name or category_id is None or seller is None or in_stock_sum is None:
-                missing_data_rows.append({
-                    'row': index + 1,
-                    'barcode': barcode,
-                    'name': name,
-                    'category_id': category_id,
-                    'seller': seller,
-                    'in_stock_sum': in_stock_sum,
-                    'cell': cell
-                })
-                continue  # Переходим к следующей записи
-
-            try:
-                # Создание или обновление записи
-                Product.objects.update_or_create(
-                    barcode=barcode,
-                    defaults={
-                        'name': name,
-                        'category_id': category_id,
-                        'seller': seller,
-                        'in_stock_sum': in_stock_sum,
-                        'cell': cell
-                    }
-                )
-            except Exception as e:
-                transaction.set_rollback(True)
-                return Response({'error': f'Ошибка при загрузке данных: {str(e)}'}, status=400)
+    # Проверка всех строк по одной карте категорий
+    items, errors = validate_product_rows(data, strict=False)
 
-    # Проверка на наличие строк с отсутствующими обязательными данными
-    if missing_data_rows:
-        return Response({
+    # Строки без ошибок записываются, даже если в файле есть ошибочные
+    task_id = None
+    if items and request.data.get('async'):
+        # Большие файлы можно записать в фоне - прогресс придет по WebSocket
+        task_id = enqueue_product_upsert(items, request.user.id)
+    elif items:
+        try:
+            upsert_products(items)
+        except Exception as e:
+            return Response({'error': f'Ошибка при загрузке данных: {str(e)}'}, status=400)
+
+    # Проверка на наличие строк с отсутствующими или некорректными данными
+    if errors:
+        missing_data_rows = []
+        for error in errors:
+            row = error['data'] if isinstance(error['data'], dict) else {}
+            missing_data_rows.append({
+                'row': error['row'],
+                'barcode': row.get('barcode'),
+                'name': row.get('name'),
+                'category_id': row.get('category_id'),
+                'seller': row.get('seller'),
+                'in_stock_sum': row.get('in_stock_sum'),
+                'cell': row.get('cell'),
+                'errors': error['errors'],
+            })
+        response_data = {
             'error': 'Отсутствуют обязательные данные в строках.',
             'missing_data': missing_data_rows
-        }, status=400)
+        }
+        if task_id:
+            response_data['task_id'] = task_id
+        return Response(response_data, status=400)
+
+    if task_id:
+        return Response({'message': 'Загрузка запущена, ждите уведомления.', 'task_id': task_id}, status=202)
     
     # Возвращаем успешный ответ, если все данные загружены корректно
     return Response({'message': 'Данные успешно загружены'}, status=201)
@@ -1758,31 +1744,19 @@ class PhotographerStatsView(APIView):
         except ValueError:
             return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, status=400)
 
-        # Получаем список фотографов и вычисляем статистику
-        stats = (
-            User.objects
-            .filter(groups__name="Фотограф")
-            .annotate(
-                # Подсчет уникальных заявок
-                requests_count=Count(
-                    'photographer_requests',
-                    filter=Q(
-                        photographer_requests__status_id__in=[5, 6, 7, 8, 9], 
-                        photographer_requests__photo_date__date=selected_date
-                    ),
-                    distinct=True
-                ),
-                # Подсчет товаров, связанных с этими заявками
-                total_products=Count(
-                    'photographer_requests__strequestproduct',
-                    filter=Q(
-                        photographer_requests__status_id__in=[5, 6, 7, 8, 9], 
-                        photographer_requests__photo_date__date=selected_date
-                    )
-                )
-            )
-            .values('id', 'first_name', 'last_name', 'requests_count', 'total_products')
-        )
+        # Заявки за день в статусах 5-9 одним сгруппированным запросом, затем все фотографы группы
+        start_dt, end_dt = day_range(selected_date)
+        by_user = {item['user_id']: item for item in photographer_stats(start_dt, end_dt, statuses=[5, 6, 7, 8, 9])}
+        stats = [
+            {
+                'id': user['id'],
+                'first_name': user['first_name'],
+                'last_name': user['last_name'],
+                'requests_count': by_user.get(user['id'], {}).get('requests', 0),
+                'total_products': by_user.get(user['id'], {}).get('products', 0),
+            }
+            for user in User.objects.filter(groups__name="Фотограф").order_by('id').values('id', 'first_name', 'last_name')
+        ]
 
         return Response(stats)
 
@@ -1795,26 +1769,24 @@ class RetoucherStatsView(APIView):
         if not selected_date:
             return Response({"error": "Date parameter is required"}, status=400)
 
-        # Get retouchers and calculate stats
-        stats = (
-            User.objects
-            .filter(groups__name="Ретушер")
-            .annotate(
-                # Count distinct requests
-                requests_count=Count(
-                    'retoucher_requests',
-                    filter=Q(retoucher_requests__status_id__in=[8, 9], retoucher_requests__retouch_date__date=selected_date),
-                    distinct=True
-                ),
-                # Count distinct products in the requests
-                total_products=Count(
-                    'retoucher_requests__strequestproduct__id',
-                    filter=Q(retoucher_requests__status_id__in=[8, 9], retoucher_requests__retouch_date__date=selected_date),
-                    distinct=True
-                )
-            )
-            .values('id', 'first_name', 'last_name', 'requests_count', 'total_products')
-        )
+        try:
+            selected_date = datetime.strptime(selected_date, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, status=400)
+
+        # Заявки за день в статусах 8-9 одним сгруппированным запросом, затем все ретушеры группы
+        start_dt, end_dt = day_range(selected_date)
+        by_user = {item['user_id']: item for item in retoucher_stats(start_dt, end_dt, statuses=[8, 9])}
+        stats = [
+            {
+                'id': user['id'],
+                'first_name': user['first_name'],
+                'last_name': user['last_name'],
+                'requests_count': by_user.get(user['id'], {}).get('requests', 0),
+                'total_products': by_user.get(user['id'], {}).get('products', 0),
+            }
+            for user in User.objects.filter(groups__name="Ретушер").order_by('id').values('id', 'first_name', 'last_name')
+        ]
 
         return Response(stats)
 
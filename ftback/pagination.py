@@ -1,5 +1,7 @@
 from rest_framework.pagination import PageNumberPagination
 
+from core.pagination import KeysetPaginationMixin
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
@@ -17,7 +19,7 @@ class RetouchRequestPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 2000
 
-class ReadyPhotosPagination(PageNumberPagination):
+class ReadyPhotosPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 100             # дефолт
     page_size_query_param = 'page_size'
     max_page_size = 200000     # максимальный размер
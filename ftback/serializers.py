@@ -24,6 +24,8 @@ from core.models import(
     RetouchStatus,
     SRetouchStatus,
 )
+from core.reference_data import get_reference
+from manager.numbering_logic import allocate_number, RETOUCH_REQUEST_SEQUENCE
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -335,8 +337,7 @@ class SRRetouchRequestCreateSerializer(serializers.Serializer):
         strequestproduct_ids = validated_data.get('strequestproduct_ids')
         retoucher_id = validated_data.get('retoucher_id', None)
 
-        max_number = RetouchRequest.objects.aggregate(mn=Max('RequestNumber'))['mn'] or 0
-        request_number = max_number + 1
+        request_number = allocate_number(RETOUCH_REQUEST_SEQUENCE)
 
         retoucher = None
         if retoucher_id:
@@ -592,7 +593,7 @@ class RetouchStatusUpdateSerializer(serializers.Serializer):
 
         # Проверяем корректность retouch_status_id
         try:
-            new_status = RetouchStatus.objects.get(id=retouch_status_id)
+            new_status = get_reference(RetouchStatus, retouch_status_id)
         except RetouchStatus.DoesNotExist:
             raise serializers.ValidationError({"retouch_status_id": "RetouchStatus does not exist."})
 
@@ -651,7 +652,7 @@ class SRetouchStatusUpdateSerializer(serializers.Serializer):
 
         # Проверяем корректность sretouch_status_id
         try:
-            new_status = SRetouchStatus.objects.get(id=sretouch_status_id)
+            new_status = get_reference(SRetouchStatus, sretouch_status_id)
         except SRetouchStatus.DoesNotExist:
             raise serializers.ValidationError({"sretouch_status_id": "SRetouchStatus does not exist."})
 
@@ -689,7 +690,7 @@ class RetouchRequestSetStatusSerializer(serializers.Serializer):
 
         # 2) Проверяем, есть ли такой статус
         try:
-            new_status = RetouchRequestStatus.objects.get(id=status_id)
+            new_status = get_reference(RetouchRequestStatus, status_id)
         except RetouchRequestStatus.DoesNotExist:
             raise serializers.ValidationError({"status_id": "RetouchRequestStatus not found."})
 
@@ -43,6 +43,10 @@ from core.models import (
     SRetouchStatus,
     Nofoto
 )
+from core.pagination import KeysetPaginationMixin
+from core.reference_data import get_reference, get_reference_or_404
+from manager.numbering_logic import allocate_number, STREQUEST_SEQUENCE
+from core.staff_stats_logic import day_range, photographer_stats, assistant_stats, sorted_by
 from .serializers import (
     UserProfileSerializer,
     ProductSerializer,
@@ -265,7 +269,7 @@ class PhotographerUpdateProductView(APIView):
         # Проверяем, указан ли photo_status, и валиден ли он
         if photo_status_id is not None:
             try:
-                photo_status = PhotoStatus.objects.get(id=photo_status_id)
+                photo_status = get_reference(PhotoStatus, photo_status_id)
             except PhotoStatus.DoesNotExist:
                 return Response({"error": "Указанный photo_status не найден."}, 
                                 status=status.HTTP_404_NOT_FOUND)
@@ -307,7 +311,7 @@ class CreateSTRequestPhotoTimeView(APIView):
         # --- Added functionality: Create ProductOperation entry ---
         try:
             # Get the operation type (assuming id=50 exists)
-            operation_type_instance = get_object_or_404(ProductOperationTypes, id=50)
+            operation_type_instance = get_reference_or_404(ProductOperationTypes, 50)
 
             # Create the ProductOperation record
             ProductOperation.objects.create(
@@ -379,7 +383,7 @@ class StartShootingView(APIView):
         st_request_product = get_object_or_404(STRequestProduct, request=st_request, product=product)
 
         # Предполагается, что PhotoStatus с pk=10 уже есть в базе данных
-        photo_status_obj = get_object_or_404(PhotoStatus, pk=10)
+        photo_status_obj = get_reference_or_404(PhotoStatus, 10)
 
         st_request_product.photo_status = photo_status_obj
         st_request_product.save()
@@ -687,7 +691,7 @@ class UpdateSRetouchStatusView(APIView):
 
                 # Меняем статус заявки
                 try:
-                    new_status = RetouchRequestStatus.objects.get(id=5)
+                    new_status = get_reference(RetouchRequestStatus, 5)
                     retouch_request.status = new_status
                     retouch_request.save(update_fields=["status"])
                 except RetouchRequestStatus.DoesNotExist:
@@ -1013,22 +1017,9 @@ def stockman_opened(request):
 def get_next_request_number() -> str:
     """
     Возвращает следующий номер заявки (строка длиной 13 символов с ведущими нулями).
-    Если записей нет, начинаем с '0000000000001'.
-    Предполагаем, что в RequestNumber хранятся только цифры в виде строки.
+    Номер выдает общий счетчик заявок, повторно он не выдается.
     """
-    max_number = STRequest.objects.aggregate(max_num=Max('RequestNumber'))['max_num']
-    if max_number is None:
-        # Если еще ни одной заявки нет
-        return "0000000000001"
-    try:
-        # Пробуем интерпретировать существующий макс. номер как число
-        next_num_int = int(max_number) + 1
-    except ValueError:
-        # Если вдруг в базе окажется не-числовая строка,
-        # можно либо сгенерировать ошибку, либо начать с 1.
-        next_num_int = 1
-    # Преобразуем в строку, дополненную нулями до длины 13
-    return str(next_num_int).zfill(13)
+    return str(allocate_number(STREQUEST_SEQUENCE)).zfill(13)
 
 def strequest_create(request):
     """
@@ -1055,7 +1046,7 @@ def strequest_create(request):
         # Принудительно устанавливаем статус = 1
         # Предполагаем, что такая запись (ID=1) в STRequestStatus существует.
         try:
-            strequest.status = STRequestStatus.objects.get(pk=1)
+            strequest.status = get_reference(STRequestStatus, 1)
         except STRequestStatus.DoesNotExist:
             return Response(
                 {"detail": "Статус с ID=1 не найден в STRequestStatus."},
@@ -1120,7 +1111,7 @@ def nofoto_create(request):
         # Убедимся, что операция с ID=2 существует
         # (если уверены, что существует — можно пропустить проверку)
         try:
-            operation_del = STRequestHistoryOperations.objects.get(pk=2)
+            operation_del = get_reference(STRequestHistoryOperations, 2)
         except STRequestHistoryOperations.DoesNotExist:
             return Response(
                 {"detail": "Не найдена операция STRequestHistoryOperations c ID=2."},
@@ -1283,107 +1274,31 @@ def sp_daily_stats(request):
     # Пытаемся распарсить дату из формата dd.mm.yyyy
     try:
         day, month, year = map(int, date_str.split('.'))
-        stats_date = datetime(year, month, day)
+        stats_date = date(year, month, day)
     except (ValueError, TypeError):
         return Response(
             {"detail": "Некорректный формат даты. Ожидается dd.mm.yyyy"},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # ----------------------------------------------------------------------------
-    # 1. ФОТОГРАФЫ
-    # ----------------------------------------------------------------------------
-    # Фильтруем заявки, у которых date (только год, месяц, день) совпадает с photo_date
-    # И у которых есть фотограф photographer.
-    # Для каждой такой заявки суммируем товары с photo_status ∈ [1,2,25] и sphoto_status=1.
-    # Затем группируем по фотографу.
-
-    photographers_data = {}
-    # Список нужных заявок
-    photographer_requests = STRequest.objects.filter(
-        photo_date__year=stats_date.year,
-        photo_date__month=stats_date.month,
-        photo_date__day=stats_date.day
-    ).exclude(photographer=None)
-
-    # Подтягиваем связанные продукты одним запросом
-    # (select_related/ prefetch_related по необходимости)
-    for streq in photographer_requests.prefetch_related('strequestproduct_set', 'photographer'):
-        if not streq.photographer:
-            continue
-        ph = streq.photographer
-        # Подсчёт количества товаров в этой заявке
-        # photo_status ∈ [1,2,25], sphoto_status=1
-        count_products = STRequestProduct.objects.filter(
-            request=streq,
-            photo_status__id__in=[1, 2, 25],
-            sphoto_status__id=1
-        ).count()
-
-        # накапливаем в dict
-        if ph.id not in photographers_data:
-            photographers_data[ph.id] = {
-                "user": ph,
-                "count": 0
-            }
-        photographers_data[ph.id]["count"] += count_products
-
-    # Формируем итоговый список
-    photographers_result = []
-    for ph_id, val in photographers_data.items():
-        user = val["user"]
-        total = val["count"]
-        first_name = user.first_name or ""
-        last_name = user.last_name or ""
-        photographers_result.append(f"{first_name} {last_name} - {total}")
-
-    # ----------------------------------------------------------------------------
-    # 2. АССИСТЕНТЫ
-    # ----------------------------------------------------------------------------
-    # Смотрим заявки, у которых assistant_date (год/месяц/день) = stats_date
-    # и есть ассистент. По каждой заявке считаем ВСЕ товары (STRequestProduct.count)
-    # Группируем по ассистенту, суммируем.
-
-    assistants_data = {}
-    assistant_requests = STRequest.objects.filter(
-        assistant_date__year=stats_date.year,
-        assistant_date__month=stats_date.month,
-        assistant_date__day=stats_date.day
-    ).exclude(assistant=None)
-
-    for streq in assistant_requests.prefetch_related('strequestproduct_set', 'assistant'):
-        if not streq.assistant:
-            continue
-        asst = streq.assistant
-        # Подсчёт всех товаров в заявке
-        count_products = STRequestProduct.objects.filter(request=streq).count()
-
-        if asst.id not in assistants_data:
-            assistants_data[asst.id] = {
-                "user": asst,
-                "count": 0
-            }
-        assistants_data[asst.id]["count"] += count_products
-
-    # Формируем итоговый список
-    assistants_result = []
-    for asst_id, val in assistants_data.items():
-        user = val["user"]
-        total = val["count"]
-        first_name = user.first_name or ""
-        last_name = user.last_name or ""
-        assistants_result.append(f"{first_name} {last_name} - {total}")
-
-    # ----------------------------------------------------------------------------
-    # Итоговый ответ
-    # ----------------------------------------------------------------------------
+    start_dt, end_dt = day_range(stats_date)
+
+    # Фотографы: товары с photo_status ∈ [1,2,25] и sphoto_status=1 в заявках с photo_date за день.
+    # Ассистенты: все товары в заявках с assistant_date за день.
+    photographers = sorted_by(photographer_stats(start_dt, end_dt), 'photographed')
+    assistants = sorted_by(assistant_stats(start_dt, end_dt), 'products')
+
     response_data = {
-        "photographers": photographers_result,
-        "assistants": assistants_result
+        "photographers": [
+            f"{item['first_name'] or ''} {item['last_name'] or ''} - {item['photographed']}" for item in photographers
+        ],
+        "assistants": [
+            f"{item['first_name'] or ''} {item['last_name'] or ''} - {item['products']}" for item in assistants
+        ]
     }
     return Response(response_data, status=status.HTTP_200_OK)
 
-class ProductOperationHistoryNew(PageNumberPagination):
+class ProductOperationHistoryNew(KeysetPaginationMixin, PageNumberPagination):
     page_size = 50  # можно настроить размер страницы
     page_size_query_param = 'page_size'
     max_page_size = 999999
@@ -1,6 +1,8 @@
 from rest_framework.pagination import PageNumberPagination
 
-class StandardResultsSetPagination(PageNumberPagination):
+from core.pagination import KeysetPaginationMixin
+
+class StandardResultsSetPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 999999
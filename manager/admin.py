@@ -1,3 +1,36 @@
 from django.contrib import admin
+from .models import QueueCounter, NumberSequence, DailyStat, DailyStatDay
+from .numbering_logic import resync_number_sequence
 
-# Register your models here.
+
+@admin.register(QueueCounter)
+class QueueCounterAdmin(admin.ModelAdmin):
+    list_display = ['key', 'value', 'updated_at']
+    search_fields = ['key']
+
+
+@admin.register(NumberSequence)
+class NumberSequenceAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_value', 'updated_at']
+    search_fields = ['name']
+    actions = ['resync_with_tables']
+
+    @admin.action(description="Сверить с максимальным номером в таблице")
+    def resync_with_tables(self, request, queryset):
+        for sequence in queryset:
+            resync_number_sequence(sequence.name)
+        self.message_user(request, f"Сверено счетчиков: {queryset.count()}")
+
+
+@admin.register(DailyStat)
+class DailyStatAdmin(admin.ModelAdmin):
+    list_display = ['date', 'metric', 'dimension', 'count', 'total']
+    list_filter = ['metric']
+    search_fields = ['metric', 'dimension']
+    date_hierarchy = 'date'
+
+
+@admin.register(DailyStatDay)
+class DailyStatDayAdmin(admin.ModelAdmin):
+    list_display = ['date', 'computed_at']
+    date_hierarchy = 'date'
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'manager'
+
+    def ready(self):
+        from .queue_counter_logic import connect_queue_counter_signals
+        connect_queue_counter_signals()
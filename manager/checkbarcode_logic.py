@@ -1,11 +1,24 @@
-from typing import List
+# manager/checkbarcode_logic.py
+"""
+Классификация штрихкодов: есть фото -> в очереди на ретушь -> без фото ->
+блок (магазин/категория/SKU) -> заказано -> на ФС -> возможно нет остатков -> не найдены.
+
+Общая для BarcodeCheckView, BarcodeSequentialCheckView и команды бота.
+Все флаги по входному набору считаются одним запросом к Product с EXISTS-подзапросами,
+стоп-листы и Nofoto берутся из короткоживущего кэша.
+"""
+from typing import Dict, List
+from asgiref.sync import sync_to_async
 from aiogram.utils.markdown import hbold, hcode
 from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
 # Импортируем все необходимые модели
 from core.models import (
     Product,
+    ProductCategory,
     Nofoto,
     Blocked_Shops,
     Blocked_Barcode,
@@ -14,179 +27,176 @@ from core.models import (
     STRequestProduct
 )
 
+# Сколько часов после проверки старшим товар считается "в очереди на ретушь"
+RETOUCH_QUEUE_WINDOW = timedelta(hours=30)
+
+# Стоп-листы и Nofoto меняются редко - держим их в кэше
+BARCODE_CHECK_SETS_CACHE_KEY = 'manager:barcode_check_sets'
+BARCODE_CHECK_SETS_TTL = 60
+
+# Порядок каскада: ключ, заголовок для бота, статус для последовательной проверки
+BARCODE_CATEGORIES = [
+    ('has_photo', "✅ Есть фото", "Есть фото"),
+    ('in_retouch_queue', "⏳ В очереди на ретушь", "В очереди на ретушь"),
+    ('nofoto', "🚫 Без фото", "Без фото"),
+    ('blocked_by_shop', "🔒 Блок (магазин)", "Заблокирован магазин"),
+    ('blocked_by_category', "🔒 Блок (категория)", "Заблокирована категория"),
+    ('blocked_by_barcode', "🔒 Блок (SKU)", "Заблокирован SKU"),
+    ('ordered', "🛒 Заказано", "Заказан"),
+    ('onfs', "📦 На ФС", "Принят"),
+    ('possible_zero_stock', "📉 Возможно нет остатков", "Возможно нет остатков"),
+    ('missed', "❓ Не найдены", "Не найдено"),
+]
+CATEGORY_KEYS = [key for key, _, _ in BARCODE_CATEGORIES]
+CATEGORY_STATUSES = {key: status for key, _, status in BARCODE_CATEGORIES}
+
+
+def normalize_barcodes(values) -> List[str]:
+    """Оставляет только цифровые ШК до 13 знаков и дополняет их нулями до 13 (порядок сохраняется)."""
+    result = []
+    for value in values:
+        if value is None:
+            continue
+        bc = str(value).strip()
+        if bc.isdigit() and len(bc) <= 13:
+            result.append(bc.zfill(13))
+    return result
+
+
+def get_barcode_check_sets() -> Dict[str, set]:
+    sets = cache.get(BARCODE_CHECK_SETS_CACHE_KEY)
+    if sets is None:
+        sets = {
+            'blocked_shops': set(Blocked_Shops.objects.values_list('shop_id', flat=True)),
+            'blocked_categories': set(ProductCategory.objects.filter(IsBlocked=True).values_list('id', flat=True)),
+            'blocked_barcodes': set(Blocked_Barcode.objects.values_list('barcode', flat=True)),
+            'nofoto_barcodes': set(Nofoto.objects.values_list('product__barcode', flat=True)),
+        }
+        cache.set(BARCODE_CHECK_SETS_CACHE_KEY, sets, BARCODE_CHECK_SETS_TTL)
+    return sets
+
+
+def classify_barcodes(barcodes) -> Dict[str, str]:
+    """
+    {штрихкод: категория из CATEGORY_KEYS} для нормализованных ШК.
+    Один запрос к Product (флаги фото/ретуши/заказа - EXISTS) плюс кэш стоп-листов.
+    """
+    unique = set(barcodes)
+    if not unique:
+        return {}
+    sets = get_barcode_check_sets()
+
+    rows = Product.objects.filter(barcode__in=unique).annotate(
+        has_photo=Exists(RetouchRequestProduct.objects.filter(
+            st_request_product__product=OuterRef('pk'), retouch_status_id=2, sretouch_status_id=1
+        )),
+        in_retouch_queue=Exists(STRequestProduct.objects.filter(
+            product=OuterRef('pk'), photo_status_id=1, sphoto_status_id=1,
+            senior_check_date__gte=timezone.now() - RETOUCH_QUEUE_WINDOW
+        )),
+        ordered=Exists(OrderProduct.objects.filter(
+            product=OuterRef('pk'), order__status_id__in=[2, 3]
+        )),
+    ).values_list('barcode', 'seller', 'category_id', 'move_status_id', 'in_stock_sum',
+                  'has_photo', 'in_retouch_queue', 'ordered')
+
+    result = {}
+    for barcode, seller, category_id, move_status_id, in_stock_sum, has_photo, in_retouch_queue, ordered in rows:
+        flags = {
+            'has_photo': has_photo,
+            'in_retouch_queue': in_retouch_queue,
+            'nofoto': barcode in sets['nofoto_barcodes'],
+            'blocked_by_shop': seller in sets['blocked_shops'],
+            'blocked_by_category': category_id in sets['blocked_categories'],
+            'blocked_by_barcode': barcode in sets['blocked_barcodes'],
+            'ordered': ordered,
+            'onfs': move_status_id == 3,
+            'possible_zero_stock': in_stock_sum == 0,
+        }
+        result[barcode] = next((key for key in CATEGORY_KEYS if flags.get(key)), 'missed')
+
+    # ШК из стоп-листа считается заблокированным, даже если товара нет в базе
+    for barcode in unique - result.keys():
+        result[barcode] = 'blocked_by_barcode' if barcode in sets['blocked_barcodes'] else 'missed'
+    return result
+
+
+def group_by_category(classified: Dict[str, str]) -> Dict[str, List[str]]:
+    groups = {key: [] for key in CATEGORY_KEYS}
+    for barcode, category in classified.items():
+        groups[category].append(barcode)
+    for bucket in groups.values():
+        bucket.sort()
+    return groups
+
+
+def get_barcode_details(classified: Dict[str, str]) -> Dict[str, dict]:
+    """Даты и ссылки для последовательной проверки - по одному запросу на категорию, где они есть."""
+    groups = group_by_category(classified)
+    details = {}
+
+    if groups['has_photo']:
+        for barcode, retouch_link, photo_date in RetouchRequestProduct.objects.filter(
+            st_request_product__product__barcode__in=groups['has_photo'],
+            retouch_status_id=2, sretouch_status_id=1
+        ).values_list('st_request_product__product__barcode', 'retouch_link',
+                      'st_request_product__request__photo_date'):
+            details.setdefault(barcode, {"retouch_link": retouch_link, "photo_date": photo_date})
+
+    if groups['in_retouch_queue']:
+        for barcode, photo_date in STRequestProduct.objects.filter(
+            product__barcode__in=groups['in_retouch_queue'],
+            photo_status_id=1, sphoto_status_id=1,
+            senior_check_date__gte=timezone.now() - RETOUCH_QUEUE_WINDOW
+        ).values_list('product__barcode', 'request__photo_date'):
+            details.setdefault(barcode, {"date": photo_date})
+
+    if groups['nofoto']:
+        for barcode, date in Nofoto.objects.filter(
+            product__barcode__in=groups['nofoto']
+        ).values_list('product__barcode', 'date'):
+            details.setdefault(barcode, {"date": date})
+
+    if groups['ordered']:
+        for barcode, order_date in OrderProduct.objects.filter(
+            product__barcode__in=groups['ordered'], order__status_id__in=[2, 3]
+        ).values_list('product__barcode', 'order__date'):
+            details.setdefault(barcode, {"order_date": order_date})
+
+    if groups['onfs']:
+        for barcode, income_date in Product.objects.filter(
+            barcode__in=groups['onfs']
+        ).values_list('barcode', 'income_date'):
+            details[barcode] = {"income_date": income_date}
+
+    return details
+
+
+async def classify_barcodes_async(barcodes) -> Dict[str, str]:
+    return await sync_to_async(classify_barcodes)(barcodes)
+
 
 async def check_barcodes(barcodes: List[str]) -> str:
     """
     Проверяет список штрихкодов по категориям, аналогичным BarcodeCheckView.
     Возвращает отформатированное HTML-сообщение с результатами.
     """
-    # 1. Валидация и нормализация
-    raw = [bc.strip() for bc in barcodes if bc and bc.strip().isdigit()]
-    initial_set = {bc.zfill(13) for bc in raw if len(bc) <= 13}
+    initial_set = set(normalize_barcodes(barcodes))
     if not initial_set:
         return "❗ Нет валидных штрихкодов для проверки."
 
-    barcodes_to_check = initial_set.copy()
-
-    # 2. Инициализация категорий
-    has_photo = set()
-    in_retouch_queue = set()
-    nofoto = set()
-    blocked_by_shop = set()
-    blocked_by_category = set()
-    blocked_by_barcode = set()
-    ordered = set()
-    onfs = set()
-    possible_zero_stock = set()
-    
-    # 3. Последовательные проверки
-    # 3.1 Есть фото
-    if barcodes_to_check:
-        found = set()
-        qs = RetouchRequestProduct.objects.filter(
-            st_request_product__product__barcode__in=barcodes_to_check,
-            retouch_status__id=2,
-            sretouch_status__id=1
-        ).values_list('st_request_product__product__barcode', flat=True)
-        async for code in qs:
-            found.add(code)
-        if found:
-            has_photo.update(found)
-            barcodes_to_check -= found
-
-    # 3.2 В очереди на ретушь
-    if barcodes_to_check:
-        found = set()
-        three_days_ago = timezone.now() - timedelta(hours=20)
-        qs = STRequestProduct.objects.filter(
-            product__barcode__in=barcodes_to_check,
-            photo_status__id=1,
-            sphoto_status__id=1,
-            senior_check_date__gte=three_days_ago
-        ).values_list('product__barcode', flat=True)
-        async for code in qs:
-            found.add(code)
-        if found:
-            in_retouch_queue.update(found)
-            barcodes_to_check -= found
-
-    # 3.3 Без фото (Nofoto)
-    if barcodes_to_check:
-        found = set()
-        qs = Nofoto.objects.filter(
-            product__barcode__in=barcodes_to_check
-        ).values_list('product__barcode', flat=True)
-        async for code in qs:
-            found.add(code)
-        if found:
-            nofoto.update(found)
-            barcodes_to_check -= found
-
-    # 3.4 Блок (магазин)
-    if barcodes_to_check:
-        found = set()
-        shop_ids = {sid async for sid in Blocked_Shops.objects.values_list('shop_id', flat=True)}
-        if shop_ids:
-            qs = Product.objects.filter(
-                barcode__in=barcodes_to_check, 
-                seller__in=shop_ids
-            ).values_list('barcode', flat=True)
-            async for code in qs:
-                found.add(code)
-            if found:
-                blocked_by_shop.update(found)
-                barcodes_to_check -= found
-
-    # 3.5 Блок (категория)
-    if barcodes_to_check:
-        found = set()
-        qs = Product.objects.filter(
-            barcode__in=barcodes_to_check, 
-            category__IsBlocked=True
-        ).values_list('barcode', flat=True)
-        async for code in qs:
-            found.add(code)
-        if found:
-            blocked_by_category.update(found)
-            barcodes_to_check -= found
-
-    # 3.6 Блок (SKU)
-    if barcodes_to_check:
-        found = set()
-        qs = Blocked_Barcode.objects.filter(
-            barcode__in=barcodes_to_check
-        ).values_list('barcode', flat=True)
-        async for code in qs:
-            found.add(code)
-        if found:
-            blocked_by_barcode.update(found)
-            barcodes_to_check -= found
-
-    # 3.7 Заказано
-    if barcodes_to_check:
-        found = set()
-        qs = OrderProduct.objects.filter(
-            product__barcode__in=barcodes_to_check,
-            order__status__id__in=[2, 3]
-        ).values_list('product__barcode', flat=True)
-        async for code in qs:
-            found.add(code)
-        if found:
-            ordered.update(found)
-            barcodes_to_check -= found
-
-    # 3.8 На ФС
-    if barcodes_to_check:
-        found = set()
-        qs = Product.objects.filter(
-            barcode__in=barcodes_to_check, 
-            move_status__id=3
-        ).values_list('barcode', flat=True)
-        async for code in qs:
-            found.add(code)
-        if found:
-            onfs.update(found)
-            barcodes_to_check -= found
-
-    # 3.9 Возможно нет остатков
-    if barcodes_to_check:
-        found = set()
-        qs = Product.objects.filter(
-            barcode__in=barcodes_to_check, 
-            in_stock_sum=0
-        ).values_list('barcode', flat=True)
-        async for code in qs:
-            found.add(code)
-        if found:
-            possible_zero_stock.update(found)
-            barcodes_to_check -= found
-
-    # 3.10 Не найдены
-    missed = barcodes_to_check
-
-    # 4. Формирование сообщения
-    sections = [
-        ("✅ Есть фото", has_photo),
-        ("⏳ В очереди на ретушь", in_retouch_queue),
-        ("🚫 Без фото", nofoto),
-        ("🔒 Блок (магазин)", blocked_by_shop),
-        ("🔒 Блок (категория)", blocked_by_category),
-        ("🔒 Блок (SKU)", blocked_by_barcode),
-        ("🛒 Заказано", ordered),
-        ("📦 На ФС", onfs),
-        ("📉 Возможно нет остатков", possible_zero_stock),
-        ("❓ Не найдены", missed),
-    ]
-    
+    groups = group_by_category(await classify_barcodes_async(initial_set))
+
     lines: List[str] = []
-    total_found = len(initial_set) - len(missed)
+    total_found = len(initial_set) - len(groups['missed'])
     lines.append(hbold(f"✅ Проверено: {len(initial_set)}, Найдено: {total_found}"))
     lines.append("")
 
-    for title, bucket in sections:
+    for key, title, _ in BARCODE_CATEGORIES:
+        bucket = groups[key]
         if bucket:  # Показываем секцию, только если в ней есть товары
             lines.append(hbold(f"{title} ({len(bucket)})") + ":")
-            for code in sorted(bucket):
+            for code in bucket:
                 lines.append(hcode(code))
             lines.append("")
 
@@ -0,0 +1,414 @@
+# manager/index_advisor_logic.py
+"""
+Советник по индексам для горячих выборок (очереди, статистика, выдача заданий).
+
+Проба (Probe) - вызов, повторяющий выборки эндпоинта. Запросы пробы перехватываются
+(CaptureQueriesContext), для каждого SELECT выполняется EXPLAIN (FORMAT JSON):
+- Seq Scan по таблице с фильтром - кандидат на индекс; из фильтра берутся колонки:
+  сначала сравнения на равенство (=, IN, IS NULL), затем диапазоны (<, >=, ...);
+- предложение сверяется с индексами модели (Meta.indexes, индексы ForeignKey/db_index).
+
+Замеры (медиана нескольких прогонов) снимаются без индексов из INDEX_PACK (before)
+и с ними (after). Все изменения - удаление/создание индексов, синтетические данные
+(seed_hot_path_data) - делаются в одной транзакции и откатываются: команда index_advisor
+не меняет базу, но на время работы держит блокировки таблиц, запускать ее на копии.
+Работает только на PostgreSQL.
+"""
+import json
+import random
+import re
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Product, ProductOperation, RetouchRequest, RetouchRequestProduct, STRequest, STRequestProduct
+from core.staff_stats_logic import assistant_stats, day_range, photographer_stats, retoucher_stats
+from render.dispatch_logic import QUEUES
+from render.models import ModerationStudioUpload, ModerationUpload, Render
+from render.models import Product as RenderProduct
+from .queue_counter_logic import compute_queue_counters
+from .rollup_logic import compute_daily_stats
+
+# Индексы горячих выборок, которые поставляются миграциями (модель, имя индекса)
+INDEX_PACK = [
+    ('core.STRequestProduct', 'core_strp_photo_status_idx'),
+    ('core.RetouchRequestProduct', 'core_rrp_retouch_status_idx'),
+    ('core.Product', 'core_product_move_income_idx'),
+    ('core.ProductOperation', 'core_prodop_type_date_idx'),
+    ('render.Product', 'render_product_moderation_idx'),
+    ('render.Render', 'render_render_retoucher_st_idx'),
+    ('render.ModerationUpload', 'render_modupload_mod_st_idx'),
+    ('render.ModerationStudioUpload', 'render_studioupld_mod_st_idx'),
+]
+
+# Таблицы меньше порога (pg_class.reltuples) последовательно читаются быстрее, чем по индексу
+DEFAULT_MIN_ROWS = 1000
+DEFAULT_REPEAT = 5
+
+# Условие из плана: колонка, (приведение типа), оператор
+_CONDITION_RE = re.compile(
+    r'"?([A-Za-z_][A-Za-z0-9_]*)"?\)?(?:::[a-z ]+?)?\s+(= ANY|=|<>|>=|<=|>|<|IS NOT NULL|IS NULL)'
+)
+_EQUALITY_OPERATORS = {'=', '= ANY', 'IS NULL'}
+_RANGE_OPERATORS = {'>=', '<=', '>', '<'}
+
+
+@dataclass
+class Probe:
+    name: str
+    # run(context) выполняет выборки эндпоинта; context: {'user': User | None, 'start': ..., 'end': ...}
+    run: Callable
+
+
+@dataclass
+class IndexProposal:
+    model: str
+    table: str
+    columns: list
+    fields: list
+    probes: list = field(default_factory=list)
+    covered_by: str = None
+
+    def as_code(self):
+        # Имя индекса в Django - не длиннее 30 символов
+        name = f"{self.table}_{'_'.join(column[:6] for column in self.columns)}"[:26].rstrip('_').lower()
+        return f"{self.model}: models.Index(fields={self.fields!r}, name='{name}_idx')"
+
+
+# --- Пробы ---
+
+def _claimed_probe(queue):
+    def run(context):
+        list(queue.get_candidates().order_by(*queue.ordering)[:1])
+        if context['user'] is not None:
+            list(queue.get_claimed(context['user'])[:1])
+    return run
+
+
+def _retoucher_renders_probe(context):
+    if context['user'] is None:
+        return
+    Render.objects.filter(Retoucher=context['user'], RetouchStatus_id=5).count()
+    list(Render.objects.filter(Retoucher=context['user'], RetouchStatus_id__in=[1, 2, 5]).order_by('-id')[:50])
+
+
+def _moderator_day_probe(context):
+    if context['user'] is None:
+        return
+    for model in (ModerationUpload, ModerationStudioUpload):
+        model.objects.filter(
+            Moderator=context['user'], UploadTimeStart__gte=context['day_start'], UploadTimeStart__lt=context['end']
+        ).count()
+
+
+def _stock_products_probe(context):
+    list(Product.objects.filter(move_status_id=3).order_by('income_date')[:100])
+    Product.objects.filter(move_status_id=3, priority=True).count()
+
+
+def _operations_probe(context):
+    list(ProductOperation.objects.filter(
+        date__range=(context['start'], context['end']), operation_type_id__in=[3, 4]
+    ).values_list('user_id', 'operation_type_id'))
+
+
+PROBES = [
+    Probe('get_current_queues (пересчет счетчиков)', lambda context: compute_queue_counters()),
+    Probe('StartCheck: очередь рендеров', _claimed_probe(QUEUES['render_check'])),
+    Probe('ModeratorUploadStart: очередь загрузки', _claimed_probe(QUEUES['moderation_upload'])),
+    Probe('ModerationStudioUploadStart: очередь ФС', _claimed_probe(QUEUES['studio_upload'])),
+    Probe('Рендеры ретушера по статусу', _retoucher_renders_probe),
+    Probe('Загрузки модератора за день', _moderator_day_probe),
+    Probe('Статистика фотографов/ассистентов/ретушеров', lambda context: (
+        photographer_stats(context['start'], context['end']),
+        assistant_stats(context['start'], context['end']),
+        retoucher_stats(context['start'], context['end']),
+    )),
+    Probe('Дневная статистика (rollup)', lambda context: compute_daily_stats(context['start'], context['end'])),
+    Probe('Товары на складе', _stock_products_probe),
+    Probe('Операции приемки/отправки за период', _operations_probe),
+]
+
+
+def build_probe_context(days=7):
+    today = timezone.localdate()
+    start, end = day_range(today - timedelta(days=days - 1), today)
+    return {
+        'user': User.objects.order_by('id').first(),
+        'start': start,
+        'end': end,
+        'day_start': day_range(today)[0],
+    }
+
+
+# --- Замеры и планы ---
+
+def time_probe(probe, context, repeat=DEFAULT_REPEAT):
+    """Медиана времени пробы в мс и число ее запросов."""
+    timings = []
+    queries = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            probe.run(context)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = captured.captured_queries
+    return round(statistics.median(timings), 2), queries
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def _iter_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _iter_nodes(child)
+
+
+def seq_scans(plan):
+    """[(таблица, фильтр)] для узлов Seq Scan с условием."""
+    return [
+        (node['Relation Name'], node['Filter'])
+        for node in _iter_nodes(plan)
+        if node.get('Node Type') == 'Seq Scan' and node.get('Filter')
+    ]
+
+
+def filter_columns(filter_text, boolean_columns=()):
+    """
+    Колонки условия: сначала сравнения на равенство, затем диапазоны (без повторов).
+    Булевы колонки PostgreSQL выводит без оператора ("IsOnRender", NOT "IsOnRender"),
+    поэтому они ищутся по имени среди boolean_columns.
+    """
+    equality, ranges = [], []
+    for column, operator in _CONDITION_RE.findall(filter_text):
+        if operator in _EQUALITY_OPERATORS and column not in equality:
+            equality.append(column)
+        elif operator in _RANGE_OPERATORS and column not in ranges:
+            ranges.append(column)
+    for column in boolean_columns:
+        if column not in equality and re.search(rf'\b{re.escape(column)}\b', filter_text):
+            equality.append(column)
+    return equality + [column for column in ranges if column not in equality]
+
+
+def _model_for_table(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+def _table_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+
+def _model_index_columns(model):
+    """{имя: [колонки]} индексов модели: Meta.indexes и одиночные индексы полей (ForeignKey, db_index)."""
+    indexes = {}
+    for index in model._meta.indexes:
+        if index.fields:
+            indexes[index.name] = [model._meta.get_field(name.lstrip('-')).column for name in index.fields]
+    for model_field in model._meta.concrete_fields:
+        if model_field.db_index or model_field.unique:
+            indexes[f"{model_field.name} (поле)"] = [model_field.column]
+    return indexes
+
+
+def propose_index(table, filter_text):
+    model = _model_for_table(table)
+    if model is None:
+        return None
+    column_fields = {model_field.column: model_field.name for model_field in model._meta.concrete_fields}
+    boolean_columns = [
+        model_field.column for model_field in model._meta.concrete_fields
+        if model_field.get_internal_type() == 'BooleanField'
+    ]
+    columns = [column for column in filter_columns(filter_text, boolean_columns) if column in column_fields]
+    if not columns:
+        return None
+    proposal = IndexProposal(
+        model=model._meta.label,
+        table=table,
+        columns=columns,
+        fields=[column_fields[column] for column in columns],
+    )
+    # Индекс модели покрывает предложение, если его ведущие колонки - те же (в любом порядке)
+    for name, index_columns in _model_index_columns(model).items():
+        if set(index_columns[:len(columns)]) == set(columns):
+            proposal.covered_by = name
+            break
+    return proposal
+
+
+def analyze_queries(probe_name, queries, proposals, min_rows=DEFAULT_MIN_ROWS):
+    """Добавляет в proposals ({(таблица, колонки): IndexProposal}) кандидатов из планов запросов пробы."""
+    for query in queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        for table, filter_text in seq_scans(explain(sql)):
+            if _table_rows(table) < min_rows:
+                continue
+            proposal = propose_index(table, filter_text)
+            if proposal is None:
+                continue
+            key = (proposal.table, tuple(proposal.columns))
+            proposal = proposals.setdefault(key, proposal)
+            if probe_name not in proposal.probes:
+                proposal.probes.append(probe_name)
+    return proposals
+
+
+# --- Индексы пакета ---
+
+def get_pack_indexes():
+    """[(модель, Index)] из INDEX_PACK."""
+    result = []
+    for label, name in INDEX_PACK:
+        model = apps.get_model(label)
+        result.append((model, next(index for index in model._meta.indexes if index.name == name)))
+    return result
+
+
+def _existing_index_names(model):
+    with connection.cursor() as cursor:
+        return set(connection.introspection.get_constraints(cursor, model._meta.db_table))
+
+
+def set_pack_indexes(present):
+    """Создает (present=True) или удаляет индексы пакета. Возвращает имена измененных индексов."""
+    changed = []
+    with connection.schema_editor(atomic=False) as schema_editor:
+        for model, index in get_pack_indexes():
+            exists = index.name in _existing_index_names(model)
+            if present and not exists:
+                schema_editor.add_index(model, index)
+            elif not present and exists:
+                schema_editor.remove_index(model, index)
+            else:
+                continue
+            changed.append(index.name)
+    analyze_tables({model._meta.db_table for model, _ in get_pack_indexes()})
+    return changed
+
+
+def analyze_tables(tables):
+    with connection.cursor() as cursor:
+        for table in sorted(tables):
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+
+
+# --- Синтетические данные ---
+
+SEEDED_TABLES = [
+    Product, STRequest, STRequestProduct, ProductOperation, RetouchRequest, RetouchRequestProduct,
+    RenderProduct, Render, ModerationUpload, ModerationStudioUpload,
+]
+
+
+def seed_hot_path_data(size, seed=0):
+    """
+    size товаров с заявками, операциями, рендерами и загрузками с распределением статусов,
+    похожим на рабочее. Справочные id (статусы, типы операций) берутся как есть:
+    внешние ключи в PostgreSQL проверяются при фиксации, а транзакция откатывается.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    users = list(User.objects.order_by('id')[:20]) or [
+        User.objects.create(username=f"index_advisor_{index}") for index in range(20)
+    ]
+
+    def some_time(days=60):
+        return now - timedelta(minutes=rng.randint(0, days * 24 * 60))
+
+    products = Product.objects.bulk_create([
+        Product(
+            barcode=f"7{index:012d}", name=f"index advisor {index}", in_stock_sum=0,
+            move_status_id=rng.choice([1, 2, 3, 3, 3, 4, 7]), income_date=some_time(),
+            priority=rng.random() < 0.1,
+        )
+        for index in range(size)
+    ], batch_size=5000)
+    requests = STRequest.objects.bulk_create([
+        STRequest(
+            RequestNumber=f"6{index:012d}", status_id=rng.choice([1, 2, 3, 5, 5, 5]),
+            photographer=rng.choice(users), assistant=rng.choice(users), retoucher=rng.choice(users),
+            photo_date=some_time(), assistant_date=some_time(), retouch_date=some_time(),
+        )
+        for index in range(max(1, size // 20))
+    ], batch_size=5000)
+    st_products = STRequestProduct.objects.bulk_create([
+        STRequestProduct(
+            request=rng.choice(requests), product=product,
+            photo_status_id=rng.choice([1, 1, 2, 3, 25, None]),
+            sphoto_status_id=rng.choice([1, 1, None]), OnRetouch=rng.random() < 0.5,
+        )
+        for product in products
+    ], batch_size=5000)
+    ProductOperation.objects.bulk_create([
+        ProductOperation(product=product, operation_type_id=rng.choice([3, 3, 4, 4, 25, 30]),
+                         user=rng.choice(users))
+        for product in products for _ in range(2)
+    ], batch_size=5000)
+    # date - auto_now_add: разносим операции по дням за 60 дней
+    operation_ids = list(ProductOperation.objects.filter(product__in=products).values_list('id', flat=True))
+    for day in range(60):
+        ProductOperation.objects.filter(id__in=operation_ids[day::60]).update(date=now - timedelta(days=day))
+
+    retouch_requests = RetouchRequest.objects.bulk_create([
+        RetouchRequest(RequestNumber=5_000_000_000 + index, retoucher=rng.choice(users))
+        for index in range(max(1, size // 50))
+    ])
+    retouch_products = RetouchRequestProduct.objects.bulk_create([
+        RetouchRequestProduct(
+            retouch_request=rng.choice(retouch_requests), st_request_product=st_product,
+            retouch_status_id=rng.choice([1, 2, 2, 3]), sretouch_status_id=rng.choice([1, 2, None]),
+            IsOnUpload=rng.random() < 0.3,
+        )
+        for st_product in st_products[::2]
+    ], batch_size=5000)
+
+    render_products = RenderProduct.objects.bulk_create([
+        RenderProduct(
+            Barcode=f"8{index:012d}", WMSQuantity=rng.randint(0, 500),
+            PhotoModerationStatus=rng.choice(['Отклонено', 'Одобрено', 'Одобрено', 'На модерации']),
+            IsOnRender=rng.random() < 0.5, IsRetouchBlock=rng.random() < 0.05, IsOnOrder=rng.random() < 0.2,
+        )
+        for index in range(size)
+    ], batch_size=5000)
+    renders = Render.objects.bulk_create([
+        Render(
+            Product=product, Retoucher=rng.choice(users), CheckTimeStart=some_time(), RetouchTimeEnd=some_time(),
+            RetouchStatus_id=rng.choice([1, 2, 3, 4, 5, 6, 6, 7]), RetouchSeniorStatus_id=rng.choice([1, 2, None]),
+            IsOnUpload=rng.random() < 0.5,
+        )
+        for product in render_products
+    ], batch_size=5000)
+    for upload_model, items in ((ModerationUpload, renders), (ModerationStudioUpload, retouch_products)):
+        upload_model.objects.bulk_create([
+            upload_model(
+                RenderPhotos=item, Moderator=rng.choice(users), UploadTimeStart=some_time(),
+                UploadStatus_id=rng.choice([1, 2, 2, 2, 3, 4]),
+            )
+            for item in items
+        ], batch_size=5000)
+
+    analyze_tables({model._meta.db_table for model in SEEDED_TABLES})
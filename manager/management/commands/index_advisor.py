@@ -0,0 +1,116 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from manager.index_advisor_logic import (
+    DEFAULT_MIN_ROWS, DEFAULT_REPEAT, INDEX_PACK, PROBES, analyze_queries, build_probe_context,
+    seed_hot_path_data, set_pack_indexes, time_probe
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Замер горячих выборок (очереди, статистика, выдача заданий) без индексов INDEX_PACK и с ними, '
+            'EXPLAIN перехваченных запросов и предложения индексов для оставшихся Seq Scan. '
+            'Все изменения откатываются; таблицы блокируются на время работы - запускать на копии базы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Создать N синтетических товаров с заявками, рендерами и загрузками')
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Прогонов пробы для медианы')
+        parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS,
+                            help='Не предлагать индексы для таблиц меньше N строк')
+        parser.add_argument('--days', type=int, default=7, help='Период статистических проб, дней')
+        parser.add_argument('--output', help='Записать отчет в JSON-файл')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Советник по индексам работает только с PostgreSQL.")
+
+        report = {}
+        try:
+            with transaction.atomic():
+                report = self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+        self._print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Отчет записан в {options['output']}"))
+
+    def _run(self, options):
+        if options['seed']:
+            self.stdout.write(f"Создание синтетических данных: {options['seed']} товаров...")
+            seed_hot_path_data(options['seed'])
+        context = build_probe_context(options['days'])
+
+        removed = set_pack_indexes(present=False)
+        before = {}
+        proposals = {}
+        for probe in PROBES:
+            elapsed, queries = time_probe(probe, context, options['repeat'])
+            before[probe.name] = (elapsed, len(queries))
+            analyze_queries(probe.name, queries, proposals, options['min_rows'])
+
+        set_pack_indexes(present=True)
+        after = {}
+        remaining = {}
+        for probe in PROBES:
+            elapsed, queries = time_probe(probe, context, options['repeat'])
+            after[probe.name] = (elapsed, len(queries))
+            analyze_queries(probe.name, queries, remaining, options['min_rows'])
+
+        return {
+            'generated_at': timezone.now().isoformat(),
+            'seeded': options['seed'],
+            'index_pack': [name for _, name in INDEX_PACK],
+            'dropped_for_baseline': removed,
+            'probes': [
+                {
+                    'name': probe.name,
+                    'before_ms': before[probe.name][0],
+                    'after_ms': after[probe.name][0],
+                    'queries': after[probe.name][1],
+                }
+                for probe in PROBES
+            ],
+            'proposals': [self._proposal_dict(proposal) for proposal in proposals.values()],
+            'remaining_seq_scans': [self._proposal_dict(proposal) for proposal in remaining.values()],
+        }
+
+    @staticmethod
+    def _proposal_dict(proposal):
+        return {
+            'model': proposal.model,
+            'fields': proposal.fields,
+            'probes': proposal.probes,
+            'covered_by': proposal.covered_by,
+            'code': proposal.as_code(),
+        }
+
+    def _print_report(self, report):
+        self.stdout.write(f"{'проба':<46} | {'без пакета, мс':>14} | {'с пакетом, мс':>13} | {'запросов':>8}")
+        for row in report['probes']:
+            self.stdout.write(
+                f"{row['name']:<46} | {row['before_ms']:>14.2f} | {row['after_ms']:>13.2f} | {row['queries']:>8}"
+            )
+
+        self.stdout.write("\nSeq Scan без индексов пакета:")
+        for proposal in report['proposals']:
+            covered = f" - покрывает {proposal['covered_by']}" if proposal['covered_by'] else ""
+            self.stdout.write(f"  {proposal['code']}{covered}")
+
+        self.stdout.write("\nSeq Scan с индексами пакета:")
+        if not report['remaining_seq_scans']:
+            self.stdout.write("  нет")
+        for proposal in report['remaining_seq_scans']:
+            covered = f" (есть {proposal['covered_by']}, планировщик выбрал Seq Scan)" if proposal['covered_by'] else ""
+            self.stdout.write(f"  {proposal['code']}{covered} <- {', '.join(proposal['probes'])}")
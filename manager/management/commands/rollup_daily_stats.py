@@ -0,0 +1,35 @@
+# manager/management/commands/rollup_daily_stats.py
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from manager.rollup_logic import rollup_daily_stats, get_recompute_days
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневную статистику (DailyStat) за период - для бэкфилла и исправления данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Первый день, ГГГГ-ММ-ДД')
+        parser.add_argument('--to', dest='date_to', help='Последний день, ГГГГ-ММ-ДД (по умолчанию вчера)')
+        parser.add_argument('--days', type=int, help='Сколько дней до --to пересчитать, если --from не указан')
+
+    def _parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Неверный формат даты: {value}. Используйте ГГГГ-ММ-ДД.')
+
+    def handle(self, *args, **options):
+        date_to = self._parse_date(options['date_to']) if options['date_to'] else timezone.localdate() - timedelta(days=1)
+        if options['date_from']:
+            date_from = self._parse_date(options['date_from'])
+        else:
+            date_from = date_to - timedelta(days=(options['days'] or get_recompute_days()) - 1)
+        if date_from > date_to:
+            raise CommandError('--from должна быть меньше или равна --to.')
+
+        self.stdout.write(f'Пересчет дневной статистики за {date_from} - {date_to}...')
+        written = rollup_daily_stats(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f'Готово, записано строк: {written}.'))
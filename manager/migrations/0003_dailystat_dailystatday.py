@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0002_numbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('metric', models.CharField(max_length=64, verbose_name='Метрика')),
+                ('dimension', models.CharField(blank=True, default='', max_length=255, verbose_name='Измерение')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Количество')),
+                ('total', models.FloatField(default=0, verbose_name='Сумма (секунды и т.п.)')),
+            ],
+            options={
+                'verbose_name': 'Дневная статистика',
+                'verbose_name_plural': 'Дневная статистика',
+                'constraints': [models.UniqueConstraint(fields=('date', 'metric', 'dimension'), name='manager_dailystat_date_metric_dim_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyStatDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='День')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='Посчитано')),
+            ],
+            options={
+                'verbose_name': 'Посчитанный день статистики',
+                'verbose_name_plural': 'Посчитанные дни статистики',
+            },
+        ),
+    ]
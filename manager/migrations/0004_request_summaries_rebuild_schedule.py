@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:56
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+REBUILD_TASK = 'core.tasks.rebuild_request_summaries_task'
+
+
+def create_schedule(apps, schema_editor):
+    # Сверка сводки заявок раз в сутки, ночью
+    now = timezone.localtime()
+    next_run = timezone.make_aware(datetime.combine(now.date(), time(3, 0)))
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        func=REBUILD_TASK,
+        defaults={
+            'name': 'Сверка сводки по товарам заявок',
+            'schedule_type': 'D',
+            'repeats': -1,
+            'next_run': next_run,
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    apps.get_model('django_q', 'Schedule').objects.filter(func=REBUILD_TASK).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0003_dailystat_dailystatday'),
+        ('django_q', '0018_task_success_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
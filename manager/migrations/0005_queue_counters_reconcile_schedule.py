@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:05
+
+from django.db import migrations
+from django.utils import timezone
+
+RECONCILE_TASK = 'manager.tasks.reconcile_queue_counters_task'
+
+
+def create_schedule(apps, schema_editor):
+    # Первый запуск сразу: заполняет счетчики после деплоя
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        func=RECONCILE_TASK,
+        defaults={
+            'name': 'Сверка счетчиков очередей',
+            'schedule_type': 'I',
+            'minutes': 15,
+            'repeats': -1,
+            'next_run': timezone.now(),
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    apps.get_model('django_q', 'Schedule').objects.filter(func=RECONCILE_TASK).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0004_request_summaries_rebuild_schedule'),
+        ('django_q', '0018_task_success_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:06
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+CLEANUP_TASK = 'core.tasks.cleanup_old_exports'
+
+
+def create_schedule(apps, schema_editor):
+    # Файлы фоновых выгрузок (MEDIA_ROOT/exports) чистятся раз в сутки, ночью
+    now = timezone.localtime()
+    next_run = timezone.make_aware(datetime.combine(now.date(), time(4, 0)))
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        func=CLEANUP_TASK,
+        defaults={
+            'name': 'Удаление старых файлов выгрузок',
+            'schedule_type': 'D',
+            'repeats': -1,
+            'next_run': next_run,
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    apps.get_model('django_q', 'Schedule').objects.filter(func=CLEANUP_TASK).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0005_queue_counters_reconcile_schedule'),
+        ('django_q', '0018_task_success_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
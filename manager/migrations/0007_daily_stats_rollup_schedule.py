@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:06
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+ROLLUP_TASK = 'manager.tasks.rollup_daily_stats_task'
+
+
+def create_schedule(apps, schema_editor):
+    # Ночной пересчет последних дней; дни до деплоя заполняются командой rollup_daily_stats --from/--to
+    now = timezone.localtime()
+    next_run = timezone.make_aware(datetime.combine(now.date(), time(2, 0)))
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        func=ROLLUP_TASK,
+        defaults={
+            'name': 'Пересчет дневной статистики',
+            'schedule_type': 'D',
+            'repeats': -1,
+            'next_run': next_run,
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    apps.get_model('django_q', 'Schedule').objects.filter(func=ROLLUP_TASK).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0006_exports_cleanup_schedule'),
+        ('django_q', '0018_task_success_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
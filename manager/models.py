@@ -1,3 +1,61 @@
 from django.db import models
 
-# Create your models here.
+
+#Счетчики очередей, поддерживаемые инкрементально (см. queue_counter_logic)
+class QueueCounter(models.Model):
+    key = models.CharField(max_length=64, unique=True, verbose_name="Ключ счетчика")
+    value = models.BigIntegerField(default=0, verbose_name="Значение")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Счетчик очереди"
+        verbose_name_plural = "Счетчики очередей"
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+#Счетчики номеров заявок/заказов (см. numbering_logic)
+class NumberSequence(models.Model):
+    name = models.CharField(max_length=64, unique=True, verbose_name="Последовательность")
+    last_value = models.BigIntegerField(default=0, verbose_name="Последний выданный номер")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Счетчик номеров"
+        verbose_name_plural = "Счетчики номеров"
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+
+#Дневные агрегаты статистики (см. rollup_logic): метрика за день в разрезе измерения
+class DailyStat(models.Model):
+    date = models.DateField(verbose_name="День")
+    metric = models.CharField(max_length=64, verbose_name="Метрика")
+    dimension = models.CharField(max_length=255, blank=True, default='', verbose_name="Измерение")
+    count = models.BigIntegerField(default=0, verbose_name="Количество")
+    total = models.FloatField(default=0, verbose_name="Сумма (секунды и т.п.)")
+
+    class Meta:
+        verbose_name = "Дневная статистика"
+        verbose_name_plural = "Дневная статистика"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'metric', 'dimension'], name='manager_dailystat_date_metric_dim_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.metric}[{self.dimension}] = {self.count}"
+
+
+#Дни, за которые агрегаты DailyStat посчитаны
+class DailyStatDay(models.Model):
+    date = models.DateField(unique=True, verbose_name="День")
+    computed_at = models.DateTimeField(auto_now=True, verbose_name="Посчитано")
+
+    class Meta:
+        verbose_name = "Посчитанный день статистики"
+        verbose_name_plural = "Посчитанные дни статистики"
+
+    def __str__(self):
+        return f"{self.date}"
@@ -0,0 +1,98 @@
+# manager/numbering_logic.py
+"""
+Выдача номеров заявок, заказов и накладных.
+
+Каждая последовательность - строка NumberSequence, которая блокируется
+(SELECT ... FOR UPDATE) на время выдачи: параллельные создатели ждут друг друга,
+а не сталкиваются на unique-ограничении. Номер получается за один запрос
+без сканирования таблицы; allocate_numbers(name, n) резервирует сразу n номеров.
+Внутри внешней транзакции блокировка держится до ее коммита, при откате номер не теряется.
+
+При первом обращении счетчик инициализируется максимальным номером из таблицы.
+"""
+import logging
+from typing import List
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Max
+from django.db.models.functions import Cast
+
+from .models import NumberSequence
+
+logger = logging.getLogger(__name__)
+
+STREQUEST_SEQUENCE = 'strequest'
+ORDER_SEQUENCE = 'order'
+RETOUCH_REQUEST_SEQUENCE = 'retouch_request'
+INVOICE_SEQUENCE = 'invoice'
+
+# Последовательность -> (модель, поле с номером)
+NUMBER_SEQUENCES = {
+    STREQUEST_SEQUENCE: ('core.STRequest', 'RequestNumber'),
+    ORDER_SEQUENCE: ('core.Order', 'OrderNumber'),
+    RETOUCH_REQUEST_SEQUENCE: ('core.RetouchRequest', 'RequestNumber'),
+    INVOICE_SEQUENCE: ('core.Invoice', 'InvoiceNumber'),
+}
+
+
+def get_table_max_number(name) -> int:
+    """Максимальный номер в таблице; в строковых полях учитываются только цифровые значения."""
+    label, field_name = NUMBER_SEQUENCES[name]
+    model = apps.get_model(label)
+    field = model._meta.get_field(field_name)
+    queryset = model.objects.all()
+    if isinstance(field, BigIntegerField):
+        value = queryset.aggregate(max_number=Max(field_name))['max_number']
+    else:
+        # Строковый номер сортируется лексикографически - сравниваем как число
+        value = queryset.filter(**{f'{field_name}__regex': r'^[0-9]+$'}).aggregate(
+            max_number=Max(Cast(field_name, BigIntegerField()))
+        )['max_number']
+    return int(value or 0)
+
+
+def _lock_sequence(name):
+    if name not in NUMBER_SEQUENCES:
+        raise ValueError(f"Неизвестная последовательность номеров: {name}")
+    sequence = NumberSequence.objects.select_for_update().filter(name=name).first()
+    if sequence is None:
+        try:
+            with transaction.atomic():
+                NumberSequence.objects.create(name=name, last_value=get_table_max_number(name))
+        except IntegrityError:
+            # Счетчик одновременно создал другой процесс
+            pass
+        sequence = NumberSequence.objects.select_for_update().get(name=name)
+    return sequence
+
+
+def allocate_numbers(name, count) -> List[int]:
+    """Резервирует count подряд идущих номеров последовательности name."""
+    if count < 1:
+        return []
+    with transaction.atomic():
+        sequence = _lock_sequence(name)
+        first = sequence.last_value + 1
+        sequence.last_value += count
+        sequence.save(update_fields=['last_value', 'updated_at'])
+    return list(range(first, first + count))
+
+
+def allocate_number(name) -> int:
+    return allocate_numbers(name, 1)[0]
+
+
+def resync_number_sequence(name) -> int:
+    """
+    Подтягивает счетчик к максимальному номеру в таблице (если номера
+    создавались в обход allocate_numbers). Возвращает новое значение счетчика.
+    """
+    with transaction.atomic():
+        sequence = _lock_sequence(name)
+        table_max = get_table_max_number(name)
+        if table_max > sequence.last_value:
+            logger.warning(f"Счетчик номеров {name} отставал: {sequence.last_value} -> {table_max}")
+            sequence.last_value = table_max
+            sequence.save(update_fields=['last_value', 'updated_at'])
+        return sequence.last_value
@@ -0,0 +1,562 @@
+# manager/queue_counter_logic.py
+"""
+Счетчики очередей, поддерживаемые инкрементально.
+
+Вместо пересчета очередей по растущим таблицам значения хранятся в QueueCounter
+и обновляются дельтами (F() + delta) после коммита транзакции, в которой изменилась запись:
+- одиночный save() - по значениям полей в памяти: снимок загруженной строки
+  (core.dirty_fields) и текущие значения; запросы нужны только за связанными строками
+  (статус заказа/заявки, тип категории товара) и только при смене ключевых полей;
+- update()/bulk_update()/bulk_create()/delete() и delete() объекта - через хук
+  core.querysets.TrackedQuerySet: счетчики затронутых строк до записи и после (count_* по pk).
+  Удаление считается вместе с отслеживаемыми строками, которые удаляются каскадом.
+Счетчики "уникальных заявок" хранятся по группам (photo_check_requests:<id заявки>),
+а родительский счетчик меняется при переходе группы через ноль.
+
+Строки не блокируются: два параллельных save() одной строки применят одну и ту же дельту,
+а удаление через каскад от неотслеживаемой модели (товар, заявка на ретушь) и смена
+категории товара или типа категории на счетчиках не отражаются. Такие расхождения
+исправляет только периодическая сверка (reconcile_queue_counters) - полный пересчет
+под блокировкой таблицы счетчиков с отчетом о расхождениях; расписание (каждые 15 минут)
+создает manager/migrations/0005_queue_counters_reconcile_schedule.py.
+Если дельту посчитать нельзя (upsert, слишком большая массовая операция, ошибка),
+счетчики помечаются устаревшими; чтение ставит сверку в очередь и отдает текущие значения.
+"""
+import logging
+from collections import Counter
+
+from django.db import DatabaseError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_save, pre_save
+from django_q.tasks import async_task
+
+from core.models import Order, OrderProduct, Product, STRequest, STRequestProduct, RetouchRequestProduct
+from core.querysets import DELETE, register_write_hook
+from render.models import Render, Product as RenderProduct
+from .models import QueueCounter
+
+logger = logging.getLogger(__name__)
+
+# STRequestType категории -> суффикс ключа счетчика
+REQUEST_TYPE_SUFFIXES = {1: 'regular', 2: 'clothing', 3: 'kgt'}
+
+# Статусы заказов: созданные и на сборке
+ORDER_STAGES = {2: 'created', 3: 'assembly'}
+
+# Счетчики по группам: ключ группы - "<счетчик>:<id заявки>"
+GROUP_SEPARATOR = ':'
+
+# Служебный ключ: 1 - счетчики сверены и поддерживаются, 0 (или нет строки) - нужна сверка,
+# 2 - сверка уже поставлена в очередь
+COUNTERS_STATE_KEY = '__state__'
+STATE_DIRTY = 0
+STATE_CLEAN = 1
+STATE_RECONCILE_QUEUED = 2
+
+# Массовые операции больше этого числа строк не считаются по pk, а помечают счетчики устаревшими
+BULK_TRACKING_LIMIT = 5000
+
+SHOOTING_REQUEST_STATUS = 2
+PHOTO_CHECK_STATUSES = [1, 2, 25]
+# Фото, уже проверенные старшим фотографом
+PHOTO_CHECKED_STATUSES = [1, 2, 3]
+PHOTO_CHECK = Q(sphoto_status_id__isnull=True) | ~Q(sphoto_status_id__in=PHOTO_CHECKED_STATUSES)
+RETOUCH_CHECK = Q(sretouch_status_id__isnull=True) | Q(sretouch_status_id=0)
+RENDER_QUEUE = {'PhotoModerationStatus': "Отклонено", 'IsOnRender': False, 'IsRetouchBlock': False}
+RENDER_UPLOAD_QUEUE = {'RetouchStatus_id': 6, 'RetouchSeniorStatus_id': 1, 'IsOnUpload': False}
+
+COUNTER_KEYS = [
+    *(f"{stage}_orders" for stage in ORDER_STAGES.values()),
+    *(f"{stage}_products{suffix}"
+      for stage in (*ORDER_STAGES.values(), 'shooting')
+      for suffix in ('', *(f"_{s}" for s in REQUEST_TYPE_SUFFIXES.values()))),
+    'shooting_requests',
+    'retouch_queue', 'photo_check_products', 'photo_check_requests',
+    'retouch_check_products', 'retouch_check_requests', 'fs_photo_upload_queue',
+    'render_queue', 'render_upload_queue',
+]
+
+
+def group_key(counter, group_id):
+    return f"{counter}{GROUP_SEPARATOR}{group_id}"
+
+
+# --- Подсчет по наборам строк ---
+
+def _count_products_by_type(counts, prefix, rows):
+    """rows: [(type_id, n)] -> prefix_products и prefix_products_<тип>."""
+    for type_id, n in rows:
+        counts[f"{prefix}_products"] += n
+        suffix = REQUEST_TYPE_SUFFIXES.get(type_id)
+        if suffix:
+            counts[f"{prefix}_products_{suffix}"] += n
+
+
+def count_orders(qs):
+    counts = Counter()
+    for status_id, n in (qs.filter(status_id__in=list(ORDER_STAGES))
+                         .values_list('status_id').annotate(n=Count('id'))):
+        counts[f"{ORDER_STAGES[status_id]}_orders"] += n
+    return counts
+
+
+def count_order_products(qs):
+    counts = Counter()
+    rows = (qs.filter(order__status_id__in=list(ORDER_STAGES))
+            .values_list('order__status_id', 'product__category__STRequestType_id')
+            .annotate(n=Count('id')))
+    for status_id, type_id, n in rows:
+        _count_products_by_type(counts, ORDER_STAGES[status_id], [(type_id, n)])
+    return counts
+
+
+def count_st_requests(qs):
+    return Counter(shooting_requests=qs.filter(status_id=SHOOTING_REQUEST_STATUS).count())
+
+
+def count_st_request_products(qs):
+    counts = Counter()
+    _count_products_by_type(
+        counts, 'shooting',
+        qs.filter(request__status_id=SHOOTING_REQUEST_STATUS)
+        .values_list('product__category__STRequestType_id').annotate(n=Count('id'))
+    )
+    # Очередь на ретушь (photo_status=1) входит в photo_status IN (1, 2, 25)
+    rows = (qs.filter(photo_status_id__in=PHOTO_CHECK_STATUSES)
+            .values_list('request_id')
+            .annotate(
+                retouch=Count('id', filter=Q(photo_status_id=1, sphoto_status_id=1, OnRetouch=False)),
+                check=Count('id', filter=PHOTO_CHECK),
+            ))
+    for request_id, retouch, check in rows:
+        counts['retouch_queue'] += retouch
+        counts['photo_check_products'] += check
+        if check:
+            counts[group_key('photo_check_requests', request_id)] += check
+    return counts
+
+
+def count_retouch_request_products(qs):
+    counts = Counter()
+    rows = (qs.filter(retouch_status_id=2)
+            .values_list('retouch_request_id')
+            .annotate(
+                check=Count('id', filter=RETOUCH_CHECK),
+                upload=Count('id', filter=Q(sretouch_status_id=1, IsOnUpload=False)),
+            ))
+    for retouch_request_id, check, upload in rows:
+        counts['retouch_check_products'] += check
+        counts['fs_photo_upload_queue'] += upload
+        if check:
+            counts[group_key('retouch_check_requests', retouch_request_id)] += check
+    return counts
+
+
+def count_render_products(qs):
+    return Counter(render_queue=qs.filter(**RENDER_QUEUE).count())
+
+
+def count_renders(qs):
+    return Counter(render_upload_queue=qs.filter(**RENDER_UPLOAD_QUEUE).count())
+
+
+# --- Вклад одной строки по значениям полей ---
+# values - {attname: значение} отслеживаемых полей строки, None - строки нет (до вставки)
+
+def _product_type(product_id):
+    return (Product.objects.filter(pk=product_id)
+            .values_list('category__STRequestType_id', flat=True).first())
+
+
+def _order_stage(values):
+    return ORDER_STAGES.get(values['status_id']) if values else None
+
+
+def _is_shooting_request(values):
+    return bool(values) and values['status_id'] == SHOOTING_REQUEST_STATUS
+
+
+def _order_row_counts(pk, before, after):
+    """Заказ: сам заказ и, при смене этапа, все его товары (один сгруппированный запрос)."""
+    before_counts, after_counts = Counter(), Counter()
+    old_stage, new_stage = _order_stage(before), _order_stage(after)
+    if old_stage == new_stage:
+        return before_counts, after_counts
+    rows = []
+    if before is not None:
+        rows = list(OrderProduct.objects.filter(order_id=pk)
+                    .values_list('product__category__STRequestType_id').annotate(n=Count('id')))
+    for counts, stage in ((before_counts, old_stage), (after_counts, new_stage)):
+        if stage:
+            counts[f"{stage}_orders"] += 1
+            _count_products_by_type(counts, stage, rows)
+    return before_counts, after_counts
+
+
+def _order_product_counts(values):
+    counts = Counter()
+    if values:
+        status_id = Order.objects.filter(pk=values['order_id']).values_list('status_id', flat=True).first()
+        stage = ORDER_STAGES.get(status_id)
+        if stage:
+            _count_products_by_type(counts, stage, [(_product_type(values['product_id']), 1)])
+    return counts
+
+
+def _order_product_row_counts(pk, before, after):
+    if before == after:
+        return Counter(), Counter()
+    return _order_product_counts(before), _order_product_counts(after)
+
+
+def _st_request_row_counts(pk, before, after):
+    """Заявка: сама заявка и, при входе в статус "на съемку" или выходе из него, ее товары."""
+    before_counts, after_counts = Counter(), Counter()
+    was_shooting, is_shooting = _is_shooting_request(before), _is_shooting_request(after)
+    if was_shooting == is_shooting:
+        return before_counts, after_counts
+    rows = []
+    if before is not None:
+        rows = list(STRequestProduct.objects.filter(request_id=pk)
+                    .values_list('product__category__STRequestType_id').annotate(n=Count('id')))
+    counts = before_counts if was_shooting else after_counts
+    counts['shooting_requests'] += 1
+    _count_products_by_type(counts, 'shooting', rows)
+    return before_counts, after_counts
+
+
+def _st_request_product_own_counts(values):
+    counts = Counter()
+    if values and values['photo_status_id'] in PHOTO_CHECK_STATUSES:
+        if values['photo_status_id'] == 1 and values['sphoto_status_id'] == 1 and not values['OnRetouch']:
+            counts['retouch_queue'] += 1
+        if values['sphoto_status_id'] not in PHOTO_CHECKED_STATUSES:
+            counts['photo_check_products'] += 1
+            counts[group_key('photo_check_requests', values['request_id'])] += 1
+    return counts
+
+
+def _st_request_product_shooting_counts(values):
+    counts = Counter()
+    if values:
+        status_id = (STRequest.objects.filter(pk=values['request_id'])
+                     .values_list('status_id', flat=True).first())
+        if status_id == SHOOTING_REQUEST_STATUS:
+            _count_products_by_type(counts, 'shooting', [(_product_type(values['product_id']), 1)])
+    return counts
+
+
+def _st_request_product_row_counts(pk, before, after):
+    before_counts = _st_request_product_own_counts(before)
+    after_counts = _st_request_product_own_counts(after)
+    # Очередь на съемку зависит от заявки и товара - запросы только при их смене
+    key_fields = ('request_id', 'product_id')
+    if (before and tuple(before[f] for f in key_fields)) != (after and tuple(after[f] for f in key_fields)):
+        before_counts += _st_request_product_shooting_counts(before)
+        after_counts += _st_request_product_shooting_counts(after)
+    return before_counts, after_counts
+
+
+def _retouch_request_product_counts(values):
+    counts = Counter()
+    if values and values['retouch_status_id'] == 2:
+        if values['sretouch_status_id'] in (None, 0):
+            counts['retouch_check_products'] += 1
+            counts[group_key('retouch_check_requests', values['retouch_request_id'])] += 1
+        if values['sretouch_status_id'] == 1 and not values['IsOnUpload']:
+            counts['fs_photo_upload_queue'] += 1
+    return counts
+
+
+def _matches(values, conditions):
+    return bool(values) and all(values[attname] == value for attname, value in conditions.items())
+
+
+def _own_row_counts(counts):
+    def row_counts(pk, before, after):
+        return counts(before), counts(after)
+    return row_counts
+
+
+class CounterSpec:
+    """
+    Как считать вклад строк модели в счетчики.
+    count(pks) - полный вклад строк по базе (у заказа это и сам заказ, и его товары);
+    count_deleted(pks) - вклад вместе с отслеживаемыми строками, удаляемыми каскадом;
+    row_counts(pk, before, after) - вклад одной строки до и после save() по значениям полей.
+    """
+
+    def __init__(self, fields, count, row_counts, count_deleted=None):
+        self.fields = set(fields)
+        self.count = count
+        self.row_counts = row_counts
+        self.count_deleted = count_deleted or count
+
+
+def _by_pk(model, count):
+    def count_pks(pks):
+        return count(model.objects.filter(pk__in=pks)) if pks else Counter()
+    return count_pks
+
+
+def _count_orders_with_products(pks):
+    return _by_pk(Order, count_orders)(pks) + count_order_products(OrderProduct.objects.filter(order_id__in=pks))
+
+
+def _count_st_requests_with_products(pks):
+    return (_by_pk(STRequest, count_st_requests)(pks)
+            + count_st_request_products(STRequestProduct.objects.filter(request_id__in=pks)))
+
+
+COUNTER_SPECS = {
+    Order: CounterSpec(['status'], _count_orders_with_products, _order_row_counts),
+    OrderProduct: CounterSpec(
+        ['order', 'product'], _by_pk(OrderProduct, count_order_products), _order_product_row_counts,
+    ),
+    STRequest: CounterSpec(
+        ['status'],
+        _count_st_requests_with_products,
+        _st_request_row_counts,
+        lambda pks: (_count_st_requests_with_products(pks) + count_retouch_request_products(
+            RetouchRequestProduct.objects.filter(st_request_product__request_id__in=pks))),
+    ),
+    STRequestProduct: CounterSpec(
+        ['request', 'product', 'photo_status', 'sphoto_status', 'OnRetouch'],
+        _by_pk(STRequestProduct, count_st_request_products),
+        _st_request_product_row_counts,
+        lambda pks: (_by_pk(STRequestProduct, count_st_request_products)(pks) + count_retouch_request_products(
+            RetouchRequestProduct.objects.filter(st_request_product_id__in=pks))),
+    ),
+    RetouchRequestProduct: CounterSpec(
+        ['retouch_request', 'retouch_status', 'sretouch_status', 'IsOnUpload'],
+        _by_pk(RetouchRequestProduct, count_retouch_request_products),
+        _own_row_counts(_retouch_request_product_counts),
+    ),
+    RenderProduct: CounterSpec(
+        ['PhotoModerationStatus', 'IsOnRender', 'IsRetouchBlock'],
+        _by_pk(RenderProduct, count_render_products),
+        _own_row_counts(lambda values: Counter(render_queue=int(_matches(values, RENDER_QUEUE)))),
+        lambda pks: (_by_pk(RenderProduct, count_render_products)(pks)
+                     + count_renders(Render.objects.filter(Product_id__in=pks))),
+    ),
+    Render: CounterSpec(
+        ['RetouchStatus', 'RetouchSeniorStatus', 'IsOnUpload'],
+        _by_pk(Render, count_renders),
+        _own_row_counts(lambda values: Counter(render_upload_queue=int(_matches(values, RENDER_UPLOAD_QUEUE)))),
+    ),
+}
+
+
+def compute_queue_counters():
+    """Все счетчики с нуля (включая групповые ключи)."""
+    return (count_orders(Order.objects.all())
+            + count_order_products(OrderProduct.objects.all())
+            + count_st_requests(STRequest.objects.all())
+            + count_st_request_products(STRequestProduct.objects.all())
+            + count_retouch_request_products(RetouchRequestProduct.objects.all())
+            + count_render_products(RenderProduct.objects.all())
+            + count_renders(Render.objects.all()))
+
+
+def collapse_counters(counts):
+    """Групповые ключи -> число групп в родительском счетчике; все ключи COUNTER_KEYS присутствуют."""
+    result = dict.fromkeys(COUNTER_KEYS, 0)
+    for key, value in counts.items():
+        if GROUP_SEPARATOR in key:
+            if value > 0:
+                result[key.split(GROUP_SEPARATOR)[0]] += 1
+        elif key in result:
+            result[key] = value
+    return result
+
+
+# --- Применение дельт ---
+
+def _increment(key, delta):
+    if not QueueCounter.objects.filter(key=key).update(value=F('value') + delta):
+        QueueCounter.objects.get_or_create(key=key)
+        QueueCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def _apply_group_delta(key, delta):
+    row = QueueCounter.objects.select_for_update().filter(key=key).first()
+    old = row.value if row else 0
+    new = old + delta
+    if new > 0:
+        if row:
+            row.value = new
+            row.save(update_fields=['value', 'updated_at'])
+        else:
+            QueueCounter.objects.create(key=key, value=new)
+    elif row:
+        row.delete()
+
+    parent = key.split(GROUP_SEPARATOR)[0]
+    if old <= 0 < new:
+        _increment(parent, 1)
+    elif new <= 0 < old:
+        _increment(parent, -1)
+
+
+def apply_queue_deltas(delta):
+    try:
+        with transaction.atomic():
+            # Фиксированный порядок ключей - чтобы параллельные транзакции не ловили deadlock
+            for key in sorted(delta):
+                if GROUP_SEPARATOR in key:
+                    _apply_group_delta(key, delta[key])
+                else:
+                    _increment(key, delta[key])
+    except DatabaseError as e:
+        logger.error(f"Не удалось применить дельту счетчиков очередей: {e}", exc_info=True)
+        mark_queue_counters_dirty()
+
+
+def schedule_queue_deltas(before, after):
+    delta = Counter(after)
+    delta.subtract(before)
+    delta = {key: value for key, value in delta.items() if value}
+    if delta:
+        transaction.on_commit(lambda: apply_queue_deltas(delta))
+
+
+def mark_queue_counters_dirty():
+    QueueCounter.objects.update_or_create(key=COUNTERS_STATE_KEY, defaults={'value': STATE_DIRTY})
+
+
+def schedule_queue_counters_dirty():
+    transaction.on_commit(mark_queue_counters_dirty)
+
+
+# --- Чтение и сверка ---
+
+def reconcile_queue_counters():
+    """
+    Пересчитывает счетчики с нуля, перезаписывает таблицу и возвращает
+    {'counters': {...}, 'drift': {ключ: (было, стало)}} по родительским ключам.
+    """
+    counts = compute_queue_counters()
+    fresh = collapse_counters(counts)
+
+    with transaction.atomic():
+        stored = dict(QueueCounter.objects.select_for_update().values_list('key', 'value'))
+        was_clean = stored.get(COUNTERS_STATE_KEY) == STATE_CLEAN
+        drift = {
+            key: (stored.get(key), value)
+            for key, value in fresh.items()
+            if was_clean and stored.get(key) != value
+        }
+        QueueCounter.objects.all().delete()
+        rows = [QueueCounter(key=key, value=value) for key, value in fresh.items()]
+        rows += [QueueCounter(key=key, value=value) for key, value in counts.items()
+                 if GROUP_SEPARATOR in key and value > 0]
+        rows.append(QueueCounter(key=COUNTERS_STATE_KEY, value=STATE_CLEAN))
+        QueueCounter.objects.bulk_create(rows, batch_size=1000)
+
+    if drift:
+        logger.warning(f"Расхождение счетчиков очередей: {drift}")
+    return {'counters': fresh, 'drift': drift}
+
+
+def _queue_reconcile():
+    """Ставит сверку в очередь один раз, пока она не выполнена (условный UPDATE по состоянию)."""
+    state, created = QueueCounter.objects.get_or_create(
+        key=COUNTERS_STATE_KEY, defaults={'value': STATE_RECONCILE_QUEUED}
+    )
+    if created or QueueCounter.objects.filter(
+        key=COUNTERS_STATE_KEY, value=STATE_DIRTY
+    ).update(value=STATE_RECONCILE_QUEUED):
+        async_task('manager.tasks.reconcile_queue_counters_task')
+
+
+def read_queue_counters():
+    """
+    Текущие значения счетчиков (один запрос). Устаревшие счетчики не пересобираются
+    при чтении: сверка ставится в очередь, а до нее отдаются текущие значения
+    (на пустой таблице - нули).
+    """
+    stored = dict(
+        QueueCounter.objects.exclude(key__contains=GROUP_SEPARATOR).values_list('key', 'value')
+    )
+    if stored.get(COUNTERS_STATE_KEY) != STATE_CLEAN or any(key not in stored for key in COUNTER_KEYS):
+        _queue_reconcile()
+    return {key: stored.get(key, 0) for key in COUNTER_KEYS}
+
+
+# --- Отслеживание изменений ---
+
+_attnames_cache = {}
+
+
+def _tracked_attnames(model):
+    attnames = _attnames_cache.get(model)
+    if attnames is None:
+        attnames = _attnames_cache[model] = [
+            model._meta.get_field(name).attname for name in COUNTER_SPECS[model].fields
+        ]
+    return attnames
+
+
+def _on_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Запоминает значения отслеживаемых полей до записи: {} - строки еще нет."""
+    if raw:
+        return
+    if update_fields is not None and not COUNTER_SPECS[sender].fields & {
+        sender._meta.get_field(name).name for name in update_fields
+    }:
+        return
+    attnames = _tracked_attnames(sender)
+    if instance.pk is None:
+        instance._queue_counter_previous = {}
+        return
+    dirty = instance.get_dirty_fields()
+    if dirty is not None and not dirty.intersection(attnames):
+        return
+    # Без снимка (объект создан не из БД, в т.ч. Model(pk=...)) - один запрос до записи
+    instance._queue_counter_previous = instance.get_previous_values(attnames)
+
+
+def _on_post_save(sender, instance, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_queue_counter_previous', None)
+    if previous is None:
+        return
+    current = {attname: getattr(instance, attname) for attname in _tracked_attnames(sender)}
+    before, after = COUNTER_SPECS[sender].row_counts(instance.pk, previous or None, current)
+    schedule_queue_deltas(before, after)
+
+
+class _BulkCounterTracker:
+    def __init__(self, count):
+        self.count = count
+        self.before_counts = None
+
+    def before(self, pks):
+        self.before_counts = self.count(pks) if len(pks) <= BULK_TRACKING_LIMIT else None
+
+    def after(self, pks):
+        if self.before_counts is None:
+            self.invalidate()
+        else:
+            schedule_queue_deltas(self.before_counts, self.count(pks))
+
+    def invalidate(self):
+        schedule_queue_counters_dirty()
+
+
+def queue_counter_write_hook(model, fields):
+    spec = COUNTER_SPECS.get(model)
+    if spec is None:
+        return None
+    if fields is DELETE:
+        return _BulkCounterTracker(spec.count_deleted)
+    if fields is not None and not spec.fields & {model._meta.get_field(name).name for name in fields}:
+        return None
+    return _BulkCounterTracker(spec.count)
+
+
+def connect_queue_counter_signals():
+    register_write_hook(queue_counter_write_hook)
+    for model in COUNTER_SPECS:
+        uid = f"queue_counters_{model._meta.label_lower}"
+        pre_save.connect(_on_pre_save, sender=model, dispatch_uid=uid)
+        post_save.connect(_on_post_save, sender=model, dispatch_uid=uid)
@@ -1,90 +1,78 @@
 # manager/queue_logic.py
-import asyncio
-from django.db.models import Q
+from asgiref.sync import sync_to_async
+from django.utils import timezone
 
-from core.models import (
-    Order, OrderProduct, STRequest, STRequestProduct, RetouchRequestProduct,
-    ProductCategory, Blocked_Shops, Blocked_Barcode, Nofoto
-)
-from render.models import Render, Product as RenderProduct
+from render.reshoot_logic import get_reshoot_candidates
+from .queue_counter_logic import read_queue_counters, reconcile_queue_counters
 
 
-async def get_queue_stats_message_async() -> str:
+def get_real_shooting_queue_count():
+    """Реальная очередь на съемку отклоненных - по индексу кандидатов на пересъемку."""
+    return get_reshoot_candidates().count()
+
+
+def get_queue_snapshot(force=False):
     """
-    Асинхронно собирает статистику по всем очередям и возвращает готовое сообщение.
+    Снимок очередей: счетчики из QueueCounter (один запрос)
+    и реальная очередь на съемку по ReshootCandidate. force=True - сверка счетчиков с нуля.
     """
-    # --- Словарь задач с добавленной разбивкой ---
-    tasks = {
-        # --- Созданные заказы ---
-        "created_orders": Order.objects.filter(status__id=2).acount(),
-        "created_products": OrderProduct.objects.filter(order__status__id=2).acount(),
-        "created_products_regular": OrderProduct.objects.filter(order__status__id=2, product__category__STRequestType_id=1).acount(),
-        "created_products_clothing": OrderProduct.objects.filter(order__status__id=2, product__category__STRequestType_id=2).acount(),
-        "created_products_kgt": OrderProduct.objects.filter(order__status__id=2, product__category__STRequestType_id=3).acount(),
+    counters = reconcile_queue_counters()['counters'] if force else read_queue_counters()
+    snapshot = dict(counters)
+    snapshot['real_shooting_queue'] = get_real_shooting_queue_count()
+    snapshot['generated_at'] = timezone.now().isoformat()
+    return snapshot
 
-        # --- На сборке ---
-        "assembly_orders": Order.objects.filter(status__id=3).acount(),
-        "assembly_products": OrderProduct.objects.filter(order__status__id=3).acount(),
-        "assembly_products_regular": OrderProduct.objects.filter(order__status__id=3, product__category__STRequestType_id=1).acount(),
-        "assembly_products_clothing": OrderProduct.objects.filter(order__status__id=3, product__category__STRequestType_id=2).acount(),
-        "assembly_products_kgt": OrderProduct.objects.filter(order__status__id=3, product__category__STRequestType_id=3).acount(),
 
-        # --- Очередь на съемку ---
-        "shooting_requests": STRequest.objects.filter(status__id=2).acount(),
-        "shooting_products": STRequestProduct.objects.filter(request__status__id=2).acount(),
-        "shooting_products_regular": STRequestProduct.objects.filter(request__status__id=2, product__category__STRequestType_id=1).acount(),
-        "shooting_products_clothing": STRequestProduct.objects.filter(request__status__id=2, product__category__STRequestType_id=2).acount(),
-        "shooting_products_kgt": STRequestProduct.objects.filter(request__status__id=2, product__category__STRequestType_id=3).acount(),
-
-        # --- Остальные очереди (без изменений) ---
-        "retouch_queue": STRequestProduct.objects.filter(
-            photo_status__id=1, sphoto_status__id=1, OnRetouch=False
-        ).acount(),
-        "photo_check_requests": STRequestProduct.objects.filter(
-            photo_status_id__in=[1, 2, 25]
-        ).exclude(
-            sphoto_status_id__in=[1, 2, 3]
-        ).values('request_id').distinct().acount(),
-        "photo_check_products": STRequestProduct.objects.filter(
-            photo_status_id__in=[1, 2, 25]
-        ).exclude(
-            sphoto_status_id__in=[1, 2, 3]
-        ).acount(),
-        "retouch_check_requests": RetouchRequestProduct.objects.filter(
-            Q(retouch_status_id=2) & (Q(sretouch_status_id__isnull=True) | Q(sretouch_status_id=0))
-        ).values('retouch_request_id').distinct().acount(),
-        "retouch_check_products": RetouchRequestProduct.objects.filter(
-            Q(retouch_status_id=2) & (Q(sretouch_status_id__isnull=True) | Q(sretouch_status_id=0))
-        ).acount(),
-        "render_queue": RenderProduct.objects.filter(
-            PhotoModerationStatus="Отклонено",
-            IsOnRender=False,
-            IsRetouchBlock=False
-        ).acount(),
-        "render_upload_queue": Render.objects.filter(
-            RetouchStatus_id=6, RetouchSeniorStatus_id=1, IsOnUpload=False
-        ).acount(),
-        "fs_photo_upload_queue": RetouchRequestProduct.objects.filter(
-            retouch_status_id=2, sretouch_status_id=1, IsOnUpload=False
-        ).acount(),
-        "real_shooting_queue": RenderProduct.objects.filter(
-            IsOnOrder=False, WMSQuantity__gt=0, PhotoModerationStatus="Отклонено",
-            render__CheckResult__id__in=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 50]
-        ).exclude(
-            ShopID__in=Blocked_Shops.objects.values_list('shop_id', flat=True)
-        ).exclude(
-            CategoryID__in=ProductCategory.objects.filter(IsBlocked=True).values_list('id', flat=True)
-        ).exclude(
-            Barcode__in=Blocked_Barcode.objects.values_list('barcode', flat=True)
-        ).exclude(
-            Barcode__in=Nofoto.objects.values_list('product__barcode', flat=True)
-        ).distinct().acount()
+def queue_snapshot_to_response(snapshot):
+    """Формат ответа эндпоинта get_current_queues."""
+    return {
+        "created_orders": {
+            "orders_count": snapshot['created_orders'],
+            "products_count": snapshot['created_products'],
+        },
+        "assembly_orders": {
+            "orders_count": snapshot['assembly_orders'],
+            "products_count": snapshot['assembly_products'],
+        },
+        "shooting_requests": {
+            "requests_count": snapshot['shooting_requests'],
+            "products_count": snapshot['shooting_products'],
+        },
+        "retouch_queue": {
+            "count": snapshot['retouch_queue']
+        },
+        "photo_check_queue": {
+            "requests_count": snapshot['photo_check_requests'],
+            "products_count": snapshot['photo_check_products'],
+        },
+        "retouch_check_queue": {
+            "requests_count": snapshot['retouch_check_requests'],
+            "products_count": snapshot['retouch_check_products'],
+        },
+        "render_queue": {
+            "count": snapshot['render_queue']
+        },
+        "render_upload_queue": {
+            "count": snapshot['render_upload_queue']
+        },
+        "fs_photo_upload_queue": {
+            "count": snapshot['fs_photo_upload_queue']
+        },
+        "real_shooting_queue": {
+            "count": snapshot['real_shooting_queue']
+        }
     }
 
-    # Запускаем все задачи одновременно
-    results = await asyncio.gather(*tasks.values())
-    stats = dict(zip(tasks.keys(), results))
 
+async def get_queue_stats_message_async() -> str:
+    """
+    Асинхронно получает снимок очередей и возвращает готовое сообщение.
+    """
+    stats = await sync_to_async(get_queue_snapshot)()
+    return format_queue_stats_message(stats)
+
+
+def format_queue_stats_message(stats) -> str:
     # --- Формирование сообщения ---
     def prepositional_form(count, singular, plural):
         if not isinstance(count, int):
@@ -0,0 +1,360 @@
+# manager/rollup_logic.py
+"""
+Дневные агрегаты статистики (DailyStat): метрика за день в разрезе измерения
+(тип съемки, PhotoModerationStatus, пользователь, категория).
+
+- compute_daily_stats(start, end) считает метрики по исходным таблицам - несколько
+  сгруппированных по дню запросов на весь диапазон;
+- rollup_daily_stats(start, end) записывает их в DailyStat и отмечает дни в DailyStatDay.
+  Ночная задача manager.tasks.rollup_daily_stats_task (расписание - миграция
+  manager 0007_daily_stats_rollup_schedule) пересчитывает последние DAILY_STATS_RECOMPUTE_DAYS
+  дней (статусы ретуши/фото меняются и после дня события),
+  бэкфилл - командой rollup_daily_stats --from ... --to ...;
+- load_daily_stats(start, end) читает посчитанные дни одним запросом по индексу,
+  а последние DAILY_STATS_LIVE_DAYS дней и непосчитанные дни досчитывает на лету.
+
+Снимок по товарам (write_product_stats_to_google_sheet) - отдельные метрики product_*,
+записываются на день снятия record_product_snapshot().
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import (
+    Order, OrderProduct, Product, ProductCategory, ProductOperation, RetouchRequestProduct, STRequestProduct
+)
+from render.models import ModerationStudioUpload, ModerationUpload, Render
+from .models import DailyStat, DailyStatDay
+
+logger = logging.getLogger(__name__)
+
+UNSPECIFIED = "Не указан"
+
+# --- Метрики событий (по дням) ---
+# Заказано: OrderProduct по дате заказа, измерение - тип съемки категории
+METRIC_ORDERED = 'ordered'
+# Принято: операции type=3, измерение - PhotoModerationStatus
+METRIC_ACCEPTED = 'accepted'
+# Из них первая приемка товара
+METRIC_ACCEPTED_NEW = 'accepted_new'
+METRIC_SENT = 'sent'
+METRIC_DEFECTIVE_PRODUCT = 'defective_product'
+METRIC_PHOTOGRAPHED = 'photographed'
+METRIC_RETOUCHED = 'retouched'
+METRIC_DEFECTIVE_SHOOTING = 'defective_shooting'
+METRIC_RENDERS_DONE = 'renders_done'
+METRIC_RENDERS_REJECTED = 'renders_rejected'
+METRIC_RENDERS_UPLOADED = 'renders_uploaded'
+METRIC_STUDIO_PHOTOS_UPLOADED = 'studio_photos_uploaded'
+# Приемка заказов по Order.accept_date: count - заказы, total - секунды
+METRIC_ASSEMBLY_TIME = 'assembly_time'
+METRIC_ACCEPTANCE_TIME = 'acceptance_time_per_product'
+METRIC_ACCEPTANCE_TIME_BY_USER = 'acceptance_time_per_product_by_user'
+METRIC_ORDER_PRODUCTS_ACCEPTED = 'order_products_accepted'
+METRIC_ORDER_PRODUCTS_TOTAL = 'order_products_total'
+# Принятые товары по OrderProduct.accepted_date, измерение - id категории
+METRIC_ACCEPTED_BY_CATEGORY = 'accepted_by_category'
+
+EVENT_METRICS = [
+    METRIC_ORDERED, METRIC_ACCEPTED, METRIC_ACCEPTED_NEW, METRIC_SENT, METRIC_DEFECTIVE_PRODUCT,
+    METRIC_PHOTOGRAPHED, METRIC_RETOUCHED, METRIC_DEFECTIVE_SHOOTING, METRIC_RENDERS_DONE,
+    METRIC_RENDERS_REJECTED, METRIC_RENDERS_UPLOADED, METRIC_STUDIO_PHOTOS_UPLOADED,
+    METRIC_ASSEMBLY_TIME, METRIC_ACCEPTANCE_TIME, METRIC_ACCEPTANCE_TIME_BY_USER,
+    METRIC_ORDER_PRODUCTS_ACCEPTED, METRIC_ORDER_PRODUCTS_TOTAL, METRIC_ACCEPTED_BY_CATEGORY,
+]
+
+# Показатели фотостудии (FSAllstats, get_fs_all_stats): подпись -> метрика (сумма по измерениям)
+FS_STATS_METRICS = [
+    ("Заказано", METRIC_ORDERED),
+    ("Принято", METRIC_ACCEPTED),
+    ("Отправлено", METRIC_SENT),
+    ("Брак товара", METRIC_DEFECTIVE_PRODUCT),
+    ("Сфотографировано", METRIC_PHOTOGRAPHED),
+    ("Отретушировано", METRIC_RETOUCHED),
+    ("Брак по съемке", METRIC_DEFECTIVE_SHOOTING),
+    ("Сделано рендеров", METRIC_RENDERS_DONE),
+    ("Отклонено на рендерах", METRIC_RENDERS_REJECTED),
+    ("Загружено рендеров", METRIC_RENDERS_UPLOADED),
+    ("Загружено фото от фс", METRIC_STUDIO_PHOTOS_UPLOADED),
+]
+
+# --- Снимок по товарам (на момент расчета) ---
+BLOCKED_STATUS = 'Заблокирован'
+PRODUCT_SNAPSHOT_METRICS = [
+    'product_total', 'product_blocked', 'product_passed_moderation', 'product_in_moderation',
+    'product_rejected_moderation', 'product_in_stock', 'product_blocked_in_stock',
+    'product_passed_moderation_in_stock', 'product_in_moderation_in_stock', 'product_rejected_moderation_in_stock',
+]
+
+DEFAULT_RECOMPUTE_DAYS = 7
+DEFAULT_LIVE_DAYS = 2
+# Сколько дней считать одним проходом при бэкфилле
+ROLLUP_CHUNK_DAYS = 31
+
+
+def get_recompute_days():
+    return getattr(settings, 'DAILY_STATS_RECOMPUTE_DAYS', DEFAULT_RECOMPUTE_DAYS)
+
+
+def get_live_days():
+    return getattr(settings, 'DAILY_STATS_LIVE_DAYS', DEFAULT_LIVE_DAYS)
+
+
+def _day_range(start_date, end_date):
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min)),
+        timezone.make_aware(datetime.combine(end_date, time.max)),
+    )
+
+
+def _iter_days(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def _user_display_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+def compute_daily_stats(start_date, end_date):
+    """
+    Считает метрики событий за дни [start_date, end_date] по исходным таблицам.
+    Возвращает {(день, метрика, измерение): [count, total]}.
+    """
+    start_dt, end_dt = _day_range(start_date, end_date)
+    stats = defaultdict(lambda: [0, 0.0])
+
+    def add(day, metric, dimension='', count=0, total=0.0):
+        entry = stats[(day, metric, dimension)]
+        entry[0] += count
+        entry[1] += total
+
+    # Заказано
+    ordered = OrderProduct.objects.filter(order__date__range=(start_dt, end_dt)) \
+        .annotate(day=TruncDate('order__date')) \
+        .values('day', 'product__category__STRequestType__name') \
+        .annotate(count=Count('id')).order_by()
+    for item in ordered:
+        add(item['day'], METRIC_ORDERED, item['product__category__STRequestType__name'] or UNSPECIFIED, item['count'])
+
+    # Отправлено и брак товара
+    operations = ProductOperation.objects.filter(date__range=(start_dt, end_dt)) \
+        .annotate(day=TruncDate('date')).values('day') \
+        .annotate(
+            sent=Count('id', filter=Q(operation_type_id=4)),
+            defective_product=Count('id', filter=Q(operation_type_id__in=[25, 30])),
+        ).order_by()
+    for item in operations:
+        add(item['day'], METRIC_SENT, count=item['sent'])
+        add(item['day'], METRIC_DEFECTIVE_PRODUCT, count=item['defective_product'])
+
+    # Принято: по PhotoModerationStatus и признак первой приемки товара
+    first_acceptance = ProductOperation.objects.filter(
+        product=OuterRef('product'), operation_type_id=3
+    ).order_by('date').values('date')[:1]
+    acceptance_ops = ProductOperation.objects.filter(date__range=(start_dt, end_dt), operation_type_id=3) \
+        .annotate(day=TruncDate('date'), first_acceptance_date=Subquery(first_acceptance)) \
+        .values('day', 'first_acceptance_date', 'PhotoModerationStatus')
+    for op in acceptance_ops.iterator():
+        add(op['day'], METRIC_ACCEPTED, op['PhotoModerationStatus'] or UNSPECIFIED, 1)
+        if op['day'] == op['first_acceptance_date'].date():
+            add(op['day'], METRIC_ACCEPTED_NEW, count=1)
+
+    # Сфотографировано
+    photographed = STRequestProduct.objects.filter(
+        request__photo_date__range=(start_dt, end_dt),
+        photo_status_id__in=[1, 2, 25],
+        sphoto_status_id=1,
+    ).annotate(day=TruncDate('request__photo_date')).values('day').annotate(count=Count('id')).order_by()
+    for item in photographed:
+        add(item['day'], METRIC_PHOTOGRAPHED, count=item['count'])
+
+    # Отретушировано и брак по съемке
+    retouch = RetouchRequestProduct.objects.filter(retouch_request__retouch_date__range=(start_dt, end_dt)) \
+        .annotate(day=TruncDate('retouch_request__retouch_date')).values('day') \
+        .annotate(
+            retouched=Count('id', filter=Q(retouch_status_id=2, sretouch_status_id=1)),
+            defective_shooting=Count('id', filter=Q(retouch_status_id=3, sretouch_status_id=1)),
+        ).order_by()
+    for item in retouch:
+        add(item['day'], METRIC_RETOUCHED, count=item['retouched'])
+        add(item['day'], METRIC_DEFECTIVE_SHOOTING, count=item['defective_shooting'])
+
+    # Рендеры
+    renders = Render.objects.filter(CheckTimeStart__range=(start_dt, end_dt)) \
+        .annotate(day=TruncDate('CheckTimeStart')).values('day') \
+        .annotate(
+            done=Count('id', filter=Q(RetouchStatus_id=6)),
+            rejected=Count('id', filter=Q(RetouchStatus_id=7)),
+        ).order_by()
+    for item in renders:
+        add(item['day'], METRIC_RENDERS_DONE, count=item['done'])
+        add(item['day'], METRIC_RENDERS_REJECTED, count=item['rejected'])
+
+    # Загрузки рендеров и фото от ФС
+    for model, metric in [(ModerationUpload, METRIC_RENDERS_UPLOADED),
+                          (ModerationStudioUpload, METRIC_STUDIO_PHOTOS_UPLOADED)]:
+        uploads = model.objects.filter(UploadTimeStart__range=(start_dt, end_dt), UploadStatus_id=2) \
+            .annotate(day=TruncDate('UploadTimeStart')).values('day').annotate(count=Count('id')).order_by()
+        for item in uploads:
+            add(item['day'], metric, count=item['count'])
+
+    # Приемка заказов
+    orders = Order.objects.filter(accept_date__range=(start_dt, end_dt)) \
+        .annotate(
+            day=TruncDate('accept_date'),
+            total_products=Count('orderproduct'),
+            accepted_products=Count('orderproduct', filter=Q(orderproduct__accepted=True)),
+        ).values(
+            'day', 'date', 'accept_date', 'accept_time', 'total_products', 'accepted_products',
+            'accept_user_id', 'accept_user__first_name', 'accept_user__last_name', 'accept_user__username',
+        )
+    for order in orders:
+        day = order['day']
+        if order['date']:
+            add(day, METRIC_ASSEMBLY_TIME, count=1, total=(order['accept_date'] - order['date']).total_seconds())
+        add(day, METRIC_ORDER_PRODUCTS_ACCEPTED, count=order['accepted_products'])
+        add(day, METRIC_ORDER_PRODUCTS_TOTAL, count=order['total_products'])
+        if order['accept_time'] and order['accepted_products'] > 0:
+            seconds = (order['accept_time'] / order['accepted_products']).total_seconds()
+            add(day, METRIC_ACCEPTANCE_TIME, count=1, total=seconds)
+            if order['accept_user_id']:
+                username = _user_display_name(order['accept_user__first_name'], order['accept_user__last_name'],
+                                              order['accept_user__username'])
+                add(day, METRIC_ACCEPTANCE_TIME_BY_USER, username, count=1, total=seconds)
+
+    # Принятые товары по категориям
+    by_category = OrderProduct.objects.filter(accepted=True, accepted_date__range=(start_dt, end_dt)) \
+        .annotate(day=TruncDate('accepted_date')).values('day', 'product__category_id') \
+        .annotate(count=Count('id')).order_by()
+    for item in by_category:
+        category_id = item['product__category_id']
+        add(item['day'], METRIC_ACCEPTED_BY_CATEGORY, '' if category_id is None else str(category_id), item['count'])
+
+    return stats
+
+
+def rollup_daily_stats(start_date, end_date):
+    """Пересчитывает и записывает DailyStat за дни [start_date, end_date]. Возвращает число строк."""
+    written = 0
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=ROLLUP_CHUNK_DAYS - 1), end_date)
+        stats = compute_daily_stats(chunk_start, chunk_end)
+        rows = [
+            DailyStat(date=day, metric=metric, dimension=dimension, count=count, total=total)
+            for (day, metric, dimension), (count, total) in stats.items()
+            if count or total
+        ]
+        with transaction.atomic():
+            DailyStat.objects.filter(date__range=(chunk_start, chunk_end), metric__in=EVENT_METRICS).delete()
+            DailyStat.objects.bulk_create(rows, batch_size=1000)
+            DailyStatDay.objects.bulk_create(
+                [DailyStatDay(date=day) for day in _iter_days(chunk_start, chunk_end)],
+                update_conflicts=True, unique_fields=['date'], update_fields=['computed_at'],
+            )
+        written += len(rows)
+        logger.info(f"Дневная статистика за {chunk_start} - {chunk_end}: {len(rows)} строк.")
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def rollup_recent_daily_stats(days=None):
+    """Ночной пересчет: последние days завершившихся дней (по умолчанию DAILY_STATS_RECOMPUTE_DAYS)."""
+    days = days or get_recompute_days()
+    end_date = timezone.localdate() - timedelta(days=1)
+    start_date = end_date - timedelta(days=days - 1)
+    return rollup_daily_stats(start_date, end_date)
+
+
+def _contiguous_runs(days):
+    runs = []
+    for day in sorted(days):
+        if runs and runs[-1][1] + timedelta(days=1) == day:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def load_daily_stats(start_date, end_date):
+    """
+    Метрики событий за дни [start_date, end_date]: {день: {метрика: {измерение: (count, total)}}}.
+    Посчитанные дни читаются из DailyStat, последние DAILY_STATS_LIVE_DAYS дней
+    и непосчитанные дни считаются по исходным таблицам.
+    """
+    live_from = timezone.localdate() - timedelta(days=get_live_days() - 1)
+    covered = set(DailyStatDay.objects.filter(
+        date__range=(start_date, end_date), date__lt=live_from
+    ).values_list('date', flat=True))
+
+    result = defaultdict(lambda: defaultdict(dict))
+    if covered:
+        rows = DailyStat.objects.filter(
+            date__range=(min(covered), max(covered)), metric__in=EVENT_METRICS
+        ).values_list('date', 'metric', 'dimension', 'count', 'total')
+        for day, metric, dimension, count, total in rows:
+            if day in covered:
+                result[day][metric][dimension] = (count, total)
+
+    missing = [day for day in _iter_days(start_date, end_date) if day not in covered]
+    for run_start, run_end in _contiguous_runs(missing):
+        for (day, metric, dimension), (count, total) in compute_daily_stats(run_start, run_end).items():
+            if count or total:
+                result[day][metric][dimension] = (count, total)
+    return result
+
+
+def metric_count(day_stats, metric):
+    """Сумма count метрики по всем измерениям."""
+    return sum(count for count, _ in day_stats.get(metric, {}).values())
+
+
+def fs_stats_for_day(day_stats):
+    """Показатели фотостудии за день в формате FSAllstats."""
+    return {label: metric_count(day_stats, metric) for label, metric in FS_STATS_METRICS}
+
+
+def get_category_names(category_ids):
+    ids = [int(category_id) for category_id in category_ids if category_id]
+    return {str(pk): name for pk, name in ProductCategory.objects.filter(id__in=ids).values_list('id', 'name')}
+
+
+def compute_product_snapshot():
+    """Показатели по товарам на текущий момент - одним запросом."""
+    blocked = Q(ProductModerationStatus=BLOCKED_STATUS) | Q(SKUStatus=BLOCKED_STATUS)
+    in_stock = Q(in_stock_sum__gt=0)
+    passed = Q(PhotoModerationStatus="Прошло модерацию")
+    in_moderation = Q(PhotoModerationStatus="На модерации")
+    rejected = Q(PhotoModerationStatus="Отклонено")
+    return Product.objects.aggregate(
+        product_total=Count('id'),
+        product_blocked=Count('id', filter=blocked),
+        product_passed_moderation=Count('id', filter=passed),
+        product_in_moderation=Count('id', filter=in_moderation),
+        product_rejected_moderation=Count('id', filter=rejected),
+        product_in_stock=Count('id', filter=in_stock),
+        product_blocked_in_stock=Count('id', filter=in_stock & blocked),
+        product_passed_moderation_in_stock=Count('id', filter=in_stock & passed),
+        product_in_moderation_in_stock=Count('id', filter=in_stock & in_moderation),
+        product_rejected_moderation_in_stock=Count('id', filter=in_stock & rejected),
+    )
+
+
+def record_product_snapshot(day=None):
+    """Считает снимок по товарам и сохраняет его в DailyStat на день day (по умолчанию сегодня)."""
+    day = day or timezone.localdate()
+    snapshot = compute_product_snapshot()
+    DailyStat.objects.bulk_create(
+        [DailyStat(date=day, metric=metric, dimension='', count=snapshot[metric]) for metric in PRODUCT_SNAPSHOT_METRICS],
+        update_conflicts=True, unique_fields=['date', 'metric', 'dimension'], update_fields=['count'],
+    )
+    return snapshot
@@ -5,6 +5,8 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
 from core.models import ProductCategory  # поправьте путь, если иначе
+from .queue_counter_logic import reconcile_queue_counters
+from .rollup_logic import rollup_recent_daily_stats
 
 logger = logging.getLogger(__name__)
 
@@ -85,3 +87,26 @@ def update_product_categories_from_sheet():
                 )
 
     logger.info("Задача update_product_categories_from_sheet завершена.")
+
+
+def reconcile_queue_counters_task():
+    """
+    Периодическая сверка счетчиков очередей: пересчет с нуля и перезапись QueueCounter.
+    Возвращает расхождения {ключ: (было, стало)} - в норме пустой словарь.
+    """
+    result = reconcile_queue_counters()
+    if result['drift']:
+        logger.warning(f"Сверка счетчиков очередей: исправлено {len(result['drift'])} значений: {result['drift']}")
+    else:
+        logger.info("Сверка счетчиков очередей: расхождений нет.")
+    return result['drift']
+
+
+def rollup_daily_stats_task(days=None):
+    """
+    Ночной пересчет дневной статистики (DailyStat) за последние days завершившихся дней
+    (по умолчанию DAILY_STATS_RECOMPUTE_DAYS). Возвращает число записанных строк.
+    """
+    written = rollup_recent_daily_stats(days)
+    logger.info(f"Пересчет дневной статистики завершен: {written} строк.")
+    return written
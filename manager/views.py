@@ -4,8 +4,6 @@ from django.utils import timezone
 from django.http import JsonResponse
 from django.db import transaction
 from django.db.models import (
-    Subquery,
-    OuterRef,
     Min,
     Q,
     Count,
@@ -14,16 +12,12 @@ from django.db.models import (
     F,
     ExpressionWrapper,
     DurationField,
-    Sum,
-    Case,
-    When,
-    IntegerField,
     Prefetch,
     Avg
     )
-from django.db.models.functions import Concat, TruncDate, Cast
+from django.db.models.functions import Concat, Cast
 from django.views.decorators.http import require_GET
-from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from datetime import datetime, timedelta, time
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
@@ -34,7 +28,6 @@ from rest_framework import status, filters, generics
 from collections import OrderedDict, defaultdict
 from core.models import (
     Product,
-    ProductCategory,
     ProductOperation,
     ProductMoveStatus,
     ProductOperationTypes,
@@ -42,18 +35,27 @@ from core.models import (
     OrderProduct,
     OrderStatus,
     STRequest,
-    STRequestProduct,
     STRequestPhotoTime,
     RetouchRequest,
-    RetouchRequestProduct,
     RetouchStatus,
     SRetouchStatus,
-    Nofoto,
     Blocked_Shops,
     Blocked_Barcode,
     UserProfile
     )
-from render.models import Product as RenderProduct, Render, RetouchStatus as RenderRetouchStatus, SeniorRetouchStatus as RenderSeniorRetouchStatus, ModerationUpload, ModerationStudioUpload
+from core.reference_data import get_reference
+from render.models import RetouchStatus as RenderRetouchStatus, SeniorRetouchStatus as RenderSeniorRetouchStatus
+from core.product_upload_logic import validate_product_rows, format_row_errors, upsert_products, enqueue_product_upsert
+from .queue_logic import get_queue_snapshot, queue_snapshot_to_response
+from .rollup_logic import (
+    load_daily_stats, fs_stats_for_day, get_category_names, METRIC_ORDERED, METRIC_ACCEPTED, METRIC_ACCEPTED_NEW,
+    METRIC_ASSEMBLY_TIME, METRIC_ACCEPTANCE_TIME, METRIC_ACCEPTANCE_TIME_BY_USER, METRIC_ORDER_PRODUCTS_ACCEPTED,
+    METRIC_ORDER_PRODUCTS_TOTAL, METRIC_ACCEPTED_BY_CATEGORY,
+)
+from .numbering_logic import allocate_numbers, ORDER_SEQUENCE
+from .checkbarcode_logic import (
+    CATEGORY_STATUSES, classify_barcodes, get_barcode_details, group_by_category, normalize_barcodes
+)
 from .serializers import (
     STRequestSerializer,
     STRequestDetailSerializer,
@@ -227,13 +229,14 @@ class CreateOrderEnd(APIView):
         if is_priority:
             Product.objects.filter(barcode__in=valid_barcodes).update(priority=True)
 
-        last_order = Order.objects.order_by('-OrderNumber').first()
-        next_order_number = (last_order.OrderNumber + 1) if last_order and last_order.OrderNumber is not None else 1
+        # Номера сразу для всех заказов разбиения (по chunk_size товаров)
+        chunk_size = 30
+        order_numbers = allocate_numbers(ORDER_SEQUENCE, -(-len(valid_barcodes) // chunk_size))
 
         try:
-            order_status_obj = OrderStatus.objects.get(id=2)
-            product_move_status_obj = ProductMoveStatus.objects.get(id=2)
-            operation_type_obj = ProductOperationTypes.objects.get(id=2)
+            order_status_obj = get_reference(OrderStatus, 2)
+            product_move_status_obj = get_reference(ProductMoveStatus, 2)
+            operation_type_obj = get_reference(ProductOperationTypes, 2)
         except OrderStatus.DoesNotExist:
             return Response({'error': 'OrderStatus с id=2 не найден.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         except ProductMoveStatus.DoesNotExist:
@@ -242,7 +245,6 @@ class CreateOrderEnd(APIView):
             return Response({'error': 'ProductOperationTypes с id=2 не найден.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         created_order_numbers = []
-        chunk_size = 30
         
         # Получаем все валидные объекты Product один раз перед циклом по чанкам
         # valid_products_dict используется далее, так что это название сохраним
@@ -254,6 +256,7 @@ class CreateOrderEnd(APIView):
             
             # Используем transaction.atomic для гарантии целостности при создании заказа и связанных объектов
             with transaction.atomic():
+                next_order_number = order_numbers[i // chunk_size]
                 order = Order.objects.create(
                     OrderNumber=next_order_number,
                     date=timezone.now(),
@@ -261,7 +264,6 @@ class CreateOrderEnd(APIView):
                     status=order_status_obj
                 )
                 created_order_numbers.append(next_order_number)
-                next_order_number += 1
 
                 order_products_in_chunk = []
                 operations_in_chunk = []
@@ -311,8 +313,7 @@ class CreateOrderEnd(APIView):
             chat_id="-1002453118841"
             message_thread_id = 9
             try:
-                async_task(
-                    'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+                enqueue_telegram_message(
                     chat_id=chat_id,
                     text=message_text,
                     message_thread_id=message_thread_id
@@ -345,140 +346,23 @@ def manager_bulk_upload(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    errors = []
-    valid_data = []
-    
-    # Обрабатываем каждую строку данных
-    for index, row in enumerate(data, start=1):
-        row_errors = []
-        
-        required_fields = ["barcode", "name", "category_id", "seller", "in_stock_sum", "cell"]
-        # Проверка наличия всех необходимых полей
-        for field in required_fields:
-            if field not in row:
-                row_errors.append(f"Отсутствует поле '{field}'")
-        
-        if row_errors: # Если основные поля отсутствуют, нет смысла продолжать с этой строкой
-            errors.append(f"Строка {index}: " + ", ".join(row_errors))
-            continue
-
-        # Переменные для хранения валидированных значений
-        processed_barcode = None
-        validated_name = None
-        validated_category = None
-        validated_seller = None
-        validated_in_stock_sum = None
-        # cell_from_row будет использоваться для cell
-
-        # 1. Валидация и обработка штрихкода (barcode) - ИЗМЕНЕННАЯ ЛОГИКА
-        barcode_input = row.get('barcode') 
-        
-        if barcode_input is None:
-            row_errors.append("Поле 'barcode' не может быть null.")
-        else:
-            # Конвертируем в строку, так как из Excel может прийти число (например, если штрихкод 0123, Excel может передать 123)
-            barcode_str_candidate = str(barcode_input).strip()
-
-            if not barcode_str_candidate:
-                row_errors.append("Поле 'barcode' не должно быть пустым после обработки.")
-            elif not barcode_str_candidate.isdigit():
-                row_errors.append(f"Поле 'barcode' ('{barcode_str_candidate}') должно содержать только цифры.")
-            elif len(barcode_str_candidate) > 13:
-                # Ошибка, если исходный штрихкод (до дополнения нулями) уже длиннее 13 символов
-                row_errors.append(f"Длина исходного штрихкода '{barcode_str_candidate}' ({len(barcode_str_candidate)}) не должна превышать 13 цифр.")
-            else:
-                # Если длина <= 13 и состоит из цифр, дополняем ведущими нулями до 13 символов
-                processed_barcode = barcode_str_candidate.zfill(13)
-        
-        # 2. Валидация наименования (name) - оригинальная логика
-        name_from_row = row.get('name')
-        if not isinstance(name_from_row, str) or not name_from_row.strip():
-            row_errors.append("Поле 'name' должно быть непустой строкой")
-        else:
-            validated_name = name_from_row.strip()
-        
-        # 3. Валидация id категории (category_id) и проверка существования - оригинальная логика
-        category_id_from_row = row.get('category_id')
-        try:
-            category_id = int(category_id_from_row)
-            try:
-                validated_category = ProductCategory.objects.get(id=category_id)
-            except ProductCategory.DoesNotExist:
-                row_errors.append(f"Категория с id {category_id} не существует")
-        except (ValueError, TypeError):
-            row_errors.append("Поле 'category_id' должно быть числом")
-        
-        # 4. Валидация поля seller - оригинальная логика
-        seller_from_row = row.get('seller')
-        try:
-            validated_seller = int(seller_from_row)
-        except (ValueError, TypeError):
-            row_errors.append("Поле 'seller' должно быть числом")
-        
-        # 5. Валидация количества (in_stock_sum) - оригинальная логика
-        in_stock_sum_from_row = row.get('in_stock_sum')
-        try:
-            validated_in_stock_sum = int(in_stock_sum_from_row)
-        except (ValueError, TypeError):
-            row_errors.append("Поле 'in_stock_sum' должно быть числом")
-        
-        # 6. Валидация поля ячейки (cell) - оригинальная логика
-        cell_from_row = row.get('cell')
-        if not isinstance(cell_from_row, str):
-            # Эта оригинальная проверка добавит ошибку, если cell_from_row будет None или числом.
-            # Оставляем как есть, согласно требованию "не трогать остальной функционал".
-            row_errors.append("Поле 'cell' должно быть строкой")
-        # Значение для 'cell' будет отформатировано при добавлении в valid_data, как в оригинале
-
-        if row_errors:
-            errors.append(f"Строка {index}: " + ", ".join(row_errors))
-        else:
-            # Если ошибок на этой строке нет, добавляем данные в список для загрузки
-            # Используем оригинальную логику для cell при добавлении в словарь
-            cell_value_for_dict = cell_from_row.strip() if isinstance(cell_from_row, str) else cell_from_row
-            
-            valid_data.append({
-                'barcode': processed_barcode,      # Используем обработанный штрихкод
-                'name': validated_name,
-                'category': validated_category,
-                'seller': validated_seller,
-                'in_stock_sum': validated_in_stock_sum,
-                'cell': cell_value_for_dict,
-            })
-    
+    # Проверка всех строк по одной карте категорий
+    valid_data, errors = validate_product_rows(data, strict=True)
     if errors:
-        return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
-    
+        return Response({"errors": format_row_errors(errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Большие файлы можно записать в фоне - прогресс придет по WebSocket
+    if request.data.get('async'):
+        task_id = enqueue_product_upsert(valid_data, request.user.id)
+        return Response({
+            "message": "Загрузка запущена, ждите уведомления.",
+            "task_id": task_id
+        }, status=status.HTTP_202_ACCEPTED)
+
     # Если все данные валидны – создаем или обновляем продукты
-    created_count = 0
-    updated_count = 0
-    for item in valid_data:
-        product, created = Product.objects.get_or_create(
-            barcode=item['barcode'], # Поиск по обработанному (дополненному) штрихкоду
-            defaults={
-                'name': item['name'],
-                'category': item['category'],
-                'seller': item['seller'],
-                'in_stock_sum': item['in_stock_sum'],
-                'cell': item['cell'],
-                # 'move_status' and other fields with defaults/null=True will use their defaults
-                # or can be added here if they come from the input file and are validated.
-            }
-        )
-        if not created:
-            # Обновляем данные существующего продукта
-            product.name = item['name']
-            product.category = item['category']
-            product.seller = item['seller']
-            product.in_stock_sum = item['in_stock_sum']
-            product.cell = item['cell']
-            product.save()
-            updated_count += 1
-        else:
-            created_count += 1
-            
+    result = upsert_products(valid_data)
     return Response({
-        "message": f"Данные успешно загружены. Создано: {created_count}, Обновлено: {updated_count}."
+        "message": f"Данные успешно загружены. Создано: {result['created']}, Обновлено: {result['updated']}."
     }, status=status.HTTP_200_OK)
 
 #Статистика фс
@@ -499,119 +383,12 @@ def FSAllstats(request):
     if start_date > end_date:
         return JsonResponse({'error': 'start_date должна быть меньше или равна end_date.'}, status=400)
 
-    # Границы диапазона по времени
-    start_dt = datetime.combine(start_date, time.min)
-    end_dt = datetime.combine(end_date, time.max)
-
-    # 1. Агрегация "Заказано" – считаем OrderProduct по дате заказа
-    orders_agg = OrderProduct.objects.filter(
-        order__date__range=(start_dt, end_dt)
-    ).annotate(day=TruncDate('order__date')
-    ).values('day').annotate(count=Count('id'))
-    orders_dict = {item['day']: item['count'] for item in orders_agg}
-
-    # 2. Агрегация операций (Принято, Отправлено, Брак товара) по ProductOperation
-    ops_agg = ProductOperation.objects.filter(
-        date__range=(start_dt, end_dt)
-    ).annotate(day=TruncDate('date')
-    ).values('day').annotate(
-        accepted=Sum(Case(When(operation_type__id=3, then=1), default=0, output_field=IntegerField())),
-        sent=Sum(Case(When(operation_type__id=4, then=1), default=0, output_field=IntegerField())),
-        defective_product=Sum(Case(When(operation_type__id__in=[25, 30], then=1), default=0, output_field=IntegerField()))
-    )
-    ops_dict = {}
-    for item in ops_agg:
-        ops_dict[item['day']] = {
-            'Принято': item['accepted'] or 0,
-            'Отправлено': item['sent'] or 0,
-            'Брак товара': item['defective_product'] or 0
-        }
-
-    # 3. Агрегация "Сфотографировано" – напрямую по STRequestProduct
-    st_agg = STRequestProduct.objects.filter(
-        request__photo_date__range=(start_dt, end_dt),
-        photo_status__id__in=[1, 2, 25],
-        sphoto_status__id=1
-    ).annotate(day=TruncDate('request__photo_date')
-    ).values('day').annotate(total_photographed=Count('id'))
-    st_dict = {item['day']: item['total_photographed'] for item in st_agg}
-
-    # 4. Агрегация "Отретушировано" и "Брак по съемке" – напрямую по RetouchRequestProduct
-    retouch_agg = RetouchRequestProduct.objects.filter(
-        retouch_request__retouch_date__range=(start_dt, end_dt)
-    ).annotate(day=TruncDate('retouch_request__retouch_date')
-    ).values('day').annotate(
-        total_retouched=Count('id', filter=Q(retouch_status__id=2, sretouch_status__id=1)),
-        total_defective_shooting=Count('id', filter=Q(retouch_status__id=3, sretouch_status__id=1))
-    )
-    retouch_dict = {}
-    for item in retouch_agg:
-        retouch_dict[item['day']] = {
-            'Отретушировано': item['total_retouched'] or 0,
-            'Брак по съемке': item['total_defective_shooting'] or 0
-        }
-
-    # --- Новые агрегации ---
-
-    # 5. Агрегация "Сделано рендеров" (status=6) и "Отклонено на рендерах" (status=7) - из Render по CheckTimeStart
-    renders_agg = Render.objects.filter(
-        CheckTimeStart__range=(start_dt, end_dt)
-    ).annotate(day=TruncDate('CheckTimeStart')
-    ).values('day').annotate(
-        renders_done=Count('id', filter=Q(RetouchStatus__id=6)),
-        renders_rejected=Count('id', filter=Q(RetouchStatus__id=7))
-    )
-    renders_dict = {}
-    for item in renders_agg:
-        renders_dict[item['day']] = {
-            'Сделано рендеров': item['renders_done'] or 0,
-            'Отклонено на рендерах': item['renders_rejected'] or 0
-        }
-
-    # 6. Агрегация "Загружено рендеров" - из ModerationUpload по UploadTimeStart (status=2)
-    moderation_upload_agg = ModerationUpload.objects.filter(
-        UploadTimeStart__range=(start_dt, end_dt),
-        UploadStatus__id=2
-    ).annotate(day=TruncDate('UploadTimeStart')
-    ).values('day').annotate(count=Count('id'))
-    moderation_upload_dict = {item['day']: item['count'] for item in moderation_upload_agg}
-
-    # 7. Агрегация "Загружено фото от фс" - из ModerationStudioUpload по UploadTimeStart (status=2)
-    moderation_studio_upload_agg = ModerationStudioUpload.objects.filter(
-        UploadTimeStart__range=(start_dt, end_dt),
-        UploadStatus__id=2
-    ).annotate(day=TruncDate('UploadTimeStart')
-    ).values('day').annotate(count=Count('id'))
-    moderation_studio_upload_dict = {item['day']: item['count'] for item in moderation_studio_upload_agg}
-
-    # --- Конец новых агрегаций ---
-
-
-    # 8. Формирование итогового словаря с данными для каждого дня
+    # Посчитанные дни - из DailyStat, последние и непосчитанные - по исходным таблицам
+    daily_stats = load_daily_stats(start_date, end_date)
     result = {}
     current_date = start_date
     while current_date <= end_date:
-        day_key = current_date  # объект date
-
-        # Получаем данные по рендерам для текущего дня
-        render_stats = renders_dict.get(day_key, {})
-
-        result[str(current_date)] = {
-            # Старые метрики
-            'Заказано': orders_dict.get(day_key, 0),
-            'Принято': ops_dict.get(day_key, {}).get('Принято', 0),
-            'Отправлено': ops_dict.get(day_key, {}).get('Отправлено', 0),
-            'Брак товара': ops_dict.get(day_key, {}).get('Брак товара', 0),
-            'Сфотографировано': st_dict.get(day_key, 0),
-            'Отретушировано': retouch_dict.get(day_key, {}).get('Отретушировано', 0),
-            'Брак по съемке': retouch_dict.get(day_key, {}).get('Брак по съемке', 0),
-
-            # Новые метрики
-            'Сделано рендеров': render_stats.get('Сделано рендеров', 0),
-            'Отклонено на рендерах': render_stats.get('Отклонено на рендерах', 0),
-            'Загружено рендеров': moderation_upload_dict.get(day_key, 0),
-            'Загружено фото от фс': moderation_studio_upload_dict.get(day_key, 0),
-        }
+        result[str(current_date)] = fs_stats_for_day(daily_stats.get(current_date, {}))
         current_date += timedelta(days=1)
 
     return JsonResponse(result)
@@ -698,154 +475,9 @@ class PhotographersStatistic(View):
 #Очередь ФС
 @require_GET
 def get_current_queues(request):
-    # --- Существующий функционал (без изменений) ---
-    # Очередь созданных заказов: Order со статусом 2
-    created_orders = Order.objects.filter(status__id=2)
-    created_orders_count = created_orders.count()
-    created_orders_products_count = OrderProduct.objects.filter(order__in=created_orders).count()
-
-    # Очередь заказов на сборке: Order со статусом 3
-    assembly_orders = Order.objects.filter(status__id=3)
-    assembly_orders_count = assembly_orders.count()
-    assembly_orders_products_count = OrderProduct.objects.filter(order__in=assembly_orders).count()
-
-    # Очередь на съемку: STRequest со статусом 2
-    shooting_requests_qs = STRequest.objects.filter(status__id=2)
-    shooting_requests_count = shooting_requests_qs.count()
-    shooting_requests_products_count = STRequestProduct.objects.filter(request__in=shooting_requests_qs).count()
-
-    # Очередь на ретушь: STRequestProduct с photo_status=1, sphoto_status=1 и OnRetouch=False
-    # !! Убедитесь, что модель STRequestProduct и поле OnRetouch существуют !!
-    try:
-        retouch_queue_count = STRequestProduct.objects.filter(
-            photo_status__id=1,
-            sphoto_status__id=1,
-            OnRetouch=False # Проверьте актуальность этого поля
-        ).count()
-    except AttributeError: # Пример обработки, если поле OnRetouch отсутствует
-        print("Warning: Field 'OnRetouch' not found on STRequestProduct model.")
-        retouch_queue_count = 0 # Или другое значение по умолчанию
-
-    # Очередь на проверку фото:
-    # STRequestProduct: photo_status IN (1, 2, 25) AND sphoto_status != 1
-    photo_check_products_qs = STRequestProduct.objects.filter(
-        photo_status_id__in=[1, 2, 25]
-    ).exclude(
-        sphoto_status_id__in=[1, 2, 3] # Исключаем статусы 1, 2, 3
-    )
-    photo_check_products_count = photo_check_products_qs.count()
-    # Считаем уникальные STRequest, связанные с этими продуктами
-    photo_check_requests_count = photo_check_products_qs.values('request_id').distinct().count()
-
-    # Очередь на проверку ретуши:
-    # RetouchRequestProduct: retouch_status = 2 AND (sretouch_status IS NULL OR sretouch_status = 0)
-    retouch_check_products_qs = RetouchRequestProduct.objects.filter(
-        Q(retouch_status_id=2) &
-        (Q(sretouch_status_id__isnull=True) | Q(sretouch_status_id=0))
-    )
-    retouch_check_products_count = retouch_check_products_qs.count()
-    # Считаем уникальные RetouchRequest, связанные с этими продуктами
-    retouch_check_requests_count = retouch_check_products_qs.values('retouch_request_id').distinct().count()
-
-    # Очередь рендеры:
-    # render.Product: PhotoModerationStatus IN ('Отклонено', 'На модерации'), IsOnRender=False, IsRetouchBlock=False, WMSQuantity > 0
-    render_queue_count = RenderProduct.objects.filter(
-        PhotoModerationStatus="Отклонено",
-        IsOnRender=False,
-        IsRetouchBlock=False,
-        # WMSQuantity__gt=0
-    ).count()
-
-    # Очередь на загрузку рендеров:
-    # Render: RetouchStatus=6, RetouchSeniorStatus=1, IsOnUpload=false
-    render_upload_queue_count = Render.objects.filter(
-        RetouchStatus_id=6,      # Используем _id для ForeignKey
-        RetouchSeniorStatus_id=1,# Используем _id для ForeignKey
-        IsOnUpload=False
-    ).count()
-
-    # Очередь на загрузку фото от фс:
-    # RetouchRequestProduct: retouch_status=2, sretouch_status=1, IsOnUpload=False
-    # !! Убедитесь, что модель RetouchRequestProduct и поле IsOnUpload существуют !!
-    try:
-        fs_photo_upload_queue_count = RetouchRequestProduct.objects.filter(
-            retouch_status_id=2,
-            sretouch_status_id=1,
-            IsOnUpload=False # Проверьте актуальность этого поля
-        ).count()
-    except AttributeError: # Пример обработки, если поле IsOnUpload отсутствует
-        print("Warning: Field 'IsOnUpload' not found on RetouchRequestProduct model.")
-        fs_photo_upload_queue_count = 0 # Или другое значение по умолчанию
-
-    # --- Новый функционал: Реальная очередь на съемку ---
-    # Определяем ID статусов RenderCheckResult, которые означают необходимость пересъемки
-    rejected_check_result_ids = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 50]
-
-    photo_moderation_statuses = ["Отклонено"]
-    
-    blocked_shop_ids = Blocked_Shops.objects.values_list('shop_id', flat=True)
-    blocked_category_ids = ProductCategory.objects.filter(IsBlocked=True).values_list('id', flat=True)
-    blocked_barcodes = Blocked_Barcode.objects.values_list('barcode', flat=True)
-
-    # Считаем количество уникальных продуктов (RenderProduct), которые:
-    # 1. Не находятся в заказе (IsOnOrder=False).
-    # 2. Имеют хотя бы одну связанную запись Render, у которой CheckResult ID
-    #    находится в списке rejected_check_result_ids.
-    
-    real_shooting_queue_count = RenderProduct.objects.filter(
-        IsOnOrder=False, # Фильтр по полю самого продукта
-        WMSQuantity__gt=0,
-        PhotoModerationStatus__in=photo_moderation_statuses,
-        render__CheckResult__id__in=rejected_check_result_ids
-    ).exclude(
-        ShopID__in=blocked_shop_ids
-    ).exclude(
-        CategoryID__in=blocked_category_ids
-    ).exclude(
-        Barcode__in=blocked_barcodes
-    ).distinct().count() # Считаем только уникальные продукты
-
-    # --- Формирование ответа ---
-    data = {
-        # --- Существующие ключи ---
-        "created_orders": {
-            "orders_count": created_orders_count,
-            "products_count": created_orders_products_count,
-        },
-        "assembly_orders": {
-            "orders_count": assembly_orders_count,
-            "products_count": assembly_orders_products_count,
-        },
-        "shooting_requests": {
-            "requests_count": shooting_requests_count,
-            "products_count": shooting_requests_products_count,
-        },
-        "retouch_queue": {
-            "count": retouch_queue_count
-        },
-        "photo_check_queue": {
-             "requests_count": photo_check_requests_count,
-             "products_count": photo_check_products_count,
-        },
-        "retouch_check_queue": {
-            "requests_count": retouch_check_requests_count,
-            "products_count": retouch_check_products_count,
-        },
-        "render_queue": {
-            "count": render_queue_count
-        },
-        "render_upload_queue": {
-            "count": render_upload_queue_count
-        },
-        "fs_photo_upload_queue": {
-            "count": fs_photo_upload_queue_count
-        },
-        # --- Добавленный ключ для новой очереди ---
-        "real_shooting_queue": {
-             "count": real_shooting_queue_count
-        }
-    }
-
+    # Все счетчики берутся из общего снимка очередей (счетчики QueueCounter),
+    # тот же снимок используется для сообщения бота
+    data = queue_snapshot_to_response(get_queue_snapshot())
     return JsonResponse(data)
 
 #Лист заявок на съемку
@@ -1348,14 +980,7 @@ class BarcodeCheckView(APIView):
             )
 
         # 2. Приводим к строкам и дополняем до 13 цифр, отбрасывая невалидные
-        processed = set()
-        for bc in barcodes_input:
-            if bc is None:
-                continue
-            bc_str = str(bc).strip()
-            if not bc_str.isdigit() or len(bc_str) > 13:
-                continue
-            processed.add(bc_str.zfill(13))
+        processed = set(normalize_barcodes(barcodes_input))
 
         if not processed:
             return Response(
@@ -1363,142 +988,11 @@ class BarcodeCheckView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        barcodes_to_check = processed.copy()
-
-        # Результирующие списки для штрихкодов
-        has_photo_list = []
-        in_retouch_queue_list = []
-        nofoto_list = []
-        blocked_by_shop_list = []
-        blocked_by_category_list = []
-        blocked_by_barcode_list = []
-        ordered_list = []
-        onfs_list = []
-        possible_zero_stock_list = [] # ✨ Новый список
-
-        # 3. Проверка "Есть фото"
-        if barcodes_to_check:
-            found_barcodes = set(
-                RetouchRequestProduct.objects
-                                     .filter(
-                                         st_request_product__product__barcode__in=barcodes_to_check,
-                                         retouch_status__id=2,
-                                         sretouch_status__id=1
-                                     )
-                                     .values_list('st_request_product__product__barcode', flat=True)
-            )
-            if found_barcodes:
-                has_photo_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
-
-        # 4. Проверка "В очереди на ретушь"
-        if barcodes_to_check:
-            three_days_ago = timezone.now() - timedelta(hours=30)
-            found_barcodes = set(
-                STRequestProduct.objects
-                                .filter(
-                                    product__barcode__in=barcodes_to_check,
-                                    photo_status__id=1,
-                                    sphoto_status__id=1,
-                                    senior_check_date__gte=three_days_ago
-                                )
-                                .values_list('product__barcode', flat=True)
-            )
-            if found_barcodes:
-                in_retouch_queue_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
-
-        # 5. Проверка "Без фото" (Nofoto)
-        if barcodes_to_check:
-            found_barcodes = set(
-                Nofoto.objects
-                      .filter(product__barcode__in=barcodes_to_check)
-                      .values_list('product__barcode', flat=True)
-            )
-            if found_barcodes:
-                nofoto_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
-
-        # 6. Проверка "Заблокирован по магазину"
-        if barcodes_to_check:
-            blocked_shop_ids = set(Blocked_Shops.objects.values_list('shop_id', flat=True))
-            found_barcodes = set(
-                Product.objects
-                       .filter(barcode__in=barcodes_to_check, seller__in=blocked_shop_ids)
-                       .values_list('barcode', flat=True)
-            )
-            if found_barcodes:
-                blocked_by_shop_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
-
-        # 7. Проверка "Заблокирован по категории"
-        if barcodes_to_check:
-            found_barcodes = set(
-                Product.objects
-                       .filter(barcode__in=barcodes_to_check, category__IsBlocked=True)
-                       .values_list('barcode', flat=True)
-            )
-            if found_barcodes:
-                blocked_by_category_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
-
-        # 8. Проверка "Заблокирован по штрихкоду"
-        if barcodes_to_check:
-            blocked_barcode_set = set(Blocked_Barcode.objects.values_list('barcode', flat=True))
-            found_barcodes = barcodes_to_check & blocked_barcode_set
-            if found_barcodes:
-                blocked_by_barcode_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
-
-        # 9. Проверка "Заказан"
-        if barcodes_to_check:
-            found_barcodes = set(
-                OrderProduct.objects
-                            .filter(product__barcode__in=barcodes_to_check, order__status__id__in=[2, 3])
-                            .values_list('product__barcode', flat=True)
-            )
-            if found_barcodes:
-                ordered_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
-
-        # 10. Проверка "Принят на складе" (onfs)
-        if barcodes_to_check:
-            found_barcodes = set(
-                Product.objects
-                       .filter(barcode__in=barcodes_to_check, move_status__id=3)
-                       .values_list('barcode', flat=True)
-            )
-            if found_barcodes:
-                onfs_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
-        
-        # 11. ✨ Новая проверка "Возможно нет остатков"
-        if barcodes_to_check:
-            found_barcodes = set(
-                Product.objects
-                       .filter(barcode__in=barcodes_to_check, in_stock_sum=0)
-                       .values_list('barcode', flat=True)
-            )
-            if found_barcodes:
-                possible_zero_stock_list.extend(list(found_barcodes))
-                barcodes_to_check -= found_barcodes
+        # 3. Классификация всего набора (общий каскад с ботом и последовательной проверкой)
+        groups = group_by_category(classify_barcodes(processed))
 
-        # 12. Все оставшиеся - "Не найдено" (missed)
-        missed_list = list(barcodes_to_check)
-
-        # 13. Отправляем результат на фронт
-        return Response({
-            'has_photo': sorted(has_photo_list),
-            'in_retouch_queue': sorted(in_retouch_queue_list),
-            'nofoto': sorted(nofoto_list),
-            'blocked_by_shop': sorted(blocked_by_shop_list),
-            'blocked_by_category': sorted(blocked_by_category_list),
-            'blocked_by_barcode': sorted(blocked_by_barcode_list),
-            'ordered': sorted(ordered_list),
-            'onfs': sorted(onfs_list),
-            'possible_zero_stock': sorted(possible_zero_stock_list), # ✨ Добавлено в ответ
-            'missed': sorted(missed_list),
-        }, status=status.HTTP_200_OK)
+        # 4. Отправляем результат на фронт
+        return Response(groups, status=status.HTTP_200_OK)
 
 # Новый эндпоинт для последовательной проверки статуса штрихкодов
 class BarcodeSequentialCheckView(APIView):
@@ -1511,13 +1005,7 @@ class BarcodeSequentialCheckView(APIView):
             )
 
         # Обработка и валидация входных штрихкодов
-        processed_barcodes = []
-        for bc in barcodes_input:
-            if bc is None:
-                continue
-            bc_str = str(bc).strip()
-            if bc_str.isdigit() and len(bc_str) <= 13:
-                processed_barcodes.append(bc_str.zfill(13))
+        processed_barcodes = normalize_barcodes(barcodes_input)
         
         if not processed_barcodes:
             return Response(
@@ -1525,150 +1013,14 @@ class BarcodeSequentialCheckView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        barcodes_to_check = set(processed_barcodes)
-        results_map = {}
-
-        # 1. Проверка: Есть фото с ретуши
-        if barcodes_to_check:
-            recent_photos = RetouchRequestProduct.objects.filter(
-                st_request_product__product__barcode__in=barcodes_to_check,
-                retouch_status__id=2,
-                sretouch_status__id=1,
-            ).select_related(
-                'st_request_product__product',
-                'st_request_product__request'
-            )
-            for rp in recent_photos:
-                barcode = rp.st_request_product.product.barcode
-                if barcode in barcodes_to_check:
-                    results_map[barcode] = {
-                        "barcode": barcode,
-                        "retouch_link": rp.retouch_link,
-                        "photo_date": rp.st_request_product.request.photo_date,
-                        "barcode_status": "Есть фото"
-                    }
-                    barcodes_to_check.remove(barcode)
-
-        # 2. Проверка: В очереди на ретушь
-        if barcodes_to_check:
-            three_days_ago = timezone.now() - timedelta(hours=30)
-            retouch_queue_entries = STRequestProduct.objects.filter(
-                product__barcode__in=barcodes_to_check,
-                photo_status__id=1,
-                sphoto_status__id=1,
-                senior_check_date__gte=three_days_ago
-            ).select_related('product', 'request')
-
-            for srp in retouch_queue_entries:
-                barcode = srp.product.barcode
-                if barcode in barcodes_to_check:
-                    results_map[barcode] = {
-                        "barcode": barcode,
-                        "date": srp.request.photo_date,
-                        "barcode_status": "В очереди на ретушь"
-                    }
-                    barcodes_to_check.remove(barcode)
-        
-        # 3. Проверка: Запись в Nofoto
-        if barcodes_to_check:
-            nofoto_entries = Nofoto.objects.filter(
-                product__barcode__in=barcodes_to_check
-            ).select_related('product')
-            for entry in nofoto_entries:
-                barcode = entry.product.barcode
-                if barcode in barcodes_to_check:
-                    results_map[barcode] = {
-                        "barcode": barcode,
-                        "date": entry.date,
-                        "barcode_status": "Без фото"
-                    }
-                    barcodes_to_check.remove(barcode)
-
-        # 4. Проверка: Заблокирован магазин
-        if barcodes_to_check:
-            blocked_shop_ids = set(Blocked_Shops.objects.values_list('shop_id', flat=True))
-            if blocked_shop_ids:
-                products_in_blocked_shops = Product.objects.filter(
-                    barcode__in=barcodes_to_check,
-                    seller__in=blocked_shop_ids
-                )
-                for product in products_in_blocked_shops:
-                    barcode = product.barcode
-                    if barcode in barcodes_to_check:
-                        results_map[barcode] = {
-                            "barcode": barcode,
-                            "barcode_status": "Заблокирован магазин"
-                        }
-                        barcodes_to_check.remove(barcode)
-
-        # 5. Проверка: Заблокирован SKU
-        if barcodes_to_check:
-            blocked_skus = Blocked_Barcode.objects.filter(barcode__in=barcodes_to_check)
-            for blocked in blocked_skus:
-                barcode = blocked.barcode
-                if barcode in barcodes_to_check:
-                    results_map[barcode] = {
-                        "barcode": barcode,
-                        "barcode_status": "Заблокирован SKU"
-                    }
-                    barcodes_to_check.remove(barcode)
-
-        # 6. Проверка: Заблокирована категория
-        if barcodes_to_check:
-            products_in_blocked_cats = Product.objects.filter(
-                barcode__in=barcodes_to_check,
-                category__IsBlocked=True
-            )
-            for product in products_in_blocked_cats:
-                barcode = product.barcode
-                if barcode in barcodes_to_check:
-                    results_map[barcode] = {
-                        "barcode": barcode,
-                        "barcode_status": "Заблокирована категория"
-                    }
-                    barcodes_to_check.remove(barcode)
-        
-        # 7. Проверка: Заказан
-        if barcodes_to_check:
-            ordered_products = OrderProduct.objects.filter(
-                product__barcode__in=barcodes_to_check,
-                order__status__id__in=[2, 3]
-            ).select_related('product', 'order')
-            for op in ordered_products:
-                barcode = op.product.barcode
-                if barcode in barcodes_to_check:
-                    results_map[barcode] = {
-                        "barcode": barcode,
-                        "order_date": op.order.date,
-                        "barcode_status": "Заказан"
-                    }
-                    barcodes_to_check.remove(barcode)
-        
-        # 8. Проверка: Принят на складе
-        if barcodes_to_check:
-            on_fs_products = Product.objects.filter(
-                barcode__in=barcodes_to_check,
-                move_status__id=3
-            )
-            for product in on_fs_products:
-                barcode = product.barcode
-                if barcode in barcodes_to_check:
-                    results_map[barcode] = {
-                        "barcode": barcode,
-                        "income_date": product.income_date,
-                        "barcode_status": "Принят"
-                    }
-                    barcodes_to_check.remove(barcode)
-
-        # 10. Если ничего не найдено
-        for barcode in barcodes_to_check:
-            results_map[barcode] = {
-                "barcode": barcode,
-                "barcode_status": "Не найдено"
-            }
+        classified = classify_barcodes(processed_barcodes)
+        details = get_barcode_details(classified)
 
         # Сборка итогового ответа в порядке исходного запроса
-        final_results = [results_map[bc] for bc in processed_barcodes if bc in results_map]
+        final_results = [
+            {"barcode": bc, **details.get(bc, {}), "barcode_status": CATEGORY_STATUSES[classified[bc]]}
+            for bc in processed_barcodes
+        ]
 
         return Response(final_results, status=status.HTTP_200_OK)
 
@@ -1814,244 +1166,97 @@ class AcceptanceDashboardView(APIView):
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-
-            # Создаем "наивные" datetime
-            naive_start_dt = datetime.combine(start_date, time.min)
-            naive_end_dt = datetime.combine(end_date, time.max)
-
-            # Делаем их "осведомленными" о часовом поясе
-            start_dt = timezone.make_aware(naive_start_dt)
-            end_dt = timezone.make_aware(naive_end_dt)
-
         except ValueError:
             return Response(
                 {"error": "Invalid date format. Use YYYY-MM-DD."},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # --- Initialize daily data structure ---
-        response = defaultdict(lambda: defaultdict(dict))
-        delta = end_date - start_date
-        all_dates = [start_date + timedelta(days=i) for i in range(delta.days + 1)]
-
-        # --- 2. Ordered Products (by day and by STRequestType) ---
-        ordered_products_qs = OrderProduct.objects.filter(order__date__range=(start_dt, end_dt))\
-            .select_related('product__category__STRequestType')\
-            .annotate(day=TruncDate('order__date'))\
-            .values('day', 'product__category__STRequestType__name')\
-            .annotate(count=Count('id'))\
-            .order_by('day')
-
-        total_ordered_count = 0
-        total_by_type = defaultdict(int)
-
-        for item in ordered_products_qs:
-            date_str = item['day'].strftime('%Y-%m-%d')
-            type_name = item['product__category__STRequestType__name'] or "Не указан"
-            count = item['count']
-
-            response[date_str]['ordered_products']['count'] = response[date_str]['ordered_products'].get('count', 0) + count
-            response[date_str]['ordered_products_by_type'][type_name] = response[date_str]['ordered_products_by_type'].get(type_name, 0) + count
-            total_ordered_count += count
-            total_by_type[type_name] += count
-        
-        # Calculate ratios for ordered products
-        for date_str, data in response.items():
-            daily_total = data.get('ordered_products', {}).get('count', 0)
-            if daily_total > 0:
-                for type_name, count in data.get('ordered_products_by_type', {}).items():
-                    data['ordered_products_by_type'][type_name] = round(count / daily_total, 2)
-        
-        # --- 3. Accepted Products & Stats (based on Order.accept_date) ---
-        orders_in_range = Order.objects.filter(accept_date__range=(start_dt, end_dt))\
-            .select_related('accept_user')\
-            .annotate(
-                day=TruncDate('accept_date'),
-                total_products=Count('orderproduct'),
-                accepted_products=Count('orderproduct', filter=Q(orderproduct__accepted=True)),
-                assembly_duration=ExpressionWrapper(F('accept_date') - F('date'), output_field=DurationField())
-            ).order_by('day')
-
-        total_accepted_products = 0
-        total_assembly_duration = timedelta()
-        total_assembly_orders = 0
-        total_accuracy_numerator = 0
-        total_accuracy_denominator = 0
-        total_acceptance_time_per_product = timedelta()
-        total_acceptance_orders_with_time = 0
-        user_acceptance_time = defaultdict(lambda: {'total_duration': timedelta(), 'count': 0})
-        
-        for order in orders_in_range:
-            date_str = order.day.strftime('%Y-%m-%d')
-            
-            # Assembly Time
-            response[date_str]['assembly_time']['total_seconds'] = response[date_str]['assembly_time'].get('total_seconds', 0) + order.assembly_duration.total_seconds()
-            response[date_str]['assembly_time']['count'] = response[date_str]['assembly_time'].get('count', 0) + 1
-            total_assembly_duration += order.assembly_duration
-            total_assembly_orders += 1
-
-            # Assembly Accuracy
-            response[date_str]['assembly_accuracy']['accepted'] = response[date_str]['assembly_accuracy'].get('accepted', 0) + order.accepted_products
-            response[date_str]['assembly_accuracy']['total'] = response[date_str]['assembly_accuracy'].get('total', 0) + order.total_products
-            total_accuracy_numerator += order.accepted_products
-            total_accuracy_denominator += order.total_products
-
-            # Accepted Count (from this query)
-            response[date_str]['accepted_count'] = response[date_str].get('accepted_count', 0) + order.accepted_products
-            total_accepted_products += order.accepted_products
-
-            # Acceptance Time per Product
-            # Проверяем, что есть принятые товары, чтобы избежать деления на ноль
-            if order.accept_time and order.accepted_products > 0:
-                # Делим на количество ПРИНЯТЫХ товаров
-                time_per_product = order.accept_time / order.accepted_products
-                
-                # Остальная логика остается без изменений
-                response[date_str]['acceptance_time_per_product']['total_seconds'] = response[date_str]['acceptance_time_per_product'].get('total_seconds', 0) + time_per_product.total_seconds()
-                response[date_str]['acceptance_time_per_product']['count'] = response[date_str]['acceptance_time_per_product'].get('count', 0) + 1
-                total_acceptance_time_per_product += time_per_product
-                total_acceptance_orders_with_time += 1
-                if order.accept_user:
-                    username = f"{order.accept_user.first_name} {order.accept_user.last_name}".strip() or order.accept_user.username
-                    user_acceptance_time[username]['total_duration'] += time_per_product
-                    user_acceptance_time[username]['count'] += 1
-
-        # --- 4. Top Accepted Categories ---
-        top_categories_qs = OrderProduct.objects.filter(accepted=True, accepted_date__range=(start_dt, end_dt))\
-            .values('product__category__id', 'product__category__name')\
-            .annotate(count=Count('id'))\
-            .order_by('-count')
-
-        top_accepted_categories = [
-            {"category_id": cat['product__category__id'], "category_name": cat['product__category__name'], "count": cat['count']}
-            for cat in top_categories_qs
-        ]
-
-        # --- 5. New Products Ratio & PhotoModerationStatus breakdown ---
-        first_acceptance_subquery = ProductOperation.objects.filter(
-            product=OuterRef('product'), operation_type_id=3
-        ).order_by('date').values('date')[:1]
+        daily_stats = load_daily_stats(start_date, end_date)
+        all_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
 
-        acceptance_ops = ProductOperation.objects.filter(date__range=(start_dt, end_dt), operation_type_id=3)\
-            .annotate(
-                day=TruncDate('date'),
-                first_acceptance_date=Subquery(first_acceptance_subquery)
-            ).values('day', 'first_acceptance_date', 'PhotoModerationStatus')
+        def ratios(counts, total):
+            return {k: round(v / total, 2) for k, v in counts.items()} if total > 0 else {}
 
-        total_new_accepted = 0
-        total_ops_accepted = 0
-        total_by_photo_status = defaultdict(int)
+        def average_duration(count, total_seconds):
+            return format_duration_human_readable(timedelta(seconds=total_seconds / count)) if count > 0 else "N/A"
 
-        for op in acceptance_ops:
-            date_str = op['day'].strftime('%Y-%m-%d')
-            # Changed variable name from 'status' to 'photo_moderation_status'
-            photo_moderation_status = op['PhotoModerationStatus'] or "Не указан"
-            is_new = op['day'] == op['first_acceptance_date'].date()
-
-            response[date_str]['new_products']['total'] = response[date_str]['new_products'].get('total', 0) + 1
-            # Use the new variable name here
-            response[date_str]['by_photo_status'][photo_moderation_status] = response[date_str]['by_photo_status'].get(photo_moderation_status, 0) + 1
-            total_ops_accepted += 1
-            # And also here
-            total_by_photo_status[photo_moderation_status] += 1
-            if is_new:
-                response[date_str]['new_products']['new_count'] = response[date_str]['new_products'].get('new_count', 0) + 1
-                total_new_accepted += 1
-
-        # --- Final Calculations and Formatting ---
         final_response = {'daily_data': {}, 'totals': {}}
+        total_by_type = defaultdict(int)
+        total_by_photo_status = defaultdict(int)
+        total_by_category = defaultdict(int)
+        user_acceptance_time = defaultdict(lambda: [0, 0.0])
+        totals = defaultdict(lambda: [0, 0.0])
 
         for date_obj in all_dates:
-            date_str = date_obj.strftime('%Y-%m-%d')
-            day_data = response[date_str]
-            final_day = {}
-
-            # Ordered
-            final_day['ordered_products_count'] = day_data.get('ordered_products', {}).get('count', 0)
-            final_day['ordered_products_by_type_ratio'] = day_data.get('ordered_products_by_type', {})
-            
-            # Accepted
-            final_day['accepted_products_count'] = day_data.get('accepted_count', 0)
-
-            # Assembly Time
-            assembly_info = day_data.get('assembly_time', {})
-            if assembly_info.get('count', 0) > 0:
-                avg_assembly_seconds = assembly_info['total_seconds'] / assembly_info['count']
-                final_day['average_assembly_time'] = format_duration_human_readable(timedelta(seconds=avg_assembly_seconds))
-            else:
-                final_day['average_assembly_time'] = "N/A"
+            day_stats = daily_stats.get(date_obj, {})
+            day = {metric: [sum(v[0] for v in dims.values()), sum(v[1] for v in dims.values())]
+                   for metric, dims in day_stats.items()}
+            for metric, (count, total) in day.items():
+                totals[metric][0] += count
+                totals[metric][1] += total
+
+            by_type = {name: count for name, (count, _) in day_stats.get(METRIC_ORDERED, {}).items()}
+            by_photo_status = {name: count for name, (count, _) in day_stats.get(METRIC_ACCEPTED, {}).items()}
+            for name, count in by_type.items():
+                total_by_type[name] += count
+            for name, count in by_photo_status.items():
+                total_by_photo_status[name] += count
+            for category_id, (count, _) in day_stats.get(METRIC_ACCEPTED_BY_CATEGORY, {}).items():
+                total_by_category[category_id] += count
+            for username, (count, seconds) in day_stats.get(METRIC_ACCEPTANCE_TIME_BY_USER, {}).items():
+                user_acceptance_time[username][0] += count
+                user_acceptance_time[username][1] += seconds
+
+            ordered_count = day.get(METRIC_ORDERED, [0])[0]
+            accepted_ops = day.get(METRIC_ACCEPTED, [0])[0]
+            accuracy_total = day.get(METRIC_ORDER_PRODUCTS_TOTAL, [0])[0]
+            final_response['daily_data'][date_obj.strftime('%Y-%m-%d')] = {
+                'ordered_products_count': ordered_count,
+                'ordered_products_by_type_ratio': ratios(by_type, ordered_count),
+                'accepted_products_count': day.get(METRIC_ORDER_PRODUCTS_ACCEPTED, [0])[0],
+                'average_assembly_time': average_duration(*day.get(METRIC_ASSEMBLY_TIME, [0, 0.0])),
+                'assembly_accuracy_ratio': round(day.get(METRIC_ORDER_PRODUCTS_ACCEPTED, [0])[0] / accuracy_total, 2) if accuracy_total > 0 else 0,
+                'average_acceptance_time_per_product': average_duration(*day.get(METRIC_ACCEPTANCE_TIME, [0, 0.0])),
+                'new_products_ratio': round(day.get(METRIC_ACCEPTED_NEW, [0])[0] / accepted_ops, 2) if accepted_ops > 0 else 0,
+                'photo_moderation_status_ratio': ratios(by_photo_status, accepted_ops),
+            }
 
-            # Assembly Accuracy
-            accuracy_info = day_data.get('assembly_accuracy', {})
-            if accuracy_info.get('total', 0) > 0:
-                final_day['assembly_accuracy_ratio'] = round(accuracy_info.get('accepted', 0) / accuracy_info['total'], 2)
-            else:
-                final_day['assembly_accuracy_ratio'] = 0
-            
-            # Acceptance Time per Product
-            acceptance_time_info = day_data.get('acceptance_time_per_product', {})
-            if acceptance_time_info.get('count', 0) > 0:
-                avg_seconds = acceptance_time_info['total_seconds'] / acceptance_time_info['count']
-                final_day['average_acceptance_time_per_product'] = format_duration_human_readable(timedelta(seconds=avg_seconds))
-            else:
-                final_day['average_acceptance_time_per_product'] = "N/A"
-            
-            # New Products Ratio
-            new_prod_info = day_data.get('new_products', {})
-            if new_prod_info.get('total', 0) > 0:
-                final_day['new_products_ratio'] = round(new_prod_info.get('new_count', 0) / new_prod_info['total'], 2)
-            else:
-                final_day['new_products_ratio'] = 0
+        # Итоги
+        total_ordered_count = totals[METRIC_ORDERED][0]
+        total_ops_accepted = totals[METRIC_ACCEPTED][0]
+        total_new_accepted = totals[METRIC_ACCEPTED_NEW][0]
+        total_accuracy_denominator = totals[METRIC_ORDER_PRODUCTS_TOTAL][0]
 
-            # Photo Moderation Status Ratio
-            photo_status_info = day_data.get('by_photo_status', {})
-            total_status_count = sum(photo_status_info.values())
-            if total_status_count > 0:
-                final_day['photo_moderation_status_ratio'] = {k: round(v / total_status_count, 2) for k, v in photo_status_info.items()}
-            else:
-                final_day['photo_moderation_status_ratio'] = {}
-
-            final_response['daily_data'][date_str] = final_day
-        
-        # Calculate Totals
         final_response['totals']['ordered_products_count'] = total_ordered_count
-        if total_ordered_count > 0:
-            final_response['totals']['ordered_products_by_type_ratio'] = {k: round(v / total_ordered_count, 2) for k, v in total_by_type.items()}
-        else:
-            final_response['totals']['ordered_products_by_type_ratio'] = {}
-            
-        final_response['totals']['accepted_products_count'] = total_accepted_products
-        
-        if total_assembly_orders > 0:
-            avg_assembly = total_assembly_duration / total_assembly_orders
-            final_response['totals']['average_assembly_time'] = format_duration_human_readable(avg_assembly)
-        else:
-            final_response['totals']['average_assembly_time'] = "N/A"
-
+        final_response['totals']['ordered_products_by_type_ratio'] = ratios(total_by_type, total_ordered_count)
+        final_response['totals']['accepted_products_count'] = totals[METRIC_ORDER_PRODUCTS_ACCEPTED][0]
+        final_response['totals']['average_assembly_time'] = average_duration(*totals[METRIC_ASSEMBLY_TIME])
         if total_accuracy_denominator > 0:
-            final_response['totals']['assembly_accuracy_ratio'] = round(total_accuracy_numerator / total_accuracy_denominator, 2)
+            final_response['totals']['assembly_accuracy_ratio'] = round(totals[METRIC_ORDER_PRODUCTS_ACCEPTED][0] / total_accuracy_denominator, 2)
         else:
             final_response['totals']['assembly_accuracy_ratio'] = 0
-        
-        if total_acceptance_orders_with_time > 0:
-            avg_acceptance_time = total_acceptance_time_per_product / total_acceptance_orders_with_time
-            final_response['totals']['average_acceptance_time_per_product'] = format_duration_human_readable(avg_acceptance_time)
-        else:
-            final_response['totals']['average_acceptance_time_per_product'] = "N/A"
-        
+        final_response['totals']['average_acceptance_time_per_product'] = average_duration(*totals[METRIC_ACCEPTANCE_TIME])
         final_response['totals']['average_acceptance_time_by_user'] = {
-            user: format_duration_human_readable(data['total_duration'] / data['count'])
-            for user, data in user_acceptance_time.items() if data['count'] > 0
+            user: average_duration(count, seconds)
+            for user, (count, seconds) in user_acceptance_time.items() if count > 0
         }
 
-        final_response['totals']['top_accepted_categories'] = top_accepted_categories
-        
+        category_names = get_category_names(total_by_category.keys())
+        final_response['totals']['top_accepted_categories'] = [
+            {
+                "category_id": int(category_id) if category_id else None,
+                "category_name": category_names.get(category_id),
+                "count": count,
+            }
+            for category_id, count in sorted(total_by_category.items(), key=lambda item: -item[1])
+        ]
+
         final_response['totals']['total_newly_accepted_products'] = total_new_accepted
         if total_ops_accepted > 0:
             final_response['totals']['new_products_ratio'] = round(total_new_accepted / total_ops_accepted, 2)
-            final_response['totals']['photo_moderation_status_ratio'] = {k: round(v / total_ops_accepted, 2) for k, v in total_by_photo_status.items()}
         else:
             final_response['totals']['new_products_ratio'] = 0
-            final_response['totals']['photo_moderation_status_ratio'] = {}
+        final_response['totals']['photo_moderation_status_ratio'] = ratios(total_by_photo_status, total_ops_accepted)
 
         return Response(final_response, status=status.HTTP_200_OK)
@@ -312,5 +312,39 @@ STATICFILES_DIRS = [
 
 SERVICE_ACCOUNT_FILE = os.path.join(BASE_DIR, 'credentials.json')
 
+# Параллельные запросы к Google Drive при сборке архивов исходников
+RETOUCH_ARCHIVE_MAX_WORKERS = 8
+
+# Локальный кэш исходников Drive (file_id + md5), вытесняется при очистке архивов
+RETOUCH_BLOB_CACHE_DIR = os.path.join(MEDIA_ROOT, 'retouch_blob_cache')
+RETOUCH_BLOB_CACHE_MAX_BYTES = 50 * 1024 ** 3
+
+# Как часто (сек) процесс сверяет версию кэша справочников (core.reference_data)
+REFERENCE_DATA_CHECK_INTERVAL = 5
+
+# Дневная статистика (manager.rollup_logic): сколько прошедших дней пересчитывает ночная задача
+# и за сколько последних дней (включая сегодня) статистика всегда считается по исходным таблицам
+DAILY_STATS_RECOMPUTE_DAYS = 7
+DAILY_STATS_LIVE_DAYS = 2
+
+# Очереди заданий render.dispatch_logic: сколько заданий выдавать сотруднику за раз
+# и через сколько минут незавершенное задание загрузки возвращается в очередь
+WORK_DISPATCH_PRECLAIM = {
+    'render_check': 1,
+    'moderation_upload': 1,
+    'studio_upload': 1,
+}
+WORK_DISPATCH_LEASE_MINUTES = {
+    'moderation_upload': 120,
+    'studio_upload': 120,
+}
+
+# Очередь исходящих сообщений Telegram (Redis stream), разбирается командой run_telegram_delivery
+TELEGRAM_OUTBOX_REDIS = {
+    'host': '127.0.0.1',
+    'port': 6379,
+    'db': 3,
+}
+
 FRONTEND_BASE_URL = 'http://192.168.1.196:3000'
 API_AND_MEDIA_BASE_URL = 'http://192.168.1.196:8000'
@@ -2,10 +2,11 @@
 import asyncio
 from django.utils import timezone
 from django.db import transaction
-from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from asgiref.sync import async_to_sync
 # Импортируем модели из вашего приложения core
 from core.models import Order, OrderProduct, OrderStatus
+from core.reference_data import get_reference
 from auto.models import RGTScripts
 # Импортируем нашу "отправлялку" сообщений из приложения бота
 
@@ -44,8 +45,7 @@ def schedule_queue_stats_okz():
 
     # Используем нашу асинхронную функцию для отправки
     print(f"Попытка отправки статистики ОКЗ в чат {target_chat_id}...")
-    async_task(
-        'telegram_bot.tasks.send_message_task',  # <-- Вызываем БЕЗОПАСНУЮ СИНХРОННУЮ ОБЕРТКУ
+    enqueue_telegram_message(
         chat_id=target_chat_id,
         text=message_text,
         message_thread_id=target_thread_id
@@ -80,8 +80,8 @@ def schedule_order_status_refresh():
     # 3. Вычисляем пороговую дату и получаем статусы
     threshold_date = timezone.now() - threshold_duration
     try:
-        status_to_check = OrderStatus.objects.get(id=3) # "На сборке"
-        status_to_set = OrderStatus.objects.get(id=2)   # "Создан"
+        status_to_check = get_reference(OrderStatus, 3) # "На сборке"
+        status_to_set = get_reference(OrderStatus, 2)   # "Создан"
     except OrderStatus.DoesNotExist as e:
         print(f"Критическая ошибка: Не найден статус заказа (id=2 или id=3). Задача прервана. Ошибка: {e}")
         return
@@ -120,8 +120,7 @@ def schedule_order_status_refresh():
         target_thread_id = 9
 
         print(f"Попытка отправки уведомления о сбросе статусов в чат {target_chat_id}...")
-        async_task(
-            'telegram_bot.tasks.send_message_task',  # <-- Вызываем БЕЗОПАСНУЮ СИНХРОННУЮ ОБЕРТКУ
+        enqueue_telegram_message(
             chat_id=target_chat_id,
             text=message_text,
             message_thread_id=target_thread_id
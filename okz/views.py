@@ -8,7 +8,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.filters import OrderingFilter
 from django.db.models import Count, Q, ExpressionWrapper, F, DurationField, Sum
 from django_filters.rest_framework import DjangoFilterBackend
-from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from datetime import datetime, time
 from core.models import (
     Order,
@@ -26,6 +26,7 @@ from core.models import (
     Invoice,
     InvoiceProduct
     )
+from core.reference_data import get_reference
 from .serializers import (
     OrderSerializer,
     OrderStatusSerializer,
@@ -175,7 +176,7 @@ class OrderStartAssemblyView(APIView):
             )
         
         # Обновляем поля заказа
-        order.status = OrderStatus.objects.get(id=3)
+        order.status = get_reference(OrderStatus, 3)
         order.assembly_date = timezone.now()
         order.save()
         
@@ -189,8 +190,7 @@ class OrderStartAssemblyView(APIView):
             f"Начат сбор заказа №{order.OrderNumber}\n"
             f"Количество товаров - {count}"
         )
-        async_task(
-            'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+        enqueue_telegram_message(
             chat_id=telegram_chat_id,
             text=message_text,
             message_thread_id=OKZ_THREAD_ID
@@ -73,12 +73,12 @@ class STRequestListSerializer(serializers.ModelSerializer):
     photo_date = serializers.DateTimeField(format=DATETIME_FORMAT, read_only=True, input_formats=['iso-8601'])
     assistant_date = serializers.DateTimeField(format=DATETIME_FORMAT, read_only=True, input_formats=['iso-8601'])
 
-    # Кастомные поля, значения которых берутся из аннотаций в View
-    total_products = serializers.IntegerField(source='total_products_count', read_only=True)
-    priority = serializers.BooleanField(source='has_priority_product', read_only=True)
-    info = serializers.BooleanField(source='has_product_with_info', read_only=True)
+    # Кастомные поля из сводки по товарам заявки (STRequest.summary_*)
+    total_products = serializers.IntegerField(source='summary_total', read_only=True)
+    priority = serializers.BooleanField(source='summary_has_priority', read_only=True)
+    info = serializers.BooleanField(source='summary_has_info', read_only=True)
 
-    for_check_count = serializers.IntegerField(source='for_check_count_annotation', read_only=True)
+    for_check_count = serializers.IntegerField(source='summary_for_check', read_only=True)
 
     class Meta:
         model = STRequest
@@ -4,11 +4,10 @@ import re
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum, Q, Count, Exists, OuterRef, Min, Value, F
-from django.db.models.functions import Coalesce
+from django.db.models import Sum, Q, Count, F
 from aiogram.utils.markdown import hbold, hcode
 from asgiref.sync import async_to_sync
-from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 
 # Импортируем google api клиенты
 from google.oauth2 import service_account
@@ -17,46 +16,18 @@ from googleapiclient.errors import HttpError
 
 # Импортируем модели и задачу отправки
 from core.models import STRequest, STRequestProduct, STRequestType
+from core.staff_stats_logic import photographer_stats, user_display_name, sorted_by
 from stockman.views import determine_and_set_strequest_type
 
 logger = logging.getLogger(__name__)
 
 def _get_photographer_stats(start_date, end_date):
-    products_filter = (
-        Q(strequestproduct__photo_status__id__in=[1, 2, 25]) &
-        Q(strequestproduct__sphoto_status__id=1)
-    )
-
-    stats = (
-        STRequest.objects
-        .filter(photo_date__range=(start_date, end_date),
-                photographer__isnull=False)
-        # группируем по фотографу и собираем имя/username
-        .values(
-            'photographer__first_name',
-            'photographer__last_name',
-            'photographer__username',
-        )
-        # сразу считаем все связанные strequestproduct по условию
-        .annotate(
-            total_products=Count(
-                'strequestproduct',
-                filter=products_filter,
-            )
-        )
-        .order_by('-total_products')
-    )
-
-    result = []
-    for item in stats:
-        count = item['total_products']
-        if count > 0:
-            # Собираем отображаемое имя
-            name = f"{item['photographer__first_name']} {item['photographer__last_name']}".strip()
-            if not name:
-                name = item['photographer__username']
-            result.append({'name': name, 'count': count})
-    return result
+    """Снятые товары по фотографам за [start_date, end_date), по убыванию."""
+    stats = sorted_by(photographer_stats(start_date, end_date), 'photographed')
+    return [
+        {'name': user_display_name(item['first_name'], item['last_name'], item['username']), 'count': item['photographed']}
+        for item in stats if item['photographed'] > 0
+    ]
 
 
 def schedule_photographer_stats():
@@ -105,8 +76,7 @@ def schedule_photographer_stats():
 
     # 5. Отправляем сообщение
     print(f"Попытка отправки статистики фотографов в чат {target_chat_id}...")
-    async_task(
-        'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+    enqueue_telegram_message(
         chat_id=target_chat_id,
         text=message_text
     )
@@ -144,24 +114,11 @@ def send_priority_strequests_notification():
         """Вложенная функция для получения и группировки заявок."""
         logger.info("Получение приоритетных заявок из БД...")
         
-        queryset = STRequest.objects.filter(status_id=2)
-        
-        priority_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            product__priority=True
-        )
-        queryset = queryset.annotate(has_priority_product=Exists(priority_subquery))
-        
-        very_far_date = timezone.make_aware(datetime(9999, 12, 31, 23, 59, 59))
-        queryset = queryset.annotate(
-            min_income_date_raw=Min('strequestproduct__product__income_date')
-        ).annotate(
-            min_income_date=Coalesce('min_income_date_raw', Value(very_far_date))
-        )
-        
-        queryset = queryset.order_by(
-            F('has_priority_product').desc(),
-            F('min_income_date').asc()
+        # Сортировка по сводке заявки (core.request_summary_logic), как в списке STRequest2ListView
+        queryset = STRequest.objects.filter(status_id=2).order_by(
+            F('summary_has_priority').desc(),
+            F('summary_min_income_date').asc(nulls_last=True),
+            'id'
         ).values('RequestNumber', 'STRequestType_id')
         
         grouped_requests = {"normal": [], "clothing": [], "kgt": []}
@@ -210,8 +167,7 @@ def send_priority_strequests_notification():
 
         if message_to_send:
             logger.info(f"Отправка сообщения в чат {TARGET_CHAT_ID}...")
-            async_task(
-                'telegram_bot.tasks.send_message_task',
+            enqueue_telegram_message(
                 chat_id=TARGET_CHAT_ID,
                 text=message_to_send,
                 parse_mode='HTML'
@@ -341,8 +297,7 @@ def check_photographer_folders():
         MESSAGE_THREAD_ID = 1519
 
         logger.info(f"Отправка отчета в чат {target_chat_id}...")
-        async_task(
-            'telegram_bot.tasks.send_message_task',
+        enqueue_telegram_message(
             chat_id=target_chat_id,
             text=message_text,
             message_thread_id=MESSAGE_THREAD_ID,
@@ -4,13 +4,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Exists, OuterRef, Min, Count, Q, Value, BooleanField, F, Case, When, Subquery
-from django.db.models.functions import Coalesce
+from django.db.models import F
 from django.contrib.auth.models import User, Group
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db import transaction
 from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from datetime import datetime, timedelta
 
 from core.models import (
@@ -26,6 +26,7 @@ from core.models import (
     ProductOperationTypes,
     ProductOperation
     )
+from core.reference_data import get_reference, get_reference_or_404
 from .serializers import (
     STRequestListSerializer,
     UserFullNameSerializer,
@@ -51,6 +52,24 @@ def is_senior_photographer(user):
         # If the group doesn't exist, then no user can be a member.
         return False
 
+def dashboard_requests(status_id):
+    """
+    Заявки со статусом status_id для списков фотографов: приоритетные первыми,
+    затем по самой ранней приемке товара (заявки без даты - в конце).
+    Количества и признаки берутся из сводки STRequest.summary_* (core.request_summary_logic).
+    """
+    return STRequest.objects.filter(status_id=status_id).select_related(
+        'photographer',
+        'stockman',
+        'assistant',
+        'status',
+        'STRequestType'
+    ).order_by(
+        F('summary_has_priority').desc(),
+        F('summary_min_income_date').asc(nulls_last=True),
+        'id'
+    )
+
 #список заявок со статусом создана
 class STRequest2ListView(generics.ListAPIView):
     """
@@ -64,61 +83,7 @@ class STRequest2ListView(generics.ListAPIView):
     filterset_class = STRequestFilter
 
     def get_queryset(self):
-        queryset = STRequest.objects.filter(status_id=2)
-
-        priority_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            product__priority=True
-        )
-        queryset = queryset.annotate(
-            has_priority_product=Exists(priority_subquery)
-        )
-
-        # Ensure very_far_date is timezone-aware if USE_TZ is True
-        very_far_date = timezone.make_aware(datetime(9999, 12, 31, 23, 59, 59))
-        queryset = queryset.annotate(
-            min_income_date_raw=Min('strequestproduct__product__income_date')
-        ).annotate(
-            min_income_date=Coalesce('min_income_date_raw', Value(very_far_date))
-        )
-
-        info_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            product__info__isnull=False
-        ).exclude(product__info='')
-        queryset = queryset.annotate(
-            has_product_with_info=Exists(info_subquery)
-        )
-
-        queryset = queryset.annotate(
-            total_products_count=Count('strequestproduct')
-        )
-
-        for_check_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            photo_status_id__in=[1, 2, 25]
-        ).exclude(
-            sphoto_status_id=1
-        ).values('request').annotate(count=Count('id')).values('count')
-        
-        # ✨ Apply the for_check_count_annotation
-        queryset = queryset.annotate(
-            for_check_count_annotation=Coalesce(Subquery(for_check_subquery), 0)
-        )
-
-        queryset = queryset.order_by(
-            F('has_priority_product').desc(),
-            F('min_income_date').asc()
-        )
-
-        queryset = queryset.select_related(
-            'photographer',
-            'stockman',
-            'assistant',
-            'status'
-        )
-        
-        queryset = queryset.prefetch_related('strequestproduct_set')
+        queryset = dashboard_requests(2)
 
         st_type_param = self.request.query_params.get('strequest_type')
         if st_type_param:
@@ -140,62 +105,7 @@ class STRequest3ListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = STRequest.objects.filter(status_id=3)
-
-        priority_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            product__priority=True
-        )
-        queryset = queryset.annotate(
-            has_priority_product=Exists(priority_subquery)
-        )
-
-        very_far_date = timezone.make_aware(datetime(9999, 12, 31, 23, 59, 59))
-        queryset = queryset.annotate(
-            min_income_date_raw=Min('strequestproduct__product__income_date')
-        ).annotate(
-            min_income_date=Coalesce('min_income_date_raw', Value(very_far_date))
-        )
-
-        info_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            product__info__isnull=False
-        ).exclude(product__info='')
-        queryset = queryset.annotate(
-            has_product_with_info=Exists(info_subquery)
-        )
-
-        queryset = queryset.annotate(
-            total_products_count=Count('strequestproduct')
-        )
-
-        for_check_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            photo_status_id__in=[1, 2, 25]
-        ).exclude(
-            sphoto_status_id=1
-        ).values('request').annotate(count=Count('id')).values('count')
-
-        # ✨ Apply the for_check_count_annotation
-        queryset = queryset.annotate(
-            for_check_count_annotation=Coalesce(Subquery(for_check_subquery), 0)
-        )
-
-        queryset = queryset.order_by(
-            F('has_priority_product').desc(),
-            F('min_income_date').asc()
-        )
-
-        queryset = queryset.select_related(
-            'photographer',
-            'stockman',
-            'assistant',
-            'status'
-        )
-        
-        queryset = queryset.prefetch_related('strequestproduct_set')
-
-        return queryset
+        return dashboard_requests(3)
     
 #список заявок со статусом отснято
 class STRequest5ListView(generics.ListAPIView):
@@ -210,66 +120,9 @@ class STRequest5ListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = STRequest.objects.filter(status_id=5)
-
         # ✨ Filter for photo_date within the last 24 hours
         status5_treshold = timezone.now() - timedelta(hours=24)
-        queryset = queryset.filter(photo_date__gte=status5_treshold) # photo_date must be greater than or equal to 24 hours ago
-
-        priority_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            product__priority=True
-        )
-        queryset = queryset.annotate(
-            has_priority_product=Exists(priority_subquery)
-        )
-
-        very_far_date = timezone.make_aware(datetime(9999, 12, 31, 23, 59, 59))
-        queryset = queryset.annotate(
-            min_income_date_raw=Min('strequestproduct__product__income_date')
-        ).annotate(
-            min_income_date=Coalesce('min_income_date_raw', Value(very_far_date))
-        )
-
-        info_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            product__info__isnull=False
-        ).exclude(product__info='')
-        queryset = queryset.annotate(
-            has_product_with_info=Exists(info_subquery)
-        )
-
-        queryset = queryset.annotate(
-            total_products_count=Count('strequestproduct')
-        )
-
-        for_check_subquery = STRequestProduct.objects.filter(
-            request=OuterRef('pk'),
-            photo_status_id__in=[1, 2, 25]
-        ).exclude(
-            sphoto_status_id=1
-        ).values('request').annotate(count=Count('id')).values('count')
-
-        # ✨ Apply the for_check_count_annotation
-        queryset = queryset.annotate(
-            for_check_count_annotation=Coalesce(Subquery(for_check_subquery), 0)
-        )
-        
-        queryset = queryset.order_by(
-            F('has_priority_product').desc(),
-            F('min_income_date').asc()
-        )
-
-        queryset = queryset.select_related(
-            'photographer',
-            'stockman',
-            'assistant',
-            'status'
-        )
-        
-        queryset = queryset.prefetch_related('strequestproduct_set')
-
-        return queryset
+        return dashboard_requests(5).filter(photo_date__gte=status5_treshold)
 
 #Получение списка фотографов на смене
 class WorkingPhotographerListView(generics.ListAPIView):
@@ -378,7 +231,7 @@ class AssignPhotographerView(views.APIView):
         # --- Создание записей в ProductOperation ---
         # Получаем тип операции "Назначение фотографа" (предполагаем ID=5)
         try:
-            operation_type_assign_photographer = ProductOperationTypes.objects.get(id=5)
+            operation_type_assign_photographer = get_reference(ProductOperationTypes, 5)
         except ProductOperationTypes.DoesNotExist:
             # Обработка случая, если тип операции с ID=5 не найден.
             # Можно вернуть ошибку или создать его, если это допустимо.
@@ -433,8 +286,7 @@ class AssignPhotographerView(views.APIView):
             photographer_message = f"Вам назначена заявка {st_request.RequestNumber}"
             if info_details:
                 photographer_message += f"\n\n*Товары с инфо:*\n{info_details}"
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+            enqueue_telegram_message(
                 chat_id=photographer_telegram_id,
                 text=photographer_message
             )
@@ -443,8 +295,7 @@ class AssignPhotographerView(views.APIView):
             group_chat_id = "-1002559221974" # Рекомендуется вынести в настройки
             group_thread_id = 2              # Рекомендуется вынести в настройки
             group_message = f"*Назначены товары с инфо для заявки {st_request.RequestNumber}:*\n{info_details}"
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+            enqueue_telegram_message(
                 chat_id=group_chat_id,
                 text=group_message,
                 message_thread_id=group_thread_id
@@ -623,8 +474,7 @@ class NoFotoView(views.APIView):
             
             full_message_text = "\n".join(message_lines)
 
-            async_task(
-                'telegram_bot.tasks.send_message_task',
+            enqueue_telegram_message(
                 chat_id=TELEGRAM_CHAT_ID,
                 text=full_message_text,
                 message_thread_id=TELEGRAM_THREAD_ID
@@ -647,7 +497,7 @@ class NoFotoView(views.APIView):
 
         # 3. Создаем записи Product Operation
         try:
-            operation_type_nofoto = ProductOperationTypes.objects.get(id=72)
+            operation_type_nofoto = get_reference(ProductOperationTypes, 72)
             ProductOperation.objects.create(
                 product=product,
                 operation_type=operation_type_nofoto,
@@ -655,7 +505,7 @@ class NoFotoView(views.APIView):
                 comment=request_number_for_comment if request_number_for_comment else f"Товар {barcode} помечен как NoFoto"
             )
 
-            operation_type_cannot_shoot = ProductOperationTypes.objects.get(id=56)
+            operation_type_cannot_shoot = get_reference(ProductOperationTypes, 56)
             ProductOperation.objects.create(
                 product=product,
                 operation_type=operation_type_cannot_shoot,
@@ -740,7 +590,7 @@ class UpdateSTRequestProductPhotoStatusView(views.APIView):
             request__RequestNumber=request_number,
             product__barcode=barcode
         )
-        new_photo_status = get_object_or_404(PhotoStatus, id=photo_status_id)
+        new_photo_status = get_reference_or_404(PhotoStatus, photo_status_id)
 
         st_request_product.photo_status = new_photo_status
         st_request_product.save(update_fields=['photo_status'])
@@ -790,7 +640,7 @@ class UpdateSTRequestProductSPhotoStatusView(views.APIView):
         except STRequestProduct.DoesNotExist: # get_object_or_404 сам выбросит Http404, но для ясности можно оставить
              return Response({"error": "Запись STRequestProduct не найдена."}, status=status.HTTP_404_NOT_FOUND)
 
-        new_sphoto_status = get_object_or_404(SPhotoStatus, id=sphoto_status_id)
+        new_sphoto_status = get_reference_or_404(SPhotoStatus, sphoto_status_id)
 
         # --- Основные обновления STRequestProduct ---
         st_request_product.sphoto_status = new_sphoto_status
@@ -829,7 +679,7 @@ class UpdateSTRequestProductSPhotoStatusView(views.APIView):
             
             if operation_type_id_for_po:
                 try:
-                    operation_type_instance = ProductOperationTypes.objects.get(id=operation_type_id_for_po)
+                    operation_type_instance = get_reference(ProductOperationTypes, operation_type_id_for_po)
                     photographer_user = st_request_product.request.photographer
                     
                     ProductOperation.objects.create(
@@ -857,7 +707,7 @@ class UpdateSTRequestProductSPhotoStatusView(views.APIView):
 
         elif new_sphoto_status.id == 2: # "На доработку" или аналогичный статус
             try:
-                photo_status_to_set = PhotoStatus.objects.get(id=10)
+                photo_status_to_set = get_reference(PhotoStatus, 10)
                 st_request_product.photo_status = photo_status_to_set
                 update_fields.append('photo_status')
             except PhotoStatus.DoesNotExist:
@@ -874,8 +724,7 @@ class UpdateSTRequestProductSPhotoStatusView(views.APIView):
                 message_text = (f"Правки по заявке {st_request_product.request.RequestNumber}:\n"
                                 f"{st_request_product.product.barcode} - {comment_for_tg}")
                 try:
-                    async_task(
-                        'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+                    enqueue_telegram_message(
                         chat_id=photographer.profile.telegram_id,
                         text=message_text
                     )
@@ -940,7 +789,7 @@ class ReturnSTRequestToShootingView(APIView): # <<< Наследуемся от
 
         target_status_id = 3
         try:
-            target_status = STRequestStatus.objects.get(id=target_status_id)
+            target_status = get_reference(STRequestStatus, target_status_id)
         except STRequestStatus.DoesNotExist:
              return Response(
                 {"error": f"Статус с ID {target_status_id} ('На съемке') не найден в системе."},
@@ -118,3 +118,23 @@ class ModerationStudioUploadAdmin(admin.ModelAdmin):
         # Получаем все связанные объекты и объединяем их строковые представления через запятую
         return ", ".join([str(result) for result in obj.RejectedReason.all()])
     get_RejectedReason.short_description = 'Результаты проверки'
+
+
+@admin.register(models.ReshootCandidate)
+class ReshootCandidateAdmin(admin.ModelAdmin):
+    list_display = ['Barcode', 'STRequestTypeID', 'WMSQuantity', 'FirstCheckTime', 'updated_at']
+    list_filter = ['STRequestTypeID']
+    search_fields = ['Barcode']
+
+
+@admin.register(models.SheetSyncState)
+class SheetSyncStateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'sheet_name', 'row_count', 'watermark', 'last_full_rebuild', 'updated_at']
+    readonly_fields = ['schema_hash', 'watermark', 'row_count', 'last_full_rebuild', 'updated_at']
+    actions = ['force_full_rebuild']
+
+    @admin.action(description='Полностью перезаписать лист при следующей синхронизации')
+    def force_full_rebuild(self, request, queryset):
+        # Пустой хэш схемы - следующий запуск пересоберет лист целиком
+        updated = queryset.update(schema_hash='')
+        self.message_user(request, f"Помечено для полной перезаписи: {updated}")
@@ -0,0 +1,283 @@
+# render/dispatch_logic.py
+"""
+Выдача заданий из очередей «взять следующее» (рендеры ретушерам, загрузки модераторам).
+
+Очередь описывается WorkQueue:
+- get_candidates() - свободные единицы работы, ordering - порядок выдачи;
+  фильтр и порядок совпадают с частичным индексом модели, так что выборка - короткий index scan;
+- claim_items(items, worker, now) - помечает единицы взятыми и создает задания сотрудника;
+- get_claimed(worker) - уже выданные сотруднику и не завершенные задания (сначала начатые).
+
+claim_next() берет строки через SELECT ... FOR UPDATE SKIP LOCKED: одновременные запросы
+не ждут друг друга на первой строке очереди, а получают следующие свободные.
+Если в настройках WORK_DISPATCH_PRECLAIM для очереди задано N > 1, сотруднику сразу
+выдается пачка из N заданий - следующие запросы обслуживаются без обращения к очереди.
+
+Аренда (WORK_DISPATCH_LEASE_MINUTES): задания, которые не завершили за это время,
+возвращаются в очередь (release_expired) - задачей release_expired_claims_task
+и сразу, если очередь оказалась пустой.
+
+Задержка выдачи и количество выдач пишутся в кэш (get_dispatch_metrics).
+"""
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import RetouchRequestProduct
+from core.reference_data import get_reference
+from .models import ModerationStudioUpload, ModerationUpload, Product, Render, RetouchStatus, UploadStatus
+
+logger = logging.getLogger(__name__)
+
+RETOUCH_STATUS_IN_PROGRESS_ID = 1
+UPLOAD_STATUS_IN_PROGRESS_ID = 1
+# Статус, в который переводятся задания с истекшей арендой (как в update_moderation_uploads_status)
+UPLOAD_STATUS_EXPIRED_ID = 4
+
+# Выдача дольше порога пишется в лог предупреждением
+SLOW_CLAIM_MS = 500
+METRICS_PREFIX = 'work_dispatch'
+METRIC_FIELDS = ('claims', 'preclaimed_served', 'empty', 'released', 'latency_ms_total', 'slow')
+
+
+@dataclass
+class WorkQueue:
+    name: str
+    get_candidates: Callable
+    ordering: Sequence[str]
+    claim_items: Callable
+    get_claimed: Callable
+    # Отмечает выданное заранее задание начатым (время начала - момент выдачи сотруднику)
+    start_claimed: Optional[Callable] = None
+    # Возвращает в очередь задания, начатые раньше cutoff. Возвращает число заданий
+    release_expired: Optional[Callable] = None
+
+
+def get_preclaim_size(queue):
+    return max(1, getattr(settings, 'WORK_DISPATCH_PRECLAIM', {}).get(queue.name, 1))
+
+
+def get_lease(queue):
+    minutes = getattr(settings, 'WORK_DISPATCH_LEASE_MINUTES', {}).get(queue.name)
+    return timedelta(minutes=minutes) if minutes else None
+
+
+# --- Метрики ---
+
+def _metric_key(queue_name, field):
+    return f"{METRICS_PREFIX}:{queue_name}:{field}"
+
+
+def _incr_metrics(queue_name, **values):
+    # Метрики не должны ломать выдачу заданий, если кэш недоступен
+    try:
+        for field, value in values.items():
+            if not value:
+                continue
+            key = _metric_key(queue_name, field)
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, value)
+    except Exception as e:
+        logger.warning(f"Не удалось записать метрики очереди {queue_name}: {e}")
+
+
+def get_dispatch_metrics(queue_names=None):
+    """{очередь: {claims, preclaimed_served, empty, released, latency_ms_total, slow, avg_latency_ms}}"""
+    names = queue_names or list(QUEUES)
+    keys = {_metric_key(name, field): (name, field) for name in names for field in METRIC_FIELDS}
+    values = cache.get_many(list(keys))
+    result = {name: {field: 0 for field in METRIC_FIELDS} for name in names}
+    for key, value in values.items():
+        name, field = keys[key]
+        result[name][field] = int(value)
+    for data in result.values():
+        data['avg_latency_ms'] = round(data['latency_ms_total'] / data['claims'], 1) if data['claims'] else None
+    return result
+
+
+# --- Выдача ---
+
+def _claim_batch(queue, worker, size):
+    with transaction.atomic():
+        items = list(
+            queue.get_candidates()
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by(*queue.ordering)[:size]
+        )
+        if not items:
+            return []
+        return queue.claim_items(items, worker, timezone.now())
+
+
+def release_expired_claims(queue, now=None):
+    """Возвращает в очередь задания queue с истекшей арендой. Возвращает их число."""
+    lease = get_lease(queue)
+    if not lease or not queue.release_expired:
+        return 0
+    released = queue.release_expired((now or timezone.now()) - lease)
+    if released:
+        logger.info(f"Очередь {queue.name}: возвращено {released} заданий с истекшей арендой.")
+        _incr_metrics(queue.name, released=released)
+    return released
+
+
+def claim_next(queue, worker):
+    """
+    Следующее задание сотрудника worker: уже выданное (начатое или взятое пачкой заранее)
+    или новое из очереди. Возвращает (задание, создано_сейчас); (None, False) - очередь пуста.
+    """
+    claimed = queue.get_claimed(worker).first()
+    if claimed is not None:
+        if queue.start_claimed and queue.start_claimed(claimed):
+            _incr_metrics(queue.name, preclaimed_served=1)
+        return claimed, False
+
+    started = time.monotonic()
+    claims = _claim_batch(queue, worker, get_preclaim_size(queue))
+    if not claims and release_expired_claims(queue):
+        claims = _claim_batch(queue, worker, get_preclaim_size(queue))
+    latency_ms = int((time.monotonic() - started) * 1000)
+
+    if not claims:
+        _incr_metrics(queue.name, empty=1)
+        return None, False
+    slow = latency_ms >= SLOW_CLAIM_MS
+    if slow:
+        logger.warning(f"Очередь {queue.name}: выдача задания заняла {latency_ms} мс.")
+    _incr_metrics(queue.name, claims=1, latency_ms_total=latency_ms, slow=int(slow))
+    return claims[0], True
+
+
+# --- Очередь рендеров (StartCheck) ---
+
+def _render_candidates():
+    return Product.objects.filter(
+        PhotoModerationStatus="Отклонено",
+        IsOnRender=False,
+        IsRetouchBlock=False,
+        IsModerationBlock=False,
+    )
+
+
+def _claim_renders(products, retoucher, now):
+    Product.objects.filter(pk__in=[product.pk for product in products]).update(IsOnRender=True, updated_at=now)
+    retouch_status_started = get_reference(RetouchStatus, RETOUCH_STATUS_IN_PROGRESS_ID)
+    return [
+        Render.objects.create(
+            Product=product,
+            Retoucher=retoucher,
+            CheckTimeStart=now,
+            RetouchStatus=retouch_status_started
+        )
+        for product in products
+    ]
+
+
+def _claimed_renders(retoucher):
+    return Render.objects.filter(
+        Retoucher=retoucher,
+        RetouchStatus__id=RETOUCH_STATUS_IN_PROGRESS_ID
+    ).select_related('Product')
+
+
+RENDER_CHECK_QUEUE = WorkQueue(
+    name='render_check',
+    get_candidates=_render_candidates,
+    ordering=['-WMSQuantity', 'id'],
+    claim_items=_claim_renders,
+    get_claimed=_claimed_renders,
+)
+
+
+# --- Очереди загрузки модераторами ---
+
+def _claim_uploads(upload_model, work_model, items, moderator, now):
+    """Задания загрузки: первое начато сейчас, остальные выданы заранее (без UploadTimeStart)."""
+    work_model.objects.filter(pk__in=[item.pk for item in items]).update(IsOnUpload=True, updated_at=now)
+    upload_status_started = get_reference(UploadStatus, UPLOAD_STATUS_IN_PROGRESS_ID)
+    return [
+        upload_model.objects.create(
+            RenderPhotos=item,
+            Moderator=moderator,
+            UploadTimeStart=now if index == 0 else None,
+            UploadStatus=upload_status_started
+        )
+        for index, item in enumerate(items)
+    ]
+
+
+def _claimed_uploads(upload_model, moderator):
+    return upload_model.objects.filter(
+        Moderator=moderator,
+        UploadStatus__id=UPLOAD_STATUS_IN_PROGRESS_ID
+    ).order_by(F('UploadTimeStart').asc(nulls_last=True), 'id')
+
+
+def _start_upload(upload):
+    if upload.UploadTimeStart is not None:
+        return False
+    upload.UploadTimeStart = timezone.now()
+    upload.save(update_fields=['UploadTimeStart', 'updated_at'])
+    return True
+
+
+def _release_uploads(upload_model, work_model, cutoff):
+    with transaction.atomic():
+        expired = upload_model.objects.select_for_update(skip_locked=True).filter(
+            Q(UploadStatus_id=UPLOAD_STATUS_IN_PROGRESS_ID) | Q(UploadStatus_id__isnull=True)
+        ).annotate(
+            claimed_at=Coalesce('UploadTimeStart', 'created_at')
+        ).filter(claimed_at__lt=cutoff)
+        ids = dict(expired.values_list('id', 'RenderPhotos_id'))
+        if not ids:
+            return 0
+        now = timezone.now()
+        work_model.objects.filter(pk__in=[work_id for work_id in ids.values() if work_id]).update(
+            IsOnUpload=False, updated_at=now
+        )
+        return upload_model.objects.filter(pk__in=list(ids)).update(
+            UploadStatus_id=UPLOAD_STATUS_EXPIRED_ID, updated_at=now
+        )
+
+
+MODERATION_UPLOAD_QUEUE = WorkQueue(
+    name='moderation_upload',
+    get_candidates=lambda: Render.objects.filter(
+        RetouchStatus_id=6,
+        RetouchSeniorStatus_id=1,
+        IsOnUpload=False,
+        Product__IsModerationBlock=False
+    ),
+    ordering=['RetouchTimeEnd', 'id'],
+    claim_items=lambda items, worker, now: _claim_uploads(ModerationUpload, Render, items, worker, now),
+    get_claimed=lambda worker: _claimed_uploads(ModerationUpload, worker).select_related('RenderPhotos__Product'),
+    start_claimed=_start_upload,
+    release_expired=lambda cutoff: _release_uploads(ModerationUpload, Render, cutoff),
+)
+
+STUDIO_UPLOAD_QUEUE = WorkQueue(
+    name='studio_upload',
+    get_candidates=lambda: RetouchRequestProduct.objects.filter(
+        IsOnUpload=False,
+        retouch_status_id=2,
+        sretouch_status_id=1
+    ),
+    ordering=['updated_at', 'id'],
+    claim_items=lambda items, worker, now: _claim_uploads(ModerationStudioUpload, RetouchRequestProduct, items, worker, now),
+    get_claimed=lambda worker: _claimed_uploads(ModerationStudioUpload, worker).select_related(
+        'RenderPhotos__st_request_product__product'
+    ),
+    start_claimed=_start_upload,
+    release_expired=lambda cutoff: _release_uploads(ModerationStudioUpload, RetouchRequestProduct, cutoff),
+)
+
+QUEUES = {queue.name: queue for queue in (RENDER_CHECK_QUEUE, MODERATION_UPLOAD_QUEUE, STUDIO_UPLOAD_QUEUE)}
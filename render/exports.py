@@ -0,0 +1,39 @@
+# render/exports.py
+from core.export_logic import ExportColumn, TableExport, as_str, iso_datetime_formatter
+from .models import ModerationStudioUpload, ModerationUpload
+
+
+def _studio_uploads_queryset():
+    return ModerationStudioUpload.objects.filter(IsUploaded=True)
+
+
+def _render_uploads_queryset():
+    return ModerationUpload.objects.filter(IsUploaded=True)
+
+
+# Колонки листов аналитики конверсии (раньше - ModerationStudioUploadSerializer / ModerationUploadSerializer)
+STUDIO_UPLOADS_EXPORT = TableExport(
+    name='uploaded_sku',
+    filename='uploaded_sku',
+    get_queryset=_studio_uploads_queryset,
+    columns=[
+        ExportColumn('barcode', ['RenderPhotos__st_request_product__product__barcode'], as_str),
+        ExportColumn('sku_id', ['RenderPhotos__st_request_product__product__SKUID'], as_str),
+        ExportColumn('category_id', ['RenderPhotos__st_request_product__product__category_id'], as_str),
+        ExportColumn('UploadTimeStart', ['UploadTimeStart'], formatter_factory=iso_datetime_formatter),
+        ExportColumn('retouch_link', ['RenderPhotos__retouch_link'], as_str),
+    ],
+)
+
+RENDER_UPLOADS_EXPORT = TableExport(
+    name='uploaded_render',
+    filename='uploaded_render',
+    get_queryset=_render_uploads_queryset,
+    columns=[
+        ExportColumn('barcode', ['RenderPhotos__Product__Barcode'], as_str),
+        ExportColumn('sku_id', ['RenderPhotos__Product__SKUID'], as_str),
+        ExportColumn('category_id', ['RenderPhotos__Product__CategoryID'], as_str),
+        ExportColumn('UploadTimeStart', ['UploadTimeStart'], formatter_factory=iso_datetime_formatter),
+        ExportColumn('retouch_link', ['RenderPhotos__RetouchPhotosLink'], as_str),
+    ],
+)
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-17 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('render', '0009_alter_product_shopname'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReshootCandidate',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reshoot_candidate', serialize=False, to='render.product')),
+                ('Barcode', models.CharField(max_length=13)),
+                ('STRequestTypeID', models.IntegerField(blank=True, null=True, verbose_name='Тип съемки категории')),
+                ('WMSQuantity', models.BigIntegerField(default=0)),
+                ('FirstCheckTime', models.DateTimeField(blank=True, null=True, verbose_name='Первая проверка с отклонением')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Кандидат на пересъемку',
+                'verbose_name_plural': 'Кандидаты на пересъемку',
+                'indexes': [models.Index(fields=['STRequestTypeID', '-WMSQuantity', 'FirstCheckTime'], name='render_reshoot_type_order_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-17 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('render', '0010_reshootcandidate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SheetSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('spreadsheet_id', models.CharField(max_length=100)),
+                ('sheet_name', models.CharField(max_length=100)),
+                ('schema_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш заголовков')),
+                ('watermark', models.DateTimeField(blank=True, null=True, verbose_name='Выгружено по updated_at')),
+                ('row_count', models.IntegerField(default=0, verbose_name='Строк данных на листе')),
+                ('last_full_rebuild', models.DateTimeField(blank=True, null=True, verbose_name='Последняя полная перезапись')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Синхронизация Google Таблицы',
+                'verbose_name_plural': 'Синхронизации Google Таблиц',
+            },
+        ),
+        migrations.CreateModel(
+            name='SheetSyncRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.BigIntegerField()),
+                ('row_number', models.IntegerField(verbose_name='Номер строки на листе')),
+                ('row_hash', models.CharField(max_length=32)),
+                ('state', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='render.sheetsyncstate')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('state', 'object_id'), name='render_sheetsyncrow_state_object_uniq')],
+            },
+        ),
+    ]
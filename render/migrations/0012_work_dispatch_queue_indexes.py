@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('render', '0011_sheetsyncstate_sheetsyncrow'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('IsModerationBlock', False), ('IsOnRender', False), ('IsRetouchBlock', False), ('PhotoModerationStatus', 'Отклонено')), fields=['-WMSQuantity', 'id'], name='render_product_check_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='render',
+            index=models.Index(condition=models.Q(('IsOnUpload', False), ('RetouchSeniorStatus', 1), ('RetouchStatus', 6)), fields=['RetouchTimeEnd', 'id'], name='render_render_upload_queue_idx'),
+        ),
+    ]
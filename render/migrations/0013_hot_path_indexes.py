@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_retouchrequestproduct_retouch_end_date'),
+        ('render', '0012_work_dispatch_queue_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moderationstudioupload',
+            index=models.Index(fields=['Moderator', 'UploadStatus', 'UploadTimeStart'], name='render_studioupld_mod_st_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moderationupload',
+            index=models.Index(fields=['Moderator', 'UploadStatus', 'UploadTimeStart'], name='render_modupload_mod_st_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['PhotoModerationStatus', 'IsOnRender', 'IsRetouchBlock', 'IsOnOrder', '-WMSQuantity'], name='render_product_moderation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='render',
+            index=models.Index(fields=['Retoucher', 'RetouchStatus'], name='render_render_retoucher_st_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:49
+
+from django.db import migrations
+from django.utils import timezone
+
+REFRESH_TASK = 'render.tasks.refresh_reshoot_candidates_task'
+
+
+def create_schedule(apps, schema_editor):
+    # Первый запуск - сразу после деплоя: до него таблица кандидатов пустая
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        func=REFRESH_TASK,
+        defaults={
+            'name': 'Пересборка кандидатов на пересъемку',
+            'schedule_type': 'I',
+            'minutes': 10,
+            'repeats': -1,
+            'next_run': timezone.now(),
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    apps.get_model('django_q', 'Schedule').objects.filter(func=REFRESH_TASK).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('render', '0013_hot_path_indexes'),
+        ('django_q', '0018_task_success_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:07
+
+from django.db import migrations
+from django.utils import timezone
+
+RELEASE_TASK = 'render.tasks.release_expired_claims_task'
+
+
+def create_schedule(apps, schema_editor):
+    # Задания с истекшей арендой возвращаются в очередь, даже когда в ней есть другие
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        func=RELEASE_TASK,
+        defaults={
+            'name': 'Возврат в очередь заданий с истекшей арендой',
+            'schedule_type': 'I',
+            'minutes': 5,
+            'repeats': -1,
+            'next_run': timezone.now(),
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    apps.get_model('django_q', 'Schedule').objects.filter(func=RELEASE_TASK).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('render', '0014_reshoot_candidates_schedule'),
+        ('django_q', '0018_task_success_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -1,11 +1,22 @@
 #render.models
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
 from core.models import RetouchRequestProduct
+from core.dirty_fields import DirtyFieldsMixin
+from core.querysets import TrackedDeleteMixin, TrackedQuerySet
+
+# Комментарий -> поле времени, которое проставляется при его изменении
+COMMENT_TIME_FIELDS = {
+    'RetouchComment': 'RetouchCommentDate',
+    'RetouchSeniorComment': 'RetouchSeniorCommentTime',
+    'ModerationComment': 'ModerationCommentTime',
+    'RejectComment': 'RejectCommentTime',
+}
 
 #Основная модель продукта
-class Product(models.Model):
+class Product(TrackedDeleteMixin, DirtyFieldsMixin, models.Model):
     Barcode = models.CharField(max_length=13, unique=True)
     ProductID = models.BigIntegerField(null=True, blank=True)
     SKUID = models.BigIntegerField(null=True, blank=True)
@@ -41,34 +52,47 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TrackedQuerySet.as_manager()
+
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            # Очередь StartCheck (render.dispatch_logic.RENDER_CHECK_QUEUE)
+            models.Index(
+                fields=['-WMSQuantity', 'id'],
+                condition=Q(PhotoModerationStatus="Отклонено", IsOnRender=False, IsRetouchBlock=False, IsModerationBlock=False),
+                name='render_product_check_queue_idx',
+            ),
+            # Счетчик очереди рендеров и выборки по статусу модерации фото
+            models.Index(
+                fields=['PhotoModerationStatus', 'IsOnRender', 'IsRetouchBlock', 'IsOnOrder', '-WMSQuantity'],
+                name='render_product_moderation_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.Barcode}"
 
     def save(self, *args, **kwargs):
-        # Если объект уже существует, получаем предыдущие значения для сравнения
+        # Если объект уже существует, сравниваем комментарии со значениями при загрузке
+        # (без повторного чтения строки, см. DirtyFieldsMixin)
         if self.pk:
-            previous = Product.objects.get(pk=self.pk)
-            if self.RetouchComment != previous.RetouchComment:
-                self.RetouchCommentDate = timezone.now()
-            if self.RetouchSeniorComment != previous.RetouchSeniorComment:
-                self.RetouchSeniorCommentTime = timezone.now()
-            if self.ModerationComment != previous.ModerationComment:
-                self.ModerationCommentTime = timezone.now()
-            if self.RejectComment != previous.RejectComment:
-                self.RejectCommentTime = timezone.now()
+            previous = self.get_previous_values(list(COMMENT_TIME_FIELDS))
+            changed = [
+                comment_field for comment_field in COMMENT_TIME_FIELDS
+                if getattr(self, comment_field) != previous.get(comment_field)
+            ]
+            now = timezone.now()
+            for comment_field in changed:
+                setattr(self, COMMENT_TIME_FIELDS[comment_field], now)
+            kwargs['update_fields'] = self.with_derived_fields(
+                kwargs.get('update_fields'), changed, [COMMENT_TIME_FIELDS[field] for field in changed]
+            )
         else:
             # Новый объект: если комментарий задан, устанавливаем дату
-            if self.RetouchComment and not self.RetouchCommentDate:
-                self.RetouchCommentDate = timezone.now()
-            if self.RetouchSeniorComment and not self.RetouchSeniorCommentTime:
-                self.RetouchSeniorCommentTime = timezone.now()
-            if self.ModerationComment and not self.ModerationCommentTime:
-                self.ModerationCommentTime = timezone.now()
-            if self.RejectComment and not self.RejectCommentTime:
-                self.RejectCommentTime = timezone.now()
+            for comment_field, time_field in COMMENT_TIME_FIELDS.items():
+                if getattr(self, comment_field) and not getattr(self, time_field):
+                    setattr(self, time_field, timezone.now())
         super().save(*args, **kwargs)
 
 #результаты проверки
@@ -96,7 +120,7 @@ class SeniorRetouchStatus(models.Model):
         return f"{self.id} - {self.name}"
 
 #модель для рендера
-class Render(models.Model):
+class Render(TrackedDeleteMixin, DirtyFieldsMixin, models.Model):
     Product = models.ForeignKey(Product, on_delete=models.CASCADE)
     
     Retoucher = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Ретушёр")
@@ -123,6 +147,22 @@ class Render(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = TrackedQuerySet.as_manager()
+    # Снимок полей нужен только счетчикам очередей - save() пишет все поля, как раньше
+    narrow_update_fields = False
+
+    class Meta:
+        indexes = [
+            # Очередь загрузки рендеров модераторами (render.dispatch_logic.MODERATION_UPLOAD_QUEUE)
+            models.Index(
+                fields=['RetouchTimeEnd', 'id'],
+                condition=Q(RetouchStatus=6, RetouchSeniorStatus=1, IsOnUpload=False),
+                name='render_render_upload_queue_idx',
+            ),
+            # Рендеры ретушера по статусу (StartCheck, списки ретушера)
+            models.Index(fields=['Retoucher', 'RetouchStatus'], name='render_render_retoucher_st_idx'),
+        ]
+
     def __str__(self):
         return f"{self.Product.Barcode}"
 
@@ -181,6 +221,12 @@ class ModerationUpload(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    class Meta:
+        indexes = [
+            # Задания модератора по статусу (render.dispatch_logic.MODERATION_UPLOAD_QUEUE, статистика за день)
+            models.Index(fields=['Moderator', 'UploadStatus', 'UploadTimeStart'], name='render_modupload_mod_st_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.UploadTimeStart and self.UploadTimeEnd:
             self.UploadTime = self.UploadTimeEnd - self.UploadTimeStart
@@ -209,6 +255,12 @@ class ModerationStudioUpload(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    class Meta:
+        indexes = [
+            # Задания модератора по статусу (render.dispatch_logic.STUDIO_UPLOAD_QUEUE, статистика за день)
+            models.Index(fields=['Moderator', 'UploadStatus', 'UploadTimeStart'], name='render_studioupld_mod_st_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.UploadTimeStart and self.UploadTimeEnd:
             self.UploadTime = self.UploadTimeEnd - self.UploadTimeStart
@@ -216,3 +268,56 @@ class ModerationStudioUpload(models.Model):
 
     def __str__(self):
         return f"{self.RenderPhotos.st_request_product.product.barcode}"
+
+#Кандидаты на пересъемку: товары с отклоненными рендерами, прошедшие все стоп-листы
+#Таблица пересобирается задачей refresh_reshoot_candidates (render.reshoot_logic)
+class ReshootCandidate(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='reshoot_candidate')
+    Barcode = models.CharField(max_length=13)
+    STRequestTypeID = models.IntegerField(null=True, blank=True, verbose_name="Тип съемки категории")
+    WMSQuantity = models.BigIntegerField(default=0)
+    FirstCheckTime = models.DateTimeField(null=True, blank=True, verbose_name="Первая проверка с отклонением")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Кандидат на пересъемку"
+        verbose_name_plural = "Кандидаты на пересъемку"
+        indexes = [
+            models.Index(fields=['STRequestTypeID', '-WMSQuantity', 'FirstCheckTime'], name='render_reshoot_type_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.Barcode}"
+
+#Состояние инкрементальной выгрузки в Google Таблицу (render.sheet_sync_logic)
+class SheetSyncState(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    spreadsheet_id = models.CharField(max_length=100)
+    sheet_name = models.CharField(max_length=100)
+    schema_hash = models.CharField(max_length=64, blank=True, verbose_name="Хэш заголовков")
+    watermark = models.DateTimeField(null=True, blank=True, verbose_name="Выгружено по updated_at")
+    row_count = models.IntegerField(default=0, verbose_name="Строк данных на листе")
+    last_full_rebuild = models.DateTimeField(null=True, blank=True, verbose_name="Последняя полная перезапись")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Синхронизация Google Таблицы"
+        verbose_name_plural = "Синхронизации Google Таблиц"
+
+    def __str__(self):
+        return self.name
+
+#Строка листа: какая запись в какой строке и с каким содержимым
+class SheetSyncRow(models.Model):
+    state = models.ForeignKey(SheetSyncState, on_delete=models.CASCADE, related_name='rows')
+    object_id = models.BigIntegerField()
+    row_number = models.IntegerField(verbose_name="Номер строки на листе")
+    row_hash = models.CharField(max_length=32)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['state', 'object_id'], name='render_sheetsyncrow_state_object_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.state_id}:{self.object_id} -> {self.row_number}"
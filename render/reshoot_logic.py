@@ -0,0 +1,122 @@
+# render/reshoot_logic.py
+"""
+Индекс кандидатов на пересъемку (ReshootCandidate).
+
+Тяжелый отбор (DISTINCT по Product x Render.CheckResult и четыре стоп-листа)
+выполняется один раз при пересборке таблицы, а эндпоинт RejectToShooting и счетчик
+real_shooting_queue читают готовые строки по индексу (тип, -остаток, первая проверка).
+Стоп-листы (магазины, категории, баркоды, Nofoto) и флаг "в заказе" меняются в течение дня,
+поэтому проверяются и при чтении - по маленьким таблицам, без пересборки.
+Таблицу пересобирает задача refresh_reshoot_candidates_task по расписанию
+(создается миграцией render 0014) и после загрузки выгрузки товаров.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Min
+
+from core.models import ProductCategory, Blocked_Shops, Blocked_Barcode, Nofoto
+from .models import Product, ReshootCandidate
+
+logger = logging.getLogger(__name__)
+
+# CheckResult рендеров, означающие необходимость пересъемки
+REJECTED_CHECK_RESULT_IDS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 50]
+
+REFRESH_BATCH_SIZE = 1000
+
+
+def exclude_stop_lists(queryset, prefix=''):
+    """
+    Исключает заблокированные магазины, категории, баркоды и товары из Nofoto.
+    prefix - путь к render.Product от модели queryset ('' или 'product__').
+    """
+    return queryset.exclude(
+        **{f'{prefix}ShopID__in': Blocked_Shops.objects.values_list('shop_id', flat=True)}
+    ).exclude(
+        **{f'{prefix}CategoryID__in': ProductCategory.objects.filter(IsBlocked=True).values_list('id', flat=True)}
+    ).exclude(
+        **{f'{prefix}Barcode__in': Blocked_Barcode.objects.values_list('barcode', flat=True)}
+    ).exclude(
+        **{f'{prefix}Barcode__in': Nofoto.objects.values_list('product__barcode', flat=True)}
+    )
+
+
+def get_reshoot_source_queryset():
+    """Товары, которые реально нужно переснять (исходный тяжелый запрос)."""
+    return exclude_stop_lists(Product.objects.filter(
+        IsOnOrder=False,
+        PhotoModerationStatus="Отклонено",
+        render__CheckResult__id__in=REJECTED_CHECK_RESULT_IDS,
+        WMSQuantity__gt=0
+    ))
+
+
+def refresh_reshoot_candidates():
+    """
+    Пересобирает ReshootCandidate: один проход тяжелого запроса,
+    удаление выбывших товаров и upsert остальных.
+    Возвращает {'total', 'removed'}.
+    """
+    category_types = dict(ProductCategory.objects.values_list('id', 'STRequestType_id'))
+    rows = (get_reshoot_source_queryset()
+            .values_list('id', 'Barcode', 'CategoryID', 'WMSQuantity')
+            .annotate(first_check_time=Min('render__CheckTimeStart'))
+            .order_by())
+    candidates = [
+        ReshootCandidate(
+            product_id=product_id,
+            Barcode=barcode,
+            STRequestTypeID=category_types.get(category_id),
+            WMSQuantity=wms_quantity,
+            FirstCheckTime=first_check_time,
+        )
+        for product_id, barcode, category_id, wms_quantity, first_check_time in rows
+    ]
+    fresh_ids = {candidate.product_id for candidate in candidates}
+
+    with transaction.atomic():
+        stale_ids = [pk for pk in ReshootCandidate.objects.values_list('product_id', flat=True)
+                     if pk not in fresh_ids]
+        for start in range(0, len(stale_ids), REFRESH_BATCH_SIZE):
+            ReshootCandidate.objects.filter(product_id__in=stale_ids[start:start + REFRESH_BATCH_SIZE]).delete()
+        ReshootCandidate.objects.bulk_create(
+            candidates,
+            batch_size=REFRESH_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['Barcode', 'STRequestTypeID', 'WMSQuantity', 'FirstCheckTime', 'updated_at'],
+        )
+
+    logger.info(f"Кандидаты на пересъемку: {len(candidates)}, удалено выбывших: {len(stale_ids)}")
+    return {'total': len(candidates), 'removed': len(stale_ids)}
+
+
+def get_reshoot_candidates():
+    """
+    Кандидаты в порядке выдачи: больший остаток, затем более ранняя проверка.
+    Флаг "в заказе" и стоп-листы меняются между пересборками, поэтому проверяются по товару.
+    """
+    return (exclude_stop_lists(ReshootCandidate.objects.filter(product__IsOnOrder=False), 'product__')
+            .order_by('-WMSQuantity', 'FirstCheckTime'))
+
+
+def get_reshoot_barcodes(limit, type_quotas):
+    """
+    Баркоды на пересъемку с квотами по типам съемки.
+    type_quotas: {тип: число} для типов 2 и 3; тип 1 добирает оставшиеся места.
+    По одному срезу индекса на тип.
+    """
+    barcodes = []
+    for type_id, type_limit in type_quotas.items():
+        if type_limit > 0:
+            barcodes.extend(get_reshoot_candidates()
+                            .filter(STRequestTypeID=type_id)
+                            .values_list('Barcode', flat=True)[:type_limit])
+
+    remaining = limit - len(barcodes)
+    if remaining > 0:
+        barcodes.extend(get_reshoot_candidates()
+                        .filter(STRequestTypeID=1)
+                        .values_list('Barcode', flat=True)[:remaining])
+    return barcodes
@@ -0,0 +1,266 @@
+# render/sheet_sync_logic.py
+"""
+Инкрементальная выгрузка таблиц в Google Sheets.
+
+Строки описываются TableExport (core.export_logic) - плоский values() без сериализаторов.
+Для каждого листа хранится SheetSyncState (watermark по updated_at, число строк, хэш заголовков)
+и SheetSyncRow (запись -> номер строки на листе + хэш содержимого).
+Запуск sync_sheet():
+- новые записи дописываются в конец листа через values().append;
+- измененные после watermark записи с другим содержимым правятся на месте через values().batchUpdate;
+  изменением считается и изменение связанных строк, из которых берутся колонки (их updated_at);
+- лист перезаписывается целиком только при смене заголовков, первом запуске,
+  исчезновении выгруженных записей (строки пришлось бы удалять) или force_full=True.
+Записи идут на лист в порядке id.
+"""
+import hashlib
+import json
+import logging
+import re
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+
+from core.export_logic import TableExport
+from .models import SheetSyncRow, SheetSyncState
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк отправлять одним запросом записи
+SHEET_WRITE_CHUNK = 5000
+# Сколько диапазонов в одном batchUpdate
+SHEET_PATCH_CHUNK = 500
+# Перекрытие окна по updated_at: записи, закоммиченные позже, но с меньшим updated_at
+WATERMARK_OVERLAP = timedelta(minutes=5)
+VALUE_INPUT_OPTION = 'USER_ENTERED'
+# Блокировка от параллельного запуска одной синхронизации (с запасом к таймауту задачи)
+SYNC_LOCK_PREFIX = 'sheet_sync_lock'
+SYNC_LOCK_TIMEOUT = 60 * 60
+
+
+@dataclass
+class SheetSync:
+    name: str
+    spreadsheet_id: str
+    sheet_name: str
+    export: TableExport
+    # Поле даты изменения в модели выгрузки
+    updated_field: str = 'updated_at'
+    get_service: Callable = None
+
+
+def _row_hash(row):
+    return hashlib.md5(json.dumps(row, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def _schema_hash(sync):
+    payload = [sync.spreadsheet_id, sync.sheet_name] + sync.export.headers
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _to_cell(value):
+    # null в values() Sheets API пропускает ячейку, а не очищает ее
+    return '' if value is None else value
+
+
+def _change_fields(sync, queryset):
+    """
+    Поля даты изменения, по которым ищутся измененные записи: поле самой записи
+    и такое же поле каждой связанной модели, из которой берутся колонки
+    (RenderPhotos__updated_at, RenderPhotos__Product__updated_at и т.п.).
+    """
+    fields = [sync.updated_field]
+    for path in sync.export.value_fields():
+        parts = path.split(LOOKUP_SEP)
+        opts = queryset.model._meta
+        for depth, part in enumerate(parts[:-1], start=1):
+            field = opts.get_field(part)
+            if not field.is_relation:
+                break
+            opts = field.related_model._meta
+            change_field = LOOKUP_SEP.join(parts[:depth] + [sync.updated_field])
+            if change_field not in fields and any(f.name == sync.updated_field for f in opts.concrete_fields):
+                fields.append(change_field)
+    return fields
+
+
+def _iter_records(sync, queryset, change_fields):
+    """(id, последнее изменение записи или связанных строк, строка) в порядке id."""
+    to_row = sync.export.build_row_function()
+    fields = sync.export.value_fields() + ['id'] + change_fields
+    for values in queryset.order_by('id').values(*fields).iterator(chunk_size=SHEET_WRITE_CHUNK):
+        updated = max((values[f] for f in change_fields if values[f] is not None), default=None)
+        yield values['id'], updated, [_to_cell(cell) for cell in to_row(values)]
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+_RANGE_START_ROW = re.compile(r'![A-Z]+(\d+)')
+
+
+def _appended_start_row(response):
+    updated_range = response.get('updates', {}).get('updatedRange', '')
+    match = _RANGE_START_ROW.search(updated_range)
+    if not match:
+        raise ValueError(f"Не удалось определить строку добавления из ответа Sheets: {updated_range!r}")
+    return int(match.group(1))
+
+
+def _full_rebuild(sync, state, service, queryset):
+    # Пока лист не перезаписан целиком, журнал недействителен: сбой посередине -
+    # снова полная перезапись при следующем запуске
+    state.rows.all().delete()
+    state.schema_hash = ''
+    state.row_count = 0
+    state.watermark = None
+    state.save()
+
+    values_api = service.spreadsheets().values()
+    values_api.clear(spreadsheetId=sync.spreadsheet_id, range=sync.sheet_name).execute()
+
+    records = list(_iter_records(sync, queryset, _change_fields(sync, queryset)))
+    values_api.update(
+        spreadsheetId=sync.spreadsheet_id,
+        range=f"{sync.sheet_name}!A1",
+        valueInputOption=VALUE_INPUT_OPTION,
+        body={'values': [sync.export.headers]},
+    ).execute()
+    updated_cells = len(sync.export.headers)
+    # Данные с A2; журнал строк пишется сразу после каждого записанного чанка
+    for offset, chunk in zip(range(0, len(records), SHEET_WRITE_CHUNK), _chunks(records, SHEET_WRITE_CHUNK)):
+        result = values_api.update(
+            spreadsheetId=sync.spreadsheet_id,
+            range=f"{sync.sheet_name}!A{offset + 2}",
+            valueInputOption=VALUE_INPUT_OPTION,
+            body={'values': [row for _, _, row in chunk]},
+        ).execute()
+        updated_cells += result.get('updatedCells', 0)
+        SheetSyncRow.objects.bulk_create(
+            [SheetSyncRow(state=state, object_id=object_id, row_number=offset + index + 2, row_hash=_row_hash(row))
+             for index, (object_id, _, row) in enumerate(chunk)],
+        )
+
+    state.schema_hash = _schema_hash(sync)
+    state.row_count = len(records)
+    state.watermark = max((updated for _, updated, _ in records if updated), default=None)
+    state.last_full_rebuild = timezone.now()
+    state.save()
+    logger.info(f"Лист {sync.name} перезаписан полностью: {len(records)} строк.")
+    return {'mode': 'full', 'appended': len(records), 'patched': 0, 'updated_cells': updated_cells}
+
+
+def _needs_full_rebuild(sync, state, queryset, force_full):
+    if force_full:
+        return 'force'
+    if not state.schema_hash or state.schema_hash != _schema_hash(sync):
+        return 'schema'
+    # Выгруженная запись удалена или больше не подходит под фильтр - строку нужно убрать
+    if state.rows.exclude(object_id__in=queryset.values('id')).exists():
+        return 'removed'
+    return None
+
+
+def sync_sheet(sync: SheetSync, force_full=False):
+    """
+    Синхронизирует лист с queryset выгрузки. Возвращает
+    {'mode': 'full'|'delta'|'skipped', 'appended', 'patched', 'updated_cells'}.
+    Параллельный запуск той же синхронизации пропускается (блокировка в кэше, а не строка БД:
+    транзакция не держится открытой на время запросов к Google API).
+    """
+    lock_key = f"{SYNC_LOCK_PREFIX}:{sync.name}"
+    if not cache.add(lock_key, 1, timeout=SYNC_LOCK_TIMEOUT):
+        logger.info(f"Лист {sync.name}: синхронизация уже выполняется, запуск пропущен.")
+        return {'mode': 'skipped', 'appended': 0, 'patched': 0, 'updated_cells': 0}
+    try:
+        queryset = sync.export.get_queryset()
+        service = sync.get_service()
+        state, _ = SheetSyncState.objects.get_or_create(
+            name=sync.name,
+            defaults={'spreadsheet_id': sync.spreadsheet_id, 'sheet_name': sync.sheet_name},
+        )
+        state.spreadsheet_id = sync.spreadsheet_id
+        state.sheet_name = sync.sheet_name
+
+        reason = _needs_full_rebuild(sync, state, queryset, force_full)
+        if reason:
+            logger.info(f"Лист {sync.name}: полная перезапись ({reason}).")
+            return _full_rebuild(sync, state, service, queryset)
+        return _delta_sync(sync, state, service, queryset)
+    finally:
+        cache.delete(lock_key)
+
+
+def _delta_sync(sync, state, service, queryset):
+    change_fields = _change_fields(sync, queryset)
+    changed = queryset
+    if state.watermark:
+        since = state.watermark - WATERMARK_OVERLAP
+        condition = Q()
+        for field in change_fields:
+            condition |= Q(**{f'{field}__gte': since})
+        changed = queryset.filter(condition)
+    records = list(_iter_records(sync, changed, change_fields))
+
+    known = {}
+    for ids in _chunks([object_id for object_id, _, _ in records], SHEET_WRITE_CHUNK):
+        known.update({
+            row.object_id: row for row in state.rows.filter(object_id__in=ids)
+        })
+
+    patches, new_records = [], []
+    for object_id, _, row in records:
+        row_hash = _row_hash(row)
+        existing = known.get(object_id)
+        if existing is None:
+            new_records.append((object_id, row, row_hash))
+        elif existing.row_hash != row_hash:
+            existing.row_hash = row_hash
+            patches.append(({'range': f"{sync.sheet_name}!A{existing.row_number}", 'values': [row]}, existing))
+
+    # Журнал строк обновляется после каждого успешного запроса к листу: если следующий
+    # запрос упадет, уже записанные строки не будут дописаны повторно
+    values_api = service.spreadsheets().values()
+    updated_cells = 0
+    for chunk in _chunks(patches, SHEET_PATCH_CHUNK):
+        result = values_api.batchUpdate(
+            spreadsheetId=sync.spreadsheet_id,
+            body={'valueInputOption': VALUE_INPUT_OPTION, 'data': [patch for patch, _ in chunk]},
+        ).execute()
+        updated_cells += result.get('totalUpdatedCells', 0)
+        SheetSyncRow.objects.bulk_update([row for _, row in chunk], ['row_hash'])
+
+    for chunk in _chunks(new_records, SHEET_WRITE_CHUNK):
+        result = values_api.append(
+            spreadsheetId=sync.spreadsheet_id,
+            range=f"{sync.sheet_name}!A1",
+            valueInputOption=VALUE_INPUT_OPTION,
+            insertDataOption='INSERT_ROWS',
+            body={'values': [row for _, row, _ in chunk]},
+        ).execute()
+        updated_cells += result.get('updates', {}).get('updatedCells', 0)
+        start_row = _appended_start_row(result)
+        with transaction.atomic():
+            SheetSyncRow.objects.bulk_create([
+                SheetSyncRow(state=state, object_id=object_id, row_number=start_row + index, row_hash=row_hash)
+                for index, (object_id, _, row_hash) in enumerate(chunk)
+            ])
+            SheetSyncState.objects.filter(pk=state.pk).update(row_count=F('row_count') + len(chunk))
+    state.refresh_from_db(fields=['row_count'])
+
+    if records:
+        newest = max((updated for _, updated, _ in records if updated), default=None)
+        if newest and (state.watermark is None or newest > state.watermark):
+            state.watermark = newest
+    state.save()
+    logger.info(f"Лист {sync.name}: добавлено {len(new_records)}, исправлено {len(patches)} строк.")
+    return {'mode': 'delta', 'appended': len(new_records), 'patched': len(patches),
+            'updated_cells': updated_cells}
@@ -1,13 +1,11 @@
 #render/tasks.py
 import os
-import tempfile
-import openpyxl
-import zipfile
 import logging
 import io
 import datetime
 import re
 from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from datetime import timedelta, time
 from django.utils import timezone
 from django.db import transaction
@@ -15,7 +13,7 @@ from django.db.models import Q
 
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
+from googleapiclient.http import MediaFileUpload
 from googleapiclient.errors import HttpError
 from django.contrib.auth.models import User, Group
 from .models import (
@@ -28,19 +26,22 @@ from .models import (
     RetouchStatus,
     StudioRejectedReason
     )
+from .reshoot_logic import refresh_reshoot_candidates
+from .dispatch_logic import QUEUES, release_expired_claims
 from core.models import (
     Product as CoreProduct,
     RetouchRequestProduct,
     STRequestProduct
     )
+from core.reference_data import get_reference
 
 from .serializers import (
     RetoucherRenderSerializer,
     SeniorRenderSerializer,
-    ModerationUploadRejectSerializer,
-    ModerationStudioUploadSerializer,
-    ModerationUploadSerializer
+    ModerationUploadRejectSerializer
     )
+from .exports import RENDER_UPLOADS_EXPORT, STUDIO_UPLOADS_EXPORT
+from .sheet_sync_logic import SheetSync, sync_sheet
 
 
 logger = logging.getLogger(__name__)
@@ -60,114 +61,24 @@ def escape_markdown(text: str) -> str:
 #Обновление таблицы с продуктами
 def update_products_from_drive(*args, **kwargs):
     """
-    Таска для обновления модели Product из последнего .xlsx файла в Google Drive.
+    Раньше обновляла render.Product из последнего .xlsx файла в Google Drive.
+    Теперь оба Product обновляет общая задача auto.tasks.update_products_from_excel_on_drive
+    (одно скачивание и один разбор) по своему расписанию, поэтому здесь только запись в лог:
+    задача оставлена, чтобы старое расписание в админке не падало и не запускало импорт второй раз.
     """
-    SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
-    creds = service_account.Credentials.from_service_account_file('credentials.json', scopes=SCOPES)
-    drive_service = build('drive', 'v3', credentials=creds)
-
-    folder_id = '1DMJTs6tUUA6ERkDSDTUYYsYtKHp5yIdv'
-    query = (
-        f"'{folder_id}' in parents and "
-        "mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' and trashed=false"
-    )
-
-    results = drive_service.files().list(
-        q=query,
-        fields="files(id, name, modifiedTime)",
-        includeItemsFromAllDrives=True,
-        supportsAllDrives=True
-    ).execute()
-    items = results.get('files', [])
-    if not items:
-        print("Файлы не найдены.")
-        return
-
-    # Сортируем файлы по modifiedTime по убыванию и выбираем последний
-    items.sort(key=lambda x: x.get('modifiedTime', ''), reverse=True)
-    latest_file = items[0]
-    file_id = latest_file['id']
-    print(f"Загружаем файл: {latest_file['name']} (ID: {file_id})")
-
-    # Создаем временный файл с расширением .xlsx
-    temp_file = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
-    request = drive_service.files().get_media(fileId=file_id)
-    downloader = MediaIoBaseDownload(temp_file, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-        print(f"Загружено {int(status.progress() * 100)}%.")
-    temp_file.close()
-
-    # Диагностика: выводим заголовок и содержимое архива
-    with open(temp_file.name, 'rb') as f:
-        header = f.read(4)
-        print("File header bytes:", header)
-    with zipfile.ZipFile(temp_file.name, 'r') as archive:
-        print("Содержимое архива XLSX:")
-        for file in archive.namelist():
-            print(file)
-    if not zipfile.is_zipfile(temp_file.name):
-        raise Exception("Скачанный файл не является корректным XLSX (не распознается как ZIP-архив).")
-
-    # Загружаем книгу
-    wb = openpyxl.load_workbook(temp_file.name, data_only=True)
-    ws = wb.active
-
-    # Обрабатываем строки, начиная со второй (первая – заголовок)
-    for row_index, row in enumerate(ws.iter_rows(min_row=2), start=2):
-        barcode = row[0].value  # Столбец B
-        # Если Barcode пустое или состоит только из пробелов, пропускаем эту строчку
-        if not barcode or not str(barcode).strip():
-            continue
-
-        product_data = {
-            'ProductID': int(row[1].value) if row[1].value is not None else None,
-            'SKUID': int(row[2].value) if row[2].value is not None else None,
-            'Name': row[3].value,
-            'CategoryName': row[6].value,
-            'ShopID': int(row[7].value) if row[7].value is not None else None,
-            'CategoryID': int(row[4].value) if row[4].value is not None else None,
-            'ShopType': row[5].value,
-            'ShopName': row[8].value,
-            'ProductStatus': row[9].value,
-            'ProductModerationStatus': row[10].value,
-            'PhotoModerationStatus': row[11].value,
-            'SKUStatus': row[12].value,
-            'WMSQuantity': int(row[14].value) if row[14].value is not None else None,
-        }
-
-        try:
-            Product.objects.update_or_create(Barcode=barcode, defaults=product_data)
-        except Exception as e:
-            print(f"Ошибка при обработке строки {row_index} с Barcode {barcode}: {e}")
-
-    group_chat_id = "-1002559221974"
-    group_thread_id = 11
-    group_message = f"Обновление базы рендеров - завершено"
-    async_task(
-        'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-        chat_id=group_chat_id,
-        text=group_message,
-        message_thread_id=group_thread_id
-    )
-
-    os.remove(temp_file.name)
-    print("Обновление завершено.")
+    message = ("render.tasks.update_products_from_drive больше не выполняет импорт: "
+               "товары обновляет auto.tasks.update_products_from_excel_on_drive. "
+               "Расписание этой задачи можно удалить.")
+    logger.info(message)
+    return message
 
 #Обертка для update_products_from_drive
 def update_products_from_drive_custom_timeout():
     """
-    Запускает обновление базы продуктов с таймаутом 15 минут.
-    Именно эту задачу нужно указывать в Cron-расписании в админке.
+    Оставлена для совместимости с расписанием в админке: импорт выполняет
+    auto.tasks.update_products_from_excel_on_drive_custom_timeout.
     """
-    logger.info("Запуск 'update_products_from_excel_on_drive' через обертку с таймаутом 900с")
-    async_task(
-        'render.tasks.update_products_from_drive',  # Путь к реальной задаче
-        timeout=900,   # 15 минут
-        retry=1000,    # Повтор через 20 минут, если задача упадет
-        attempts=2     # Попробовать 3 раза
-    )
+    return update_products_from_drive()
 
 #сброс рендеров на этапе проверки или без статуса
 def update_renders_and_products_status():
@@ -183,7 +94,7 @@ def update_renders_and_products_status():
 
     # Проверяем, существует ли целевой статус в базе данных, чтобы избежать ошибок FK
     try:
-        target_status = RetouchStatus.objects.get(id=TARGET_RETOUCH_STATUS_ID)
+        target_status = get_reference(RetouchStatus, TARGET_RETOUCH_STATUS_ID)
     except RetouchStatus.DoesNotExist:
         logger.error(f"Целевой RetouchStatus с ID={TARGET_RETOUCH_STATUS_ID} не найден в базе данных. Задача прервана.")
         return f"Error: Target RetouchStatus ID={TARGET_RETOUCH_STATUS_ID} not found."
@@ -239,6 +150,24 @@ def update_renders_and_products_status():
         # Перевыбрасываем исключение, чтобы Dramatiq мог обработать его согласно своей конфигурации (например, повторить попытку)
         raise e
 
+#Пересборка кандидатов на пересъемку
+def refresh_reshoot_candidates_task():
+    """
+    Пересобирает индекс кандидатов на пересъемку (ReshootCandidate).
+    Расписание (раз в 10 минут) создается миграцией render 0014; также запускается
+    после загрузки выгрузки товаров.
+    """
+    return refresh_reshoot_candidates()
+
+#Возврат в очередь заданий с истекшей арендой
+def release_expired_claims_task():
+    """
+    Возвращает в очереди задания загрузки, не завершенные за WORK_DISPATCH_LEASE_MINUTES.
+    Запускается по расписанию каждые 5 минут (миграция render 0015_release_expired_claims_schedule).
+    Возвращает {очередь: число заданий}.
+    """
+    return {name: release_expired_claims(queue) for name, queue in QUEUES.items()}
+
 #Сброс незавершенных загрузок модерации
 def update_moderation_uploads_status():
     """
@@ -252,7 +181,7 @@ def update_moderation_uploads_status():
 
     # Проверяем, существует ли целевой статус UploadStatus в базе данных
     try:
-        target_status = UploadStatus.objects.get(id=TARGET_UPLOAD_STATUS_ID)
+        target_status = get_reference(UploadStatus, TARGET_UPLOAD_STATUS_ID)
     except UploadStatus.DoesNotExist:
         logger.error(f"Целевой UploadStatus с ID={TARGET_UPLOAD_STATUS_ID} не найден в базе данных. Задача прервана.")
         return f"Error: Target UploadStatus ID={TARGET_UPLOAD_STATUS_ID} not found."
@@ -461,8 +390,7 @@ def check_uploads_for_blocked_products(): # Убран self из парамет
 
             # Отправляем сообщение
             try:
-                async_task(
-                    'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+                enqueue_telegram_message(
                     chat_id=TARGET_CHAT_ID,
                     text=final_message,
                     parse_mode='MarkdownV2'
@@ -519,148 +447,68 @@ def get_google_sheets_service():
         raise
 
 
-def update_moderation_google_sheet(*args, **kwargs): # Убран self из параметров
+MODERATION_SHEET_SYNC = SheetSync(
+    name='uploaded_sku',
+    spreadsheet_id=TARGET_SPREADSHEET_ID,
+    sheet_name=TARGET_SHEET_NAME,
+    export=STUDIO_UPLOADS_EXPORT,
+    get_service=get_google_sheets_service,
+)
+
+
+def run_moderation_sheet_sync(sync, task_label, success_message, force_full=False):
     """
-    Получает данные из ModerationStudioUpload, очищает указанный лист
-    в Google Таблице, записывает в него свежие данные и отправляет
-    уведомление о результате в Telegram.
+    Общая часть задач выгрузки загрузок модерации в Google Таблицу:
+    инкрементальная синхронизация листа (render.sheet_sync_logic) и уведомления в Telegram.
     """
-    logger.info("Запуск задачи по обновлению Google Таблицы с отчетом модерации.")
+    logger.info(f"Запуск задачи по обновлению Google Таблицы с отчетом модерации ({sync.name}).")
 
     # Определяем параметры для Telegram в одном месте
     group_chat_id = "-1002559221974"
     group_thread_id = "11"
 
-    # 1. Получение данных
-    queryset = ModerationStudioUpload.objects.select_related(
-        'RenderPhotos__st_request_product__product',
-        'RenderPhotos'
-    ).filter(IsUploaded=True).order_by('-UploadTimeStart')
-
-    # --- БЛОК ДЛЯ СЛУЧАЯ, КОГДА НЕТ ДАННЫХ ---
-    if not queryset.exists():
-        logger.info("Данные ModerationStudioUpload с IsUploaded=True не найдены.")
-        message_to_send = "ℹ️ Экспорт Uploaded_sku: нет данных для выгрузки. Таблица была очищена."
+    def notify(text):
         try:
-            sheets_service = get_google_sheets_service()
-            logger.info(f"Очистка листа '{TARGET_SHEET_NAME}'...")
-            sheets_service.spreadsheets().values().clear(
-                spreadsheetId=TARGET_SPREADSHEET_ID,
-                range=TARGET_SHEET_NAME
-            ).execute()
-            logger.info("Лист успешно очищен.")
-
-            # Попытка отправить уведомление
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+            enqueue_telegram_message(
                 chat_id=group_chat_id,
-                text=message_to_send,
+                text=text,
                 message_thread_id=group_thread_id
             )
-
-        except Exception as e:
-            logger.error(f"Ошибка при обработке пустого queryset: {e}")
-            # Отправляем сообщение об ошибке даже здесь
-            error_message = f"‼️ ОШИБКА в задаче 'Экспорт Uploaded_sku' при очистке листа: `{e}`"
-            try:
-                async_task(
-                    'telegram_bot.tasks.send_message_task',
-                    chat_id=group_chat_id,
-                    text=error_message,
-                    message_thread_id=group_thread_id
-                )
-            except Exception as tg_error:
-                logger.error(f"Не удалось отправить уведомление ОБ ОШИБЛЕНИИ в Telegram: {tg_error}")
-            # В Dramatiq для повторных попыток просто вызываем исключение
-            raise # Dramatiq's retry middleware handles this
-
-        return "Нет данных для генерации отчета. Лист очищен."
-
-    # --- ОСНОВНАЯ ЛОГИКА ---
-    serializer = ModerationStudioUploadSerializer(queryset, many=True)
-    data_to_export = serializer.data
-    headers = ['barcode', 'sku_id', 'category_id', 'UploadTimeStart', 'retouch_link']
-    values_to_write = [headers]
-    for item in data_to_export:
-        row = [item.get(header_key, "") for header_key in headers]
-        values_to_write.append(row)
-
-    rows_count = len(values_to_write) - 1
-    logger.info(f"Подготовлено {rows_count} строк данных для записи в Google Таблицу.")
-
-    # 3. Работа с Google Sheets API: очистка, запись и уведомления
-    try:
-        sheets_service = get_google_sheets_service()
-
-        # Шаг 3.1: Очистка листа
-        logger.info(f"Очистка листа '{TARGET_SHEET_NAME}'...")
-        sheets_service.spreadsheets().values().clear(
-            spreadsheetId=TARGET_SPREADSHEET_ID, range=TARGET_SHEET_NAME
-        ).execute()
-        logger.info("Лист успешно очищен.")
-
-        # Шаг 3.2: Запись новых данных
-        logger.info("Запись новых данных...")
-        body = {'values': values_to_write}
-        update_result = sheets_service.spreadsheets().values().update(
-            spreadsheetId=TARGET_SPREADSHEET_ID,
-            range=f"{TARGET_SHEET_NAME}!A1",
-            valueInputOption='USER_ENTERED',
-            body=body
-        ).execute()
-
-        # --- Уведомление об УСПЕХЕ ---
-        success_message = f"Задача Uploaded\_SKU завершена"
-        try:
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-                chat_id=group_chat_id,
-                text=success_message,
-                message_thread_id=group_thread_id # можно передать при необходимости
-            )
         except Exception as tg_error:
-            logger.error(f"Не удалось отправить уведомление об успехе в Telegram: {tg_error}")
-
-        # Возвращаем результат для логов Dramatiq
-        final_log_message = f"Google Таблица успешно обновлена. Обработано ячеек: {update_result.get('updatedCells')}."
-        logger.info(final_log_message)
-        return final_log_message
+            logger.error(f"Не удалось отправить уведомление в Telegram: {tg_error}")
 
+    try:
+        result = sync_sheet(sync, force_full=force_full)
     except HttpError as error:
-        # --- Уведомление об ОШИБКЕ API ---
-        error_message = f"ОШИБКА API Google Sheets в задаче Экспорт Uploaded\_sku"
-        try:
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-                chat_id=group_chat_id,
-                text=error_message,
-                message_thread_id=group_thread_id # можно передать при необходимости
-            )
-        except Exception as tg_error:
-            logger.error(f"Не удалось отправить уведомление ОБ ОШИБЛЕНИИ в Telegram: {tg_error}")
-
+        notify(f"ОШИБКА API Google Sheets в задаче Экспорт {task_label}")
         logger.error(f"Ошибка API Google Sheets: {error.resp.status} - {error._get_reason()}")
-        # В Dramatiq middleware Retries будет автоматически обрабатывать повторные попытки
-        # если вызовется исключение. Можно настроить max_retries и min_backoff в декораторе
-        raise # Dramatiq's retry middleware handles this
+        raise
+    except Exception:
+        notify(f"КРИТИЧЕСКАЯ ОШИБКА в задаче Экспорт {task_label}")
+        logger.exception("Полная трассировка неожиданной ошибки:")
+        raise
 
-    except Exception as e:
-        # --- Уведомление о КРИТИЧЕСКОЙ ОШИБКЕ ---
-        error_message = f"КРИТИЧЕСКАЯ ОШИБКА в задаче Экспорт Uploaded\_sku"
-        try:
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-                chat_id=group_chat_id,
-                text=error_message,
-                message_thread_id=group_thread_id
-            )
-        except Exception as tg_error:
-            logger.error(f"Не удалось отправить уведомление ОБ ОШИБЛЕНИИ в Telegram: {tg_error}")
+    if result['mode'] == 'skipped':
+        return f"Google Таблица не обновлялась: синхронизация {sync.name} уже выполняется."
 
-        logger.exception("Полная трассировка неожиданной ошибки:")
-        # В Dramatiq middleware Retries будет автоматически обрабатывать повторные попытки
-        # если вызовется исключение.
-        raise # Dramatiq's retry middleware handles this
+    notify(success_message)
+    final_log_message = (
+        f"Google Таблица успешно обновлена ({result['mode']}): добавлено строк {result['appended']}, "
+        f"исправлено {result['patched']}, обработано ячеек: {result['updated_cells']}."
+    )
+    logger.info(final_log_message)
+    return final_log_message
+
+
+def update_moderation_google_sheet(*args, force_full=False, **kwargs): # Убран self из параметров
+    """
+    Дописывает в Google Таблицу новые загрузки ModerationStudioUpload (IsUploaded=True)
+    и правит измененные строки; лист перезаписывается целиком только при смене колонок
+    или force_full=True. Результат отправляется уведомлением в Telegram.
+    """
+    return run_moderation_sheet_sync(
+        MODERATION_SHEET_SYNC, "Uploaded\\_sku", "Задача Uploaded\\_SKU завершена", force_full=force_full
+    )
 
 #обертка для update_moderation_google_sheet
 def update_moderation_google_sheet_custom_timeout():
@@ -710,145 +558,21 @@ def get_google_sheets_service_rd():
         raise
 
 
-def update_moderation_google_sheet_rd(*args, **kwargs): # Убран self из параметров
-    """
-    Получает данные из ModerationStudioUpload, очищает указанный лист
-    в Google Таблице, записывает в него свежие данные и отправляет
-    уведомление о результате в Telegram.
-    """
-    logger.info("Запуск задачи по обновлению Google Таблицы с отчетом модерации.")
-
-    # Определяем параметры для Telegram в одном месте
-    group_chat_id = "-1002559221974"
-    group_thread_id = "11"
-
-    # 1. Получение данных
-    queryset = ModerationUpload.objects.select_related(
-        'RenderPhotos__Product',
-        'RenderPhotos'
-    ).filter(IsUploaded=True).order_by('-UploadTimeStart')
+RD_MODERATION_SHEET_SYNC = SheetSync(
+    name='uploaded_render',
+    spreadsheet_id=RD_TARGET_SPREADSHEET_ID,
+    sheet_name=RD_TARGET_SHEET_NAME,
+    export=RENDER_UPLOADS_EXPORT,
+    get_service=get_google_sheets_service_rd,
+)
 
-    # --- БЛОК ДЛЯ СЛУЧАЯ, КОГДА НЕТ ДАННЫХ ---
-    if not queryset.exists():
-        logger.info("Данные ModerationStudioUpload с IsUploaded=True не найдены.")
-        message_to_send = "ℹ️ Экспорт Uploaded_Render: нет данных для выгрузки. Таблица была очищена."
-        try:
-            sheets_service = get_google_sheets_service()
-            logger.info(f"Очистка листа '{TARGET_SHEET_NAME}'...")
-            sheets_service.spreadsheets().values().clear(
-                spreadsheetId=RD_TARGET_SPREADSHEET_ID,
-                range=RD_TARGET_SHEET_NAME
-            ).execute()
-            logger.info("Лист успешно очищен.")
-
-            # Попытка отправить уведомление
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-                chat_id=group_chat_id,
-                text=message_to_send,
-                message_thread_id=group_thread_id
-            )
 
-        except Exception as e:
-            logger.error(f"Ошибка при обработке пустого queryset: {e}")
-            # Отправляем сообщение об ошибке даже здесь
-            error_message = f"‼️ ОШИБКА в задаче 'Экспорт Uploaded_Render' при очистке листа: `{e}`"
-            try:
-                async_task(
-                    'telegram_bot.tasks.send_message_task',
-                    chat_id=group_chat_id,
-                    text=error_message,
-                    message_thread_id=group_thread_id
-                )
-            except Exception as tg_error:
-                logger.error(f"Не удалось отправить уведомление ОБ ОШИБЛЕНИИ в Telegram: {tg_error}")
-            # В Dramatiq для повторных попыток просто вызываем исключение
-            raise # Dramatiq's retry middleware handles this
-
-        return "Нет данных для генерации отчета. Лист очищен."
-
-    # --- ОСНОВНАЯ ЛОГИКА ---
-    serializer = ModerationUploadSerializer(queryset, many=True)
-    data_to_export = serializer.data
-    headers = ['barcode', 'sku_id', 'category_id', 'UploadTimeStart', 'retouch_link']
-    values_to_write = [headers]
-    for item in data_to_export:
-        row = [item.get(header_key, "") for header_key in headers]
-        values_to_write.append(row)
-
-    rows_count = len(values_to_write) - 1
-    logger.info(f"Подготовлено {rows_count} строк данных для записи в Google Таблицу.")
-
-    # 3. Работа с Google Sheets API: очистка, запись и уведомления
-    try:
-        sheets_service = get_google_sheets_service_rd()
-
-        # Шаг 3.1: Очистка листа
-        logger.info(f"Очистка листа '{TARGET_SHEET_NAME}'...")
-        sheets_service.spreadsheets().values().clear(
-            spreadsheetId=RD_TARGET_SPREADSHEET_ID, range=RD_TARGET_SHEET_NAME
-        ).execute()
-        logger.info("Лист успешно очищен.")
-
-        # Шаг 3.2: Запись новых данных
-        logger.info("Запись новых данных...")
-        body = {'values': values_to_write}
-        update_result = sheets_service.spreadsheets().values().update(
-            spreadsheetId=RD_TARGET_SPREADSHEET_ID,
-            range=f"{RD_TARGET_SHEET_NAME}!A1",
-            valueInputOption='USER_ENTERED',
-            body=body
-        ).execute()
-
-        # --- Уведомление об УСПЕХЕ ---
-        success_message = f"Задача Uploaded_Render завершена"
-        try:
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-                chat_id=group_chat_id,
-                text=success_message,
-                message_thread_id=group_thread_id # можно передать при необходимости
-            )
-        except Exception as tg_error:
-            logger.error(f"Не удалось отправить уведомление об успехе в Telegram: {tg_error}")
-
-        # Возвращаем результат для логов Dramatiq
-        final_log_message = f"Google Таблица успешно обновлена. Обработано ячеек: {update_result.get('updatedCells')}."
-        logger.info(final_log_message)
-        return final_log_message
-
-    except HttpError as error:
-        # --- Уведомление об ОШИБКЕ API ---
-        error_message = f"ОШИБКА API Google Sheets в задаче Экспорт Uploaded_Render"
-        try:
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-                chat_id=group_chat_id,
-                text=error_message,
-                message_thread_id=group_thread_id # можно передать при необходимости
-            )
-        except Exception as tg_error:
-            logger.error(f"Не удалось отправить уведомление ОБ ОШИБЛЕНИИ в Telegram: {tg_error}")
-
-        logger.error(f"Ошибка API Google Sheets: {error.resp.status} - {error._get_reason()}")
-        # В Dramatiq middleware Retries будет автоматически обрабатывать повторные попытки
-        # если вызовется исключение. Можно настроить max_retries и min_backoff в декораторе
-        raise # Dramatiq's retry middleware handles this
-
-    except Exception as e:
-        # --- Уведомление о КРИТИЧЕСКОЙ ОШИБКЕ ---
-        error_message = f"КРИТИЧЕСКАЯ ОШИБКА в задаче Экспорт Redner"
-        try:
-            async_task(
-                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
-                chat_id=group_chat_id,
-                text=error_message,
-                message_thread_id=group_thread_id
-            )
-        except Exception as tg_error:
-            logger.error(f"Не удалось отправить уведомление ОБ ОШИБЛЕНИИ в Telegram: {tg_error}")
-
-        logger.exception("Полная трассировка неожиданной ошибки:")
-        # В Dramatiq middleware Retries будет автоматически обрабатывать повторные попытки
-        # если вызовется исключение.
-        raise # Dramatiq's retry middleware handles this
+def update_moderation_google_sheet_rd(*args, force_full=False, **kwargs): # Убран self из параметров
+    """
+    Дописывает в Google Таблицу новые загрузки ModerationUpload (IsUploaded=True)
+    и правит измененные строки; лист перезаписывается целиком только при смене колонок
+    или force_full=True. Результат отправляется уведомлением в Telegram.
+    """
+    return run_moderation_sheet_sync(
+        RD_MODERATION_SHEET_SYNC, "Uploaded_Render", "Задача Uploaded_Render завершена", force_full=force_full
+    )
@@ -60,4 +60,7 @@ urlpatterns = [
 
     ## Среднее время незаказанных
     path('average-check-time/', views.get_render_check_stats, name='get_average_render_check_time'),
+
+    ## Метрики выдачи заданий
+    path('work-dispatch-metrics/', views.WorkDispatchMetricsView.as_view(), name='work-dispatch-metrics'),
 ]
@@ -1,19 +1,20 @@
 #render.views
 import json
+import logging
 import django_filters
 import math
 from collections import defaultdict
 from django.shortcuts import render
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q, Case, When, Value, IntegerField, Prefetch, Count, Avg, F, DurationField, Max
+from django.db.models import Q, Prefetch, Count, Avg, F, DurationField, Max
 from django.db.models.functions import TruncDate, Now
 from django.contrib.auth.models import Group, User
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.views.decorators.http import require_POST
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from rest_framework.generics import ListAPIView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import ValidationError
@@ -38,17 +39,16 @@ from .models import (
     RenderCheckResult
     )
 from core.models import (
-    RetouchRequestProduct,
     UserProfile,
     ProductOperation,
     ProductOperationTypes,
-    RetouchRequestProduct,
     Product as CoreProduct,
     ProductCategory,
     Blocked_Shops,
     Blocked_Barcode,
     Nofoto
     )
+from core.reference_data import get_reference, get_reference_or_404, get_reference_or_none
 
 from .serializers import (
     RetoucherRenderSerializer,
@@ -61,6 +61,18 @@ from .filters import (
     RenderFilter
     )
 from .pagination import StandardResultsSetPagination
+from .reshoot_logic import get_reshoot_barcodes
+from .dispatch_logic import (
+    claim_next,
+    get_dispatch_metrics,
+    RENDER_CHECK_QUEUE,
+    MODERATION_UPLOAD_QUEUE,
+    STUDIO_UPLOAD_QUEUE,
+    RETOUCH_STATUS_IN_PROGRESS_ID,
+    UPLOAD_STATUS_IN_PROGRESS_ID
+    )
+
+logger = logging.getLogger(__name__)
 
 
 #Получение нового шк для рендера
@@ -68,7 +80,7 @@ from .pagination import StandardResultsSetPagination
 @permission_classes([IsAuthenticated])
 def StartCheck(request):
     retoucher = request.user
-    retouch_status_in_progress_id = 1  # ID статуса "в работе"
+    retouch_status_in_progress_id = RETOUCH_STATUS_IN_PROGRESS_ID  # ID статуса "в работе"
     retouch_status_accepted_id = 2     # ID статуса "принято"
     retouch_status_declined_id = 5     # ID статуса "отклонено"
     accepted_limit = 100               # Лимит принятых работ
@@ -86,105 +98,40 @@ def StartCheck(request):
             status=400
         )
 
-    # 2. Ищем существующий активный Render у этого ретушера
-    existing_render = Render.objects.filter(
-        Retoucher=retoucher,
-        RetouchStatus__id=retouch_status_in_progress_id
-    ).select_related('Product').first() # select_related для оптимизации
-
-    # 3. Если найден активный Render, возвращаем его данные
-    if existing_render:
-        # Пересчитываем отклоненные для актуальности в ответе
-        declined_count = Render.objects.filter(
-            Retoucher=retoucher,
-            RetouchStatus__id=retouch_status_declined_id
-        ).count()
-
-        response_data = {
-            "id": existing_render.id,
-            "Barcode": existing_render.Product.Barcode,
-            "Name": existing_render.Product.Name,
-            "CategoryName": existing_render.Product.CategoryName,
-            "CategoryID": existing_render.Product.CategoryID,
-            "ShopID": existing_render.Product.ShopID,
-            "ProductID": existing_render.Product.ProductID,
-            "SKUID": existing_render.Product.SKUID,
-            "declined": declined_count,
-            "accepted": accepted_count, # Используем уже посчитанный для лимита
-        }
-        # Возвращаем статус 200 OK, так как ресурс уже существует
-        return Response(response_data, status=200)
-
-    # 4. Если активного Render нет, ищем новый Product и создаем Render
+    # 2. Активный Render ретушера или новый из очереди (SELECT ... FOR UPDATE SKIP LOCKED)
     try:
-        with transaction.atomic():
-            # Ищем подходящий Product, блокируя его для предотвращения гонки состояний
-            product_qs = Product.objects.select_for_update().filter(
-                Q(IsOnRender=False) | Q(IsOnRender__isnull=True),
-                Q(IsRetouchBlock=False) | Q(IsRetouchBlock__isnull=True),
-                Q(IsModerationBlock=False) | Q(IsModerationBlock__isnull=True),
-                PhotoModerationStatus__in=["Отклонено"],
-                #WMSQuantity__gt=0
-            ).annotate(
-                status_priority=Case(
-                    When(PhotoModerationStatus="Отклонено", then=Value(1)),
-                    default=Value(3),
-                    output_field=IntegerField()
-                )
-            ).order_by('status_priority', '-WMSQuantity') # <-- Добавил select_for_update()
-
-            product = product_qs.first()
-            if not product:
-                return Response({"message": "Подходящие штрихкоды закончились"}, status=404)
-
-            # Обновляем флаг на продукте
-            product.IsOnRender = True
-            product.save(update_fields=["IsOnRender"])
-
-            # Получаем статус ретуши "в работе" (id=1)
-            try:
-                retouch_status_started = RetouchStatus.objects.get(id=retouch_status_in_progress_id)
-            except RetouchStatus.DoesNotExist:
-                 # Критическая ошибка конфигурации
-                print(f"CRITICAL ERROR: RetouchStatus with ID={retouch_status_in_progress_id} not found!")
-                return Response({"message": "Ошибка конфигурации: не найден статус ретуши."}, status=500)
-
-            # Создаем новый Render
-            new_render = Render.objects.create(
-                Product=product,
-                Retoucher=retoucher,
-                CheckTimeStart=timezone.now(), # Время начала проверки/взятия в работу
-                RetouchStatus=retouch_status_started
-            )
+        render, created = claim_next(RENDER_CHECK_QUEUE, retoucher)
+    except RetouchStatus.DoesNotExist:
+        # Критическая ошибка конфигурации
+        logger.error(f"Не найден RetouchStatus с ID={retouch_status_in_progress_id}")
+        return Response({"message": "Ошибка конфигурации: не найден статус ретуши."}, status=500)
+    except Exception:
+        logger.exception("Ошибка при выдаче рендера на проверку (StartCheck)")
+        return Response({"message": "Произошла ошибка при назначении задания на ретушь."}, status=500)
 
-        # После успешной транзакции:
-        # Снова считаем отклоненные (т.к. мог измениться статус пока искали)
-        declined_count = Render.objects.filter(
-            Retoucher=retoucher,
-            RetouchStatus__id=retouch_status_declined_id
-        ).count()
-        # Accepted_count уже посчитан в начале
+    if not render:
+        return Response({"message": "Подходящие штрихкоды закончились"}, status=404)
 
-        # Формируем ответ для нового Render
-        response_data = {
-            "id": new_render.id,
-            "Barcode": new_render.Product.Barcode, # Доступ через new_render.Product
-            "Name": new_render.Product.Name,
-            "CategoryName": new_render.Product.CategoryName,
-            "CategoryID": new_render.Product.CategoryID,
-            "ShopID": new_render.Product.ShopID,
-            "ProductID": new_render.Product.ProductID,
-            "SKUID": new_render.Product.SKUID,
-            "declined": declined_count,
-            "accepted": accepted_count,
-        }
-        # Возвращаем статус 201 Created, так как ресурс был создан
-        return Response(response_data, status=201)
+    # Пересчитываем отклоненные для актуальности в ответе
+    declined_count = Render.objects.filter(
+        Retoucher=retoucher,
+        RetouchStatus__id=retouch_status_declined_id
+    ).count()
 
-    except Exception as e:
-        # Логирование ошибки
-        print(f"Error during StartCheck transaction: {e}") # Используйте logging
-        return Response({"message": "Произошла ошибка при назначении задания на ретушь."}, status=500)
+    response_data = {
+        "id": render.id,
+        "Barcode": render.Product.Barcode,
+        "Name": render.Product.Name,
+        "CategoryName": render.Product.CategoryName,
+        "CategoryID": render.Product.CategoryID,
+        "ShopID": render.Product.ShopID,
+        "ProductID": render.Product.ProductID,
+        "SKUID": render.Product.SKUID,
+        "declined": declined_count,
+        "accepted": accepted_count, # Используем уже посчитанный для лимита
+    }
+    # 201 - задание выдано сейчас, 200 - у ретушера уже был активный Render
+    return Response(response_data, status=201 if created else 200)
 
 #Получение листа проверенных у ретушера
 class RetoucherRenderList(ListAPIView):
@@ -255,7 +202,7 @@ def UpdateRender(request, render_id):
     # Устанавливаем RetouchStatus согласно значению IsSuitable
     new_status_id = 2 if is_suitable else 5
     try:
-        retouch_status = RetouchStatus.objects.get(id=new_status_id)
+        retouch_status = get_reference(RetouchStatus, new_status_id)
     except RetouchStatus.DoesNotExist:
         return Response({"message": f"RetouchStatus with id={new_status_id} not found."}, status=500)
     render_obj.RetouchStatus = retouch_status
@@ -323,8 +270,7 @@ def UpdateRenderEdit(request, render_id):
         message_text = f"{retoucher_name} прислал на проверку правки"
         for senior in senior_retouchers:
             if hasattr(senior, 'profile') and senior.profile.telegram_id:
-                async_task(
-                    'telegram_bot.tasks.send_message_task',
+                enqueue_telegram_message(
                     chat_id=senior.profile.telegram_id,
                     text=message_text
                 )
@@ -336,7 +282,7 @@ def UpdateRenderEdit(request, render_id):
     # Устанавливаем RetouchStatus согласно значению IsSuitable
     new_status_id = 3 if is_suitable else 7
     try:
-        retouch_status = RetouchStatus.objects.get(id=new_status_id)
+        retouch_status = get_reference(RetouchStatus, new_status_id)
     except RetouchStatus.DoesNotExist:
         return Response({"message": f"RetouchStatus with id={new_status_id} not found."}, status=500)
     render_obj.RetouchStatus = retouch_status
@@ -398,7 +344,7 @@ def SendForCheck(request):
 
     # 1. Обновляем все Render со статусом 5 в статус 7
     try:
-        status7 = RetouchStatus.objects.get(id=7)
+        status7 = get_reference(RetouchStatus, 7)
     except RetouchStatus.DoesNotExist:
         return Response({"message": "RetouchStatus с id=6 не найден."}, status=500)
 
@@ -407,7 +353,7 @@ def SendForCheck(request):
 
     # 2. Обработка Render со статусом 2:
     try:
-        status3 = RetouchStatus.objects.get(id=3)
+        status3 = get_reference(RetouchStatus, 3)
     except RetouchStatus.DoesNotExist:
         return Response({"message": "RetouchStatus с id=3 не найден."}, status=500)
 
@@ -432,8 +378,7 @@ def SendForCheck(request):
         message_text = f"{retoucher_name} прислал на проверку {count_status3} рендеров"
         for senior in senior_retouchers:
             if hasattr(senior, 'profile') and senior.profile.telegram_id:
-                async_task(
-                    'telegram_bot.tasks.send_message_task',
+                enqueue_telegram_message(
                     chat_id=senior.profile.telegram_id,
                     text=message_text
                 )
@@ -514,7 +459,7 @@ def SeniorUpdateRender(request, render_id):
     # Устанавливаем RetouchStatus согласно значению IsSuitable
     new_status_id = 2 if is_suitable else 7
     try:
-        retouch_status = RetouchStatus.objects.get(id=new_status_id)
+        retouch_status = get_reference(RetouchStatus, new_status_id)
     except RetouchStatus.DoesNotExist:
         return Response({"message": f"RetouchStatus with id={new_status_id} not found."}, status=500)
     render_obj.RetouchStatus = retouch_status
@@ -626,7 +571,7 @@ def SeniorToEditRender(request):
         
         # Получаем новый статус ретуши
         try:
-            new_status = RetouchStatus.objects.get(id=retouch_status_id)
+            new_status = get_reference(RetouchStatus, retouch_status_id)
         except RetouchStatus.DoesNotExist:
             return Response({"message": f"RetouchStatus с id {retouch_status_id} не найден."}, status=500)
         
@@ -634,7 +579,7 @@ def SeniorToEditRender(request):
         # Если retouch_status_id == 4, то senior_status_id = 2, иначе (если 6) = 1
         senior_status_id = 2 if retouch_status_id == 4 else 1
         try:
-            new_senior_status = SeniorRetouchStatus.objects.get(id=senior_status_id)
+            new_senior_status = get_reference(SeniorRetouchStatus, senior_status_id)
         except SeniorRetouchStatus.DoesNotExist:
             return Response({"message": f"SeniorRetouchStatus с id {senior_status_id} не найден."}, status=500)
         
@@ -663,8 +608,7 @@ def SeniorToEditRender(request):
             continue
         if hasattr(retoucher, 'profile') and getattr(retoucher.profile, 'telegram_id', None):
             message_text = f"Правки по рендерам {count}"
-            async_task(
-                'telegram_bot.tasks.send_message_task',
+            enqueue_telegram_message(
                 chat_id=retoucher.profile.telegram_id,
                 text=message_text
             )
@@ -676,85 +620,36 @@ def SeniorToEditRender(request):
 @permission_classes([IsAuthenticated])
 def ModeratorUploadStart(request):
     moderator = request.user
-    upload_status_in_progress_id = 1 # ID статуса "в работе" или "начато"
-
-    # 1. Проверяем, есть ли уже активная задача у этого модератора
-    # Используем select_related для оптимизации запроса к связанным моделям
-    existing_upload = ModerationUpload.objects.filter(
-        Moderator=moderator,
-        UploadStatus__id=upload_status_in_progress_id
-    ).select_related('RenderPhotos__Product').first()
-
-    if existing_upload:
-        # Если найдена активная задача, возвращаем её данные
-        render = existing_upload.RenderPhotos
-        data = {
-            "ModerationUploadId": existing_upload.pk,
-            "Barcode": render.Product.Barcode,
-            "ProductID": render.Product.ProductID,
-            "SKUID": render.Product.SKUID,
-            "Name": render.Product.Name,
-            "ShopID": render.Product.ShopID,
-            "RetouchPhotosLink": render.RetouchPhotosLink,
-        }
-        return JsonResponse(data)
+    upload_status_in_progress_id = UPLOAD_STATUS_IN_PROGRESS_ID # ID статуса "в работе" или "начато"
 
-    # 2. Если активной задачи нет, ищем новую и создаем запись
-    # Используем транзакцию для атомарности операции поиска и назначения
+    # Активная (или выданная заранее) задача модератора либо новая из очереди
     try:
-        with transaction.atomic():
-            # Ищем следующий доступный рендер для загрузки
-            # select_for_update() блокирует выбранные строки до конца транзакции
-            render = Render.objects.select_for_update().filter(
-                RetouchStatus__id=6,
-                RetouchSeniorStatus__id=1,
-                IsOnUpload=False,
-                Product__IsModerationBlock=False
-            ).select_related('Product').order_by("RetouchTimeEnd").first() # select_related для оптимизации
-
-            # Если подходящего рендера не найдено, возвращаем сообщение
-            if not render:
-                return JsonResponse({"message": "Рендеры на загрузку закончились"}, status=404)
-
-            # Получаем объект статуса "в работе"
-            try:
-                upload_status_started = UploadStatus.objects.get(id=upload_status_in_progress_id)
-            except UploadStatus.DoesNotExist:
-                # Это критическая ошибка конфигурации, если статус не найден
-                # Логируйте эту ошибку!
-                print(f"CRITICAL ERROR: UploadStatus with ID={upload_status_in_progress_id} not found!")
-                return JsonResponse({"message": "Ошибка конфигурации: не найден статус загрузки."}, status=500)
-
-            # Помечаем рендер как взятый в работу на загрузку
-            render.IsOnUpload = True
-            render.save()
-
-            # Создаем новую запись ModerationUpload
-            new_moderation_upload = ModerationUpload.objects.create(
-                RenderPhotos=render,
-                Moderator=moderator,
-                UploadTimeStart=timezone.now(),
-                UploadStatus=upload_status_started # <-- Устанавливаем статус "в работе"
-            )
-
-            # Формируем данные для ответа с информацией о новой задаче
-            data = {
-                "ModerationUploadId": new_moderation_upload.pk,
-                "Barcode": render.Product.Barcode,
-                "ProductID": render.Product.ProductID,
-                "SKUID": render.Product.SKUID,
-                "Name": render.Product.Name,
-                "ShopID": render.Product.ShopID,
-                "RetouchPhotosLink": render.RetouchPhotosLink,
-            }
-            return JsonResponse(data)
-
-    except Exception as e:
-        # Логируйте исключение для отладки
-        print(f"Error during ModeratorUploadStart transaction: {e}") # Используйте logging в продакшене
+        upload, _ = claim_next(MODERATION_UPLOAD_QUEUE, moderator)
+    except UploadStatus.DoesNotExist:
+        # Это критическая ошибка конфигурации, если статус не найден
+        logger.error(f"Не найден UploadStatus с ID={upload_status_in_progress_id}")
+        return JsonResponse({"message": "Ошибка конфигурации: не найден статус загрузки."}, status=500)
+    except Exception:
+        logger.exception("Ошибка при выдаче задания на загрузку (ModeratorUploadStart)")
         # Возвращаем общую ошибку пользователю
         return JsonResponse({"message": "Произошла ошибка при назначении задания."}, status=500)
 
+    # Если подходящего рендера не найдено, возвращаем сообщение
+    if not upload:
+        return JsonResponse({"message": "Рендеры на загрузку закончились"}, status=404)
+
+    render = upload.RenderPhotos
+    data = {
+        "ModerationUploadId": upload.pk,
+        "Barcode": render.Product.Barcode,
+        "ProductID": render.Product.ProductID,
+        "SKUID": render.Product.SKUID,
+        "Name": render.Product.Name,
+        "ShopID": render.Product.ShopID,
+        "RetouchPhotosLink": render.RetouchPhotosLink,
+    }
+    return JsonResponse(data)
+
 #результат загрузки модератором
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -781,10 +676,10 @@ def ModerationUploadResult(request):
     is_uploaded = data.get("IsUploaded")
     if is_uploaded is True:
         # Предполагаем, что статус с id=2 означает "загружено"
-        upload_status = UploadStatus.objects.filter(pk=2).first()
+        upload_status = get_reference_or_none(UploadStatus, 2)
     else:
         # Предполагаем, что статус с id=3 означает "не загружено"
-        upload_status = UploadStatus.objects.filter(pk=3).first()
+        upload_status = get_reference_or_none(UploadStatus, 3)
 
     if not upload_status:
         return JsonResponse({"error": "UploadStatus не найден для данного статуса"}, status=400)
@@ -843,10 +738,10 @@ def ModerationUploadEdit(request):
     is_uploaded = data.get("IsUploaded")
     if is_uploaded is True:
         # Предполагаем, что статус с id=2 означает "загружено"
-        upload_status = UploadStatus.objects.filter(pk=2).first()
+        upload_status = get_reference_or_none(UploadStatus, 2)
     else:
         # Предполагаем, что статус с id=3 означает "не загружено"
-        upload_status = UploadStatus.objects.filter(pk=3).first()
+        upload_status = get_reference_or_none(UploadStatus, 3)
 
     if not upload_status:
         return JsonResponse({"error": "UploadStatus не найден для данного статуса"}, status=400)
@@ -1178,37 +1073,12 @@ def ModerationStudioUploadStart(request):
         return Response({"detail": "Access denied. Not a Moderator."},
                         status=status.HTTP_403_FORBIDDEN)
 
-    # 2. Проверяем существующую загрузку
-    existing_upload = ModerationStudioUpload.objects.select_related(
-        'RenderPhotos__st_request_product__product',
-        'UploadStatus'
-    ).filter(Moderator=user, UploadStatus__id=1).first()
-
-    if existing_upload:
-        retouch = existing_upload.RenderPhotos
-    else:
-        # 3. Ищем новую ретушь
-        retouch = RetouchRequestProduct.objects.select_related(
-            'st_request_product__product'
-        ).filter(
-            IsOnUpload=False,
-            retouch_status__id=2,
-            sretouch_status__id=1
-        ).order_by('updated_at').first()
-
-        if not retouch:
-            return Response({"detail": "закончились шк для загрузки"},
-                            status=status.HTTP_404_NOT_FOUND)
-
-        retouch.IsOnUpload = True
-        retouch.save()
-
-        existing_upload = ModerationStudioUpload.objects.create(
-            RenderPhotos=retouch,
-            Moderator=user,
-            UploadTimeStart=timezone.now(),
-            UploadStatus=UploadStatus.objects.get(id=1)
-        )
+    # 2. Существующая (или выданная заранее) загрузка либо новая ретушь из очереди
+    existing_upload, _ = claim_next(STUDIO_UPLOAD_QUEUE, user)
+    if not existing_upload:
+        return Response({"detail": "закончились шк для загрузки"},
+                        status=status.HTTP_404_NOT_FOUND)
+    retouch = existing_upload.RenderPhotos
 
     # Получаем штрихкод
     try:
@@ -1283,12 +1153,12 @@ def ModerationStudioUploadResult(request):
     # Убедитесь, что эти ID соответствуют вашей модели UploadStatus
     if is_uploaded is True:
         # Статус "загружено" (предполагаем ID=2)
-        upload_status = UploadStatus.objects.filter(pk=2).first()
+        upload_status = get_reference_or_none(UploadStatus, 2)
         if not upload_status:
             return JsonResponse({"error": "Статус загрузки (UploadStatus) с ID=2 не найден в базе данных."}, status=400) # Улучшено сообщение
 
         try:
-            operation_type_uploaded = ProductOperationTypes.objects.get(pk=58)
+            operation_type_uploaded = get_reference(ProductOperationTypes, 58)
 
             render_photos_instance = moderation_studio_upload.RenderPhotos
             if not render_photos_instance:
@@ -1319,7 +1189,7 @@ def ModerationStudioUploadResult(request):
         # --- КОНЕЦ ЛОГИРОВАНИЯ ДЛЯ ProductOperation ---
     else:
         # Статус "не загружено" (предполагаем ID=3)
-        upload_status = UploadStatus.objects.filter(pk=3).first()
+        upload_status = get_reference_or_none(UploadStatus, 3)
 
     if not upload_status:
         # Улучшено сообщение об ошибке
@@ -1530,9 +1400,9 @@ def ModerationStudioUploadEdit(request):
     # Предполагаем те же ID для статусов загрузки, что и в оригинальном эндпоинте
     if is_uploaded is True:
         # Статус "загружено" (предполагаем ID=2)
-        upload_status = UploadStatus.objects.filter(pk=2).first()
+        upload_status = get_reference_or_none(UploadStatus, 2)
         try:
-            operation_type_uploaded = ProductOperationTypes.objects.get(pk=58)
+            operation_type_uploaded = get_reference(ProductOperationTypes, 58)
 
             render_photos_instance = moderation_studio_upload.RenderPhotos
             if not render_photos_instance:
@@ -1563,7 +1433,7 @@ def ModerationStudioUploadEdit(request):
         # --- КОНЕЦ ЛОГИРОВАНИЯ ДЛЯ ProductOperation ---
     else:
         # Статус "не загружено" (предполагаем ID=3)
-        upload_status = UploadStatus.objects.filter(pk=3).first()
+        upload_status = get_reference_or_none(UploadStatus, 3)
 
     if not upload_status:
         status_id = 2 if is_uploaded else 3
@@ -1777,8 +1647,8 @@ class SendModerationUploadForEdits(APIView):
 
         try:
             with transaction.atomic():
-                retouch_status_4 = get_object_or_404(RetouchStatus, pk=4)
-                senior_status_2 = get_object_or_404(SeniorRetouchStatus, pk=2)
+                retouch_status_4 = get_reference_or_404(RetouchStatus, 4)
+                senior_status_2 = get_reference_or_404(SeniorRetouchStatus, 2)
 
                 # Обновляем Render
                 render_instance.RetouchStatus = retouch_status_4
@@ -1799,8 +1669,7 @@ class SendModerationUploadForEdits(APIView):
                         telegram_id_to_send = user_profile.telegram_id
                         message_text=f"Правка по рендеру для продукта {render_instance.Product.Barcode}."
                         try:
-                            async_task(
-                                'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+                            enqueue_telegram_message(
                                 chat_id=telegram_id_to_send,
                                 text=message_text
                             )
@@ -1908,8 +1777,8 @@ class SendModerationUploadForReshoot(APIView):
             return Response({"detail": "Связанный объект Render не найден."}, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            retouch_status_7 = get_object_or_404(RetouchStatus, pk=7)
-            check_result_50 = get_object_or_404(RenderCheckResult, pk=50)
+            retouch_status_7 = get_reference_or_404(RetouchStatus, 7)
+            check_result_50 = get_reference_or_404(RenderCheckResult, 50)
 
             with transaction.atomic():
                 # Обновляем Render
@@ -1960,72 +1829,12 @@ def get_rejected_photos_for_shooting(request, count):
     except ValueError:
         return HttpResponseBadRequest("Invalid quota format. Please provide a float.")
 
-    # List of IDs for RenderCheckResult that indicate a reshoot is needed
-    rejected_check_result_ids = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 50]
-    
-    # Get IDs/barcodes for blocked items
-    blocked_shop_ids = Blocked_Shops.objects.values_list('shop_id', flat=True)
-    blocked_category_ids = ProductCategory.objects.filter(IsBlocked=True).values_list('id', flat=True)
-    blocked_barcodes = Blocked_Barcode.objects.values_list('barcode', flat=True)
-    nofoto_barcodes = Nofoto.objects.values_list('product__barcode', flat=True)
-
-    # Photo moderation statuses of interest
-    photo_moderation_statuses = ["Отклонено"]
-
-    # --- Link render.Product.CategoryID to core.ProductCategory.STRequestType ---
-    # Get CategoryIDs for each STRequestType
-    type_1_category_ids = ProductCategory.objects.filter(STRequestType_id=1).values_list('id', flat=True)
-    type_2_category_ids = ProductCategory.objects.filter(STRequestType_id=2).values_list('id', flat=True)
-    type_3_category_ids = ProductCategory.objects.filter(STRequestType_id=3).values_list('id', flat=True)
-
-    # --- Base query with all common filters and new sorting ---
-    base_query = Product.objects.filter(
-        IsOnOrder=False,
-        PhotoModerationStatus__in=photo_moderation_statuses,
-        render__CheckResult__id__in=rejected_check_result_ids,
-        WMSQuantity__gt=0
-    ).exclude(
-        ShopID__in=blocked_shop_ids
-    ).exclude(
-        CategoryID__in=blocked_category_ids
-    ).exclude(
-        Barcode__in=blocked_barcodes
-    ).exclude(
-        Barcode__in=nofoto_barcodes
-    ).distinct().order_by('-WMSQuantity', 'render__CheckTimeStart') # <-- Updated sorting
-
-    # --- Apply quotas to fetch barcodes ---
-    final_barcodes = []
-    
-    # Calculate limits for each type
-    limit_type_2 = math.floor(limit * limit_type_2_quota)
-    limit_type_3 = math.floor(limit * limit_type_3_quota)
-
-    # Fetch Type 2 barcodes if a limit is set
-    if limit_type_2 > 0:
-        barcodes_type_2 = list(base_query.filter(
-            CategoryID__in=type_2_category_ids
-        ).values_list('Barcode', flat=True)[:limit_type_2])
-        final_barcodes.extend(barcodes_type_2)
-
-    # Fetch Type 3 barcodes if a limit is set
-    if limit_type_3 > 0:
-        barcodes_type_3 = list(base_query.filter(
-            CategoryID__in=type_3_category_ids
-        ).exclude(
-            Barcode__in=final_barcodes
-        ).values_list('Barcode', flat=True)[:limit_type_3])
-        final_barcodes.extend(barcodes_type_3)
-
-    # Fetch Type 1 barcodes to fill the remaining slots
-    remaining_limit = limit - len(final_barcodes)
-    if remaining_limit > 0:
-        barcodes_type_1 = list(base_query.filter(
-            CategoryID__in=type_1_category_ids
-        ).exclude(
-            Barcode__in=final_barcodes
-        ).values_list('Barcode', flat=True)[:remaining_limit])
-        final_barcodes.extend(barcodes_type_1)
+    # Candidates are precomputed by refresh_reshoot_candidates; stop lists and IsOnOrder
+    # are re-checked at read time - one indexed slice per STRequestType
+    final_barcodes = get_reshoot_barcodes(limit, {
+        2: math.floor(limit * limit_type_2_quota),
+        3: math.floor(limit * limit_type_3_quota),
+    })
 
     return JsonResponse(final_barcodes, safe=False)
 
@@ -2265,3 +2074,10 @@ def get_render_check_stats(request):
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+#Метрики выдачи заданий из очередей (render.dispatch_logic)
+class WorkDispatchMetricsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_dispatch_metrics())
@@ -0,0 +1,194 @@
+# retoucher/archive_logic.py
+"""
+Сборка ZIP-архива исходников заявки на ретушь из папок Google Drive.
+
+Листинг папок и скачивание файлов идут в ограниченном пуле потоков,
+файлы скачиваются на диск (не в память), а в архив пишутся потоково
+по частям. Уже сжатые форматы (jpg, png, mp4...) кладутся без сжатия.
+Файлы с md5Checksum берутся из локального кэша (см. drive_cache).
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
+
+from .drive_cache import get_cached_file
+
+logger = logging.getLogger(__name__)
+
+SCOPES_DRIVE_READONLY = ["https://www.googleapis.com/auth/drive.readonly"]
+
+# Количество параллельных запросов к Google Drive по умолчанию
+DEFAULT_ARCHIVE_MAX_WORKERS = 8
+
+# Размер куска при скачивании и при копировании в архив
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Эти форматы уже сжаты - deflate только тратит CPU
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.webp', '.heic', '.heif', '.gif',
+    '.mp4', '.mov', '.avi', '.zip', '.rar', '.7z',
+}
+
+_thread_local = threading.local()
+
+
+def get_drive_service():
+    """
+    Клиент Google API (httplib2) не потокобезопасен,
+    поэтому у каждого потока пула свой экземпляр сервиса.
+    """
+    service = getattr(_thread_local, 'drive_service', None)
+    if service is None:
+        creds = service_account.Credentials.from_service_account_file(
+            settings.SERVICE_ACCOUNT_FILE, scopes=SCOPES_DRIVE_READONLY)
+        service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        _thread_local.drive_service = service
+    return service
+
+
+def list_folder_files(folder_id):
+    """Все файлы папки (с постраничной загрузкой): [{'id', 'name', 'md5Checksum', 'size'}]."""
+    service = get_drive_service()
+    files = []
+    page_token = None
+    while True:
+        response = service.files().list(
+            q=f"'{folder_id}' in parents and trashed=false",
+            fields="nextPageToken, files(id,name,md5Checksum,size)",
+            pageSize=1000,
+            pageToken=page_token,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True
+        ).execute()
+        files.extend(response.get('files', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return files
+
+
+def download_file_to_path(file_id, path):
+    """Скачивает файл Drive на диск кусками по DOWNLOAD_CHUNK_SIZE."""
+    request = get_drive_service().files().get_media(fileId=file_id)
+    with open(path, 'wb') as fh:
+        downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+
+
+def fetch_file(file_meta, work_dir, local_name):
+    """
+    Возвращает (путь, временный ли файл): из кэша блобов или,
+    если файл не кэшируется, скачивает его во work_dir.
+    """
+    path = get_cached_file(file_meta, download_file_to_path)
+    if path:
+        return path, False
+    path = os.path.join(work_dir, local_name)
+    download_file_to_path(file_meta['id'], path)
+    return path, True
+
+
+def compress_type_for(file_name):
+    ext = os.path.splitext(file_name)[1].lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def write_file_to_zip(zipf, arcname, source_path):
+    """Потоково копирует файл в новую запись архива, не читая его целиком в память."""
+    info = zipfile.ZipInfo.from_file(source_path, arcname)
+    info.compress_type = compress_type_for(arcname)
+    with open(source_path, 'rb') as src, zipf.open(info, 'w', force_zip64=True) as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+
+def get_archive_max_workers():
+    return getattr(settings, 'RETOUCH_ARCHIVE_MAX_WORKERS', DEFAULT_ARCHIVE_MAX_WORKERS)
+
+
+def build_drive_archive(zip_path, folders, max_workers=None, on_folder_done=None):
+    """
+    Собирает архив zip_path из папок Drive.
+
+    folders: список (prefix, folder_id) - файлы папки попадают в архив как prefix/имя_файла.
+    on_folder_done(done, total, prefix) вызывается в текущем потоке после того,
+    как все файлы папки записаны в архив (или папка пропущена из-за ошибки).
+    Возвращает {'folders', 'files', 'cached_files', 'failed_files', 'bytes'},
+    где cached_files - файлы, взятые из кэша блобов (включая только что скачанные в него).
+    """
+    max_workers = max_workers or get_archive_max_workers()
+    total = len(folders)
+    stats = {'folders': total, 'files': 0, 'cached_files': 0, 'failed_files': 0, 'bytes': 0}
+    done_count = 0
+
+    def folder_done(key):
+        nonlocal done_count
+        prefix = folders[key][0]
+        done_count += 1
+        if on_folder_done:
+            on_folder_done(done_count, total, prefix)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool, \
+            tempfile.TemporaryDirectory(dir=settings.MEDIA_ROOT) as work_dir, \
+            zipfile.ZipFile(zip_path, 'w', allowZip64=True) as zipf:
+
+        # 1. Листинг всех папок параллельно
+        # (ключ - индекс папки: один баркод может встретиться дважды)
+        listing_futures = {
+            pool.submit(list_folder_files, folder_id): key
+            for key, (_, folder_id) in enumerate(folders)
+        }
+        remaining = {}
+        download_futures = {}
+        for future in as_completed(listing_futures):
+            key = listing_futures[future]
+            prefix = folders[key][0]
+            try:
+                files = future.result()
+            except Exception as e:
+                logger.warning(f"Ошибка при получении списка файлов {prefix}: {e}")
+                folder_done(key)
+                continue
+            if not files:
+                folder_done(key)
+                continue
+            remaining[key] = len(files)
+            # 2. Скачивание файлов параллельно (в кэш блобов или во временную папку)
+            for index, f in enumerate(files):
+                future = pool.submit(fetch_file, f, work_dir, f"{key}_{index}")
+                download_futures[future] = (key, f['name'])
+
+        # 3. Запись в архив по мере готовности (ZipFile пишется только из этого потока)
+        for future in as_completed(download_futures):
+            key, file_name = download_futures[future]
+            prefix = folders[key][0]
+            local_path, is_temp = None, False
+            try:
+                local_path, is_temp = future.result()
+                write_file_to_zip(zipf, f"{prefix}/{file_name}", local_path)
+                stats['files'] += 1
+                stats['bytes'] += os.path.getsize(local_path)
+                if not is_temp:
+                    stats['cached_files'] += 1
+            except Exception as e:
+                stats['failed_files'] += 1
+                logger.warning(f"Ошибка при обработке файла {prefix}/{file_name}: {e}")
+            finally:
+                if is_temp and os.path.exists(local_path):
+                    os.remove(local_path)
+
+            remaining[key] -= 1
+            if remaining[key] == 0:
+                folder_done(key)
+
+    return stats
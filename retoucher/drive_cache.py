@@ -0,0 +1,132 @@
+# retoucher/drive_cache.py
+"""
+Локальный кэш исходников из Google Drive.
+
+Файл хранится под ключом (file_id, md5Checksum): если фото в папке съёмки
+не менялось, повторная сборка архива (переназначение заявки, повторное
+скачивание ретушёром) берёт его с диска, а не из Drive.
+Вытеснение - по давности использования (mtime) при превышении лимита размера.
+"""
+import logging
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Лимит размера кэша по умолчанию
+DEFAULT_BLOB_CACHE_MAX_BYTES = 50 * 1024 ** 3
+
+# Блобы, использованные позже этого срока, не вытесняются:
+# они могут прямо сейчас читаться сборкой архива
+BLOB_MIN_AGE_SECONDS = 6 * 60 * 60
+
+# Недокачанные .part-файлы старше этого срока считаются брошенными
+PARTIAL_MAX_AGE_SECONDS = 6 * 60 * 60
+
+PARTIAL_SUFFIX = '.part'
+
+
+def get_cache_dir():
+    return getattr(settings, 'RETOUCH_BLOB_CACHE_DIR',
+                   os.path.join(settings.MEDIA_ROOT, 'retouch_blob_cache'))
+
+
+def get_cache_max_bytes():
+    return getattr(settings, 'RETOUCH_BLOB_CACHE_MAX_BYTES', DEFAULT_BLOB_CACHE_MAX_BYTES)
+
+
+def blob_path(file_id, md5_checksum):
+    return os.path.join(get_cache_dir(), md5_checksum[:2], f"{file_id}_{md5_checksum}")
+
+
+def get_cached_file(file_meta, download):
+    """
+    Путь к локальной копии файла Drive; при промахе скачивает его через
+    download(file_id, path). Возвращает None, если у файла нет md5Checksum
+    (Google-документы и т.п.) - такие файлы не кэшируются.
+    """
+    md5_checksum = file_meta.get('md5Checksum')
+    if not md5_checksum:
+        return None
+
+    path = blob_path(file_meta['id'], md5_checksum)
+    if os.path.exists(path):
+        try:
+            # Отмечаем использование для LRU
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            # Блоб вытеснили между проверкой и utime - скачиваем заново
+            pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = f"{path}.{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+    try:
+        download(file_meta['id'], partial_path)
+        expected_size = file_meta.get('size')
+        if expected_size is not None and os.path.getsize(partial_path) != int(expected_size):
+            raise IOError(f"Размер {file_meta['id']} не совпадает с Drive")
+        # Атомарно: параллельные воркеры, скачавшие тот же файл, просто перезапишут блоб
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return path
+
+
+def evict_blob_cache(max_bytes=None):
+    """
+    Удаляет брошенные .part-файлы и самые давно использованные блобы,
+    пока кэш не уложится в max_bytes. Возвращает {'removed', 'freed_bytes', 'total_bytes'}.
+    """
+    max_bytes = get_cache_max_bytes() if max_bytes is None else max_bytes
+    cache_dir = get_cache_dir()
+    stats = {'removed': 0, 'freed_bytes': 0, 'total_bytes': 0}
+    if not os.path.isdir(cache_dir):
+        return stats
+
+    now = time.time()
+    blobs = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if name.endswith(PARTIAL_SUFFIX):
+                if now - st.st_mtime > PARTIAL_MAX_AGE_SECONDS:
+                    _remove(path, st.st_size, stats)
+                continue
+            blobs.append((st.st_mtime, st.st_size, path))
+            stats['total_bytes'] += st.st_size
+
+    blobs.sort()
+    for mtime, size, path in blobs:
+        if stats['total_bytes'] <= max_bytes:
+            break
+        if now - mtime < BLOB_MIN_AGE_SECONDS:
+            # Дальше только свежие блобы
+            break
+        if _remove(path, size, stats):
+            stats['total_bytes'] -= size
+
+    logger.info(f"Кэш исходников: удалено {stats['removed']} файлов, "
+                f"освобождено {stats['freed_bytes']} байт, осталось {stats['total_bytes']} байт.")
+    return stats
+
+
+def _remove(path, size, stats):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.error(f"Не удалось удалить {path} из кэша: {e}")
+        return False
+    stats['removed'] += 1
+    stats['freed_bytes'] += size
+    return True
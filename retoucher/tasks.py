@@ -1,8 +1,6 @@
 #retoucher/tasks.py
 import os
-import zipfile
 import tempfile
-import io
 import re
 import logging
 import datetime
@@ -10,21 +8,16 @@ from django.conf import settings
 from django.utils import timezone
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from django_q.tasks import async_task
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError as GoogleHttpError
-from googleapiclient.http import MediaIoBaseDownload
+from telegram_bot.delivery import enqueue_telegram_message
 
 from core.models import User
 from retoucher.models import RetouchRequest, RetouchRequestProduct
+from .archive_logic import build_drive_archive
+from .drive_cache import evict_blob_cache
 from aiogram.utils.markdown import hlink
 
 logger = logging.getLogger(__name__)
 
-SCOPES_DRIVE_READONLY = ["https://www.googleapis.com/auth/drive.readonly"]
-SERVICE_ACCOUNT_FILE_PATH = settings.SERVICE_ACCOUNT_FILE
-
 
 def download_retouch_request_files_task(retouch_request_id, user_id=None):
     """
@@ -72,64 +65,41 @@ def download_retouch_request_files_task(retouch_request_id, user_id=None):
 
         send_ws_message('status_update', {'stage': 'Инициализация', 'message': 'Начинаю подготовку архива...'})
 
-        creds = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE_PATH, scopes=SCOPES_DRIVE_READONLY)
-        drive_service = build('drive', 'v3', credentials=creds)
-
-        products = RetouchRequestProduct.objects.filter(
+        products = list(RetouchRequestProduct.objects.filter(
             retouch_request=retouch_request,
             st_request_product__photos_link__isnull=False
-        ).select_related('st_request_product__product')
+        ).select_related('st_request_product__product'))
 
-        if not products.exists():
+        if not products:
             msg = f"Нет продуктов со ссылками у заявки {request_number}"
             send_ws_message('info', {'message': msg})
             # Эта проверка уже использует `request_user` из Блока 1, что безопасно
             if request_user and request_user.profile and request_user.profile.telegram_id:
-                async_task(
-                    'telegram_bot.tasks.send_message_task',
+                enqueue_telegram_message(
                     chat_id=request_user.profile.telegram_id,
                     text=msg
                 )
             return
 
+        # Папки Drive по баркодам; товары без корректной ссылки пропускаем, как и раньше
+        folders = []
+        for p in products:
+            folder_id = get_folder_id_from_url(p.st_request_product.photos_link)
+            if folder_id:
+                folders.append((p.st_request_product.product.barcode, folder_id))
+
+        def on_folder_done(done, total, barcode):
+            send_ws_message('progress', {
+                'current': done, 'total': total, 'percent': round((done / total) * 100),
+                'description': f"Обработано: {barcode}"
+            })
+
         fd, temp_zip_path = tempfile.mkstemp(suffix=".zip", dir=settings.MEDIA_ROOT)
         os.close(fd)
 
-        with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for idx, p in enumerate(products, start=1):
-                folder_id = get_folder_id_from_url(p.st_request_product.photos_link)
-                barcode = p.st_request_product.product.barcode
-
-                if not folder_id:
-                    continue
-
-                try:
-                    response = drive_service.files().list(
-                        q=f"'{folder_id}' in parents and trashed=false",
-                        fields="files(id,name)",
-                        includeItemsFromAllDrives=True,
-                        supportsAllDrives=True
-                    ).execute()
-
-                    for f in response.get('files', []):
-                        file_id, file_name = f['id'], f['name']
-                        request = drive_service.files().get_media(fileId=file_id)
-                        buf = io.BytesIO()
-                        downloader = MediaIoBaseDownload(buf, request)
-                        done = False
-                        while not done:
-                            _, done = downloader.next_chunk()
-                        buf.seek(0)
-                        zipf.writestr(f"{barcode}/{file_name}", buf.read())
-
-                except Exception as e:
-                    logger.warning(f"Ошибка при обработке {barcode}: {e}")
-
-                send_ws_message('progress', {
-                    'current': idx, 'total': products.count(), 'percent': round((idx / products.count()) * 100),
-                    'description': f"Обработано: {barcode}"
-                })
+        # Параллельный листинг/скачивание и потоковая запись в архив
+        stats = build_drive_archive(temp_zip_path, folders, on_folder_done=on_folder_done)
+        logger.info(f"Архив заявки {request_number} собран: {stats}")
 
         final_dir = os.path.join(settings.MEDIA_ROOT, 'retouch_downloads')
         os.makedirs(final_dir, exist_ok=True)
@@ -148,8 +118,7 @@ def download_retouch_request_files_task(retouch_request_id, user_id=None):
             })
             message = f"Готов архив для {request_number} \n {frontend_url}"
             if request_user.profile and request_user.profile.telegram_id:
-                async_task(
-                    'telegram_bot.tasks.send_message_task', 
+                enqueue_telegram_message(
                     chat_id=request_user.profile.telegram_id,
                     text=message
                 )
@@ -181,12 +150,18 @@ def cleanup_old_retouch_archives(days_to_keep=1):
     """
     Dramatiq task to delete old retouch request archives from the media directory.
     By default, deletes archives older than 1 day.
+    Also trims the Drive source blob cache down to RETOUCH_BLOB_CACHE_MAX_BYTES.
     """
     cleanup_threshold = timezone.now() - datetime.timedelta(days=days_to_keep)
 
     archive_dir = os.path.join(settings.MEDIA_ROOT, 'retouch_downloads')
     logger.info(f"Starting cleanup of old archives in: {archive_dir}. Deleting files older than {days_to_keep} day(s).")
 
+    try:
+        evict_blob_cache()
+    except Exception as e:
+        logger.error(f"Error evicting blob cache: {e}", exc_info=True)
+
     if not os.path.exists(archive_dir):
         logger.warning(f"Directory '{archive_dir}' does not exist. Skipping cleanup.")
         return
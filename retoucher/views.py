@@ -6,6 +6,7 @@ import io
 import logging
 import re
 from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 
 from django.utils import timezone
 from django.conf import settings
@@ -166,8 +167,7 @@ class SendRequestForReviewView(views.APIView):
 
         for senior in senior_retouchers:
             if hasattr(senior, 'profile') and senior.profile.telegram_id:
-                async_task(
-                    'telegram_bot.tasks.send_message_task',
+                enqueue_telegram_message(
                     chat_id=senior.profile.telegram_id,
                     text=message
                 )
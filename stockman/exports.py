@@ -0,0 +1,33 @@
+# stockman/exports.py
+from core.export_logic import (
+    ExportColumn, TableExport, as_int_or_raw, as_text, as_yes_no, datetime_formatter, full_name
+)
+from core.models import OrderProduct
+
+
+def _order_products_queryset():
+    return OrderProduct.objects.order_by('-order__OrderNumber', 'product__barcode')
+
+
+ORDER_PRODUCTS_EXPORT = TableExport(
+    name='order_products',
+    filename='order_products',
+    sheet_title='OrderProducts',
+    get_queryset=_order_products_queryset,
+    columns=[
+        ExportColumn('Штрихкод', ['product__barcode'], as_int_or_raw),
+        ExportColumn('Наименование', ['product__name']),
+        ExportColumn('ID магазина', ['product__seller'], as_int_or_raw),
+        ExportColumn('Номер заказа', ['order__OrderNumber'], as_int_or_raw),
+        ExportColumn('Статус заказа', ['order__status__name'], as_text),
+        ExportColumn('Дата создания заказа', ['order__date'], formatter_factory=datetime_formatter),
+        ExportColumn('Заказчик', ['order__creator__first_name', 'order__creator__last_name'], full_name,
+                     present_if='order__creator_id'),
+        ExportColumn('Дата сборки заказа', ['order__assembly_date'], formatter_factory=datetime_formatter),
+        ExportColumn('Товаровед приемки', ['order__accept_user__first_name', 'order__accept_user__last_name'],
+                     full_name, present_if='order__accept_user_id'),
+        ExportColumn('Дата приемки заказа', ['order__accept_date'], formatter_factory=datetime_formatter),
+        ExportColumn('Дата приемки товара', ['accepted_date'], formatter_factory=datetime_formatter),
+        ExportColumn('Принято', ['accepted'], as_yes_no),
+    ],
+)
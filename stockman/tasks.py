@@ -4,7 +4,7 @@ from collections import defaultdict
 from django.utils import timezone
 from aiogram.utils.markdown import hbold
 from asgiref.sync import async_to_sync
-from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from core.models import ProductOperation
 
 def schedule_product_operations_stats():
@@ -84,8 +84,7 @@ def schedule_product_operations_stats():
     target_chat_id = "-1002213405207" # Используем строку для надежности
 
     print(f"Попытка отправки статистики товароведов в чат {target_chat_id}...")
-    async_task(
-        'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+    enqueue_telegram_message(
         chat_id=target_chat_id,
         text=message_text
     )
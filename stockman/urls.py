@@ -25,6 +25,7 @@ urlpatterns = [
     path('current-products/', views.PublicCurrentProducts.as_view(), name='current-products'),
     path('orderproducts/', views.OrderProductListAPIView.as_view(), name='orderproducts-list'),
     path('export_order_products/', views.export_order_products, name='export-order-products'),
+    path('export_order_products/async/', views.export_order_products_async, name='export-order-products-async'),
     #Принятые без заявок
     path('problematic-products-1/', views.ProblematicProduct1ListView.as_view(), name='problematic-product-list-1'),
     #дубликаты в заявках
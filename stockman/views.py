@@ -1,4 +1,5 @@
 from django.shortcuts import render, get_object_or_404
+from django.db import transaction
 from django.utils import timezone
 from django.utils.timezone import localtime
 from django.http import HttpResponse
@@ -10,12 +11,11 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.filters import OrderingFilter
 from rest_framework.generics import ListAPIView
-from django_q.tasks import async_task
+from telegram_bot.delivery import enqueue_telegram_message
 from django.db.models import Count, Q, ExpressionWrapper, F, DurationField, Subquery, OuterRef, Exists
 from django_filters.rest_framework import DjangoFilterBackend
 from datetime import datetime, timedelta
 from tgbot.tgbot import send_order_accept_message
-from openpyxl import Workbook
 
 from core.models import (
     Order,
@@ -35,6 +35,10 @@ from core.models import (
     Invoice,
     InvoiceProduct,
     )
+from core.reference_data import get_reference, get_reference_or_none
+from manager.numbering_logic import allocate_number, STREQUEST_SEQUENCE
+from core.export_logic import EXPORT_FORMAT_XLSX, EXPORT_FORMATS, enqueue_export, export_response
+from .exports import ORDER_PRODUCTS_EXPORT
 from .serializers import (
     OrderSerializer,
     OrderStatusSerializer,
@@ -200,7 +204,7 @@ def order_accept_start(request, ordernumber):
     
     # Обновление статуса заказа на статус с id=4
     try:
-        new_status = OrderStatus.objects.get(pk=4)
+        new_status = get_reference(OrderStatus, 4)
     except OrderStatus.DoesNotExist:
         return Response({"error": "Статус заказа с id 4 не найден."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -282,12 +286,23 @@ def order_accept_product(request, ordernumber):
     results = []
     products_with_info_details = [] # Список для хранения кортежей (barcode, info)
 
+    # Все товары, тип операции и строки заказа - одним запросом каждое
+    products = Product.objects.in_bulk({str(bc) for bc in barcodes}, field_name='barcode')
+    operation_type = get_reference_or_none(ProductOperationTypes, 3)
+    order_products = defaultdict(list)
+    for order_product in OrderProduct.objects.filter(order=order, product__in=products.values()):
+        order_products[order_product.product_id].append(order_product)
+
+    now = timezone.now()
+    products_to_update = {}
+    operations_to_create = []
+    order_products_to_update = {}
+
     for barcode in barcodes:
         barcode_result = {"barcode": barcode}
         # Находим продукт по штрихкоду
-        try:
-            product = Product.objects.get(barcode=barcode)
-        except Product.DoesNotExist:
+        product = products.get(str(barcode))
+        if product is None:
             barcode_result["error"] = "Продукт с данным штрихкодом не найден."
             results.append(barcode_result)
             continue
@@ -301,41 +316,58 @@ def order_accept_product(request, ordernumber):
         # Обновляем поля модели Product
         product.move_status_id = 3  # статус "приемки", предполагается, что статус с id=3 существует
         product.income_stockman = request.user
-        product.income_date = timezone.now()
-        product.save()
+        product.income_date = now
+        product.updated_at = now  # bulk_update не проставляет auto_now
+        products_to_update[product.pk] = product
 
         # Создаем запись в ProductOperation
-        try:
-            operation_type = ProductOperationTypes.objects.get(pk=3)
-        except ProductOperationTypes.DoesNotExist:
+        if operation_type is None:
             barcode_result["error"] = "Тип операции с id 3 не найден."
             # Важно: если продукт уже обработан и info добавлено, но тут ошибка,
             # сообщение все равно будет отправлено в конце. Это поведение можно изменить при необходимости.
             results.append(barcode_result)
-            continue 
+            continue
 
-        ProductOperation.objects.create(
+        # bulk_create не вызывает ProductOperation.save() - статусы товара копируем сами
+        operations_to_create.append(ProductOperation(
             product=product,
             operation_type=operation_type,
             user=request.user,
-            # date выставится автоматически через auto_now_add (если так настроена модель ProductOperation)
-        )
+            ProductStatus=product.ProductStatus,
+            ProductModerationStatus=product.ProductModerationStatus,
+            PhotoModerationStatus=product.PhotoModerationStatus,
+            SKUStatus=product.SKUStatus,
+        ))
 
         # Обновляем запись в OrderProduct
-        try:
-            order_product = OrderProduct.objects.get(order=order, product=product)
-        except OrderProduct.DoesNotExist:
+        if not order_products.get(product.pk):
             barcode_result["error"] = "Продукт не найден в заказе."
             results.append(barcode_result)
             continue
 
-        order_product.accepted = True
-        order_product.accepted_date = timezone.now()
-        order_product.save()
+        for order_product in order_products[product.pk]:
+            order_product.accepted = True
+            order_product.accepted_date = now
+            order_product.updated_at = now
+            order_products_to_update[order_product.pk] = order_product
 
         barcode_result["status"] = "Продукт успешно принят."
         results.append(barcode_result)
 
+    with transaction.atomic():
+        if products_to_update:
+            Product.objects.bulk_update(
+                products_to_update.values(),
+                ['move_status', 'income_stockman', 'income_date', 'updated_at']
+            )
+        if operations_to_create:
+            ProductOperation.objects.bulk_create(operations_to_create)
+        if order_products_to_update:
+            OrderProduct.objects.bulk_update(
+                order_products_to_update.values(),
+                ['accepted', 'accepted_date', 'updated_at']
+            )
+
     # <<< НАЧАЛО ДОПОЛНЕНИЯ - ОТПРАВКА СООБЩЕНИЯ >>>
     if products_with_info_details:
         message_lines = ["Приняты товары с инфо:"]
@@ -346,8 +378,7 @@ def order_accept_product(request, ordernumber):
         chat_id_to_send = '-1002559221974'
         thread_id_to_send = 2
         
-        async_task(
-            'telegram_bot.tasks.send_message_task',
+        enqueue_telegram_message(
             chat_id=chat_id_to_send,
             text=telegram_message_text,
             message_thread_id=thread_id_to_send
@@ -359,19 +390,10 @@ def order_accept_product(request, ordernumber):
 #получение следующего номера заявки
 def get_next_request_number():
     """
-    Вспомогательная функция для вычисления следующего номера заявки.
-    Если заявок нет или RequestNumber некорректен, начальное значение равно 1.
+    Вспомогательная функция для выдачи следующего номера заявки.
+    Номер резервируется в общем счетчике, повторно он не выдается.
     """
-    last_request = STRequest.objects.order_by('-RequestNumber').first()
-    if last_request:
-        try:
-            last_number = int(last_request.RequestNumber)
-        except ValueError:
-            last_number = 0
-    else:
-        last_number = 0
-    new_number = last_number + 1
-    return str(new_number)
+    return str(allocate_number(STREQUEST_SEQUENCE))
 
 #создание новой заявки (пустой черновик)
 @api_view(['POST'])
@@ -380,7 +402,7 @@ def strequest_create(request):
     next_number = get_next_request_number()
     
     try:
-        status_instance = STRequestStatus.objects.get(pk=2)
+        status_instance = get_reference(STRequestStatus, 2)
     except STRequestStatus.DoesNotExist:
         return Response(
             {"error": "Статус заявки с id=1 не найден."},
@@ -411,7 +433,7 @@ def strequest_create_barcodes(request):
     
     # Получаем статус заявки с id=2
     try:
-        status_instance = STRequestStatus.objects.get(pk=2)
+        status_instance = get_reference(STRequestStatus, 2)
     except STRequestStatus.DoesNotExist:
         return Response({"error": "Статус заявки с id=2 не найден."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -424,7 +446,7 @@ def strequest_create_barcodes(request):
     
     # Получаем тип операции для ProductOperation с id=71
     try:
-        product_operation_type = ProductOperationTypes.objects.get(id=71)
+        product_operation_type = get_reference(ProductOperationTypes, 71)
     except ProductOperationTypes.DoesNotExist:
         return Response({"error": "Тип операции ProductOperation с id=71 не найден."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -570,7 +592,7 @@ def strequest_add_product(request, STRequestNumber, Barcode):
     
     # 6. Создаем запись ProductOperation
     try:
-        operation_type_instance = ProductOperationTypes.objects.get(id=71)
+        operation_type_instance = get_reference(ProductOperationTypes, 71)
     except ProductOperationTypes.DoesNotExist:
         return Response(
             {"error": "Тип операции для ProductOperation с id=71 не найден."},
@@ -631,7 +653,7 @@ def strequest_delete_barcode(request, STRequestNumber, Barcode):
     
     # 5. Создаем запись ProductOperation с типом операции id=72
     try:
-        operation_type_instance = ProductOperationTypes.objects.get(id=72)
+        operation_type_instance = get_reference(ProductOperationTypes, 72)
     except ProductOperationTypes.DoesNotExist:
         return Response(
             {"error": "Тип операции для ProductOperation с id=72 не найден."},
@@ -805,14 +827,14 @@ class InvoiceCreateView(APIView):
 
         # Получаем статус товародвижения с id=4
         try:
-            new_move_status = ProductMoveStatus.objects.get(id=4)
+            new_move_status = get_reference(ProductMoveStatus, 4)
         except ProductMoveStatus.DoesNotExist:
             return Response({"error": "ProductMoveStatus с id=4 не найден."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Получаем тип операции с id=4 для создания записи ProductOperation
         try:
-            op_type = ProductOperationTypes.objects.get(id=4)
+            op_type = get_reference(ProductOperationTypes, 4)
         except ProductOperationTypes.DoesNotExist:
             return Response({"error": "ProductOperationType с id=4 не найден."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -865,8 +887,7 @@ def check_and_notify_defect(product):
         # Отправляем сообщение в указанный чат
         chat_id_to_send="-1002559221974"
         thread_id="447"
-        async_task(
-            'telegram_bot.tasks.send_message_task', # Путь к нашей функции
+        enqueue_telegram_message(
             chat_id=chat_id_to_send,
             text=message,
             message_thread_id=thread_id
@@ -892,7 +913,7 @@ class ProductMarkDefectView(APIView):
         
         # Обновляем статус товародвижения на 25
         try:
-            defect_status = ProductMoveStatus.objects.get(id=25)
+            defect_status = get_reference(ProductMoveStatus, 25)
         except ProductMoveStatus.DoesNotExist:
             return Response({"error": "Статус товародвижения с id=25 не найден."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -901,7 +922,7 @@ class ProductMarkDefectView(APIView):
         
         # Создаем операцию с типом 25
         try:
-            op_type = ProductOperationTypes.objects.get(id=25)
+            op_type = get_reference(ProductOperationTypes, 25)
         except ProductOperationTypes.DoesNotExist:
             return Response({"error": "Тип операции с id=25 не найден."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -936,7 +957,7 @@ class ProductMarkOpenedView(APIView):
         
         # Обновляем статус товародвижения на 30
         try:
-            opened_status = ProductMoveStatus.objects.get(id=30)
+            opened_status = get_reference(ProductMoveStatus, 30)
         except ProductMoveStatus.DoesNotExist:
             return Response({"error": "Статус товародвижения с id=30 не найден."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -945,7 +966,7 @@ class ProductMarkOpenedView(APIView):
         
         # Создаем операцию с типом 30
         try:
-            op_type = ProductOperationTypes.objects.get(id=30)
+            op_type = get_reference(ProductOperationTypes, 30)
         except ProductOperationTypes.DoesNotExist:
             return Response({"error": "Тип операции с id=30 не найден."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1021,108 +1042,25 @@ class OrderProductListAPIView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 def export_order_products(request):
-    # Получаем все записи с нужной сортировкой и заранее выбираем связанные объекты:
-    order_products = OrderProduct.objects.select_related(
-        'order',
-        'product',
-        'order__status',
-        'order__creator',
-        'order__accept_user'
-    ).order_by('-order__OrderNumber', 'product__barcode')
-
-    # Создаем книгу и активный лист
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "OrderProducts"
-
-    # Определяем заголовки колонок
-    headers = [
-        'Штрихкод', 
-        'Наименование', 
-        'ID магазина', 
-        'Номер заказа', 
-        'Статус заказа', 
-        'Дата создания заказа', 
-        'Заказчик', 
-        'Дата сборки заказа', 
-        'Товаровед приемки', 
-        'Дата приемки заказа', 
-        'Дата приемки товара', 
-        'Принято'
-    ]
-    ws.append(headers)
-
-    for op in order_products:
-        # Преобразуем штрихкод в число, если это возможно
-        barcode = op.product.barcode
-        try:
-            barcode_num = int(barcode)
-        except (ValueError, TypeError):
-            barcode_num = barcode
-
-        name = op.product.name
-
-        # Преобразуем seller в число, если возможно
-        try:
-            shop_id = int(op.product.seller) if op.product.seller is not None else None
-        except (ValueError, TypeError):
-            shop_id = op.product.seller
-
-        try:
-            order_number = int(op.order.OrderNumber) if op.order.OrderNumber is not None else None
-        except (ValueError, TypeError):
-            order_number = op.order.OrderNumber
-
-        order_status = op.order.status.name if op.order.status else ''
-
-        creation_date = (
-            timezone.localtime(op.order.date).strftime('%d.%m.%Y %H:%M:%S')
-            if op.order.date else ''
-        )
-        customer = (
-            f"{op.order.creator.first_name} {op.order.creator.last_name}"
-            if op.order.creator else ''
-        )
-        assembly_date = (
-            timezone.localtime(op.order.assembly_date).strftime('%d.%m.%Y %H:%M:%S')
-            if op.order.assembly_date else ''
-        )
-        accept_user = (
-            f"{op.order.accept_user.first_name} {op.order.accept_user.last_name}"
-            if op.order.accept_user else ''
-        )
-        order_accept_date = (
-            timezone.localtime(op.order.accept_date).strftime('%d.%m.%Y %H:%M:%S')
-            if op.order.accept_date else ''
-        )
-        product_accepted_date = (
-            timezone.localtime(op.accepted_date).strftime('%d.%m.%Y %H:%M:%S')
-            if op.accepted_date else ''
-        )
-        accepted = "да" if op.accepted else "нет"
-
-        row = [
-            barcode_num,
-            name,
-            shop_id,
-            order_number,
-            order_status,
-            creation_date,
-            customer,
-            assembly_date,
-            accept_user,
-            order_accept_date,
-            product_accepted_date,
-            accepted,
-        ]
-        ws.append(row)
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # Строки читаются потоком через values().iterator(), XLSX пишется write_only-книгой.
+    # ?format=csv - потоковый CSV
+    export_format = request.GET.get('format', EXPORT_FORMAT_XLSX)
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse(f"Неизвестный формат: {export_format}", status=400)
+    return export_response(ORDER_PRODUCTS_EXPORT, export_format)
+
+# Фоновая выгрузка OrderProduct: файл в MEDIA_ROOT, ссылка приходит по WebSocket
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def export_order_products_async(request):
+    export_format = request.data.get('format', EXPORT_FORMAT_XLSX)
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': f"Неизвестный формат: {export_format}"}, status=status.HTTP_400_BAD_REQUEST)
+    task_id = enqueue_export('stockman.exports.ORDER_PRODUCTS_EXPORT', request.user.id, export_format)
+    return Response(
+        {'message': 'Выгрузка запущена, ждите уведомления.', 'task_id': task_id},
+        status=status.HTTP_202_ACCEPTED
     )
-    response['Content-Disposition'] = 'attachment; filename="order_products.xlsx"'
-    wb.save(response)
-    return response
 
 #Проблемные товары 1
 class ProblematicProduct1ListView(generics.ListAPIView):
@@ -1338,7 +1276,7 @@ class BarcodePrintView(APIView):
         # 3. If checks are passed, create a new ProductOperation record
         try:
             # Assuming ProductOperationType with id=7 is for "Barcode Print"
-            print_operation_type = ProductOperationTypes.objects.get(id=7)
+            print_operation_type = get_reference(ProductOperationTypes, 7)
         except ProductOperationTypes.DoesNotExist:
             # This indicates a server configuration issue
             return Response(
@@ -1393,7 +1331,7 @@ def determine_and_set_strequest_type(request_number):
         st_req.save(update_fields=['STRequestType'])
 
     # возвращаем сам объект STRequestType
-    return STRequestType.objects.get(pk=chosen_id)
+    return get_reference(STRequestType, chosen_id)
 
 #Вручную меняем STRequestType и блокируем
 @api_view(['POST'])
@@ -1412,7 +1350,7 @@ def manual_set_strequest_type(request, RequestNumber, strequest_type_id):
 
     # 2) Находим нужный тип
     try:
-        new_type = STRequestType.objects.get(pk=strequest_type_id)
+        new_type = get_reference(STRequestType, strequest_type_id)
     except STRequestType.DoesNotExist:
         return Response({"error": "Тип заявки не найден"}, status=404)
 
@@ -0,0 +1,290 @@
+# telegram_bot/delivery.py
+"""
+Очередь исходящих сообщений Telegram.
+
+enqueue_telegram_message() кладет сообщение в Redis stream и сразу возвращается -
+не занимает воркер Django-Q. Доставкой занимается долгоживущий воркер
+(manage.py run_telegram_delivery):
+- одна aiohttp-сессия бота на весь процесс;
+- лимиты Telegram через token bucket: общий и на каждый чат;
+- сообщения в один чат/топик, пришедшие в пределах COALESCE_WINDOW, склеиваются;
+- у каждого чата своя очередь и своя корутина отправки: ожидание лимита чата, retry_after
+  на 429 или паузы после сетевой ошибки задерживают только этот чат, чтение стрима
+  и остальные чаты идут дальше;
+- сообщение подтверждается (XACK) после отправки.
+Если Redis недоступен, сообщение уходит старым путем - задачей send_message_task.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict
+
+import redis
+import redis.asyncio as aioredis
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter
+from django.conf import settings
+from django_q.tasks import async_task
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_STREAM = 'telegram:outbox'
+OUTBOX_GROUP = 'telegram-delivery'
+# Приблизительный предел длины стрима - защита от разрастания при остановленном воркере
+OUTBOX_MAXLEN = 100000
+
+# Сообщения в один чат/топик в пределах окна отправляются одним сообщением
+COALESCE_WINDOW = 1.0
+READ_BATCH = 200
+# Лимит длины текста одного сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+MESSAGE_SEPARATOR = "\n\n"
+
+# Лимиты Telegram: ~30 сообщений/с всего, 1/с в личный чат, 20/мин в группу
+GLOBAL_RATE = 25
+PRIVATE_CHAT_RATE = 1
+GROUP_CHAT_RATE = 20 / 60
+GROUP_CHAT_BURST = 3
+
+MAX_SEND_ATTEMPTS = 5
+# Сколько склеенных сообщений может ждать отправки во всех чатах, прежде чем чтение стрима встанет
+MAX_QUEUED = 1000
+# Через сколько секунд простоя корутина чата завершается
+CHAT_IDLE_TIMEOUT = 60
+# Через сколько мс чужие неподтвержденные сообщения (упавший воркер) забираются себе
+CLAIM_IDLE_MS = 60000
+
+
+def get_outbox_redis_config():
+    default = {
+        'host': settings.Q_CLUSTER['redis']['host'],
+        'port': settings.Q_CLUSTER['redis']['port'],
+        'db': 3,
+    }
+    return {**default, **getattr(settings, 'TELEGRAM_OUTBOX_REDIS', {})}
+
+
+_redis_client = None
+
+
+def _get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis(**get_outbox_redis_config(), socket_timeout=2, socket_connect_timeout=1)
+    return _redis_client
+
+
+def enqueue_telegram_message(chat_id, text, message_thread_id=None, **kwargs):
+    """
+    Ставит сообщение в очередь доставки. Аргументы как у send_message_task:
+    kwargs (parse_mode, disable_web_page_preview ...) передаются в send_message.
+    """
+    message = {'chat_id': chat_id, 'text': text, 'message_thread_id': message_thread_id, 'kwargs': kwargs}
+    try:
+        payload = json.dumps(message, ensure_ascii=False)
+        _get_redis().xadd(OUTBOX_STREAM, {'payload': payload}, maxlen=OUTBOX_MAXLEN, approximate=True)
+    except (TypeError, ValueError, redis.RedisError) as e:
+        # reply_markup и т.п. не сериализуются, Redis может быть недоступен - отправляем по-старому
+        logger.warning(f"Сообщение в чат {chat_id} не поставлено в очередь доставки ({e}), отправка задачей.")
+        async_task(
+            'telegram_bot.tasks.send_message_task',
+            chat_id=chat_id,
+            text=text,
+            message_thread_id=message_thread_id,
+            **kwargs
+        )
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _chat_bucket(chat_id):
+    # У групп и каналов отрицательный chat_id
+    if str(chat_id).startswith('-'):
+        return TokenBucket(GROUP_CHAT_RATE, GROUP_CHAT_BURST)
+    return TokenBucket(PRIVATE_CHAT_RATE)
+
+
+def coalesce_messages(entries):
+    """
+    entries: [(stream_id, message)] в порядке поступления.
+    Склеивает сообщения с одинаковыми чатом, топиком и параметрами отправки.
+    Возвращает {chat_id: [(stream_ids, chat_id, text, send_kwargs)]} с сохранением порядка.
+    """
+    groups = OrderedDict()
+    for stream_id, message in entries:
+        send_kwargs = dict(message.get('kwargs') or {})
+        if message.get('message_thread_id') is not None:
+            send_kwargs['message_thread_id'] = message['message_thread_id']
+        key = (str(message['chat_id']), json.dumps(send_kwargs, sort_keys=True))
+        groups.setdefault(key, (message['chat_id'], send_kwargs, []))[2].append((stream_id, message['text']))
+
+    by_chat = OrderedDict()
+    for (chat_key, _), (chat_id, send_kwargs, items) in groups.items():
+        outgoing = by_chat.setdefault(chat_key, [])
+        stream_ids, texts = [], []
+        for stream_id, text in items:
+            text = str(text)
+            if texts and len(MESSAGE_SEPARATOR.join(texts + [text])) > MAX_MESSAGE_LENGTH:
+                outgoing.append((stream_ids, chat_id, MESSAGE_SEPARATOR.join(texts), send_kwargs))
+                stream_ids, texts = [], []
+            stream_ids.append(stream_id)
+            texts.append(text)
+        outgoing.append((stream_ids, chat_id, MESSAGE_SEPARATOR.join(texts), send_kwargs))
+    return by_chat
+
+
+class TelegramDeliveryWorker:
+
+    def __init__(self, bot, consumer_name=None):
+        self.bot = bot
+        self.consumer = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self.redis = aioredis.Redis(**get_outbox_redis_config())
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        # chat_key -> (очередь склеенных сообщений, задача отправки)
+        self.chats = {}
+        self.queued = asyncio.Semaphore(MAX_QUEUED)
+        self.sent = 0
+
+    async def run(self):
+        await self._ensure_group()
+        # Сначала свои и брошенные упавшими воркерами неподтвержденные сообщения
+        try:
+            await self.redis.xautoclaim(OUTBOX_STREAM, OUTBOX_GROUP, self.consumer,
+                                        min_idle_time=CLAIM_IDLE_MS, start_id='0-0', count=READ_BATCH)
+        except redis.ResponseError as e:
+            # XAUTOCLAIM появился в Redis 6.2
+            logger.warning(f"Не удалось забрать брошенные сообщения Telegram: {e}")
+        # Чтение pending идет дальше последней обработанной записи: неподтвержденная запись
+        # не зацикливает разбор, а остается в pending до следующего перезапуска
+        last_id = '0'
+        while True:
+            pending = await self._read(last_id, block=None)
+            if not pending:
+                break
+            last_id = pending[-1][0]
+            await self._dispatch(pending)
+
+        while True:
+            entries = await self._read('>', block=5000)
+            if not entries:
+                continue
+            deadline = time.monotonic() + COALESCE_WINDOW
+            while len(entries) < READ_BATCH:
+                remaining_ms = int((deadline - time.monotonic()) * 1000)
+                if remaining_ms <= 0:
+                    break
+                more = await self._read('>', block=remaining_ms)
+                if not more:
+                    break
+                entries.extend(more)
+            await self._dispatch(entries)
+
+    async def close(self):
+        tasks = [task for _, task in self.chats.values()]
+        for task in tasks:
+            task.cancel()
+        # Неотправленные сообщения остаются в pending и будут отправлены после перезапуска
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.redis.aclose()
+        if getattr(self.bot, 'session', None):
+            await self.bot.session.close()
+
+    async def _ensure_group(self):
+        try:
+            await self.redis.xgroup_create(OUTBOX_STREAM, OUTBOX_GROUP, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def _read(self, stream_id, block):
+        response = await self.redis.xreadgroup(OUTBOX_GROUP, self.consumer, {OUTBOX_STREAM: stream_id},
+                                               count=READ_BATCH, block=block)
+        entries = []
+        for _, messages in response or []:
+            for entry_id, fields in messages:
+                if not fields:
+                    # Запись удалена из стрима (MAXLEN), а в pending осталась
+                    await self.redis.xack(OUTBOX_STREAM, OUTBOX_GROUP, entry_id)
+                    continue
+                try:
+                    entries.append((entry_id, json.loads(fields[b'payload'])))
+                except (KeyError, ValueError) as e:
+                    logger.error(f"Битое сообщение {entry_id} в очереди Telegram: {e}")
+                    await self.redis.xack(OUTBOX_STREAM, OUTBOX_GROUP, entry_id)
+        return entries
+
+    async def _dispatch(self, entries):
+        """Раздает склеенные сообщения по очередям чатов; ждет, только если очереди переполнены."""
+        for chat_key, outgoing in coalesce_messages(entries).items():
+            for item in outgoing:
+                await self.queued.acquire()
+                chat = self.chats.get(chat_key)
+                if chat is None:
+                    queue = asyncio.Queue()
+                    chat = self.chats[chat_key] = (queue, asyncio.create_task(self._chat_worker(chat_key, queue)))
+                chat[0].put_nowait(item)
+
+    async def _chat_worker(self, chat_key, queue):
+        # Внутри чата - строго по порядку
+        bucket = _chat_bucket(chat_key)
+        while True:
+            try:
+                stream_ids, chat_id, text, send_kwargs = await asyncio.wait_for(queue.get(), CHAT_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    del self.chats[chat_key]
+                    return
+                continue
+            try:
+                await self._send(bucket, chat_id, text, send_kwargs)
+                await self.redis.xack(OUTBOX_STREAM, OUTBOX_GROUP, *stream_ids)
+            except Exception as e:
+                # Сбой одного чата не останавливает остальные; неподтвержденные сообщения
+                # останутся в pending и будут повторены после перезапуска
+                logger.error(f"Ошибка доставки сообщений в чат {chat_key}: {e!r}", exc_info=e)
+            finally:
+                self.queued.release()
+
+    async def _send(self, bucket, chat_id, text, send_kwargs):
+        for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, **send_kwargs)
+                self.sent += 1
+                return True
+            except TelegramRetryAfter as e:
+                logger.warning(f"Telegram 429 для чата {chat_id}, повтор через {e.retry_after} с.")
+                await asyncio.sleep(e.retry_after)
+            except TelegramNetworkError as e:
+                logger.warning(f"Сетевая ошибка при отправке в чат {chat_id} (попытка {attempt}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+            except TelegramAPIError as e:
+                # Бот заблокирован, чат не найден и т.п. - повтор не поможет
+                logger.error(f"Ошибка API при отправке сообщения в чат {chat_id}: {e}")
+                return False
+            except Exception as e:
+                # Неподдерживаемый параметр send_message, ошибка aiohttp и т.п.: сообщение подтверждается
+                # и не повторяется, иначе после перезапуска оно снова первым уронило бы доставку
+                logger.exception(f"Сообщение в чат {chat_id} отброшено из-за ошибки отправки: {e!r}")
+                return False
+        logger.error(f"Сообщение в чат {chat_id} не доставлено за {MAX_SEND_ATTEMPTS} попыток.")
+        return False
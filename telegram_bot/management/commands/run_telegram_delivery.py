@@ -0,0 +1,24 @@
+# telegram_bot/management/commands/run_telegram_delivery.py
+import asyncio
+from django.core.management.base import BaseCommand
+from telegram_bot.bot_instance import bot
+from telegram_bot.delivery import TelegramDeliveryWorker
+
+class Command(BaseCommand):
+    help = 'Запускает воркер доставки исходящих сообщений Telegram из очереди Redis'
+
+    async def handle_async(self):
+        worker = TelegramDeliveryWorker(bot)
+        self.stdout.write(self.style.SUCCESS(f'Воркер доставки запущен ({worker.consumer})...'))
+        try:
+            await worker.run()
+        finally:
+            await worker.close()
+            self.stdout.write(f'Отправлено сообщений: {worker.sent}')
+
+    def handle(self, *args, **options):
+        """Синхронный wrapper для вызова асинхронного кода."""
+        try:
+            asyncio.run(self.handle_async())
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Работа воркера доставки прервана.'))
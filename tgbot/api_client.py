@@ -0,0 +1,137 @@
+# api_client.py
+"""
+Общий HTTP-клиент бота для обращений к нашему бэкенду.
+
+Одна requests.Session на процесс: соединения с BACKEND_URL переиспользуются (keep-alive),
+у каждого запроса есть таймаут. fetch_json() с cache_ttl держит ответ в памяти
+по ключу эндпоинт + параметры, так что несколько сообщений по расписанию
+в одну минуту делают один запрос.
+
+get_queues_data() внутри процесса Django (бот импортирован из views/задач)
+считает очереди напрямую через manager.queue_logic, без HTTP.
+"""
+import copy
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .botconfig import BACKEND_URL
+
+logger = logging.getLogger(__name__)
+
+# (подключение, чтение) в секундах
+DEFAULT_TIMEOUT = (5, 15)
+# Сколько секунд ответ /mn/queues/ считается свежим
+QUEUES_CACHE_TTL = 60
+POOL_MAXSIZE = 10
+
+_session = None
+_session_lock = threading.Lock()
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Повторы только при обрыве соединения и для идемпотентных методов
+                retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5,
+                              allowed_methods=frozenset(['GET', 'HEAD']))
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def _url(path):
+    return f"{BACKEND_URL}{path}"
+
+
+def _cache_key(path, params):
+    return path, tuple(sorted((params or {}).items()))
+
+
+def _cache_get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del _cache[key]
+            return None
+    # Копия - вызывающий код может изменять ответ
+    return copy.deepcopy(data)
+
+
+def _cache_set(key, data, ttl):
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + ttl, copy.deepcopy(data))
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def api_get(path, params=None, timeout=DEFAULT_TIMEOUT):
+    """GET к бэкенду через общую сессию. Возвращает requests.Response."""
+    return get_session().get(_url(path), params=params, timeout=timeout)
+
+
+def api_post(path, json=None, timeout=DEFAULT_TIMEOUT):
+    """POST к бэкенду через общую сессию. Возвращает requests.Response."""
+    return get_session().post(_url(path), json=json, timeout=timeout)
+
+
+def fetch_json(path, params=None, timeout=DEFAULT_TIMEOUT, cache_ttl=0):
+    """
+    GET с проверкой статуса, возвращает разобранный JSON.
+    cache_ttl > 0 - ответ кэшируется по пути и параметрам.
+    Исключения requests и ValueError (не JSON) пробрасываются вызывающему.
+    """
+    key = _cache_key(path, params)
+    if cache_ttl:
+        data = _cache_get(key)
+        if data is not None:
+            return data
+    response = api_get(path, params=params, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    if cache_ttl:
+        _cache_set(key, data, cache_ttl)
+    return data
+
+
+def _django_ready():
+    try:
+        from django.apps import apps
+    except ImportError:
+        return False
+    return apps.ready
+
+
+def get_queues_data(cache_ttl=QUEUES_CACHE_TTL):
+    """
+    Данные очередей в формате эндпоинта /mn/queues/.
+    В процессе Django - напрямую из manager.queue_logic, иначе - HTTP-запросом.
+    """
+    if _django_ready():
+        key = _cache_key('/mn/queues/', None)
+        data = _cache_get(key) if cache_ttl else None
+        if data is None:
+            from manager.queue_logic import get_queue_snapshot, queue_snapshot_to_response
+            data = queue_snapshot_to_response(get_queue_snapshot())
+            if cache_ttl:
+                _cache_set(key, data, cache_ttl)
+        return data
+    return fetch_json('/mn/queues/', cache_ttl=cache_ttl)
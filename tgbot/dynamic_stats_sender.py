@@ -3,6 +3,7 @@ import requests
 from datetime import datetime, date
 from telebot import TeleBot
 import logging
+from .api_client import DEFAULT_TIMEOUT, fetch_json, get_queues_data
 from .botconfig import BACKEND_URL, TELEGRAM_TOKEN
 from .photographers import fetch_priority_strequests_data, format_priority_strequests_message
 
@@ -23,16 +24,13 @@ def send_photographers_dynamic_stats():
     today_str = today.strftime('%d.%m.%Y')
     
     # Запрашиваем данные по эндпоинту
-    endpoint_url = f"{BACKEND_URL}/mn/photographers_statistic/"
     params = {
         "date_from": start_date_str,
         "date_to": today_str,
     }
     
     try:
-        response = requests.get(endpoint_url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_json("/mn/photographers_statistic/", params=params)
     except Exception as e:
         print(f"Ошибка при запросе статистики: {e}")
         return
@@ -87,12 +85,10 @@ def get_queue_stats_message():
     Получает данные с эндпоинта очередей и формирует сообщение.
     Возвращает сформированное сообщение или None в случае ошибки.
     """
-    # Убедитесь, что URL указывает на ваш эндпоинт get_current_queues
-    api_url = f"{BACKEND_URL}/mn/queues/" # Полный URL эндпоинта
+    # Внутри Django - напрямую из manager.queue_logic, иначе запрос к /mn/queues/ (с коротким кэшем)
+    api_url = f"{BACKEND_URL}/mn/queues/"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status() # Проверка на ошибки HTTP (4xx, 5xx)
-        data = response.json()
+        data = get_queues_data()
     except requests.exceptions.RequestException as e:
         print(f"Ошибка при запросе очередей ({api_url}): {e}")
         return None
@@ -213,9 +209,7 @@ def get_queue_stats_okz_message():
     Возвращает сформированное сообщение или None в случае ошибки.
     """
     try:
-        response = requests.get(f"{BACKEND_URL}/mn/queues/")
-        response.raise_for_status()
-        data = response.json()
+        data = get_queues_data()
     except Exception as e:
         print(f"Ошибка при запросе очередей: {e}")
         return None
@@ -282,9 +276,7 @@ def scheduled_order_status_refresh():
     """
     url = f"{BACKEND_URL}/auto/order-status-refresh/"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_json("/auto/order-status-refresh/")
     except Exception as e:
         # Логирование ошибки (можно заменить на ваш способ логирования)
         print(f"Ошибка при запросе к {url}: {e}")
@@ -345,16 +337,13 @@ def send_product_operations_stats():
     start_date_str = first_day.strftime('%d.%m.%Y')
     today_str = today.strftime('%d.%m.%Y')
     
-    endpoint_url = f"{BACKEND_URL}/mn/product-operations-stats/"
     params = {
         "date_from": start_date_str,
         "date_to": today_str,
     }
     
     try:
-        response = requests.get(endpoint_url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_json("/mn/product-operations-stats/", params=params)
     except Exception as e:
         print(f"Ошибка при запросе статистики по товароведам: {e}")
         return
@@ -429,15 +418,12 @@ def get_daily_moderation_stats_message():
         today_date_str = today_date_obj.strftime("%d.%m.%Y")
 
         # 2. Формируем URL для API запроса
-        api_url = f"{BACKEND_URL}/rd/senior_moderation_stats/{today_date_str}/{today_date_str}/"
+        api_path = f"/rd/senior_moderation_stats/{today_date_str}/{today_date_str}/"
+        api_url = f"{BACKEND_URL}{api_path}"
         # print(f"Запрос статистики по URL: {api_url}") # Опционально для отладки
 
-        # 3. Выполняем GET запрос к API
-        response = requests.get(api_url, timeout=15) # Таймаут запроса
-        response.raise_for_status() # Проверяем на ошибки HTTP (4xx, 5xx)
-
-        # 4. Парсим JSON ответ
-        data = response.json()
+        # 3-4. Выполняем GET запрос к API (общая сессия, таймаут DEFAULT_TIMEOUT) и парсим JSON
+        data = fetch_json(api_path, timeout=DEFAULT_TIMEOUT)
         print(f"Получены данные: {data}") # Опционально для отладки
 
         # 5. Извлекаем статистику за сегодня
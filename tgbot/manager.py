@@ -6,6 +6,7 @@ import ast # For safely evaluating string-represented dicts/lists
 # Предполагается, что botconfig.py находится в том же каталоге
 # и содержит BACKEND_URL.
 # Если botconfig.py находится в другом месте, исправьте путь импорта.
+from .api_client import get_session
 from .botconfig import BACKEND_URL #
 
 def _format_datetime_string(iso_datetime_str): #
@@ -39,7 +40,7 @@ def get_product_operations(barcode: str): #
     }
 
     try:
-        response = requests.get(api_url, params=params, timeout=20) #
+        response = get_session().get(api_url, params=params, timeout=20) #
         response.raise_for_status() #
         data = response.json() #
     except requests.exceptions.Timeout: #
@@ -116,7 +117,7 @@ def call_update_product_info_endpoint(telegram_id: str, barcodes: list, info_tex
     }
 
     try:
-        response = requests.post(endpoint_url, json=payload, timeout=25) # Таймаут 25 секунд
+        response = get_session().post(endpoint_url, json=payload, timeout=25) # Таймаут 25 секунд
         
         if response.status_code == 200:
             data = response.json()
@@ -6,12 +6,17 @@ import logging # Рекомендуется для логирования
 # и содержит BACKEND_URL.
 try:
     from .botconfig import BACKEND_URL
+    from .api_client import get_session
 except ImportError:
     # Фолбэк, если запускается не как часть пакета (например, для тестов)
     # В рабочей среде .botconfig должен быть доступен
     logging.warning("Could not import BACKEND_URL from .botconfig. Relative import failed.")
     # Установите значение по умолчанию или обработайте ошибку, если это критично
     BACKEND_URL = "http://127.0.0.1:8000" # Пример, замените или удалите
+    _session = requests.Session()
+
+    def get_session():
+        return _session
 
 
 def fetch_priority_strequests_data():
@@ -22,7 +27,7 @@ def fetch_priority_strequests_data():
     # Убедитесь, что URL эндпоинта правильный
     api_url = f"{BACKEND_URL}/ph/strequests2/?format=json"
     try:
-        response = requests.get(api_url, timeout=15) # Таймаут 15 секунд
+        response = get_session().get(api_url, timeout=15) # Таймаут 15 секунд
         response.raise_for_status()  # Проверка на HTTP ошибки (4xx, 5xx)
         data = response.json()
         return data.get("results", []) # Возвращаем список 'results' или пустой список, если ключа нет
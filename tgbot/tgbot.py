@@ -4,6 +4,7 @@ import time
 import threading
 from datetime import datetime, timedelta
 import requests
+from .api_client import DEFAULT_TIMEOUT, get_session
 from .botconfig import BACKEND_URL, TELEGRAM_TOKEN
 from .dynamic_stats_sender import (
     send_photographers_dynamic_stats,
@@ -53,7 +54,7 @@ def get_stats(date_str):
 
     try:
         # Добавляем таймаут для предотвращения зависания
-        response = requests.get(endpoint_url, params=params, timeout=15)
+        response = get_session().get(endpoint_url, params=params, timeout=15)
         response.raise_for_status() # Проверяет на HTTP ошибки (4xx, 5xx)
         data = response.json()
     except requests.exceptions.Timeout:
@@ -238,7 +239,7 @@ def process_readyphotos(message):
         barcodes_param = ",".join(barcodes)
         params = {"barcodes": barcodes_param}
         
-        response = requests.get(f"{BACKEND_URL}/ft/ready-photos/", params=params)
+        response = get_session().get(f"{BACKEND_URL}/ft/ready-photos/", params=params, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         results = data.get("results", [])
@@ -437,7 +438,7 @@ def check_existing_telegram(chat_id):
     try:
         url = f"{BACKEND_URL}/auto/userprofile_by_telegram/"
         params = {"telegram_id": chat_id}
-        response = requests.get(url, params=params)
+        response = get_session().get(url, params=params, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -453,7 +454,7 @@ def verify_user_credentials(username, password):
     try:
         url = f"{BACKEND_URL}/auto/verify_credentials/"
         payload = {"username": username, "password": password}
-        response = requests.post(url, json=payload)
+        response = get_session().post(url, json=payload, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         return data.get("success", False)
@@ -475,7 +476,7 @@ def update_telegram_profile(username, chat_id, telegram_name):
             "telegram_id": str(chat_id),
             "telegram_name": telegram_name
         }
-        response = requests.post(url, json=payload)
+        response = get_session().post(url, json=payload, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         return data.get("success", False)